@@ -1,129 +1,58 @@
 """
 Streamlit Dashboard for CBAM-ResNet50 Cervical Cancer Cell Classification
 Complete Pipeline: Raw Image → Preprocessing → Classification → Explainability
+
+Heavy dependencies are imported lazily by the subsystem that needs them, so a
+cold start only pays for Streamlit, OpenCV and NumPy:
+  - torch / torchvision (cbam_model.py): first model load or prediction
+  - pandas / plotly: probability chart
+  - pytorch_grad_cam: Step 3 explainability (Grad-CAM++ only; CBAM attention
+    maps are captured during the prediction forward pass, see attention_maps.py)
+  - pyarrow (results_store.py): only when PHOENIX_RESULTS_STORE is set
+
+Pipeline stages are instrumented with phoenix_shared/tracing.py (off unless PHOENIX_TRACE,
+PHOENIX_TRACE_FILE or PHOENIX_METRICS_PORT is set). With PHOENIX_RESULTS_STORE,
+every prediction is appended to that results store.
 """
 
+import hashlib
+import json
+import os
 import streamlit as st
-import torch
-import torch.nn as nn
-import torch.nn.functional as F
-from torchvision import transforms, models
 import cv2
 import numpy as np
-import matplotlib.pyplot as plt
 from PIL import Image
 from pathlib import Path
-import pandas as pd
-import plotly.express as px
-from skimage.metrics import structural_similarity as ssim
-
-# Grad-CAM libraries
-from pytorch_grad_cam import GradCAMPlusPlus
-from pytorch_grad_cam.utils.model_targets import ClassifierOutputTarget
-from pytorch_grad_cam.utils.image import show_cam_on_image
-
-# ============================================================================
-# MODEL ARCHITECTURE DEFINITION
-# ============================================================================
-
-class ChannelAttention(nn.Module):
-    """Channel Attention Module - focuses on 'what' is meaningful."""
-    def __init__(self, in_channels, reduction_ratio=16):
-        super(ChannelAttention, self).__init__()
-        self.avg_pool = nn.AdaptiveAvgPool2d(1)
-        self.max_pool = nn.AdaptiveMaxPool2d(1)
-        self.fc = nn.Sequential(
-            nn.Conv2d(in_channels, in_channels // reduction_ratio, 1, bias=False),
-            nn.ReLU(inplace=True),
-            nn.Conv2d(in_channels // reduction_ratio, in_channels, 1, bias=False)
-        )
-        self.sigmoid = nn.Sigmoid()
-
-    def forward(self, x):
-        avg_out = self.fc(self.avg_pool(x))
-        max_out = self.fc(self.max_pool(x))
-        out = self.sigmoid(avg_out + max_out)
-        return x * out
-
-
-class SpatialAttention(nn.Module):
-    """Spatial Attention Module - focuses on 'where' is meaningful."""
-    def __init__(self, kernel_size=7):
-        super(SpatialAttention, self).__init__()
-        padding = 3 if kernel_size == 7 else 1
-        self.conv = nn.Conv2d(2, 1, kernel_size, padding=padding, bias=False)
-        self.sigmoid = nn.Sigmoid()
-
-    def forward(self, x):
-        avg_out = torch.mean(x, dim=1, keepdim=True)
-        max_out, _ = torch.max(x, dim=1, keepdim=True)
-        out = torch.cat([avg_out, max_out], dim=1)
-        out = self.sigmoid(self.conv(out))
-        return x * out
-
-
-class CBAM(nn.Module):
-    """Convolutional Block Attention Module (CBAM)."""
-    def __init__(self, in_channels, reduction_ratio=16, kernel_size=7):
-        super(CBAM, self).__init__()
-        self.channel_attention = ChannelAttention(in_channels, reduction_ratio)
-        self.spatial_attention = SpatialAttention(kernel_size)
-
-    def forward(self, x):
-        x = self.channel_attention(x)
-        x = self.spatial_attention(x)
-        return x
-
-
-class CBAM_ResNet50(nn.Module):
-    """ResNet50 with CBAM attention modules."""
-    def __init__(self, num_classes=5, pretrained=False):
-        super(CBAM_ResNet50, self).__init__()
-        
-        resnet = models.resnet50(weights=None)
-
-        self.conv1 = resnet.conv1
-        self.bn1 = resnet.bn1
-        self.relu = resnet.relu
-        self.maxpool = resnet.maxpool
-
-        self.layer1 = resnet.layer1
-        self.cbam1 = CBAM(256)
-
-        self.layer2 = resnet.layer2
-        self.cbam2 = CBAM(512)
-
-        self.layer3 = resnet.layer3
-        self.cbam3 = CBAM(1024)
-
-        self.layer4 = resnet.layer4
-        self.cbam4 = CBAM(2048)
-
-        self.avgpool = resnet.avgpool
-        self.fc = nn.Linear(2048, num_classes)
-
-    def forward(self, x):
-        x = self.conv1(x)
-        x = self.bn1(x)
-        x = self.relu(x)
-        x = self.maxpool(x)
-
-        x = self.layer1(x)
-        x = self.cbam1(x)
-
-        x = self.layer2(x)
-        x = self.cbam2(x)
 
-        x = self.layer3(x)
-        x = self.cbam3(x)
-
-        x = self.layer4(x)
-        x = self.cbam4(x)
-
-        x = self.avgpool(x)
-        x = torch.flatten(x, 1)
-        logits = self.fc(x)
-        return logits
+from image_metrics import batch_preprocessing_metrics
+from model_input import PREPROCESS_SIZE, ImageTooLargeError, probe_image
+from rendering import CODECS, EncodedImage, render_overlays
+from results_store import image_hash
+from stage_cache import StageCache
+from phoenix_shared import tracing
+from phoenix_shared.tracing import span, traced
+
+_MODEL_CLASSES = ('ChannelAttention', 'SpatialAttention', 'CBAM', 'CBAM_ResNet50')
+DEFERRED_DOWNLOADS = tuple(int(part) for part in st.__version__.split('.')[:2]) >= (1, 50)
+
+# Dashboard stages and their inputs; a widget change reruns only the stages downstream of it
+PIPELINE_STAGES = {
+    'image': (),
+    'preprocessed': ('image',),
+    'model': (),
+    'probabilities': ('preprocessed', 'model'),
+    'gradcam': ('probabilities',),
+    'attention': ('probabilities',),
+    'class_gradcams': ('preprocessed', 'model'),
+}
+
+
+def __getattr__(name):
+    """Lazily re-export the model classes so `from app import CBAM_ResNet50` keeps working."""
+    if name in _MODEL_CLASSES:
+        import cbam_model
+        return getattr(cbam_model, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # ============================================================================
@@ -131,33 +60,116 @@ class CBAM_ResNet50(nn.Module):
 # ============================================================================
 
 @st.cache_resource
+@traced('load_model')
 def load_model(model_path):
     """Load the trained CBAM-ResNet50 model."""
     # Get the directory where app.py is located
     app_dir = Path(__file__).parent
     full_model_path = app_dir / model_path
+    # Slim weights-only export (see checkpoint_io.py), preferred when present
+    weights_path = full_model_path.with_suffix('.safetensors')
     
-    if not full_model_path.exists():
+    if not full_model_path.exists() and not weights_path.exists():
         st.error(f"❌ Model file not found at {full_model_path}")
         st.stop()
     
+    import torch
+    from cbam_model import cbam_resnet50_for_shapes
+
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    checkpoint = torch.load(full_model_path, map_location=device)
     
     class_names = ['Dyskeratotic', 'Koilocytotic', 'Metaplastic', 'Parabasal', 'Superficial-Intermediate']
-    num_classes = 5
     
-    model = CBAM_ResNet50(num_classes=num_classes)
-    model.load_state_dict(checkpoint['model_state_dict'])
+    # The export is only used while it matches the checkpoint; retraining overwrites the .pth, not the export
+    if weights_path.exists() and full_model_path.exists():
+        from checkpoint_io import export_is_current
+        if not export_is_current(weights_path, full_model_path):
+            st.warning(f"⚠️ Stale export: {weights_path.name} was not exported from the current {full_model_path.name}; "
+                       f"loading the checkpoint instead. Re-export with `python checkpoint_io.py export {model_path}`.")
+            weights_path = None
+    
+    # Layer widths are taken from the stored weights, so channel-pruned models (pruning.py) load too
+    if weights_path is not None and weights_path.exists():
+        from checkpoint_io import load_model_weights, read_header
+        shapes = {name: info['shape'] for name, info in read_header(weights_path)[0].items()}
+        model, _ = load_model_weights(lambda: cbam_resnet50_for_shapes(shapes), weights_path, device=device)
+        return model
+    
+    checkpoint = torch.load(full_model_path, map_location=device)
+    state_dict = checkpoint['model_state_dict']
+    model = cbam_resnet50_for_shapes({name: tensor.shape for name, tensor in state_dict.items()})
+    model.load_state_dict(state_dict)
     model = model.to(device)
     model.eval()
     
     return model
 
 
+@st.cache_resource
+def get_registry(registry_root):
+    """Shared model registry (see model_registry.py), one instance per process."""
+    from model_registry import ModelRegistry
+    return ModelRegistry(registry_root)
+
+
+def get_model(model_path):
+    """
+    Current model from the shared registry when PHOENIX_MODEL_REGISTRY is set
+    (weights shared across processes, hot-swappable), else from `model_path`.
+    """
+    registry_root = os.environ.get('PHOENIX_MODEL_REGISTRY')
+    if registry_root:
+        return get_registry(registry_root).get('cbam').model
+    return load_model(model_path)
+
+
+def model_version(model_path):
+    """Identifies the model `get_model` returns, so cached predictions follow hot swaps."""
+    registry_root = os.environ.get('PHOENIX_MODEL_REGISTRY')
+    if registry_root:
+        return ('registry', registry_root, get_registry(registry_root).get('cbam').version)
+    return ('file', model_path)
+
+
+def model_version_label(model_path):
+    """`model_version` as the string recorded with every stored result."""
+    return ':'.join(str(part) for part in model_version(model_path))
+
+
+@st.cache_resource
+def get_results_writer(store_root):
+    """Shared results store writer (see results_store.py), one per process; rows are written in batches."""
+    from cbam_model import CLASS_NAMES
+    from results_store import ResultsWriter
+    return ResultsWriter(store_root, CLASS_NAMES)
+
+
+def record_results(records):
+    """
+    Append predictions to the results store when PHOENIX_RESULTS_STORE is set.
+    records: dicts of `ResultsWriter.record` arguments.
+    """
+    store_root = os.environ.get('PHOENIX_RESULTS_STORE')
+    if not store_root:
+        return
+    writer = get_results_writer(store_root)
+    for record in records:
+        writer.record(**record)
+
+
 def preprocess_image_for_model(image_pil):
-    """Preprocess PIL image for model inference."""
+    """
+    Preprocess an image for model inference. A BGR uint8 array (the
+    preprocessing pipeline's output) takes the copy-free path of
+    model_input.py; a PIL image goes through the torchvision transforms.
+    """
+    import torch
+    from torchvision import transforms
+
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    if isinstance(image_pil, np.ndarray):
+        from model_input import bgr_to_tensor
+        return bgr_to_tensor(image_pil).to(device)
     transform = transforms.Compose([
         transforms.Resize((224, 224)),
         transforms.ToTensor(),
@@ -168,13 +180,18 @@ def preprocess_image_for_model(image_pil):
     return img_tensor
 
 
+@traced('predict')
 def predict(image_pil, model):
     """Get model prediction."""
+    import torch
+    import torch.nn.functional as F
+
     class_names = ['Dyskeratotic', 'Koilocytotic', 'Metaplastic', 'Parabasal', 'Superficial-Intermediate']
     
-    img_tensor = preprocess_image_for_model(image_pil)
+    with span('predict.to_tensor'):
+        img_tensor = preprocess_image_for_model(image_pil)
     
-    with torch.no_grad():
+    with torch.no_grad(), span('predict.forward'):
         outputs = model(img_tensor)
         probs = F.softmax(outputs, dim=1)
         pred_idx = torch.argmax(probs, dim=1).item()
@@ -187,38 +204,115 @@ def predict(image_pil, model):
     return pred_class, confidence, all_probs
 
 
-def generate_gradcam(image_pil, model, target_class):
-    """Generate GradCAM++ visualization."""
+@traced('predict')
+def predict_with_attention(image_pil, model):
+    """
+    Prediction plus the CBAM spatial-attention maps recorded during the same
+    forward pass: (pred_class, confidence, all_probs, attention) where
+    attention = (fused (224, 224) map, {stage: (224, 224) map}).
+    """
+    import torch
+    import torch.nn.functional as F
+    from attention_maps import AttentionCapture, fuse_attention, stage_maps
+
     class_names = ['Dyskeratotic', 'Koilocytotic', 'Metaplastic', 'Parabasal', 'Superficial-Intermediate']
     
-    img_tensor = preprocess_image_for_model(image_pil)
+    with span('predict.to_tensor'):
+        img_tensor = preprocess_image_for_model(image_pil)
     
-    # Prepare RGB image for overlay
-    rgb_img = np.array(image_pil.resize((224, 224)))
-    rgb_img = np.float32(rgb_img) / 255.0
+    with torch.no_grad(), span('predict.forward'), AttentionCapture(model) as capture:
+        probs = F.softmax(model(img_tensor), dim=1)
+    pred_idx = torch.argmax(probs, dim=1).item()
+    all_probs = {class_names[i]: probs[0, i].item() * 100 for i in range(len(class_names))}
+    
+    with span('predict.attention'):
+        fused = fuse_attention(capture.maps)[0]
+        stages = {stage: maps[0] for stage, maps in stage_maps(capture.maps).items()}
+    
+    return class_names[pred_idx], all_probs[class_names[pred_idx]], all_probs, (fused, stages)
+
+
+def compute_gradcams(image_pil, model, target_classes):
+    """
+    GradCAM++ maps for several target classes in one batched forward/backward
+    pass. Returns an (N, 224, 224) float array; a target that is not a class
+    name uses the predicted class.
+    """
+    from pytorch_grad_cam import GradCAMPlusPlus
+    from pytorch_grad_cam.utils.model_targets import ClassifierOutputTarget
+
+    class_names = ['Dyskeratotic', 'Koilocytotic', 'Metaplastic', 'Parabasal', 'Superficial-Intermediate']
+    
+    img_tensor = preprocess_image_for_model(image_pil)
     
     # GradCAM++
     target_layers = [model.layer4[-1]]
     cam = GradCAMPlusPlus(model=model, target_layers=target_layers)
     
-    # If target class specified, use it
-    if target_class in class_names:
-        target_idx = class_names.index(target_class)
-        targets = [ClassifierOutputTarget(target_idx)]
+    # If target classes specified, use them (one batch row per target)
+    if all(target in class_names for target in target_classes):
+        targets = [ClassifierOutputTarget(class_names.index(target)) for target in target_classes]
     else:
-        targets = None
-    
-    grayscale_cam = cam(input_tensor=img_tensor, targets=targets)
-    grayscale_cam = grayscale_cam[0, :]
+        import torch
+        with torch.no_grad():
+            pred_idx = model(img_tensor).argmax(dim=1).item()
+        targets = [ClassifierOutputTarget(class_names.index(target) if target in class_names else pred_idx)
+                   for target in target_classes]
     
-    # Create heatmap
-    heatmap = cv2.applyColorMap(np.uint8(255 * grayscale_cam), cv2.COLORMAP_JET)
-    heatmap = cv2.cvtColor(heatmap, cv2.COLOR_BGR2RGB)
+    with span('gradcam.cam', targets=len(targets)):
+        return cam(input_tensor=img_tensor.repeat(len(targets), 1, 1, 1), targets=targets)
+
+
+@traced('gradcam')
+def generate_gradcams(image_pil, model, target_classes):
+    """GradCAM++ heatmaps and overlays for several target classes, each (N, 224, 224, 3) uint8."""
+    cams = compute_gradcams(image_pil, model, target_classes)
     
-    # Create overlay
-    visualization = show_cam_on_image(rgb_img, grayscale_cam, use_rgb=True)
+    # Prepare RGB image for overlay
+    rgb_img = np.array(image_pil.convert('RGB').resize((224, 224)))
     
-    return heatmap, visualization
+    with span('gradcam.overlay', targets=len(cams)):
+        return render_overlays(rgb_img, cams)
+
+
+@traced('attention')
+def render_attention(image_pil, attention):
+    """Heatmaps and overlays for the fused attention map followed by each stage's map, (5, 224, 224, 3) uint8."""
+    fused, stages = attention
+    rgb_img = np.array(image_pil.convert('RGB').resize((224, 224)))
+    return render_overlays(rgb_img, np.stack([fused] + list(stages.values())))
+
+
+def generate_gradcam(image_pil, model, target_class):
+    """Generate GradCAM++ visualization."""
+    heatmaps, overlays = generate_gradcams(image_pil, model, [target_class])
+    return heatmaps[0], overlays[0]
+
+
+@traced('predict_batch')
+def predict_batch(images_pil, model):
+    """Class probabilities for a list of PIL images or BGR arrays in one forward pass, shape (N, 5)."""
+    import torch
+    import torch.nn.functional as F
+
+    if all(isinstance(image, np.ndarray) for image in images_pil):
+        from model_input import MODEL_INPUT_SIZE, bgr_to_tensor
+        # each image is normalised straight into its row of the batch
+        img_tensor = torch.empty((len(images_pil), 3, MODEL_INPUT_SIZE, MODEL_INPUT_SIZE))
+        for i, image in enumerate(images_pil):
+            bgr_to_tensor(image, out=img_tensor[i])
+        img_tensor = img_tensor.to(next(model.parameters()).device)
+    else:
+        img_tensor = torch.cat([preprocess_image_for_model(image) for image in images_pil])
+    with torch.no_grad(), span('predict.forward', batch=len(images_pil)):
+        return F.softmax(model(img_tensor), dim=1).cpu().numpy()
+
+
+def download_data(encoded):
+    """Streamlit 1.50+ accepts a callable and encodes only when the button is clicked."""
+    if DEFERRED_DOWNLOADS:
+        return encoded
+    return encoded.data
 
 
 # ============================================================================
@@ -294,55 +388,126 @@ def apply_clahe_enhancement(image, clip_limit=1.2, tile_grid_size=6):
     return cv2.merge(enhanced_channels)
 
 
+@traced('preprocess')
 def apply_preprocessing_pipeline(image_bgr):
     """Complete preprocessing pipeline."""
     # Step 1: Resize
-    resized, padding_info = resize_with_aspect_ratio_mirroring(image_bgr, target_size=256)
+    with span('preprocess.resize'):
+        resized, padding_info = resize_with_aspect_ratio_mirroring(image_bgr, target_size=256)
     
     # Step 2: NLM Denoising
-    nlm_denoised = apply_nlm_denoising(resized)
+    with span('preprocess.nlm'):
+        nlm_denoised = apply_nlm_denoising(resized)
     
     # Step 3: CLAHE Enhancement
-    final_image = apply_clahe_enhancement(nlm_denoised)
+    with span('preprocess.clahe'):
+        final_image = apply_clahe_enhancement(nlm_denoised)
     
     return resized, nlm_denoised, final_image, padding_info
 
 
+@traced('preprocess.metrics')
 def calculate_preprocessing_metrics(original, processed):
     """Calculate quality metrics between original and processed images."""
-    def calculate_psnr(img1, img2):
-        mse = np.mean((img1.astype(float) - img2.astype(float)) ** 2)
-        if mse == 0:
-            return float('inf')
-        return 20 * np.log10(255.0 / np.sqrt(mse))
-    
-    def calculate_ssim(img1, img2):
-        gray1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-        gray2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-        return ssim(gray1, gray2, data_range=255)
-    
-    def calculate_contrast(img):
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        return np.std(gray)
-    
-    psnr = calculate_psnr(original, processed)
-    ssim_val = calculate_ssim(original, processed)
-    contrast_orig = calculate_contrast(original)
-    contrast_proc = calculate_contrast(processed)
-    contrast_improvement = contrast_proc / contrast_orig if contrast_orig != 0 else 0
-    
-    return {
-        'PSNR (dB)': psnr,
-        'SSIM': ssim_val,
-        'Contrast Improvement': contrast_improvement
-    }
+    metrics = batch_preprocessing_metrics(original[None], processed[None])
+    return {name: float(values[0]) for name, values in metrics.items()}
+
+
+@traced('decode')
+def decode_upload(data):
+    """
+    Encoded upload bytes → BGR array, decoded in place by OpenCV
+    (model_input.py). Large fields are decoded at reduced scale, just big
+    enough for the 256px preprocessing resize.
+    """
+    from model_input import PREPROCESS_SIZE, decode_image_bytes
+    return decode_image_bytes(data, target_size=PREPROCESS_SIZE)
+
+
+def run_preprocessing(image_bgr):
+    """Preprocessing pipeline plus quality metrics: (resized, nlm_denoised, final_image, padding_info, metrics)."""
+    resized, nlm_denoised, final_image, padding_info = apply_preprocessing_pipeline(image_bgr)
+    metrics = calculate_preprocessing_metrics(resized, final_image)
+    return resized, nlm_denoised, final_image, padding_info, metrics
+
+
+def preprocess_for_batch(image_bgr):
+    """Preprocessing pipeline → BGR array of the final (CLAHE) stage, the model input (see predict_batch)."""
+    _, _, final_image, _ = apply_preprocessing_pipeline(image_bgr)
+    return final_image
 
 
 # ============================================================================
 # STREAMLIT APP
 # ============================================================================
 
+def run_batch_mode(uploaded_files, model_path, batch_size):
+    """Classify every uploaded image (and zip member) chunk by chunk, streaming rows into a table."""
+    import pandas as pd
+    from batch_processing import classify_stream, expand_uploads
+    from cbam_model import CLASS_NAMES
+
+    st.markdown("---")
+    st.markdown("## 📦 Batch Classification")
+    st.markdown("Each image goes through the same Resize → NLM → CLAHE pipeline before classification.")
+
+    entries = expand_uploads(uploaded_files)
+    if not entries:
+        st.warning("No images found in the uploaded files.")
+        return
+
+    with st.spinner("Loading CBAM-ResNet50 model..."):
+        model = get_model(model_path)
+
+    # Results survive reruns until the uploads or the model change
+    upload_ids = [(f.name, getattr(f, 'size', None), getattr(f, 'file_id', None)) for f in uploaded_files]
+    batch_key = hashlib.blake2b(repr((upload_ids, model_version(model_path))).encode('utf-8'),
+                                digest_size=16).hexdigest()
+
+    table = st.empty()
+    cached = st.session_state.get('batch_results')
+    if cached is not None and cached[0] == batch_key:
+        rows = cached[1]
+    else:
+        rows = []
+        progress = st.progress(0.0, text=f"Classifying {len(entries)} images...")
+        for chunk_rows in classify_stream(entries, preprocess_for_batch,
+                                          lambda images: predict_batch(images, model),
+                                          CLASS_NAMES, chunk_size=batch_size):
+            rows.extend(chunk_rows)
+            progress.progress(len(rows) / len(entries), text=f"Classified {len(rows)} / {len(entries)} images")
+            table.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        progress.empty()
+        st.session_state['batch_results'] = (batch_key, rows)
+        version = model_version_label(model_path)
+        record_results([
+            {'image_hash': row['Image Hash'], 'file_name': row['File'], 'source': 'batch', 'model_version': version,
+             'probabilities': [row[f"{name} (%)"] / 100 for name in CLASS_NAMES]}
+            for row in rows if 'Error' not in row
+        ])
+
+    results_df = pd.DataFrame(rows)
+    table.dataframe(results_df, use_container_width=True, hide_index=True)
+
+    if 'Predicted Class' in results_df:
+        st.markdown("#### 📊 Predicted Class Counts")
+        counts = results_df['Predicted Class'].value_counts().reindex(CLASS_NAMES, fill_value=0)
+        st.bar_chart(counts)
+    if 'Error' in results_df:
+        st.warning(f"{int(results_df['Error'].notna().sum())} file(s) could not be decoded.")
+
+    st.download_button(
+        label="📥 Download Batch Results (CSV)",
+        data=results_df.to_csv(index=False),
+        file_name="batch_results.csv",
+        mime="text/csv",
+        use_container_width=True
+    )
+
+
 def main():
+    tracing.configure_from_env()
+
     # Page configuration
     st.set_page_config(
         page_title="Cervical Cancer Cell Classifier",
@@ -399,11 +564,12 @@ def main():
         st.header("📤 Image Input")
         input_method = st.radio(
             "Choose input method:",
-            ["Upload Image", "Use Sample Images"],
-            help="Upload your own image or select from sample images"
+            ["Upload Image", "Use Sample Images", "Batch Upload"],
+            help="Upload your own image, select from sample images, or classify many images at once"
         )
         
         uploaded_file = None
+        uploaded_files = []
         sample_image_path = None
         
         if input_method == "Upload Image":
@@ -412,6 +578,14 @@ def main():
                 type=["bmp", "png", "jpg", "jpeg"],
                 help="Upload a microscopy image of cervical cells"
             )
+        elif input_method == "Batch Upload":
+            uploaded_files = st.file_uploader(
+                "Choose cervical cell images or zip archives",
+                type=["bmp", "png", "jpg", "jpeg", "zip"],
+                accept_multiple_files=True,
+                help="Images are decoded and classified in batches, so large uploads stay within memory"
+            )
+            batch_size = st.select_slider("Batch Size", options=[4, 8, 16, 32, 64], value=16)
         else:
             # Sample images
             st.markdown("**Select a sample image:**")
@@ -432,15 +606,13 @@ def main():
                     if selected_sample:
                         sample_image_path = sample_dir / selected_sample
                         
-                        # Show preview
-                        preview_img = Image.open(sample_image_path)
-                        st.image(preview_img, caption=selected_sample, use_container_width=True)
+                        # Read the file once; the preview is served from the encoded bytes (no decode here)
+                        sample_bytes = sample_image_path.read_bytes()
+                        st.image(sample_bytes, caption=selected_sample, use_container_width=True)
                         
-                        # Create a virtual uploaded file for consistency
+                        # Create a virtual uploaded file for consistency (BytesIO shares the bytes until written)
                         from io import BytesIO
-                        buf = BytesIO()
-                        preview_img.save(buf, format=preview_img.format if preview_img.format else 'PNG')
-                        buf.seek(0)
+                        buf = BytesIO(sample_bytes)
                         buf.name = selected_sample
                         uploaded_file = buf
                 else:
@@ -454,6 +626,18 @@ def main():
         st.header("🎨 Visualization Options")
         show_heatmap = st.checkbox("Show Heatmap Only", value=False)
         show_class_specific = st.checkbox("Show Class-Specific Activations", value=False)
+        download_codec = st.selectbox(
+            "Download Format",
+            list(CODECS),
+            format_func=str.upper,
+            help="PNG is lossless; WebP and JPEG downloads are smaller"
+        )
+        explain_method = st.selectbox(
+            "Explanation Method",
+            ["GradCAM++", "CBAM Attention"],
+            help="CBAM Attention reuses the attention maps from the prediction pass (no extra computation); "
+                 "GradCAM++ is class-specific but needs a backward pass"
+        )
         
         st.markdown("---")
         
@@ -471,7 +655,10 @@ def main():
         """)
     
     # Main content
-    if uploaded_file is None:
+    if input_method == "Batch Upload" and uploaded_files:
+        run_batch_mode(uploaded_files, model_path, batch_size)
+    
+    elif uploaded_file is None:
         st.info("👈 Please upload a cervical cell image using the sidebar to begin the analysis pipeline.")
         
         # Show workflow diagram
@@ -505,7 +692,7 @@ def main():
             - **Base:** ResNet50  
             - **Attention:** CBAM (Channel + Spatial)  
             - **Parameters:** 24,214,989  
-            - **Explainability:** GradCAM++
+            - **Explainability:** GradCAM++, CBAM attention
             """)
 
         with col2:
@@ -533,16 +720,23 @@ def main():
         st.markdown("## 🔬 Step 1: Image Preprocessing Pipeline")
         st.markdown("The uploaded raw image is preprocessed to enhance quality and remove noise before classification.")
         
+        # Stages cached across reruns of this session; UI-only toggles reuse them
+        stages = StageCache(st.session_state.setdefault('pipeline_stages', {}), PIPELINE_STAGES)
+        
         # Load the uploaded image
-        image_pil = Image.open(uploaded_file).convert('RGB')
-        image_bgr = cv2.cvtColor(np.array(image_pil), cv2.COLOR_RGB2BGR)
+        upload_bytes = uploaded_file.getvalue()
+        upload_hash = image_hash(upload_bytes)
+        try:
+            image_bgr = stages.run('image', lambda: decode_upload(upload_bytes), params=upload_hash)
+        except ImageTooLargeError as e:
+            st.error(f"❌ {e}. Please upload a smaller image.")
+            st.stop()
+        original_size = probe_image(upload_bytes)[1] or (image_bgr.shape[1], image_bgr.shape[0])
         
         with st.spinner("Applying preprocessing pipeline..."):
-            # Apply preprocessing
-            resized, nlm_denoised, final_image, padding_info = apply_preprocessing_pipeline(image_bgr)
-            
-            # Calculate metrics
-            metrics = calculate_preprocessing_metrics(resized, final_image)
+            resized, nlm_denoised, final_image, padding_info, metrics = stages.run(
+                'preprocessed', lambda: run_preprocessing(image_bgr)
+            )
         
         # Display preprocessing steps
         col1, col2, col3, col4 = st.columns(4)
@@ -550,12 +744,13 @@ def main():
         with col1:
             st.markdown("**📸 Original**")
             st.image(cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB), use_container_width=True)
-            st.caption(f"Size: {image_bgr.shape[1]}×{image_bgr.shape[0]}")
+            st.caption(f"Size: {original_size[0]}×{original_size[1]}")
         
         with col2:
             st.markdown("**① Resized (256×256)**")
             st.image(cv2.cvtColor(resized, cv2.COLOR_BGR2RGB), use_container_width=True)
-            st.caption(f"Scale: {padding_info['scale_factor']:.3f}")
+            # padding_info's factor is relative to the (possibly reduced) decode; report it against the upload
+            st.caption(f"Scale: {PREPROCESS_SIZE / max(original_size):.3f}")
         
         with col3:
             st.markdown("**② NLM Denoised**")
@@ -591,14 +786,31 @@ def main():
         
         # Load model
         with st.spinner("Loading CBAM-ResNet50 model..."):
-            model = load_model(model_path)
+            model = stages.run('model', lambda: get_model(model_path), params=model_version(model_path))
         
-        # Convert preprocessed image to PIL for prediction
+        # RGB PIL copy of the preprocessed image for display, downloads and GradCAM overlays
         preprocessed_pil = Image.fromarray(cv2.cvtColor(final_image, cv2.COLOR_BGR2RGB))
         
-        # Get prediction using preprocessed image
+        # Get prediction using preprocessed image (the BGR array goes straight into the model tensor)
         with st.spinner("Making prediction on preprocessed image..."):
-            pred_class, confidence, all_probs = predict(preprocessed_pil, model)
+            pred_class, confidence, all_probs, attention = stages.run(
+                'probabilities', lambda: predict_with_attention(final_image, model)
+            )
+        
+        # Record each (image, model) prediction once per session, not on every rerun
+        version = model_version_label(model_path)
+        recorded = st.session_state.setdefault('recorded_results', set())
+        if (upload_hash, version) not in recorded:
+            record_results([{
+                'image_hash': upload_hash,
+                'file_name': uploaded_file.name,
+                'source': 'app',
+                'model_version': version,
+                'probabilities': {k: v / 100 for k, v in all_probs.items()},
+                'metrics': {'psnr_db': metrics['PSNR (dB)'], 'ssim': metrics['SSIM'],
+                            'contrast_improvement': metrics['Contrast Improvement']},
+            }])
+            recorded.add((upload_hash, version))
         
         # Display classification results
         col1, col2 = st.columns([1, 2])
@@ -616,38 +828,45 @@ def main():
             # st.markdown(f"**Confidence:** `{confidence:.2f}%`")
             # st.markdown('</div>', unsafe_allow_html=True)
             
-            # Download preprocessed image
+            # Download preprocessed image (encoded on demand)
             st.markdown("")
-            from io import BytesIO
-            buf = BytesIO()
-            preprocessed_pil.save(buf, format='PNG')
+            preprocessed_download = EncodedImage(np.asarray(preprocessed_pil), codec=download_codec)
             st.download_button(
                 label="📥 Download Preprocessed Image",
-                data=buf.getvalue(),
-                file_name=f"preprocessed_{uploaded_file.name}",
-                mime="image/png",
+                data=download_data(preprocessed_download),
+                file_name=preprocessed_download.file_name(f"preprocessed_{Path(uploaded_file.name).stem}"),
+                mime=preprocessed_download.mime,
                 use_container_width=True
             )
         
         with col2:
             st.markdown("#### 📈 Class Probabilities")
-            # Create bar chart
-            prob_df = pd.DataFrame({
-                'Class': list(all_probs.keys()),
-                'Probability': list(all_probs.values())
-            })
-            fig = px.bar(prob_df, x='Probability', y='Class', orientation='h',
-                       color='Probability', color_continuous_scale='Blues')
-            fig.update_layout(height=280, showlegend=False, margin=dict(l=0, r=0, t=0, b=0))
-            st.plotly_chart(fig, use_container_width=True)
+            import pandas as pd
+            import plotly.express as px
+
+            with span('render.probability_chart'):
+                # Create bar chart
+                prob_df = pd.DataFrame({
+                    'Class': list(all_probs.keys()),
+                    'Probability': list(all_probs.values())
+                })
+                fig = px.bar(prob_df, x='Probability', y='Class', orientation='h',
+                           color='Probability', color_continuous_scale='Blues')
+                fig.update_layout(height=280, showlegend=False, margin=dict(l=0, r=0, t=0, b=0))
+                st.plotly_chart(fig, use_container_width=True)
         
         # STEP 3: EXPLAINABILITY
         st.markdown("---")
-        st.markdown("## 🔍 Step 3: Explainable AI (GradCAM++)")
-        st.markdown("GradCAM++ highlights which regions of the **preprocessed image** were most important for the model's classification decision.")
-        
-        with st.spinner("Generating GradCAM++ visualization..."):
-            heatmap, overlay = generate_gradcam(preprocessed_pil, model, pred_class)
+        st.markdown(f"## 🔍 Step 3: Explainable AI ({explain_method})")
+        if explain_method == "CBAM Attention":
+            st.markdown("The CBAM spatial attention maps from the classification pass, fused across the four stages, show where in the **preprocessed image** the model focused.")
+            heatmaps, overlays = stages.run('attention', lambda: render_attention(preprocessed_pil, attention))
+            heatmap, overlay = heatmaps[0], overlays[0]
+        else:
+            st.markdown("GradCAM++ highlights which regions of the **preprocessed image** were most important for the model's classification decision.")
+            
+            with st.spinner("Generating GradCAM++ visualization..."):
+                heatmap, overlay = stages.run('gradcam', lambda: generate_gradcam(preprocessed_pil, model, pred_class))
         
         # col1, col2 = st.columns(2)
         
@@ -664,7 +883,7 @@ def main():
                 st.caption("Red = High activation, Blue = Low activation")
             
             with col3:
-                st.markdown("#### 🎨 GradCAM++ Overlay")
+                st.markdown(f"#### 🎨 {explain_method} Overlay")
                 st.image(overlay, use_container_width=True)
                 st.caption("Heatmap overlaid on preprocessed image")
 
@@ -677,7 +896,7 @@ def main():
                 st.caption("Input to the model")
 
             with col2:
-                st.markdown("#### 🎨 GradCAM++ Overlay")
+                st.markdown(f"#### 🎨 {explain_method} Overlay")
                 st.image(overlay, use_container_width=True)
                 st.caption("Heatmap overlaid on preprocessed image")
             
@@ -686,6 +905,15 @@ def main():
             #     st.image(heatmap, use_container_width=True)
             #     st.caption("Red = High activation, Blue = Low activation")
         
+        # Attention of each CBAM stage (fine → coarse)
+        if explain_method == "CBAM Attention":
+            st.markdown("#### 🧩 Attention by Stage")
+            stage_cols = st.columns(4)
+            for idx, stage_name in enumerate(attention[1]):
+                with stage_cols[idx]:
+                    st.image(overlays[idx + 1], use_container_width=True)
+                    st.caption(f"{stage_name} ({224 // 2 ** (idx + 2)}×{224 // 2 ** (idx + 2)} attention)")
+        
         # Class-specific GradCAM
         if show_class_specific:
             st.markdown("---")
@@ -695,11 +923,13 @@ def main():
             class_cols = st.columns(5)
             class_names = ['Dyskeratotic', 'Koilocytotic', 'Metaplastic', 'Parabasal', 'Superficial-Intermediate']
             
+            with st.spinner("Generating class-specific activation maps..."):
+                _, class_overlays = stages.run('class_gradcams',
+                                               lambda: generate_gradcams(preprocessed_pil, model, class_names))
+            
             for idx, class_name in enumerate(class_names):
                 with class_cols[idx]:
-                    with st.spinner(f"Generating {class_name}..."):
-                        _, class_overlay = generate_gradcam(preprocessed_pil, model, class_name)
-                    st.image(class_overlay, use_container_width=True)
+                    st.image(class_overlays[idx], use_container_width=True)
                     st.caption(f"{class_name}")
                     prob_val = all_probs.get(class_name, 0)
                     st.caption(f"Prob: {prob_val:.1f}%")
@@ -741,23 +971,24 @@ def main():
             pass
         
         with col2:
-            # Save overlay as bytes for download
-            overlay_pil = Image.fromarray(overlay)
-            
-            buf_overlay = BytesIO()
-            overlay_pil.save(buf_overlay, format='PNG')
+            # Overlay download (encoded on demand)
+            overlay_download = EncodedImage(overlay, codec=download_codec)
             
             st.download_button(
-                label="📥 Download GradCAM++ Visualization",
-                data=buf_overlay.getvalue(),
-                file_name=f"gradcam_{pred_class}_{uploaded_file.name}",
-                mime="image/png",
+                label=f"📥 Download {explain_method} Visualization",
+                data=download_data(overlay_download),
+                file_name=overlay_download.file_name(
+                    f"{'attention' if explain_method == 'CBAM Attention' else 'gradcam'}_{pred_class}_{Path(uploaded_file.name).stem}"
+                ),
+                mime=overlay_download.mime,
                 use_container_width=True
             )
         
         with col3:
             # Create results JSON
             results_json = {
+                "image_hash": upload_hash,
+                "model_version": version,
                 "predicted_class": pred_class,
                 "confidence": float(confidence),
                 "probabilities": {k: float(v) for k, v in all_probs.items()},
@@ -770,7 +1001,7 @@ def main():
             
             st.download_button(
                 label="📥 Download Full Results (JSON)",
-                data=str(results_json),
+                data=json.dumps(results_json, indent=2),
                 file_name=f"results_{uploaded_file.name}.json",
                 mime="application/json",
                 use_container_width=True
@@ -0,0 +1,104 @@
+"""
+CBAM Spatial-Attention Explanations
+Forward Hooks on cbam1..cbam4 → Per-Stage Attention Maps → Fused Heatmap
+
+Every CBAM block already computes a spatial attention map (the sigmoid in
+`SpatialAttention.forward`) at 56×56, 28×28, 14×14 and 7×7 for a 224×224
+input. `AttentionCapture` keeps a reference to those maps while the model
+runs its normal inference forward pass, so an explanation costs no extra
+forward or backward pass; `fuse_attention` upsamples, normalises and combines
+them into one heatmap in [0, 1], ready for `rendering.render_overlays`.
+
+The maps are class-agnostic: they show where the network looked, not which
+class that evidence supports (use Grad-CAM++ for class-specific maps).
+
+Usage:
+    with AttentionCapture(model) as capture:
+        logits = model(batch)
+    cams = fuse_attention(capture.maps)          # (B, 224, 224) float32
+"""
+
+import numpy as np
+
+STAGES = ('cbam1', 'cbam2', 'cbam3', 'cbam4')
+FUSION_MODES = ('mean', 'product')
+
+
+class AttentionCapture:
+    """Context manager that records each CBAM stage's spatial attention map during forward passes."""
+
+    def __init__(self, model, stages=STAGES):
+        self.model = model
+        self.stages = tuple(stages)
+        self.maps = {}
+        self._handles = []
+
+    def _hook(self, stage):
+        def hook(module, inputs, output):
+            self.maps[stage] = output.detach()
+        return hook
+
+    def __enter__(self):
+        self.maps = {}
+        for stage in self.stages:
+            sigmoid = getattr(self.model, stage).spatial_attention.sigmoid
+            self._handles.append(sigmoid.register_forward_hook(self._hook(stage)))
+        return self
+
+    def __exit__(self, *exc):
+        for handle in self._handles:
+            handle.remove()
+        self._handles = []
+        return False
+
+
+def fuse_attention(maps, size=(224, 224), weights=None, mode='mean'):
+    """
+    Combine per-stage attention maps into one heatmap per image.
+
+    maps:    {stage: (B, 1, h, w) tensor} as recorded by AttentionCapture
+    size:    output (height, width)
+    weights: per-stage weights (default: equal)
+    mode:    'mean' (weighted arithmetic mean) or 'product' (weighted geometric
+             mean: high only where every stage attends)
+    Each stage is bilinearly upsampled and min-max normalised per image before
+    fusion; the result is min-max normalised again. Returns (B, H, W) float32.
+    """
+    import torch.nn.functional as F
+
+    if mode not in FUSION_MODES:
+        raise ValueError(f"Unknown fusion mode '{mode}'. Choose from: {', '.join(FUSION_MODES)}")
+    if not maps:
+        raise ValueError("No attention maps were captured; run the model inside AttentionCapture")
+
+    stages = [stage for stage in STAGES if stage in maps] + [stage for stage in maps if stage not in STAGES]
+    weights = [1.0] * len(stages) if weights is None else [float(w) for w in weights]
+    if len(weights) != len(stages):
+        raise ValueError(f"Expected {len(stages)} weights, got {len(weights)}")
+
+    fused = None
+    for stage, weight in zip(stages, weights):
+        stage_map = F.interpolate(maps[stage].float(), size=tuple(size), mode='bilinear', align_corners=False)[:, 0]
+        stage_map = _normalise(stage_map)
+        term = weight * (stage_map + 1e-6).log() if mode == 'product' else weight * stage_map
+        fused = term if fused is None else fused + term
+    fused = fused / sum(weights)
+    if mode == 'product':
+        fused = fused.exp()
+    return _normalise(fused).cpu().numpy().astype(np.float32)
+
+
+def stage_maps(maps, size=(224, 224)):
+    """{stage: (B, H, W) float32} upsampled and min-max normalised, for per-stage display."""
+    import torch.nn.functional as F
+
+    return {stage: _normalise(F.interpolate(value.float(), size=tuple(size), mode='bilinear',
+                                            align_corners=False)[:, 0]).cpu().numpy()
+            for stage, value in maps.items()}
+
+
+def _normalise(maps):
+    flat = maps.flatten(1)
+    flat = flat - flat.min(dim=1, keepdim=True).values
+    flat = flat / (flat.max(dim=1, keepdim=True).values + 1e-7)
+    return flat.view_as(maps)
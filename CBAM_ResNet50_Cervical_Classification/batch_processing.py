@@ -0,0 +1,100 @@
+"""
+Batched Classification of Many Uploads
+Uploads / Zip Archives → Lazy Decode → Chunks → Preprocess → One Forward Pass per Chunk
+
+Uploads are expanded into (name, opener) pairs without reading them; zip
+archives contribute one entry per image member. Images are decoded only when
+their chunk is processed, so at most `chunk_size` decoded images are held at
+a time and results stream back chunk by chunk.
+"""
+
+import zipfile
+from io import BytesIO
+from pathlib import PurePosixPath
+
+import numpy as np
+
+IMAGE_EXTENSIONS = {'.bmp', '.png', '.jpg', '.jpeg', '.tif', '.tiff'}
+DEFAULT_CHUNK_SIZE = 16
+
+
+def is_image_name(name):
+    path = PurePosixPath(name)
+    # skip macOS resource forks and hidden files inside archives
+    if path.name.startswith('.') or '__MACOSX' in path.parts:
+        return False
+    return path.suffix.lower() in IMAGE_EXTENSIONS
+
+
+def expand_uploads(uploaded_files):
+    """
+    [(display name, zero-arg callable returning a binary file)] for every
+    image in the uploads; zip archives are listed, not extracted.
+    """
+    entries = []
+    for uploaded in uploaded_files:
+        name = getattr(uploaded, 'name', 'upload')
+        if name.lower().endswith('.zip'):
+            archive = zipfile.ZipFile(uploaded)
+            for info in archive.infolist():
+                if not info.is_dir() and is_image_name(info.filename):
+                    entries.append((f"{name}/{info.filename}",
+                                    lambda archive=archive, info=info: archive.open(info)))
+        elif is_image_name(name):
+            entries.append((name, lambda uploaded=uploaded: BytesIO(uploaded.getvalue())))
+    return entries
+
+
+def read_bytes(opener):
+    with opener() as f:
+        return f.read()
+
+
+def decode_bgr(data):
+    """Decode one image to a BGR uint8 array, reduced for the 256px resize (see model_input.py)."""
+    from model_input import PREPROCESS_SIZE, decode_image_bytes
+    return decode_image_bytes(data, target_size=PREPROCESS_SIZE)
+
+
+def iter_chunks(items, chunk_size=DEFAULT_CHUNK_SIZE):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def classify_stream(entries, preprocess, predict_batch, class_names, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield a list of result rows per chunk.
+
+    preprocess:    BGR array → model input (any type `predict_batch` accepts)
+    predict_batch: list of model inputs → (N, num_classes) probabilities
+    Images that fail to decode produce a row with an 'Error' and no prediction.
+    Rows carry the image's content hash (the results store key, see results_store.py).
+    """
+    from results_store import image_hash
+
+    for chunk in iter_chunks(entries, chunk_size):
+        rows, inputs, positions = [], [], []
+        for name, opener in chunk:
+            try:
+                data = read_bytes(opener)
+                inputs.append(preprocess(decode_bgr(data)))
+                positions.append(len(rows))
+                rows.append({'File': name, 'Image Hash': image_hash(data)})
+            except Exception as e:
+                rows.append({'File': name, 'Error': str(e)})
+
+        if inputs:
+            probabilities = np.asarray(predict_batch(inputs))
+            for position, probs in zip(positions, probabilities):
+                pred_idx = int(np.argmax(probs))
+                row = rows[position]
+                row['Predicted Class'] = class_names[pred_idx]
+                row['Confidence (%)'] = float(probs[pred_idx] * 100)
+                row.update({f"{class_name} (%)": float(p * 100) for class_name, p in zip(class_names, probs)})
+        yield rows
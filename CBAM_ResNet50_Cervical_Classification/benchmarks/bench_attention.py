@@ -0,0 +1,128 @@
+"""
+Benchmark: CBAM attention explanations vs. Grad-CAM++
+Latency of the dashboard's explanation step and agreement between the two
+maps on the bundled sample images.
+
+Per image (preprocessed sample, 224×224):
+  - predict:              plain prediction forward pass
+  - predict + attention:  same forward pass with the CBAM maps captured and fused
+  - predict + gradcam:    prediction, then Grad-CAM++ for the predicted class
+Agreement between the fused attention map and the Grad-CAM++ map:
+  - Pearson correlation of the 224×224 maps
+  - IoU of the top 20% pixels of each map
+
+Without --model a randomly initialised CBAM-ResNet50 is used; its latencies
+are representative, but agreement is only meaningful for trained weights.
+
+Usage:
+    python benchmarks/bench_attention.py --model cbam_resnet50_cervical/best_model.pth
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+TOP_FRACTION = 0.2
+
+
+def pearson(a, b):
+    return float(np.corrcoef(a.ravel(), b.ravel())[0, 1])
+
+
+def top_iou(a, b, fraction=TOP_FRACTION):
+    """IoU of the `fraction` highest-valued pixels of each map."""
+    a_top = a >= np.quantile(a, 1 - fraction)
+    b_top = b >= np.quantile(b, 1 - fraction)
+    return float((a_top & b_top).sum() / max((a_top | b_top).sum(), 1))
+
+
+def median_time(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def load_model(model_path, seed):
+    import torch
+    from cbam_model import CBAM_ResNet50, CLASS_NAMES
+
+    if model_path is None:
+        torch.manual_seed(seed)
+        return CBAM_ResNet50(num_classes=len(CLASS_NAMES)).eval()
+    from evaluation import CBAMPredictor
+    return CBAMPredictor(model_path, device='cpu').model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CBAM attention explanations with Grad-CAM++")
+    parser.add_argument('--model', default=None, help="CBAM-ResNet50 checkpoint (default: random weights)")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=1, help="torch intra-op threads")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    import torch
+    torch.set_num_threads(args.threads)
+    import app
+    from attention_maps import FUSION_MODES, AttentionCapture, fuse_attention, stage_maps
+
+    model = load_model(args.model, args.seed)
+    samples = sorted((APP_DIR / "sample_image").glob("*.bmp"))
+
+    results = {'model': args.model or 'random', 'threads': args.threads, 'images': {}}
+    for path in samples:
+        image = Image.open(path).convert('RGB')
+        pred_class = app.predict(image, model)[0]
+        row = {
+            'predict_s': median_time(lambda: app.predict(image, model), args.repeats),
+            'predict_attention_s': median_time(lambda: app.predict_with_attention(image, model), args.repeats),
+            'predict_gradcam_s': median_time(
+                lambda: app.compute_gradcams(image, model, [app.predict(image, model)[0]]), args.repeats),
+        }
+
+        gradcam = app.compute_gradcams(image, model, [pred_class])[0]
+        with torch.no_grad(), AttentionCapture(model) as capture:
+            model(app.preprocess_image_for_model(image))
+        for mode in FUSION_MODES:
+            fused = fuse_attention(capture.maps, mode=mode)[0]
+            row[f'{mode}_pearson'] = pearson(fused, gradcam)
+            row[f'{mode}_top_iou'] = top_iou(fused, gradcam)
+        for stage, maps in stage_maps(capture.maps).items():
+            row[f'{stage}_pearson'] = pearson(maps[0], gradcam)
+        results['images'][path.stem] = row
+
+    rows = results['images'].values()
+    results['summary'] = {key: statistics.median(row[key] for row in rows) for key in next(iter(rows))}
+
+    print(f"Model: {results['model']}, {args.threads} thread(s), median of {args.repeats} runs")
+    print(f"{'Image':<26}{'predict ms':>11}{'+attn ms':>10}{'+gradcam ms':>13}"
+          f"{'r mean':>8}{'IoU mean':>10}{'r prod':>8}{'IoU prod':>10}")
+    for name, row in list(results['images'].items()) + [('median', results['summary'])]:
+        print(f"{name:<26}{row['predict_s'] * 1e3:>11.1f}{row['predict_attention_s'] * 1e3:>10.1f}"
+              f"{row['predict_gradcam_s'] * 1e3:>13.1f}{row['mean_pearson']:>8.2f}{row['mean_top_iou']:>10.2f}"
+              f"{row['product_pearson']:>8.2f}{row['product_top_iou']:>10.2f}")
+    summary = results['summary']
+    print("\nPer-stage Pearson r vs Grad-CAM++ (median): " +
+          ", ".join(f"{stage} {summary[f'{stage}_pearson']:.2f}" for stage in ('cbam1', 'cbam2', 'cbam3', 'cbam4')))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark: on-the-fly augmentation vs. a pre-generated augmented folder
+Training-loader throughput (samples/s) and disk footprint of:
+  - static:       reading a folder of pre-augmented copies (decode + resize +
+                  normalise; the augmentation was paid for once, on disk)
+  - torchvision:  per-image PIL transforms (flips, rotation, colour jitter,
+                  elastic) in the Dataset
+  - per-sample:   augmentation.BatchAugment applied to each image in the Dataset
+  - batched:      augmentation.BatchAugment on whole batches in the collate_fn
+                  (distillation.make_loader, used by distillation / pruning)
+
+The static folder is generated from the sample images (`--copies` augmented
+BMPs per source image, the format of the original dataset) in a temporary
+directory, so its size and generation time are measured, not estimated.
+
+Usage:
+    python benchmarks/bench_augmentation.py --images 64 --batch-size 32 --copies 5
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+
+def torchvision_augment():
+    from torchvision import transforms
+    return transforms.Compose([
+        transforms.RandomHorizontalFlip(),
+        transforms.RandomVerticalFlip(),
+        transforms.RandomRotation(15),
+        transforms.ColorJitter(brightness=0.1, contrast=0.1, saturation=0.1),
+        transforms.RandomApply([transforms.ElasticTransform(alpha=50.0, sigma=8.0)], p=0.3),
+    ])
+
+
+def image_dataset(paths, pil_augment=None, tensor_augment=None):
+    import torch
+    from PIL import Image
+    from evaluation import _imagenet_transform
+
+    transform = _imagenet_transform()
+
+    class Images(torch.utils.data.Dataset):
+        def __len__(self):
+            return len(paths)
+
+        def __getitem__(self, i):
+            with Image.open(paths[i]) as img:
+                img = img.convert('RGB')
+                if pil_augment is not None:
+                    img = pil_augment(img)
+                x = transform(img)
+            return (tensor_augment(x) if tensor_augment is not None else x), 0
+
+    return Images()
+
+
+def write_static_folder(sources, folder, copies):
+    """`copies` augmented BMPs per source image, as a pre-generated dataset would store them."""
+    from PIL import Image
+
+    augment = torchvision_augment()
+    folder.mkdir(parents=True, exist_ok=True)
+    written = []
+    for source in sources:
+        with Image.open(source) as img:
+            img = img.convert('RGB')
+            for k in range(copies):
+                path = folder / f"{source.stem}_aug{k}.bmp"
+                augment(img).save(path)
+                written.append(path)
+    return written
+
+
+def loader_throughput(loader, epochs):
+    samples = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for images, _ in loader:
+            samples += len(images)
+    return samples / (time.perf_counter() - start)
+
+
+def folder_bytes(paths):
+    return sum(Path(p).stat().st_size for p in set(map(str, paths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark on-the-fly vs pre-generated augmentation")
+    parser.add_argument('--images', type=int, default=64, help="Training images per epoch")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--epochs', type=int, default=2)
+    parser.add_argument('--copies', type=int, default=5, help="Augmented copies per image in the static folder")
+    parser.add_argument('--num-workers', type=int, default=0, help="DataLoader workers")
+    parser.add_argument('--threads', type=int, default=1, help="torch intra-op threads")
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    import torch
+    from phoenix_shared.augmentation import IMAGENET_MEAN, IMAGENET_STD, BatchAugment
+    from distillation import make_loader
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+
+    sources = sorted((APP_DIR / "sample_image").glob("*.bmp"))
+    paths = [sources[i % len(sources)] for i in range(args.images)]
+    source_bytes = folder_bytes(sources)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        static_paths = write_static_folder(sources, Path(tmp) / "augmented", args.copies)
+        generate_s = time.perf_counter() - start
+        static_bytes = folder_bytes(static_paths)
+        static_epoch = [static_paths[i % len(static_paths)] for i in range(args.images)]
+
+        def loader(dataset):
+            return torch.utils.data.DataLoader(dataset, batch_size=args.batch_size, shuffle=True,
+                                               num_workers=args.num_workers)
+
+        tensor_augment = BatchAugment(mean=IMAGENET_MEAN, std=IMAGENET_STD)
+        loaders = {
+            'static': loader(image_dataset(static_epoch)),
+            'torchvision': loader(image_dataset(paths, pil_augment=torchvision_augment())),
+            'per-sample': loader(image_dataset(paths, tensor_augment=tensor_augment)),
+            'batched': make_loader(paths, [0] * len(paths), train=True, batch_size=args.batch_size,
+                                   num_workers=args.num_workers),
+        }
+        results = {
+            'threads': args.threads,
+            'num_workers': args.num_workers,
+            'images': args.images,
+            'batch_size': args.batch_size,
+            'disk': {
+                'source_images': len(sources),
+                'source_bytes': source_bytes,
+                'static_copies_per_image': args.copies,
+                'static_extra_bytes': static_bytes,
+                'static_total_vs_source': (source_bytes + static_bytes) / source_bytes,
+                'static_generation_s': generate_s,
+                'on_the_fly_extra_bytes': 0,
+            },
+            'samples_per_s': {name: loader_throughput(dl, args.epochs) for name, dl in loaders.items()},
+        }
+
+    disk = results['disk']
+    print(f"{args.images} images × {args.epochs} epochs, batch {args.batch_size}, "
+          f"{args.num_workers} worker(s), {args.threads} thread(s)")
+    print(f"{'Pipeline':<14}{'Samples/s':>11}{'Distinct variants':>19}")
+    for name, rate in results['samples_per_s'].items():
+        variants = f"{args.copies} per image" if name == 'static' else "new every epoch"
+        print(f"{name:<14}{rate:>11.1f}{variants:>19}")
+    print(f"\nDisk: source {disk['source_bytes'] / 1e6:.2f} MB; pre-generated folder adds "
+          f"{disk['static_extra_bytes'] / 1e6:.2f} MB ({disk['static_total_vs_source']:.1f}× the source, "
+          f"{disk['static_generation_s']:.1f}s to write); on-the-fly adds 0 MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: bulk explainability job
+Notebook-style export (one GradCAMPlusPlus call per image and class,
+show_cam_on_image, one PNG per map) vs. cam_archive.py (batched GradCAM++ at
+native resolution into a quantized, chunked archive).
+
+A synthetic manifest repeats the sample images; a randomly initialised
+CBAM-ResNet50 checkpoint is used, so no trained model is needed. Reports
+throughput, storage per map and the largest difference between archived maps
+(upsampled on read) and the library's 224×224 maps.
+
+Usage:
+    python benchmarks/bench_cam_archive.py --images 32 --classes all
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+
+def make_manifest(path, num_images):
+    import pandas as pd
+    from cbam_model import CLASS_NAMES
+
+    samples = sorted((APP_DIR / "sample_image").glob("*.bmp"))
+    rows = [{'image_path': str(samples[i % len(samples)]), 'label_name': samples[i % len(samples)].stem}
+            for i in range(num_images)]
+    pd.DataFrame(rows).to_csv(path, index=False)
+    assert all(row['label_name'] in CLASS_NAMES for row in rows)
+    return path
+
+
+def png_export(manifest, checkpoint, output, targets):
+    """One CAM call per image and target, float overlay, PNG on disk for every map."""
+    import pandas as pd
+    import torch
+    from PIL import Image
+    from pytorch_grad_cam import GradCAMPlusPlus
+    from pytorch_grad_cam.utils.image import show_cam_on_image
+    from pytorch_grad_cam.utils.model_targets import ClassifierOutputTarget
+    from evaluation import CBAMPredictor
+
+    predictor = CBAMPredictor(checkpoint, device='cpu')
+    cam = GradCAMPlusPlus(model=predictor.model, target_layers=[predictor.model.layer4[-1]])
+    output.mkdir(parents=True, exist_ok=True)
+    maps = []
+    start = time.perf_counter()
+    for n, path in enumerate(pd.read_csv(manifest)['image_path']):
+        image = Image.open(path).convert('RGB')
+        tensor = predictor.transform(image).unsqueeze(0)
+        with torch.no_grad():
+            predicted = predictor.model(tensor).argmax(dim=1).item()
+        rgb = np.float32(image.resize((224, 224))) / 255
+        for target in (range(len(predictor.class_names)) if targets == 'all' else [predicted]):
+            grayscale = cam(input_tensor=tensor, targets=[ClassifierOutputTarget(target)])[0]
+            Image.fromarray(show_cam_on_image(rgb, grayscale, use_rgb=True)).save(output / f"{n:05d}_{target}.png")
+            maps.append(grayscale)
+    seconds = time.perf_counter() - start
+    return seconds, maps
+
+
+def directory_bytes(path):
+    return sum(p.stat().st_size for p in Path(path).rglob('*') if p.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bulk CAM archive against per-image PNG export")
+    parser.add_argument('--images', type=int, default=32, help="Images in the synthetic manifest")
+    parser.add_argument('--classes', default='all', choices=['predicted', 'all'])
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=1, help="torch intra-op threads")
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from bench_checkpoint_load import make_training_checkpoint
+    from cam_archive import CamArchive, run_job
+
+    import torch
+    torch.set_num_threads(args.threads)
+
+    results = {'images': args.images, 'classes': args.classes, 'threads': args.threads}
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        checkpoint = tmp / "best_model.pth"
+        make_training_checkpoint(checkpoint)
+        manifest = make_manifest(tmp / "manifest.csv", args.images)
+
+        seconds, reference = png_export(manifest, checkpoint, tmp / "png", args.classes)
+        results['png'] = {
+            'images_per_s': args.images / seconds,
+            'maps': len(reference),
+            'bytes_per_map': directory_bytes(tmp / "png") / len(reference),
+        }
+
+        for dtype in ('uint8', 'float16'):
+            stats = run_job(manifest, checkpoint, tmp / dtype, targets=args.classes, batch_size=args.batch_size,
+                            dtype=dtype, device='cpu', progress=False)
+            archive = CamArchive(tmp / dtype)
+            error = max(float(np.abs(archive.get(i) - reference[i]).max()) for i in range(len(archive)))
+            results[dtype] = {
+                'images_per_s': stats['images_per_s'],
+                'maps': stats['maps'],
+                'bytes_per_map': stats['bytes_per_map'],
+                'max_abs_error': error,
+            }
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"{args.images} images, classes={args.classes}, {args.threads} thread(s)")
+    print(f"{'Method':<22}{'Images/s':>10}{'Maps':>7}{'Bytes/map':>11}{'Max |Δ|':>10}")
+    for name, label in (('png', 'per-image PNG export'), ('uint8', 'archive uint8'), ('float16', 'archive float16')):
+        row = results[name]
+        error = f"{row['max_abs_error']:>10.4f}" if 'max_abs_error' in row else f"{'-':>10}"
+        print(f"{label:<22}{row['images_per_s']:>10.2f}{row['maps']:>7}{row['bytes_per_map']:>11.0f}{error}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Benchmark: full training checkpoint vs. slim memory-mapped weights
+Load time and resident memory of `torch.load` + `load_state_dict` against
+`checkpoint_io.load_model_weights`, each measured in a fresh interpreter.
+
+Without --model a randomly initialised checkpoint with Adam optimizer state
+(as written by the training notebooks) is generated in a temporary directory.
+
+Usage:
+    python benchmarks/bench_checkpoint_load.py
+    python benchmarks/bench_checkpoint_load.py --model cbam_resnet50_cervical/best_model.pth
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+
+def memory_usage_mb():
+    """Current RSS split into anonymous and file-backed pages (Linux), plus peak RSS."""
+    usage = {'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    status = Path('/proc/self/status')
+    if status.exists():
+        for line in status.read_text().splitlines():
+            key, _, value = line.partition(':')
+            if key in ('VmRSS', 'RssAnon', 'RssFile'):
+                usage[f'{key}_mb'] = int(value.split()[0]) / 1024
+    return usage
+
+
+def make_training_checkpoint(path):
+    """Random CBAM-ResNet50 checkpoint in the layout of best_model.pth, including optimizer state."""
+    import torch
+    from cbam_model import CBAM_ResNet50
+
+    model = CBAM_ResNet50(num_classes=5)
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-4)
+    model(torch.randn(2, 3, 64, 64)).sum().backward()
+    optimizer.step()
+    torch.save({
+        'epoch': 1,
+        'model_state_dict': model.state_dict(),
+        'optimizer_state_dict': optimizer.state_dict(),
+        'val_acc': 0.0,
+    }, path)
+
+
+def _child(mode, path):
+    """Runs in a fresh interpreter; prints load time and memory as JSON."""
+    import torch
+    from cbam_model import CBAM_ResNet50
+
+    torch.set_num_threads(1)
+    baseline = memory_usage_mb()
+    start = time.perf_counter()
+    if mode == 'torch_load':
+        checkpoint = torch.load(path, map_location='cpu')
+        model = CBAM_ResNet50(num_classes=5)
+        model.load_state_dict(checkpoint['model_state_dict'])
+        model.eval()
+        del checkpoint
+    else:
+        from checkpoint_io import load_model_weights
+        model, _ = load_model_weights(lambda: CBAM_ResNet50(num_classes=5), path, verify=(mode == 'mmap_verified'))
+    load_s = time.perf_counter() - start
+    after = memory_usage_mb()
+
+    torch.manual_seed(0)
+    with torch.no_grad():
+        logits = model(torch.randn(1, 3, 224, 224))
+
+    print(json.dumps({
+        'mode': mode,
+        'load_s': load_s,
+        'memory_before_mb': baseline,
+        'memory_after_mb': after,
+        'logits': logits[0].tolist(),
+    }))
+
+
+def measure(mode, path, repeats=3):
+    """Best-of-N load time in fresh interpreters (memory from the last run)."""
+    runs = []
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, str(Path(__file__).resolve()), '--child', mode, str(path)],
+                                cwd=APP_DIR, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"{mode} child failed:\n{result.stderr[-2000:]}")
+        runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    best = min(runs, key=lambda r: r['load_s'])
+    best['file_mb'] = os.path.getsize(path) / 1e6
+    return best
+
+
+def run_benchmark(model_path=None, repeats=3):
+    """Compare both load paths; returns a dict keyed by mode."""
+    from checkpoint_io import export_checkpoint
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if model_path is None:
+            model_path = Path(tmp) / "best_model.pth"
+            make_training_checkpoint(model_path)
+        weights_path = export_checkpoint(model_path, Path(tmp) / "best_model.safetensors")
+
+        results = {
+            'torch_load': measure('torch_load', model_path, repeats),
+            'mmap': measure('mmap', weights_path, repeats),
+            'mmap_verified': measure('mmap_verified', weights_path, repeats),
+        }
+
+    reference = results['torch_load']['logits']
+    for result in results.values():
+        result['max_logit_diff'] = max(abs(a - b) for a, b in zip(result.pop('logits'), reference))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark checkpoint load time and memory")
+    parser.add_argument('--model', default=None, help="Training checkpoint (default: generate a random one)")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    results = run_benchmark(args.model, args.repeats)
+    print(f"{'Path':<16}{'File MB':>9}{'Load s':>9}{'ΔRSS MB':>10}{'ΔAnon MB':>10}{'Max |Δlogit|':>14}")
+    for mode, r in results.items():
+        before, after = r['memory_before_mb'], r['memory_after_mb']
+        delta_rss = after.get('VmRSS_mb', 0) - before.get('VmRSS_mb', 0)
+        delta_anon = after.get('RssAnon_mb', 0) - before.get('RssAnon_mb', 0)
+        print(f"{mode:<16}{r['file_mb']:>9.1f}{r['load_s']:>9.3f}{delta_rss:>10.1f}{delta_anon:>10.1f}"
+              f"{r['max_logit_diff']:>14.2e}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Benchmark: training-step stalls from checkpointing
+Synchronous `torch.save` in the loop vs. checkpointing.AsyncCheckpointer
+(CPU snapshot + background writer), on CBAM-ResNet50 with AdamW.
+
+The full training state (model, optimizer moments, scheduler, RNG) of the
+CBAM model is saved every `--every` steps. Images are small (`--image-size`)
+to keep steps short; checkpoint size does not depend on it. `--disk-mbps`
+throttles writes to emulate a slow disk (0 = as fast as the local disk).
+Reports per-step times and the stall: total time of steps that saved a
+checkpoint minus the median step time.
+
+When transformers is installed, the same comparison runs through a
+`Trainer` (the ConvNeXt fine-tuning script's default path) on a randomly
+initialised ConvNeXtV2-Tiny: `trainer-sync` writes the save_steps
+checkpoint files in the training loop like the Trainer's own save,
+`trainer-async` uses checkpointing.AsyncTrainerCheckpoints. Step times come
+from Trainer callbacks; a save is charged to the step that triggered it.
+
+The benchmark also resumes from a mid-epoch checkpoint in a fresh model /
+optimizer and checks that the final weights equal an uninterrupted run's.
+
+Usage:
+    python benchmarks/bench_checkpointing.py --steps 16 --every 4 --disk-mbps 100
+"""
+
+import argparse
+import importlib.util
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+
+def throttled(checkpointer_cls, mbps):
+    """Checkpointer whose file writes take at least size / `mbps` seconds."""
+    class Throttled(checkpointer_cls):
+        def _write(self, state, path):
+            start = time.perf_counter()
+            super()._write(state, path)
+            if mbps:
+                time.sleep(max(0.0, Path(path).stat().st_size / (mbps * 1e6) - (time.perf_counter() - start)))
+    return Throttled
+
+
+def make_run(image_size, batch_size, init_seed=0, seed=0):
+    import torch
+    from phoenix_shared.augmentation import BatchAugment
+    from cbam_model import CBAM_ResNet50
+    from phoenix_shared.checkpointing import ResumableSampler
+
+    torch.manual_seed(init_seed)
+    model = CBAM_ResNet50(num_classes=5)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-4)
+    scheduler = torch.optim.lr_scheduler.LambdaLR(optimizer, lambda step: 1 - step / 1000)
+    generator = torch.Generator().manual_seed(seed)
+    images = torch.randn(8 * batch_size, 3, image_size, image_size, generator=generator)
+    labels = torch.arange(len(images)) % 5
+    loader = torch.utils.data.DataLoader(torch.utils.data.TensorDataset(images, labels), batch_size=batch_size,
+                                         sampler=ResumableSampler(len(images), seed), drop_last=True,
+                                         generator=torch.Generator().manual_seed(seed))
+    return model, optimizer, scheduler, loader, BatchAugment()
+
+
+def train(run, steps, checkpointer=None, every=None, resume=None):
+    """Train `steps` global steps; returns the per-step times and whether each step saved."""
+    import torch
+    import torch.nn.functional as F
+    from phoenix_shared.checkpointing import load_checkpoint, restore_training_state, training_state
+
+    model, optimizer, scheduler, loader, augment = run
+    epoch, start_step, global_step = 1, 0, 0
+    if resume is not None:
+        epoch, start_step, global_step = restore_training_state(load_checkpoint(resume), model, optimizer,
+                                                                scheduler)
+    batch_size, per_epoch = loader.batch_size, len(loader.dataset) // loader.batch_size
+    times = []
+    model.train()
+    while global_step < steps:
+        loader.sampler.set_epoch(epoch, start=start_step * batch_size)
+        for step, (images, labels) in enumerate(loader, start=start_step):
+            if global_step == steps:
+                break
+            start = time.perf_counter()
+            loss = F.cross_entropy(model(augment(images)), labels)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            global_step += 1
+            saved = checkpointer is not None and global_step % every == 0
+            if saved:
+                next_epoch, next_step = (epoch + 1, 0) if step + 1 == per_epoch else (epoch, step + 1)
+                checkpointer.save(training_state(model, optimizer, scheduler, next_epoch, next_step, global_step),
+                                  global_step)
+            times.append((time.perf_counter() - start, saved))
+        epoch, start_step = epoch + 1, 0
+    return times
+
+
+def train_trainer(output_dir, steps, every, batch_size, image_size, checkpointer):
+    """`train` through a transformers Trainer on ConvNeXtV2-Tiny, checkpointing with `checkpointer`."""
+    import torch
+    from transformers import (ConvNextV2Config, ConvNextV2ForImageClassification, Trainer, TrainerCallback,
+                              TrainingArguments)
+    from phoenix_shared.checkpointing import AsyncTrainerCheckpoints
+
+    class StepTimer(TrainerCallback):
+        def __init__(self):
+            self.times = []
+
+        def on_step_begin(self, args, state, control, **kwargs):
+            self.start = time.perf_counter()
+
+        def on_step_end(self, args, state, control, **kwargs):
+            self.times.append((time.perf_counter() - self.start, False))
+
+        def on_save(self, args, state, control, **kwargs):
+            self.times[-1] = (time.perf_counter() - self.start, True)
+
+    class BenchTrainer(AsyncTrainerCheckpoints, Trainer):
+        pass
+
+    torch.manual_seed(0)
+    model = ConvNextV2ForImageClassification(ConvNextV2Config(num_labels=5))
+    generator = torch.Generator().manual_seed(0)
+    images = torch.randn(8 * batch_size, 3, image_size, image_size, generator=generator)
+    dataset = [{'pixel_values': image, 'labels': torch.tensor(i % 5)} for i, image in enumerate(images)]
+    args = TrainingArguments(output_dir=str(output_dir), max_steps=steps, per_device_train_batch_size=batch_size,
+                             learning_rate=1e-4, save_strategy="steps", save_steps=every, logging_strategy="no",
+                             report_to="none", use_cpu=True, dataloader_num_workers=0, disable_tqdm=True)
+    timer = StepTimer()
+    trainer = BenchTrainer(model=model, args=args, train_dataset=dataset, callbacks=[timer],
+                           checkpointer=checkpointer)
+    trainer.train()
+    return timer.times
+
+
+def summarize(times, total_s):
+    plain = [t for t, saved in times if not saved]
+    median = statistics.median(plain)
+    saving = [t for t, saved in times if saved]
+    return {
+        'median_step_ms': median * 1e3,
+        'max_step_ms': max(t for t, _ in times) * 1e3,
+        'checkpoint_step_ms': statistics.mean(saving) * 1e3 if saving else None,
+        'stall_ms': sum(t - median for t in saving) * 1e3,
+        'total_s': total_s,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark synchronous vs asynchronous checkpointing")
+    parser.add_argument('--steps', type=int, default=16)
+    parser.add_argument('--every', type=int, default=4, help="Checkpoint every N steps")
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--image-size', type=int, default=64)
+    parser.add_argument('--disk-mbps', type=float, default=100.0, help="Emulated disk write speed (0 = no limit)")
+    parser.add_argument('--threads', type=int, default=1, help="torch intra-op threads")
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    import torch
+    from phoenix_shared.checkpointing import AsyncCheckpointer, latest_checkpoint
+    torch.set_num_threads(args.threads)
+
+    results = {'steps': args.steps, 'every': args.every, 'disk_mbps': args.disk_mbps, 'modes': {}}
+    Checkpointer = throttled(AsyncCheckpointer, args.disk_mbps)
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('none', 'sync', 'async'):
+            checkpointer = None if mode == 'none' else Checkpointer(Path(tmp) / mode, keep_last=2,
+                                                                    background=mode == 'async')
+            start = time.perf_counter()
+            times = train(make_run(args.image_size, args.batch_size), args.steps, checkpointer, args.every)
+            if checkpointer is not None:
+                checkpointer.close()
+            results['modes'][mode] = summarize(times, time.perf_counter() - start)
+        checkpoint = latest_checkpoint(Path(tmp) / 'async')
+        results['checkpoint_mb'] = checkpoint.stat().st_size / 1e6
+
+        if importlib.util.find_spec('transformers') is not None:
+            for mode in ('trainer-sync', 'trainer-async'):
+                output_dir = Path(tmp) / mode
+                checkpointer = Checkpointer(output_dir, keep_last=0, background=mode == 'trainer-async')
+                start = time.perf_counter()
+                times = train_trainer(output_dir, args.steps, args.every, args.batch_size, args.image_size,
+                                      checkpointer)
+                checkpointer.close()
+                results['modes'][mode] = summarize(times, time.perf_counter() - start)
+        else:
+            print("transformers is not installed: skipping the Trainer modes")
+
+        # exact resume: continue from a mid-run checkpoint for `--every` more steps
+        reference = make_run(args.image_size, args.batch_size)
+        train(reference, args.steps + args.every)
+        resumed = make_run(args.image_size, args.batch_size, init_seed=1)
+        torch.manual_seed(123)
+        train(resumed, args.steps + args.every, resume=checkpoint)
+        results['resume_max_weight_diff'] = max(
+            (a.float() - b.float()).abs().max().item()
+            for a, b in zip(reference[0].state_dict().values(), resumed[0].state_dict().values()))
+
+    print(f"CBAM-ResNet50 + AdamW, checkpoint {results['checkpoint_mb']:.0f} MB every {args.every} steps, "
+          f"disk {'unthrottled' if not args.disk_mbps else f'{args.disk_mbps:g} MB/s'}, {args.threads} thread(s)")
+    print(f"{'Mode':<14}{'Median step':>13}{'Checkpoint step':>17}{'Max step':>10}{'Stall':>10}{'Total':>9}")
+    for mode, row in results['modes'].items():
+        checkpoint_step = f"{row['checkpoint_step_ms']:.0f} ms" if row['checkpoint_step_ms'] else "-"
+        print(f"{mode:<14}{row['median_step_ms']:>10.0f} ms{checkpoint_step:>17}{row['max_step_ms']:>7.0f} ms"
+              f"{row['stall_ms']:>7.0f} ms{row['total_s']:>8.1f}s")
+    print(f"\nResume from step {args.steps}: max weight difference vs uninterrupted run "
+          f"{results['resume_max_weight_diff']:.1e}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark: multi-process CPU data-parallel training (phoenix_shared/distributed.py)
+Training throughput with 1, 2 and 4 gloo workers on this machine and the
+scaling efficiency relative to one worker.
+
+Each run spawns the workers locally (`distributed.launch`) and trains a
+randomly initialised torchvision ConvNeXt-Tiny (the same size as the
+fine-tuned ConvNeXt V2-Tiny) on synthetic images with a SiPakMED-like class
+balance, sharded per rank with `stratified_shard`. The per-worker batch is
+fixed (weak scaling), so ideal scaling multiplies samples/s by the number of
+workers:
+
+    efficiency(N) = samples/s(N) / (N × samples/s(1))
+
+Also checks that the replicas' weights are identical after training (the
+gradient all-reduce worked) and that every shard keeps the class balance.
+Each worker gets cpu_count // N threads. On a machine with fewer cores than
+workers the ideal is limited by the cores, so the per-core efficiency
+divides by min(N, cores) instead of N; what it loses is gradient all-reduce
+and process overhead.
+
+Usage:
+    python benchmarks/bench_ddp.py --workers 1 2 4 --steps 4 --image-size 112
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+# SiPakMED class sizes (Dyskeratotic, Koilocytotic, Metaplastic, Parabasal, Superficial-Intermediate)
+CLASS_COUNTS = (813, 825, 793, 787, 831)
+
+
+def synthetic_labels(num_images):
+    import numpy as np
+    proportions = np.array(CLASS_COUNTS) / sum(CLASS_COUNTS)
+    return np.repeat(np.arange(len(CLASS_COUNTS)), np.round(proportions * num_images).astype(int))
+
+
+def worker(args, result_path):
+    import numpy as np
+    import torch
+    import torch.nn.functional as F
+    from torchvision import models
+    from phoenix_shared.distributed import all_reduce, cleanup, setup, stratified_shard, train_ddp
+
+    rank, world_size = setup()
+    labels = synthetic_labels(args.images)
+    shard = stratified_shard(labels, rank, world_size)
+    generator = torch.Generator().manual_seed(0)
+    images = torch.randn(len(labels), 3, args.image_size, args.image_size, generator=generator)
+    dataset = torch.utils.data.TensorDataset(images[shard], torch.as_tensor(labels[shard]))
+
+    torch.manual_seed(0)
+    model = models.convnext_tiny(num_classes=len(CLASS_COUNTS))
+    _, history = train_ddp(model, dataset, lambda m, batch: F.cross_entropy(m(batch[0]), batch[1]),
+                           epochs=args.epochs, batch_size=args.batch_size, steps_per_epoch=args.steps, log=None)
+
+    checksum = sum(p.detach().double().sum().item() for p in model.parameters())
+    high, neg_low = all_reduce([checksum, -checksum], op='max')
+    shard_share = np.bincount(labels[shard], minlength=len(CLASS_COUNTS)) / len(shard)
+    (max_share_diff,) = all_reduce([float(np.abs(shard_share - np.bincount(labels) / len(labels)).max())], op='max')
+    if rank == 0:
+        with open(result_path, 'w') as f:
+            json.dump({
+                'workers': world_size,
+                'threads_per_worker': torch.get_num_threads(),
+                'shard_size': len(shard),
+                'samples_per_s': history[-1]['samples_per_s'],
+                'epoch_seconds': history[-1]['seconds'],
+                'replica_weight_spread': high + neg_low,
+                'max_class_share_diff': max_share_diff,
+            }, f)
+    cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gloo data-parallel training scaling")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--images', type=int, default=256, help="Synthetic training images")
+    parser.add_argument('--image-size', type=int, default=112)
+    parser.add_argument('--batch-size', type=int, default=8, help="Per-worker batch size")
+    parser.add_argument('--steps', type=int, default=4, help="Steps per epoch")
+    parser.add_argument('--epochs', type=int, default=2, help="The last epoch is timed (the first warms up)")
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    from phoenix_shared.distributed import launch
+
+    results = {'cpu_count': os.cpu_count(), 'image_size': args.image_size,
+               'batch_size_per_worker': args.batch_size, 'runs': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.workers:
+            result_path = Path(tmp) / f"workers_{n}.json"
+            launch(worker, n, args, str(result_path))
+            with open(result_path) as f:
+                results['runs'].append(json.load(f))
+
+    base = results['runs'][0]['samples_per_s'] / results['runs'][0]['workers']
+    for run in results['runs']:
+        run['efficiency'] = run['samples_per_s'] / (run['workers'] * base)
+        run['per_core_efficiency'] = run['samples_per_s'] / (min(run['workers'], os.cpu_count() or 1) * base)
+
+    print(f"ConvNeXt-Tiny, {args.image_size}px, batch {args.batch_size} per worker, {os.cpu_count()} CPU(s)")
+    print(f"{'Workers':>8}{'Threads':>9}{'Samples/s':>11}{'Efficiency':>12}{'Per core':>10}"
+          f"{'Weight spread':>15}{'Class Δ':>9}")
+    for run in results['runs']:
+        print(f"{run['workers']:>8}{run['threads_per_worker']:>9}{run['samples_per_s']:>11.2f}"
+              f"{run['efficiency']:>11.0%}{run['per_core_efficiency']:>9.0%}"
+              f"{run['replica_weight_spread']:>15.1e}{run['max_class_share_diff']:>9.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
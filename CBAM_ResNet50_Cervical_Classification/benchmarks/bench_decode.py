@@ -0,0 +1,240 @@
+"""
+Benchmark: per-request decode → model tensor path (model_input.py)
+The original PIL / torchvision path vs. cv2.imdecode + the fused BGR → tensor path.
+
+Latency is the median over `--repeats` runs of the real code, in three parts:
+decode (upload bytes → BGR array), preprocessing (Resize → NLM → CLAHE, the
+same in both paths) and to-tensor (final BGR image → normalised model input).
+
+Allocations are counted by running each path as the sequence of primitive
+calls it makes, including the steps inside torchvision's ToTensor /
+Normalize and NumPy's conversion of a PIL image (`tobytes`, then a copy).
+Every step whose result is a new image-sized buffer (NumPy array, PIL image
+at 4 bytes / RGB pixel, torch tensor or bytes) counts as one allocation.
+Views (from_numpy, permute, unsqueeze, frombuffer of bytes) count as none.
+
+Also checks parity: decoded pixels and the final tensors of both paths.
+
+Usage:
+    python benchmarks/bench_decode.py --repeats 20 --output decode.json
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+MEAN = [0.485, 0.456, 0.406]
+STD = [0.229, 0.224, 0.225]
+
+
+# ============================================================================
+# PATHS
+# ============================================================================
+
+def legacy_decode(data):
+    import cv2
+    import numpy as np
+    from PIL import Image
+    image_pil = Image.open(BytesIO(data)).convert('RGB')
+    return cv2.cvtColor(np.array(image_pil), cv2.COLOR_RGB2BGR)
+
+
+def legacy_to_tensor(final_image):
+    import cv2
+    from PIL import Image
+    from torchvision import transforms
+    transform = transforms.Compose([transforms.Resize((224, 224)), transforms.ToTensor(),
+                                    transforms.Normalize(mean=MEAN, std=STD)])
+    return transform(Image.fromarray(cv2.cvtColor(final_image, cv2.COLOR_BGR2RGB))).unsqueeze(0)
+
+
+def legacy_steps(data):
+    """The legacy path as primitive calls (torchvision's to_tensor / normalize spelled out)."""
+    import cv2
+    import numpy as np
+    import torch
+    from PIL import Image
+    from torchvision.transforms import functional as TF
+
+    mean, std = torch.tensor(MEAN)[:, None, None], torch.tensor(STD)[:, None, None]
+    decode = [
+        ('Image.open + load', lambda d: _loaded(Image.open(BytesIO(d)))),
+        ("convert('RGB')", lambda im: im.convert('RGB')),
+        ('np.array: tobytes', lambda im: (im.tobytes(), im.size)),
+        ('np.array: copy', lambda b: np.frombuffer(b[0], np.uint8).reshape(b[1][1], b[1][0], 3).copy()),
+        ('RGB → BGR', lambda a: cv2.cvtColor(a, cv2.COLOR_RGB2BGR)),
+    ]
+    to_tensor = [
+        ('BGR → RGB', lambda a: cv2.cvtColor(a, cv2.COLOR_BGR2RGB)),
+        ('Image.fromarray', Image.fromarray),
+        ('Resize', lambda im: TF.resize(im, [224, 224])),
+        ('ToTensor: tobytes', lambda im: (im.tobytes(), im.size)),
+        ('ToTensor: np.array copy', lambda b: np.frombuffer(b[0], np.uint8).reshape(b[1][1], b[1][0], 3).copy()),
+        ('ToTensor: from_numpy', torch.from_numpy),
+        ('ToTensor: permute.contiguous', lambda t: t.permute(2, 0, 1).contiguous()),
+        ('ToTensor: to float', lambda t: t.to(torch.float32)),
+        ('ToTensor: div 255', lambda t: t.div(255)),
+        ('Normalize: clone', lambda t: t.clone()),
+        ('Normalize: sub_ / div_', lambda t: t.sub_(mean).div_(std)),
+        ('unsqueeze', lambda t: t.unsqueeze(0)),
+    ]
+    return decode, to_tensor
+
+
+def fast_steps(data):
+    """model_input.py as primitive calls."""
+    import cv2
+    import numpy as np
+    import torch
+    from PIL import Image
+
+    def normalize(array):
+        out = torch.empty((1, 3, 224, 224))
+        hwc = torch.from_numpy(array)
+        for channel in range(3):
+            torch.mul(hwc[:, :, 2 - channel], 1.0 / (255.0 * STD[channel]), out=out[0, channel]).sub_(
+                MEAN[channel] / STD[channel])
+        return out
+
+    decode = [
+        ('np.frombuffer', lambda d: np.frombuffer(d, np.uint8)),
+        ('cv2.imdecode', lambda b: cv2.imdecode(b, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)),
+    ]
+    to_tensor = [
+        ('Image.frombuffer', lambda a: Image.frombuffer('RGB', (a.shape[1], a.shape[0]), a, 'raw', 'RGB', 0, 1)),
+        ('resize', lambda im: im.resize((224, 224), Image.BILINEAR)),
+        ('np.asarray: tobytes', lambda im: im.tobytes()),
+        ('np.asarray: view', lambda b: np.frombuffer(b, np.uint8).reshape(224, 224, 3)),
+        ('fused normalize → tensor', normalize),
+    ]
+    return decode, to_tensor
+
+
+def _loaded(image):
+    image.load()
+    return image
+
+
+# ============================================================================
+# ACCOUNTING
+# ============================================================================
+
+def _buffer(obj):
+    """(start address / identity of the memory, bytes) of an image-like object."""
+    import numpy as np
+    import torch
+    from PIL import Image
+
+    if isinstance(obj, tuple):
+        obj = obj[0]
+    if isinstance(obj, bytes):
+        return np.frombuffer(obj, np.uint8).ctypes.data, len(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.ctypes.data, obj.nbytes
+    if isinstance(obj, torch.Tensor):
+        return obj.data_ptr(), obj.numel() * obj.element_size()
+    if isinstance(obj, Image.Image):
+        # PIL keeps RGB pixels in 4 bytes
+        return id(obj.im), obj.width * obj.height * (4 if obj.mode == 'RGB' else len(obj.getbands()))
+    raise TypeError(f"Unexpected step output {type(obj).__name__}")
+
+
+def count_allocations(steps, value):
+    """
+    Run `steps` on `value`; returns (output, [(step, new bytes)]). Every
+    intermediate is kept alive until the end, so freed memory cannot be
+    reused at an address that was already seen.
+    """
+    alive = [value]
+    seen = {_buffer(value)[0]}
+    record = []
+    for name, step in steps:
+        value = step(value)
+        alive.append(value)
+        key, size = _buffer(value)
+        record.append((name, size if key not in seen else 0))
+        seen.add(key)
+    return value, record
+
+
+def median_ms(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the upload → model tensor path")
+    parser.add_argument('--images', nargs='+', default=None, help="Images (default: sample_image/*.bmp)")
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--threads', type=int, default=1, help="torch / OpenCV threads")
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    import cv2
+    import numpy as np
+    import torch
+    from app import apply_preprocessing_pipeline
+    from model_input import bgr_to_tensor, decode_image_bytes
+
+    torch.set_num_threads(args.threads)
+    cv2.setNumThreads(args.threads)
+    paths = [Path(p) for p in args.images] if args.images else sorted((APP_DIR / "sample_image").glob('*.bmp'))
+
+    results = {'threads': args.threads, 'images': []}
+    for path in paths:
+        data = path.read_bytes()
+        image_bgr = decode_image_bytes(data)
+        _, _, final_image, _ = apply_preprocessing_pipeline(image_bgr)
+
+        row = {'image': path.name, 'size': [int(image_bgr.shape[1]), int(image_bgr.shape[0])],
+               'pixels_match': bool(np.array_equal(legacy_decode(data), image_bgr)),
+               'tensor_max_diff': float((legacy_to_tensor(final_image) - bgr_to_tensor(final_image)).abs().max())}
+        row['preprocess_ms'] = median_ms(lambda: apply_preprocessing_pipeline(image_bgr), max(3, args.repeats // 4))
+        for label, decode_fn, tensor_fn, steps_fn in [
+                ('legacy', legacy_decode, legacy_to_tensor, legacy_steps),
+                ('fast', decode_image_bytes, bgr_to_tensor, fast_steps)]:
+            row[f'{label}_decode_ms'] = median_ms(lambda: decode_fn(data), args.repeats)
+            row[f'{label}_to_tensor_ms'] = median_ms(lambda: tensor_fn(final_image), args.repeats)
+            decode_steps, tensor_steps = steps_fn(data)
+            _, decode_record = count_allocations(decode_steps, data)
+            tensor_out, tensor_record = count_allocations(tensor_steps, final_image)
+            record = decode_record + tensor_record
+            row[f'{label}_allocations'] = sum(1 for _, size in record if size)
+            row[f'{label}_allocated_bytes'] = sum(size for _, size in record)
+            row[f'{label}_steps'] = record
+        results['images'].append(row)
+
+    print(f"Decode → model tensor per request, {args.threads} thread(s); preprocessing (shared) in between")
+    print(f"{'Image':<40}{'Size':>10}{'Decode ms':>16}{'To-tensor ms':>16}{'Allocations':>14}{'Allocated':>20}"
+          f"{'Preproc':>10}")
+    print(f"{'':<50}{'old → new':>16}{'old → new':>16}{'old → new':>14}{'old → new':>20}")
+    for row in results['images']:
+        size = f"{row['size'][0]}×{row['size'][1]}"
+        print(f"{row['image']:<40}{size:>10}"
+              f"{row['legacy_decode_ms']:>8.2f} → {row['fast_decode_ms']:<5.2f}"
+              f"{row['legacy_to_tensor_ms']:>8.2f} → {row['fast_to_tensor_ms']:<5.2f}"
+              f"{row['legacy_allocations']:>8} → {row['fast_allocations']:<3}"
+              f"{row['legacy_allocated_bytes'] / 2**20:>9.2f} → {row['fast_allocated_bytes'] / 2**20:<5.2f}MB"
+              f"{row['preprocess_ms']:>7.0f} ms")
+    print(f"\nDecoded pixels identical: {all(r['pixels_match'] for r in results['images'])}; "
+          f"max tensor difference {max(r['tensor_max_diff'] for r in results['images']):.1e}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
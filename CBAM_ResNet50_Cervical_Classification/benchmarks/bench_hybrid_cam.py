@@ -0,0 +1,128 @@
+"""
+Benchmark: class activation maps for the hybrid dashboards
+Overhead of `predict_with_cams` (one forward pass, a CAM for every class)
+over `predict_batch` (probabilities only) in phoenix_shared/hybrid_dashboard.py,
+with the Herlev and SiPakMED streamlit_app.py transforms and class counts,
+at several batch sizes.
+
+Both apps are imported from their directories; a random ResNet50 and a
+StandardScaler / logistic regression fitted on random features stand in for
+the saved models. The benchmark also checks that the CAMs are exact: each
+map's spatial mean must equal the head's decision value, and the
+probabilities must match predict_batch. SiPakMED's NLM + CLAHE preprocessing
+is left out so only the model path is measured.
+
+Usage:
+    python benchmarks/bench_hybrid_cam.py --batch-sizes 1 8
+"""
+
+import argparse
+import importlib.util
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+APP_DIR = Path(__file__).resolve().parent.parent
+REPO_DIR = APP_DIR.parent
+sys.path.insert(0, str(APP_DIR))
+
+DASHBOARDS = {
+    'herlev': (REPO_DIR / "Herlev Processing" / "Models" / "streamlit_app.py", 7),
+    'sipakmed': (REPO_DIR / "Sipakmed Pipeline" / "Models v1" / "streamlit_app.py", 5),
+}
+
+
+def load_dashboard(name):
+    path, _ = DASHBOARDS[name]
+    spec = importlib.util.spec_from_file_location(f"{name}_streamlit_app", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def random_head(num_classes, seed):
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(seed)
+    features = rng.normal(loc=0.5, scale=0.3, size=(40 * num_classes, 2048))
+    labels = np.arange(len(features)) % num_classes
+    scaler = StandardScaler().fit(features)
+    return LogisticRegression(max_iter=200).fit(scaler.transform(features), labels), scaler
+
+
+def median_time(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CAM overhead in the hybrid dashboards")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--threads', type=int, default=1, help="torch intra-op threads")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    import torch
+    from hybrid_model import FeatureExtractor
+    from phoenix_shared.hybrid_dashboard import predict_batch, predict_with_cams
+    torch.set_num_threads(args.threads)
+
+    samples = [Image.open(p).convert('RGB') for p in sorted((APP_DIR / "sample_image").glob("*.bmp"))]
+    results = {'threads': args.threads, 'dashboards': {}}
+    for name, (_, num_classes) in DASHBOARDS.items():
+        module = load_dashboard(name)
+        torch.manual_seed(args.seed)
+        feature_extractor = FeatureExtractor().eval()
+        classifier, scaler = random_head(num_classes, args.seed)
+        model_args = (module.transform, feature_extractor, classifier, scaler, torch.device('cpu'))
+
+        rows = {}
+        for batch_size in args.batch_sizes:
+            images = [samples[i % len(samples)] for i in range(batch_size)]
+            predict_s = median_time(lambda: predict_batch(images, *model_args), args.repeats)
+            cams_s = median_time(lambda: predict_with_cams(images, *model_args), args.repeats)
+
+            probabilities = predict_batch(images, *model_args)
+            cam_probabilities, cams = predict_with_cams(images, *model_args)
+            with torch.no_grad():
+                features = feature_extractor(torch.stack([module.transform(image) for image in images])).numpy()
+            decision = classifier.decision_function(scaler.transform(features))
+            rows[batch_size] = {
+                'predict_ms': predict_s * 1e3,
+                'predict_with_cams_ms': cams_s * 1e3,
+                'overhead_pct': (cams_s / predict_s - 1) * 100,
+                'cam_shape': list(cams.shape),
+                'max_probability_diff': float(np.abs(cam_probabilities - probabilities).max()),
+                'max_cam_mean_vs_decision_diff': float(np.abs(cams.mean(axis=(2, 3)) - decision).max()),
+            }
+        results['dashboards'][name] = rows
+
+    print(f"{args.threads} thread(s), median of {args.repeats} runs")
+    print(f"{'Dashboard':<10}{'Batch':>6}{'predict ms':>12}{'+CAMs ms':>10}{'Overhead':>10}"
+          f"{'|Δp|':>10}{'|mean(CAM)-logit|':>19}")
+    for name, rows in results['dashboards'].items():
+        for batch_size, row in rows.items():
+            print(f"{name:<10}{batch_size:>6}{row['predict_ms']:>12.1f}{row['predict_with_cams_ms']:>10.1f}"
+                  f"{row['overhead_pct']:>9.1f}%{row['max_probability_diff']:>10.1e}"
+                  f"{row['max_cam_mean_vs_decision_diff']:>19.1e}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
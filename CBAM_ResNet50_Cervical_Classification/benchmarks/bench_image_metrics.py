@@ -0,0 +1,127 @@
+"""
+Benchmark: batched image metrics vs. the per-pair skimage path
+Also checks that the batched results stay within tolerance of skimage.
+
+Usage:
+    python benchmarks/bench_image_metrics.py --num-images 500
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from skimage.metrics import structural_similarity
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from image_metrics import batch_preprocessing_metrics, batch_ssim, to_gray_stack  # noqa: E402
+
+TOLERANCES = {'PSNR (dB)': 1e-6, 'SSIM': 1e-4, 'Contrast Improvement': 1e-5}
+
+
+def reference_metrics(original, processed):
+    """The original per-pair implementation of calculate_preprocessing_metrics."""
+    mse = np.mean((original.astype(float) - processed.astype(float)) ** 2)
+    psnr = float('inf') if mse == 0 else 20 * np.log10(255.0 / np.sqrt(mse))
+
+    gray1 = cv2.cvtColor(original, cv2.COLOR_BGR2GRAY)
+    gray2 = cv2.cvtColor(processed, cv2.COLOR_BGR2GRAY)
+    ssim_val = structural_similarity(gray1, gray2, data_range=255)
+
+    contrast_orig = np.std(cv2.cvtColor(original, cv2.COLOR_BGR2GRAY))
+    contrast_proc = np.std(cv2.cvtColor(processed, cv2.COLOR_BGR2GRAY))
+    contrast_improvement = contrast_proc / contrast_orig if contrast_orig != 0 else 0
+
+    return {'PSNR (dB)': psnr, 'SSIM': ssim_val, 'Contrast Improvement': contrast_improvement}
+
+
+def make_pairs(num_images, size=256, seed=0):
+    """Synthetic cell-like images and their CLAHE-enhanced counterparts."""
+    rng = np.random.default_rng(seed)
+    originals = np.empty((num_images, size, size, 3), dtype=np.uint8)
+    processed = np.empty_like(originals)
+    clahe = cv2.createCLAHE(clipLimit=1.2, tileGridSize=(6, 6))
+    for i in range(num_images):
+        noise = rng.normal(150, 40, (size, size, 3)).astype(np.float32)
+        image = np.clip(cv2.GaussianBlur(noise, (0, 0), 3), 0, 255).astype(np.uint8)
+        originals[i] = image
+        processed[i] = cv2.merge([clahe.apply(image[:, :, c]) for c in range(3)])
+    return originals, processed
+
+
+def check_tolerance(originals, processed):
+    """Max absolute difference per metric between the batched and reference paths."""
+    batched = batch_preprocessing_metrics(originals, processed)
+    reference = [reference_metrics(o, p) for o, p in zip(originals, processed)]
+    diffs = {}
+    for key in TOLERANCES:
+        ref = np.array([r[key] for r in reference], dtype=np.float64)
+        diffs[key] = float(np.max(np.abs(batched[key] - ref)))
+
+    # Gaussian-window variant against skimage's gaussian_weights=True
+    gray1, gray2 = to_gray_stack(originals), to_gray_stack(processed)
+    ref = np.array([structural_similarity(a, b, data_range=255, gaussian_weights=True) for a, b in zip(gray1, gray2)])
+    diffs['SSIM (gaussian)'] = float(np.max(np.abs(batch_ssim(gray1, gray2, gaussian_weights=True) - ref)))
+    return diffs
+
+
+def run_benchmark(num_images=200, size=256, repeats=3, batch_size=16):
+    """Time both paths over the same stack; returns a dict of results."""
+    originals, processed = make_pairs(num_images, size)
+
+    def best_of(fn):
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    reference_time = best_of(lambda: [reference_metrics(o, p) for o, p in zip(originals, processed)])
+    batched_time = best_of(lambda: batch_preprocessing_metrics(originals, processed, batch_size=batch_size))
+
+    return {
+        'num_images': num_images,
+        'size': size,
+        'reference_s': reference_time,
+        'batched_s': batched_time,
+        'reference_images_per_s': num_images / reference_time,
+        'batched_images_per_s': num_images / batched_time,
+        'speedup': reference_time / batched_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched image quality metrics")
+    parser.add_argument('--num-images', type=int, default=200)
+    parser.add_argument('--size', type=int, default=256)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--skip-check', action='store_true', help="Skip the tolerance check against skimage")
+    args = parser.parse_args()
+
+    if not args.skip_check:
+        originals, processed = make_pairs(min(args.num_images, 32), args.size, seed=1)
+        diffs = check_tolerance(originals, processed)
+        failed = False
+        print("Tolerance check against skimage (max abs diff):")
+        for key, diff in diffs.items():
+            tol = TOLERANCES.get(key, TOLERANCES['SSIM'])
+            ok = diff <= tol
+            failed |= not ok
+            print(f"  {key:<22} {diff:.2e}  (tol {tol:.0e})  {'OK' if ok else 'FAIL'}")
+        if failed:
+            sys.exit(1)
+
+    results = run_benchmark(args.num_images, args.size, args.repeats, args.batch_size)
+    print(f"\n{results['num_images']} image pairs at {results['size']}×{results['size']}:")
+    print(f"  per-pair (skimage): {results['reference_s']:.3f}s  ({results['reference_images_per_s']:.1f} img/s)")
+    print(f"  batched:            {results['batched_s']:.3f}s  ({results['batched_images_per_s']:.1f} img/s)")
+    print(f"  speedup:            {results['speedup']:.1f}×")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: dashboard interaction latency
+Script-rerun time of app.py after UI-only widget changes, measured with
+Streamlit's AppTest (no browser, no server).
+
+A randomly initialised CBAM-ResNet50 is published to a temporary model
+registry, so no checkpoint is needed. The first sample image is analysed
+once, then each sidebar toggle is flipped and the rerun timed.
+
+To compare against another revision, check its app.py out next to the
+current one and pass it with --app:
+    git show HEAD~1:./app.py > app_before.py
+    python benchmarks/bench_interaction.py --app app_before.py
+
+Usage:
+    python benchmarks/bench_interaction.py
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+INTERACTIONS = [
+    ("Show Heatmap Only", 'checkbox', "Show Heatmap Only"),
+    ("Show Class-Specific Activations", 'checkbox', "Show Class-Specific Activations"),
+    ("Download Format", 'selectbox', "Download Format"),
+]
+
+
+def _timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"App raised: {at.exception[0].message}")
+    return time.perf_counter() - start
+
+
+def _widget(at, kind, label):
+    for widget in getattr(at.sidebar, kind):
+        if widget.label == label:
+            return widget
+    raise LookupError(f"No sidebar {kind} labelled '{label}'")
+
+
+def measure(app_path, repeats=3, timeout=600):
+    """Returns {'first_analysis_s': ..., '<interaction>': [rerun seconds, ...]}."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(app_path), default_timeout=timeout)
+    at.run()
+    results = {}
+    _widget(at, 'radio', "Choose input method:").set_value("Use Sample Images")
+    results['first_analysis_s'] = _timed_run(at)
+    results['rerun_no_change_s'] = _timed_run(at)
+
+    for name, kind, label in INTERACTIONS:
+        times = []
+        for _ in range(repeats):
+            widget = _widget(at, kind, label)
+            if kind == 'checkbox':
+                widget.set_value(not widget.value)
+            else:
+                options = list(widget.options)
+                widget.set_value(options[(options.index(str(widget.value)) + 1) % len(options)]
+                                 if str(widget.value) in options else options[1])
+            times.append(_timed_run(at))
+        results[name] = times
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dashboard rerun latency for UI-only changes")
+    parser.add_argument('--app', default=str(APP_DIR / "app.py"), help="App script to measure")
+    parser.add_argument('--repeats', type=int, default=3, help="Toggles per widget")
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from bench_checkpoint_load import make_training_checkpoint
+    from model_registry import ModelRegistry
+
+    import torch
+    torch.set_num_threads(1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = Path(tmp) / "best_model.pth"
+        make_training_checkpoint(checkpoint)
+        registry = ModelRegistry(Path(tmp) / "registry")
+        registry.publish('cbam', checkpoint, family='cbam')
+        os.environ['PHOENIX_MODEL_REGISTRY'] = str(registry.root)
+        results = measure(Path(args.app).resolve(), repeats=args.repeats)
+
+    print(f"App: {args.app}")
+    print(f"{'Interaction':<42}{'Median s':>10}{'Max s':>9}")
+    print(f"{'first analysis':<42}{results['first_analysis_s']:>10.3f}")
+    print(f"{'rerun, nothing changed':<42}{results['rerun_no_change_s']:>10.3f}")
+    for name, _, _ in INTERACTIONS:
+        print(f"{'toggle ' + name:<42}{statistics.median(results[name]):>10.3f}{max(results[name]):>9.3f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Benchmark: full vs. size-aware decode of large uploads (model_input.py)
+Latency and peak RSS of decode → 256px resize (resize_with_aspect_ratio_mirroring)
+for synthetic microscopy-like fields of growing size, as JPEG and PNG.
+
+`full` decodes every pixel, as `decode_image_bytes(data)` did; `reduced`
+passes `target_size=256`, so JPEGs are DCT-scaled while decoding and other
+formats are box-downscaled right after. Each (image, mode) runs in a fresh
+subprocess: peak RSS is the process's high-water mark (VmHWM, reset just
+before) minus its resident size before decoding, with the encoded bytes
+already loaded. Latency is the median of `--repeats` runs in the same process.
+
+The 256px outputs are compared in PSNR with each other and with an
+antialiased reference (INTER_AREA from the full image): LANCZOS on a 4000px
+image samples only a few source pixels per output pixel, so the full path
+aliases where the reduced path averages first.
+
+Usage:
+    python benchmarks/bench_large_decode.py --sizes 2048x1536 4000x3000 8000x6000 --output large_decode.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+TARGET_SIZE = 256
+
+
+def synthetic_field(width, height, seed=0):
+    """Stained-cell-like field: smooth background, soft cells with darker nuclei, sensor noise."""
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.empty((height, width, 3), dtype=np.float32)
+    for channel, base in enumerate((215, 200, 225)):
+        image[:, :, channel] = base - 15 * (xx / width) - 10 * (yy / height)
+    radius = max(8, min(width, height) // 40)
+    for _ in range(max(20, width * height // (radius * radius * 12))):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        axes = (int(radius * rng.uniform(0.6, 1.4)), int(radius * rng.uniform(0.6, 1.4)))
+        angle = float(rng.uniform(0, 180))
+        cv2.ellipse(image, (x, y), axes, angle, 0, 360, (170, 120, 190), -1, cv2.LINE_AA)
+        cv2.ellipse(image, (x, y), (axes[0] // 3, axes[1] // 3), angle, 0, 360, (110, 50, 120), -1, cv2.LINE_AA)
+    image += rng.normal(0, 6, image.shape).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+# ============================================================================
+# CHILD: ONE (IMAGE, MODE) MEASUREMENT
+# ============================================================================
+
+def _status_bytes(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+    raise KeyError(field)
+
+
+def _reset_peak_rss():
+    # the high-water mark carries over from the parent; writing 5 to clear_refs resets it (Linux ≥ 4.0)
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+
+
+def measure(path, mode, repeats):
+    import statistics
+
+    from app import resize_with_aspect_ratio_mirroring
+    from model_input import decode_image_bytes
+
+    target_size = TARGET_SIZE if mode == 'reduced' else None
+
+    def run():
+        image = decode_image_bytes(data, target_size=target_size)
+        return image.shape, resize_with_aspect_ratio_mirroring(image, TARGET_SIZE)[0]
+
+    data = Path(path).read_bytes()
+    _reset_peak_rss()
+    before = _status_bytes('VmRSS')
+    shape, _ = run()
+    peak = _status_bytes('VmHWM') - before
+
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return {'decoded_size': [shape[1], shape[0]], 'peak_rss_mb': max(peak, 0) / 2**20,
+            'latency_ms': statistics.median(times) * 1e3}
+
+
+# ============================================================================
+# PARENT
+# ============================================================================
+
+def psnr(a, b):
+    import numpy as np
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float('inf') if mse == 0 else float(10 * np.log10(255.0 ** 2 / mse))
+
+
+def quality(path):
+    """PSNR of the 256px outputs: reduced vs full, and each vs the antialiased reference."""
+    import cv2
+    from app import resize_with_aspect_ratio_mirroring
+    from model_input import decode_image_bytes
+
+    data = Path(path).read_bytes()
+    full_image = decode_image_bytes(data)
+    full = resize_with_aspect_ratio_mirroring(full_image, TARGET_SIZE)[0]
+    reduced = resize_with_aspect_ratio_mirroring(decode_image_bytes(data, target_size=TARGET_SIZE), TARGET_SIZE)[0]
+    height, width = full_image.shape[:2]
+    scale = min(TARGET_SIZE / height, TARGET_SIZE / width)
+    area = cv2.resize(full_image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    reference = resize_with_aspect_ratio_mirroring(area, TARGET_SIZE)[0]
+    return {'psnr_reduced_vs_full': psnr(reduced, full), 'psnr_full_vs_reference': psnr(full, reference),
+            'psnr_reduced_vs_reference': psnr(reduced, reference)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark full vs size-aware decoding of large images")
+    parser.add_argument('--sizes', nargs='+', default=['2048x1536', '4000x3000', '8000x6000'],
+                        help="Synthetic image sizes, WIDTHxHEIGHT")
+    parser.add_argument('--formats', nargs='+', default=['jpg', 'png'])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    parser.add_argument('--child', nargs=2, metavar=('PATH', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child[0], args.child[1], args.repeats)))
+        return
+
+    import cv2
+
+    results = {'target_size': TARGET_SIZE, 'repeats': args.repeats, 'runs': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            width, height = (int(v) for v in size.lower().split('x'))
+            image = synthetic_field(width, height)
+            for image_format in args.formats:
+                path = Path(tmp) / f"field_{width}x{height}.{image_format}"
+                params = [cv2.IMWRITE_JPEG_QUALITY, 92] if image_format == 'jpg' else []
+                cv2.imwrite(str(path), image, params)
+                run = {'size': [width, height], 'format': image_format,
+                       'file_mb': path.stat().st_size / 2**20, **quality(path)}
+                for mode in ('full', 'reduced'):
+                    output = subprocess.run(
+                        [sys.executable, __file__, '--child', str(path), mode, '--repeats', str(args.repeats)],
+                        check=True, capture_output=True, text=True).stdout
+                    run[mode] = json.loads(output.strip().splitlines()[-1])
+                results['runs'].append(run)
+                print(f"  {width}×{height} {image_format}: {run['full']['latency_ms']:.0f} → "
+                      f"{run['reduced']['latency_ms']:.0f} ms", flush=True)
+            del image
+
+    print(f"\nDecode → {TARGET_SIZE}px resize, median of {args.repeats}")
+    print(f"{'Image':<16}{'Format':>7}{'File':>9}{'Decoded as':>14}{'Latency ms':>18}{'Peak RSS MB':>18}"
+          f"{'PSNR':>8}{'vs reference':>16}")
+    print(f"{'':<46}{'full → reduced':>18}{'full → reduced':>18}{'':>8}{'full / reduced':>16}")
+    for run in results['runs']:
+        full, reduced = run['full'], run['reduced']
+        print(f"{run['size'][0]}×{run['size'][1]:<11}{run['format']:>7}{run['file_mb']:>6.1f} MB"
+              f"{reduced['decoded_size'][0]:>8}×{reduced['decoded_size'][1]:<5}"
+              f"{full['latency_ms']:>9.0f} → {reduced['latency_ms']:<6.0f}"
+              f"{full['peak_rss_mb']:>9.0f} → {reduced['peak_rss_mb']:<6.0f}"
+              f"{run['psnr_reduced_vs_full']:>6.1f}dB"
+              f"{run['psnr_full_vs_reference']:>8.1f} / {run['psnr_reduced_vs_reference']:<5.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
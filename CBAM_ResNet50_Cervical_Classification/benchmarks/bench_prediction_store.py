@@ -0,0 +1,158 @@
+"""
+Benchmark: peak memory of evaluation vs. test-set size
+All logits in memory + compute_metrics (Trainer default) vs. streaming
+accumulators + chunked on-disk store (phoenix_shared/metrics.py / prediction_store.py).
+
+Synthetic (N, 5) float32 logit batches stand in for the model; model cost
+does not depend on how predictions are accumulated. The in-memory path
+gathers every batch, concatenates them and scores the split with sklearn,
+as `trainer.evaluate` + the old `compute_metrics` did. The streaming path
+feeds each batch to StreamingConfusionMatrix / StreamingScoreMetrics and
+a PredictionWriter. Peak memory is measured with tracemalloc (NumPy
+allocations are traced). The benchmark also checks that both paths give
+the same metrics and that the reloaded store equals the logits.
+
+Usage:
+    python benchmarks/bench_prediction_store.py --rows 100000 1000000 4000000
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+NUM_CLASSES = 5
+
+
+def batches(rows, batch_size, seed=0):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, batch_size):
+        n = min(batch_size, rows - start)
+        labels = rng.integers(0, NUM_CLASSES, n)
+        logits = rng.standard_normal((n, NUM_CLASSES), dtype=np.float32)
+        logits[np.arange(n), labels] += 1.5
+        yield logits, labels
+
+
+def softmax(logits):
+    import numpy as np
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def in_memory(rows, batch_size):
+    import numpy as np
+    from sklearn.metrics import accuracy_score, f1_score, log_loss
+
+    all_logits, all_labels = [], []
+    for logits, labels in batches(rows, batch_size):
+        all_logits.append(logits)
+        all_labels.append(labels)
+    logits, labels = np.concatenate(all_logits), np.concatenate(all_labels)
+    del all_logits, all_labels
+    predictions = logits.argmax(axis=1)
+    return {'accuracy': accuracy_score(labels, predictions), 'f1': f1_score(labels, predictions, average='weighted'),
+            'log_loss': log_loss(labels, softmax(logits), labels=list(range(NUM_CLASSES)))}
+
+
+def streaming(rows, batch_size, store_path, chunk_size):
+    from phoenix_shared.metrics import StreamingConfusionMatrix, StreamingScoreMetrics
+    from phoenix_shared.prediction_store import PredictionWriter
+
+    confusion, scores = StreamingConfusionMatrix(NUM_CLASSES), StreamingScoreMetrics(NUM_CLASSES)
+    with PredictionWriter(store_path, [str(i) for i in range(NUM_CLASSES)], chunk_size=chunk_size) as writer:
+        for logits, labels in batches(rows, batch_size):
+            probabilities = softmax(logits)
+            confusion.update(labels, probabilities)
+            scores.update(labels, probabilities)
+            writer.add(logits, labels)
+    point = confusion.compute()
+    return {'accuracy': float(point['accuracy']), 'f1': float(point['f1_weighted']),
+            'log_loss': float(scores.compute()['log_loss'])}
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    metrics = fn(*args)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return metrics, peak / 2**20, seconds
+
+
+def store_matches(store_path, rows, batch_size):
+    import numpy as np
+    from phoenix_shared.prediction_store import PredictionStore
+
+    store = PredictionStore(store_path)
+    expected = batches(rows, batch_size)
+    pending = next(expected, None)
+    offset = 0
+    for scores, labels in store.iter_chunks():
+        position = 0
+        while position < len(scores):
+            logits, truth = pending
+            take = min(len(logits) - offset, len(scores) - position)
+            if not (np.array_equal(scores[position:position + take], logits[offset:offset + take]) and
+                    np.array_equal(labels[position:position + take], truth[offset:offset + take])):
+                return False
+            position += take
+            offset += take
+            if offset == len(logits):
+                pending, offset = next(expected, None), 0
+    return len(store) == rows and pending is None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark in-memory vs streaming evaluation memory")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 4_000_000],
+                        help="Test-set sizes (cells)")
+    parser.add_argument('--batch-size', type=int, default=512)
+    parser.add_argument('--chunk-size', type=int, default=65536, help="PredictionWriter rows per chunk")
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    # import up front so module import allocations are not counted in either peak
+    import sklearn.metrics  # noqa: F401
+    import phoenix_shared.metrics  # noqa: F401
+    import phoenix_shared.prediction_store  # noqa: F401
+
+    results = {'batch_size': args.batch_size, 'chunk_size': args.chunk_size, 'runs': []}
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            reference, memory_peak, memory_s = measure(in_memory, rows, args.batch_size)
+            metrics, stream_peak, stream_s = measure(streaming, rows, args.batch_size, tmp, args.chunk_size)
+            results['runs'].append({
+                'rows': rows,
+                'in_memory_peak_mb': memory_peak,
+                'in_memory_seconds': memory_s,
+                'streaming_peak_mb': stream_peak,
+                'streaming_seconds': stream_s,
+                'max_metric_diff': max(abs(reference[name] - metrics[name]) for name in reference),
+                'store_matches': store_matches(tmp, rows, args.batch_size),
+            })
+
+    print(f"{NUM_CLASSES}-class logits, batch {args.batch_size}, store chunks of {args.chunk_size} rows")
+    print(f"{'Rows':>10}{'In-memory peak':>16}{'Streaming peak':>16}{'In-memory':>11}{'Streaming':>11}"
+          f"{'Metric Δ':>10}{'Reload':>8}")
+    for run in results['runs']:
+        print(f"{run['rows']:>10}{run['in_memory_peak_mb']:>13.1f} MB{run['streaming_peak_mb']:>13.1f} MB"
+              f"{run['in_memory_seconds']:>10.1f}s{run['streaming_seconds']:>10.1f}s"
+              f"{run['max_metric_diff']:>10.1e}{'ok' if run['store_matches'] else 'FAIL':>8}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Benchmark: per-node memory with N worker processes
+Every worker `torch.load`s its own checkpoint vs. all workers mapping the
+same registry version. Workers are independent interpreters (like separate
+Streamlit processes), not forks of a common parent.
+
+Node memory is reported as the sum of PSS (proportional set size: shared
+pages are split between the processes mapping them) and the sum of RSS over
+all workers, read from /proc/<pid>/smaps_rollup (Linux only). The `idle`
+mode (same imports, no model) is the per-worker floor.
+
+The registry run also publishes a second version while the workers are up
+and checks that every worker switches to it on its next request.
+
+Usage:
+    python benchmarks/bench_registry_rss.py --workers 1 4 8
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+def read_memory_kb(pid):
+    """(Rss, Pss) in kB for a process."""
+    values = {}
+    for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines():
+        key, _, value = line.partition(':')
+        if key in ('Rss', 'Pss'):
+            values[key] = int(value.split()[0])
+    return values['Rss'], values['Pss']
+
+
+def _worker(mode, source):
+    """Worker loop: load once, then answer 'predict' / 'exit' commands from stdin."""
+    import torch
+    torch.set_num_threads(1)
+
+    # Same imports in every mode, so `idle` is the floor without any weights
+    import checkpoint_io  # noqa: F401
+    import cbam_model  # noqa: F401
+
+    registry = None
+    model = None
+    if mode == 'torch_load':
+        from cbam_model import CBAM_ResNet50
+        checkpoint = torch.load(source, map_location='cpu')
+        model = CBAM_ResNet50(num_classes=5)
+        model.load_state_dict(checkpoint['model_state_dict'])
+        model.eval()
+        del checkpoint
+    elif mode == 'registry':
+        from model_registry import ModelRegistry
+        registry = ModelRegistry(source)
+
+    version = None
+    if registry is not None:
+        version = registry.get('cbam').version
+    print(json.dumps({'version': version}), flush=True)
+
+    x = torch.randn(1, 3, 224, 224)
+    for line in sys.stdin:
+        command = line.strip()
+        if command == 'exit':
+            break
+        version = None
+        if registry is not None:
+            loaded = registry.get('cbam')
+            model, version = loaded.model, loaded.version
+        if model is not None:
+            with torch.no_grad():
+                model(x)
+        print(json.dumps({'version': version}), flush=True)
+
+
+def _start_workers(mode, source, count):
+    workers = []
+    for _ in range(count):
+        workers.append(subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), '--worker', mode, str(source)],
+            cwd=APP_DIR, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        ))
+    return workers
+
+
+def _read_replies(workers):
+    return [json.loads(w.stdout.readline())['version'] for w in workers]
+
+
+def _request(workers):
+    """Send one predict request to every worker and collect the versions they served."""
+    for w in workers:
+        w.stdin.write('predict\n')
+        w.stdin.flush()
+    return _read_replies(workers)
+
+
+def _stop(workers):
+    for w in workers:
+        try:
+            w.stdin.write('exit\n')
+            w.stdin.flush()
+        except BrokenPipeError:
+            pass
+    for w in workers:
+        w.wait(timeout=60)
+
+
+def _memory_mb(workers):
+    rss, pss = zip(*(read_memory_kb(w.pid) for w in workers))
+    return sum(rss) / 1024, sum(pss) / 1024
+
+
+def measure(mode, source, count, registry=None):
+    """
+    Start `count` workers and sum their memory once the model is loaded and
+    again after one request each (which adds per-process activation buffers).
+    """
+    start = time.perf_counter()
+    workers = _start_workers(mode, source, count)
+    try:
+        versions = _read_replies(workers)
+        ready_s = time.perf_counter() - start
+        rss_loaded, pss_loaded = _memory_mb(workers)
+        _request(workers)
+        rss_served, pss_served = _memory_mb(workers)
+        result = {
+            'mode': mode,
+            'workers': count,
+            'ready_s': ready_s,
+            'rss_loaded_mb': rss_loaded,
+            'pss_loaded_mb': pss_loaded,
+            'rss_served_mb': rss_served,
+            'pss_served_mb': pss_served,
+        }
+
+        if registry is not None:
+            new_version = registry.publish('cbam', source_checkpoint(registry), family='cbam')
+            start = time.perf_counter()
+            swapped = _request(workers)
+            result['hot_swap_s'] = time.perf_counter() - start
+            result['hot_swap_ok'] = all(v == new_version for v in swapped) and all(v != new_version for v in versions)
+        return result
+    finally:
+        _stop(workers)
+
+
+def source_checkpoint(registry):
+    return registry.root / "source_checkpoint.pth"
+
+
+def run_benchmark(worker_counts=(1, 4, 8)):
+    """Returns a list of result dicts, one per (mode, worker count)."""
+    from bench_checkpoint_load import make_training_checkpoint
+    from model_registry import ModelRegistry
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = ModelRegistry(Path(tmp) / "registry")
+        registry.root.mkdir(parents=True)
+        checkpoint = source_checkpoint(registry)
+        make_training_checkpoint(checkpoint)
+        registry.publish('cbam', checkpoint, family='cbam')
+
+        for count in worker_counts:
+            results.append(measure('idle', checkpoint, count))
+            results.append(measure('torch_load', checkpoint, count))
+            results.append(measure('registry', registry.root, count, registry=registry))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-node memory of N inference workers")
+    parser.add_argument('--workers', nargs='+', type=int, default=[1, 4, 8])
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    parser.add_argument('--worker', nargs=2, metavar=('MODE', 'SOURCE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        _worker(*args.worker)
+        return
+
+    if not Path('/proc/self/smaps_rollup').exists():
+        raise SystemExit("This benchmark needs /proc/<pid>/smaps_rollup (Linux)")
+
+    results = run_benchmark(args.workers)
+
+    print(f"{'Mode':<12}{'Workers':>8}{'Σ PSS loaded':>14}{'Σ RSS loaded':>14}{'Weights MB/worker':>19}"
+          f"{'Σ PSS served':>14}{'Ready s':>9}  Hot swap")
+    idle = {r['workers']: r['pss_loaded_mb'] for r in results if r['mode'] == 'idle'}
+    for r in results:
+        per_worker = (r['pss_loaded_mb'] - idle[r['workers']]) / r['workers']
+        swap = ''
+        if 'hot_swap_ok' in r:
+            swap = f"{'ok' if r['hot_swap_ok'] else 'FAILED'} ({r['hot_swap_s']:.2f}s)"
+        print(f"{r['mode']:<12}{r['workers']:>8}{r['pss_loaded_mb']:>14.1f}{r['rss_loaded_mb']:>14.1f}"
+              f"{per_worker:>19.1f}{r['pss_served_mb']:>14.1f}{r['ready_s']:>9.2f}  {swap}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: explainability render + encode time per request
+Float path (cv2.applyColorMap + show_cam_on_image + PIL PNG encodes for both
+download buttons on every request) vs. rendering.py (LUT heatmaps, integer
+blending, batched over CAMs, encoding only when a download is requested).
+
+Scenarios per request:
+  - 1 CAM (predicted class) and 6 CAMs (predicted + 5 class-specific maps)
+  - no download clicked, and one overlay download in each codec
+
+Usage:
+    python benchmarks/bench_render.py
+"""
+
+import argparse
+import json
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rendering import CODECS, EncodedImage, render_overlays  # noqa: E402
+
+
+def float_path(rgb_img, cams):
+    """What app.py did before: per-CAM float rendering, then eager PNG encodes of the downloads."""
+    from pytorch_grad_cam.utils.image import show_cam_on_image
+
+    rgb_float = np.float32(rgb_img) / 255.0
+    overlays = []
+    for cam in cams:
+        heatmap = cv2.applyColorMap(np.uint8(255 * cam), cv2.COLORMAP_JET)
+        heatmap = cv2.cvtColor(heatmap, cv2.COLOR_BGR2RGB)
+        overlays.append(show_cam_on_image(rgb_float, cam, use_rgb=True))
+    for image in (rgb_img, overlays[0]):
+        Image.fromarray(image).save(BytesIO(), format='PNG')
+    return overlays
+
+
+def lut_path(rgb_img, cams, codec=None):
+    """rendering.py: one batched render; encode only the download that was clicked."""
+    _, overlays = render_overlays(rgb_img, cams)
+    downloads = [EncodedImage(rgb_img, codec=codec or 'png'), EncodedImage(overlays[0], codec=codec or 'png')]
+    if codec is not None:
+        downloads[1].data
+    return overlays
+
+
+def best_time(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_benchmark(repeats=50, size=224, seed=0):
+    rng = np.random.default_rng(seed)
+    rgb_img = rng.integers(0, 256, (size, size, 3), dtype=np.uint8)
+    # smooth CAM-like maps normalised to [0, 1]
+    cams = cv2.GaussianBlur(rng.random((6, size, size), dtype=np.float32).transpose(1, 2, 0), (0, 0), 20)
+    cams = cams.transpose(2, 0, 1)
+    cams -= cams.min(axis=(1, 2), keepdims=True)
+    cams /= cams.max(axis=(1, 2), keepdims=True)
+
+    max_diff = max(int(np.abs(a.astype(int) - b.astype(int)).max())
+                   for a, b in zip(float_path(rgb_img, cams), lut_path(rgb_img, cams)))
+
+    results = []
+    for n_cams in (1, 6):
+        batch = cams[:n_cams]
+        baseline = best_time(lambda: float_path(rgb_img, batch), repeats)
+        results.append({'cams': n_cams, 'path': 'float + eager PNG', 'seconds': baseline, 'speedup': 1.0})
+        for codec in [None] + list(CODECS):
+            seconds = best_time(lambda: lut_path(rgb_img, batch, codec), repeats)
+            label = 'LUT, no download' if codec is None else f'LUT + {codec} download'
+            results.append({'cams': n_cams, 'path': label, 'seconds': seconds, 'speedup': baseline / seconds})
+    return results, max_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark overlay rendering and download encoding")
+    parser.add_argument('--repeats', type=int, default=50)
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results, max_diff = run_benchmark(args.repeats)
+    print(f"Max |overlay difference| vs. show_cam_on_image: {max_diff}")
+    print(f"{'CAMs':>5}  {'Path':<24}{'ms/request':>12}{'Speedup':>9}")
+    for r in results:
+        print(f"{r['cams']:>5}  {r['path']:<24}{r['seconds'] * 1000:>12.2f}{r['speedup']:>8.1f}×")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': results, 'max_overlay_diff': max_diff}, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
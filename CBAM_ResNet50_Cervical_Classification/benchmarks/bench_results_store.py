@@ -0,0 +1,195 @@
+"""
+Benchmark: appending to and querying the results store (results_store.py)
+Write throughput and query latency over millions of predictions, for each
+store layout and for an unindexed Parquet file.
+
+Rows are synthetic: random image hashes, Dirichlet class probabilities and
+preprocessing metrics, written through `ResultsWriter.record` with the
+default batch size. Layouts:
+  per-flush  merging off: one part per class per flush
+  tiered     the writer's default size-tiered merging
+  compacted  the tiered store after `compact()`: one part per class
+  unindexed  the same rows in one unpartitioned file in arrival order,
+             where every query scans every row group
+
+Each query is timed on a freshly opened store (part discovery included)
+and as the median of `--repeats` runs on an open one:
+  hash       one image's history, by hash
+  missing    a hash that was never recorded
+  class      all rows of one predicted class (3 columns)
+  confident  one class with confidence ≥ 0.9 (3 columns)
+  counts     rows per class
+
+Usage:
+    python benchmarks/bench_results_store.py --rows 1000000 4000000 --output results_store.json
+"""
+
+import argparse
+import json
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+QUERY_COLUMNS = ['image_hash', 'confidence', 'recorded_at']
+
+
+def write_store(root, rows, class_names, merge_parts, seed=0):
+    """Append `rows` synthetic predictions; returns (seconds, a recorded hash)."""
+    from datetime import datetime, timedelta, timezone
+
+    import numpy as np
+    from results_store import ResultsWriter
+
+    rng = np.random.default_rng(seed)
+    start_time = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    block = 65536
+    probe = None
+    start = time.perf_counter()
+    with ResultsWriter(root, class_names, flush_seconds=None, merge_parts=merge_parts) as writer:
+        for offset in range(0, rows, block):
+            n = min(block, rows - offset)
+            hashes = rng.bytes(16 * n).hex()
+            probabilities = rng.dirichlet(np.full(len(class_names), 0.3), n).astype(np.float32)
+            psnr, ssim = rng.uniform(22, 38, n), rng.uniform(0.8, 1.0, n)
+            for i in range(n):
+                writer.record(hashes[32 * i:32 * (i + 1)], probabilities[i], file_name=f"cell_{offset + i:08d}.bmp",
+                              metrics={'psnr_db': psnr[i], 'ssim': ssim[i]}, model_version="file:best_model.pth",
+                              recorded_at=start_time + timedelta(seconds=offset + i))
+            probe = probe or hashes[:32]
+    return time.perf_counter() - start, probe
+
+
+def write_unindexed(store_root, path):
+    """The store's rows in one unpartitioned file, in arrival order."""
+    import pyarrow.parquet as pq
+    from results_store import ResultsStore
+
+    table = ResultsStore(store_root).query().sort_by('recorded_at')
+    pq.write_table(table, path, compression='zstd')
+
+
+def open_store(kind, path):
+    import pyarrow.dataset as ds
+    from results_store import ResultsStore
+
+    if kind == 'unindexed':
+        return ds.dataset(path, format='parquet')
+    return ResultsStore(path)
+
+
+def run_query(kind, store, name, probe, class_name):
+    import pyarrow.dataset as ds
+
+    if kind != 'unindexed':
+        if name == 'hash':
+            return store.query(image_hash=probe).num_rows
+        if name == 'missing':
+            return store.query(image_hash='0' * 32).num_rows
+        if name == 'class':
+            return store.query(columns=QUERY_COLUMNS, predicted_class=class_name).num_rows
+        if name == 'confident':
+            return store.query(columns=QUERY_COLUMNS, predicted_class=class_name, min_confidence=0.9).num_rows
+        return sum(store.class_counts().values())
+
+    if name == 'hash':
+        return store.to_table(filter=ds.field('image_hash') == probe).num_rows
+    if name == 'missing':
+        return store.to_table(filter=ds.field('image_hash') == '0' * 32).num_rows
+    if name == 'class':
+        return store.to_table(columns=QUERY_COLUMNS, filter=ds.field('predicted_class') == class_name).num_rows
+    if name == 'confident':
+        return store.to_table(columns=QUERY_COLUMNS, filter=(ds.field('predicted_class') == class_name) &
+                              (ds.field('confidence') >= 0.9)).num_rows
+    counts = store.to_table(columns=['predicted_class']).group_by('predicted_class').aggregate(
+        [('predicted_class', 'count')])
+    return sum(counts['predicted_class_count'].to_pylist())
+
+
+def time_queries(kind, path, probe, class_name, repeats):
+    results = {}
+    for name in ('hash', 'missing', 'class', 'confident', 'counts'):
+        start = time.perf_counter()
+        rows = run_query(kind, open_store(kind, path), name, probe, class_name)
+        cold = time.perf_counter() - start
+        store = open_store(kind, path)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run_query(kind, store, name, probe, class_name)
+            times.append(time.perf_counter() - start)
+        results[name] = {'rows': rows, 'open_and_query_ms': cold * 1e3, 'query_ms': statistics.median(times) * 1e3}
+    return results
+
+
+def storage(path):
+    path = Path(path)
+    files = [path] if path.is_file() else [p for p in path.rglob('*.parquet')]
+    return len(files), sum(p.stat().st_size for p in files) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark results store writes and queries")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 4_000_000])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    from cbam_model import CLASS_NAMES
+    from results_store import DEFAULT_MERGE_PARTS, ResultsStore
+
+    class_name = CLASS_NAMES[1]
+    results = {'runs': []}
+    for rows in args.rows:
+        tmp = Path(tempfile.mkdtemp())
+        try:
+            store_root, unindexed = tmp / "store", tmp / "unindexed.parquet"
+            run = {'rows': rows, 'layouts': {}}
+            seconds, probe = write_store(tmp / "per_flush", rows, CLASS_NAMES, merge_parts=0)
+            run['per_flush_rows_per_s'] = rows / seconds
+            seconds, _ = write_store(store_root, rows, CLASS_NAMES, merge_parts=DEFAULT_MERGE_PARTS)
+            run['tiered_rows_per_s'] = rows / seconds
+            print(f"  {rows} rows appended at {run['per_flush_rows_per_s']:,.0f} rows/s per flush, "
+                  f"{run['tiered_rows_per_s']:,.0f} rows/s tiered", flush=True)
+
+            write_unindexed(store_root, unindexed)
+            for kind, path in [('per-flush', tmp / "per_flush"), ('tiered', store_root), ('compacted', store_root),
+                               ('unindexed', unindexed)]:
+                if kind == 'compacted':
+                    start = time.perf_counter()
+                    ResultsStore(store_root).compact()
+                    run['compact_seconds'] = time.perf_counter() - start
+                files, size_mb = storage(path)
+                run['layouts'][kind] = {'files': files, 'size_mb': size_mb,
+                                        'queries': time_queries(kind, path, probe, class_name, args.repeats)}
+                print(f"    {kind}: {files} files, {size_mb:.0f} MB", flush=True)
+            results['runs'].append(run)
+        finally:
+            shutil.rmtree(tmp)
+
+    queries = ('hash', 'missing', 'class', 'confident', 'counts')
+    print(f"\nQuery latency, ms: open store + query / query on an open store (median of {args.repeats})")
+    print(f"{'Rows':>9}{'Layout':>11}{'Files':>7}{'MB':>6}" + ''.join(f"{name:>16}" for name in queries))
+    for run in results['runs']:
+        for kind, layout in run['layouts'].items():
+            cells = ''.join(f"{q['open_and_query_ms']:>8.0f} / {q['query_ms']:<5.0f}"
+                            for q in (layout['queries'][name] for name in queries))
+            print(f"{run['rows']:>9}{kind:>11}{layout['files']:>7}{layout['size_mb']:>6.0f}{cells}")
+        matches = {kind: layout['queries']['hash']['rows'] for kind, layout in run['layouts'].items()}
+        print(f"{'':>9}append {run['per_flush_rows_per_s']:,.0f} rows/s per flush, "
+              f"{run['tiered_rows_per_s']:,.0f} rows/s tiered; compaction {run['compact_seconds']:.1f}s; "
+              f"hash matches {matches}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark: cold-start profile of app.py
+Import-time breakdown per top-level package plus time to first prediction
+
+Every measurement runs in a fresh interpreter so module caches from earlier
+runs do not hide import cost.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --model cbam_resnet50_cervical/best_model.pth --output startup.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+SAMPLE_IMAGE = APP_DIR / "sample_image" / "original_images" / "Parabasal_Original.bmp"
+HEAVY_MODULES = ['torch', 'torchvision', 'pandas', 'plotly.express', 'matplotlib', 'skimage', 'pytorch_grad_cam']
+
+
+def import_time_breakdown(module='app', top=15):
+    """
+    Run `python -X importtime -c "import <module>"` and attribute the self
+    time of every imported module to its root package (torch, streamlit, ...).
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=APP_DIR, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    per_package = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        per_package[name.strip().split('.')[0]] += int(self_us) / 1e6
+
+    total = sum(per_package.values())
+    breakdown = sorted(per_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {'total_s': total, 'packages': [{'package': p, 'seconds': s} for p, s in breakdown]}
+
+
+def _child(model_path):
+    """Runs inside a fresh interpreter; prints phase timings as JSON."""
+    timings = {}
+    start = time.perf_counter()
+
+    import app
+    timings['import_app_s'] = time.perf_counter() - start
+    loaded_after_import = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    import cv2
+    from PIL import Image
+
+    t = time.perf_counter()
+    image_bgr = cv2.imread(str(SAMPLE_IMAGE), cv2.IMREAD_COLOR)
+    _, _, final_image, _ = app.apply_preprocessing_pipeline(image_bgr)
+    preprocessed_pil = Image.fromarray(cv2.cvtColor(final_image, cv2.COLOR_BGR2RGB))
+    timings['preprocess_s'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    weights = 'random'
+    if model_path and Path(model_path).is_file() and Path(model_path).stat().st_size > 1024:
+        model = app.load_model(str(Path(model_path).resolve()))
+        weights = 'checkpoint'
+    else:
+        model = app.CBAM_ResNet50(num_classes=5).eval()
+    timings['load_model_s'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    app.predict(preprocessed_pil, model)
+    timings['first_predict_s'] = time.perf_counter() - t
+    timings['time_to_first_prediction_s'] = time.perf_counter() - start
+
+    print(json.dumps({
+        'timings': timings,
+        'weights': weights,
+        'heavy_modules_after_import': loaded_after_import,
+    }))
+
+
+def time_to_first_prediction(model_path=None):
+    """Spawn a fresh interpreter and time import → preprocess → load → first prediction."""
+    command = [sys.executable, str(Path(__file__).resolve()), '--child']
+    if model_path:
+        command += ['--model', str(model_path)]
+
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=APP_DIR, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup child failed:\n{result.stderr[-2000:]}")
+
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['timings']['process_wall_s'] = wall
+    return report
+
+
+def run_benchmark(model_path=None, repeats=3):
+    """Best-of-N cold-start timings plus one import-time breakdown."""
+    runs = [time_to_first_prediction(model_path) for _ in range(repeats)]
+    best = {key: min(run['timings'][key] for run in runs) for key in runs[0]['timings']}
+    return {
+        'timings': best,
+        'weights': runs[0]['weights'],
+        'heavy_modules_after_import': runs[0]['heavy_modules_after_import'],
+        'import_breakdown': import_time_breakdown(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile app.py cold start")
+    parser.add_argument('--model', default=None, help="Checkpoint to load (default: random weights)")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, str(APP_DIR))
+        _child(args.model)
+        return
+
+    results = run_benchmark(args.model, args.repeats)
+
+    print(f"Import-time breakdown of `import app` ({results['import_breakdown']['total_s']:.3f}s total):")
+    for entry in results['import_breakdown']['packages']:
+        print(f"  {entry['package']:<24} {entry['seconds']:.3f}s")
+
+    heavy = ', '.join(results['heavy_modules_after_import']) or 'none'
+    print(f"\nHeavy modules loaded by `import app`: {heavy}")
+    print(f"\nCold start (best of {args.repeats}, {results['weights']} weights):")
+    for key, value in results['timings'].items():
+        print(f"  {key:<28} {value:.3f}s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
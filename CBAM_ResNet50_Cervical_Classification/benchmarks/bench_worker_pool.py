@@ -0,0 +1,118 @@
+"""
+Benchmark: replicas × threads for CPU inference (worker_pool.py)
+Images/s and request latency of CBAM-ResNet50 for every (replicas, threads)
+combination, against one process using all cores.
+
+Each configuration starts an InferencePool (start-up is not timed). Requests
+then run closed-loop: `--in-flight` × replicas batches are kept outstanding,
+and a new one is submitted whenever one finishes. Latency is measured from
+submit to result, so it includes queueing; p99 is what a client sees with
+that many concurrent requests. Combinations that need more cores than the
+machine has are skipped unless `--oversubscribe` is given. The weights are
+a randomly initialised CBAM-ResNet50 exported to .safetensors, so every
+replica maps the same file.
+
+Usage:
+    python benchmarks/bench_worker_pool.py --replicas 1 2 4 8 --threads 1 2 4 8 --pin --output pool.json
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+
+def run_config(model_path, replicas, threads, args):
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    import numpy as np
+    import torch
+    from worker_pool import InferencePool
+
+    batch = torch.randn(args.batch_size, 3, args.image_size, args.image_size)
+    with InferencePool(model_path, replicas=replicas, threads=threads, pin=args.pin,
+                       warmup_batch=args.batch_size, input_size=args.image_size) as pool:
+        in_flight = args.in_flight * replicas
+        latencies, pending = [], {}
+        submitted = 0
+        start = time.perf_counter()
+        while submitted < args.batches or pending:
+            while submitted < args.batches and len(pending) < in_flight:
+                pending[pool.submit(batch)] = time.perf_counter()
+                submitted += 1
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                latencies.append(time.perf_counter() - pending.pop(future))
+        seconds = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1e3
+    return {
+        'replicas': replicas,
+        'threads': threads,
+        'cores_used': replicas * threads,
+        'images_per_s': args.batches * args.batch_size / seconds,
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+    }
+
+
+def main():
+    import os
+
+    parser = argparse.ArgumentParser(description="Benchmark inference worker pool configurations")
+    parser.add_argument('--replicas', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8], help="Threads per replica")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--batches', type=int, default=32, help="Batches per configuration")
+    parser.add_argument('--in-flight', type=int, default=2, help="Outstanding batches per replica")
+    parser.add_argument('--image-size', type=int, default=224)
+    parser.add_argument('--pin', action='store_true', help="Pin each replica to its own cores")
+    parser.add_argument('--oversubscribe', action='store_true', help="Also run configurations needing more cores")
+    parser.add_argument('--output', default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    import torch
+    from cbam_model import CBAM_ResNet50
+    from checkpoint_io import save_weights
+    from worker_pool import available_cores
+
+    cores = len(available_cores())
+    configs = [(r, t) for r in args.replicas for t in args.threads if args.oversubscribe or r * t <= cores]
+    # one process with every core is the default single-process deployment
+    if (1, cores) not in configs:
+        configs.insert(0, (1, cores))
+
+    results = {'cores': cores, 'cpu_count': os.cpu_count(), 'batch_size': args.batch_size,
+               'image_size': args.image_size, 'pin': args.pin, 'runs': []}
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = Path(tmp) / "model.safetensors"
+        torch.manual_seed(0)
+        save_weights(CBAM_ResNet50(num_classes=5).state_dict(), model_path)
+        for replicas, threads in configs:
+            run = run_config(model_path, replicas, threads, args)
+            results['runs'].append(run)
+            print(f"  {replicas} × {threads}: {run['images_per_s']:.1f} images/s, p99 {run['p99_ms']:.0f} ms",
+                  flush=True)
+
+    base = next(run for run in results['runs'] if (run['replicas'], run['threads']) == (1, cores))
+    print(f"\nCBAM-ResNet50, batch {args.batch_size} at {args.image_size}px, {cores} core(s), "
+          f"{'pinned' if args.pin else 'unpinned'}")
+    print(f"{'Replicas':>9}{'Threads':>9}{'Images/s':>10}{'Speed-up':>10}{'p50':>9}{'p99':>9}")
+    for run in sorted(results['runs'], key=lambda r: -r['images_per_s']):
+        run['speedup'] = run['images_per_s'] / base['images_per_s']
+        print(f"{run['replicas']:>9}{run['threads']:>9}{run['images_per_s']:>10.1f}{run['speedup']:>9.2f}×"
+              f"{run['p50_ms']:>6.0f} ms{run['p99_ms']:>6.0f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
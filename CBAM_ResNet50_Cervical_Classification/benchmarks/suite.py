@@ -0,0 +1,460 @@
+"""
+Benchmark Suite: preprocessing, inference and explainability
+Offline, CPU-only regression tracking for app.py and the hybrid dashboards
+
+Runs on the bundled sample images plus synthetic images, with randomly
+initialised weights (timings do not depend on the trained values), so no
+checkpoint or network access is needed. Results are written as JSON; the
+`compare` command flags cases whose median time regressed beyond a threshold
+and exits with status 1 if any did.
+
+Usage:
+    python benchmarks/suite.py run --output bench_baseline.json
+    python benchmarks/suite.py run --filter forward --output bench_current.json
+    python benchmarks/suite.py compare bench_baseline.json bench_current.json --threshold 0.10
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
+import cv2
+import numpy as np
+from PIL import Image
+
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(APP_DIR))
+
+SAMPLE_DIR = APP_DIR / "sample_image" / "original_images"
+SYNTHETIC_SIZES = [(256, 256), (512, 384), (1024, 768)]
+FORWARD_BATCH_SIZES = [1, 4, 16]
+NUM_CLASSES = 5
+IMAGE_EXTENSIONS = {'.bmp', '.png', '.jpg', '.jpeg'}
+
+CASES = {}
+
+
+def sample_paths():
+    if not SAMPLE_DIR.exists():
+        return []
+    return sorted(p for p in SAMPLE_DIR.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+
+
+def case(name):
+    """Register a benchmark case. The function receives the shared context and returns a zero-arg callable to time."""
+    def decorator(fn):
+        CASES[name] = fn
+        return fn
+    return decorator
+
+
+# ============================================================================
+# CONTEXT (lazily built inputs and models shared between cases)
+# ============================================================================
+
+class Context:
+    def __init__(self, seed=0):
+        self.seed = seed
+        self._cache = {}
+
+    def _get(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    @property
+    def sample_images(self):
+        """Bundled sample images as BGR arrays."""
+        def build():
+            return [cv2.imread(str(p)) for p in sample_paths()]
+        return self._get('sample_images', build)
+
+    @property
+    def sample_bytes(self):
+        """Encoded bytes of the first sample image, as received from an upload."""
+        def build():
+            paths = sample_paths()
+            if paths:
+                return paths[0].read_bytes()
+            _, encoded = cv2.imencode('.png', self.synthetic(512, 384))
+            return encoded.tobytes()
+        return self._get('sample_bytes', build)
+
+    def synthetic(self, width, height):
+        """Smooth blobs plus noise, so NLM and CLAHE do representative work."""
+        def build():
+            rng = np.random.default_rng(self.seed)
+            image = np.full((height, width, 3), 180, dtype=np.float32)
+            for _ in range(12):
+                cx, cy = rng.integers(0, width), rng.integers(0, height)
+                axes = (int(rng.integers(10, width // 6 + 11)), int(rng.integers(10, height // 6 + 11)))
+                color = tuple(float(c) for c in rng.integers(40, 160, size=3))
+                cv2.ellipse(image, (int(cx), int(cy)), axes, float(rng.integers(0, 180)), 0, 360, color, -1)
+            image += rng.normal(0, 8, image.shape).astype(np.float32)
+            return np.clip(image, 0, 255).astype(np.uint8)
+        return self._get(('synthetic', width, height), build)
+
+    @property
+    def preprocessed(self):
+        """(resized, final) of the first sample image, the app's metric inputs."""
+        def build():
+            import app
+            resized, _, final, _ = app.apply_preprocessing_pipeline(self.first_image)
+            return resized, final
+        return self._get('preprocessed', build)
+
+    @property
+    def first_image(self):
+        return self.sample_images[0] if self.sample_images else self.synthetic(512, 384)
+
+    @property
+    def preprocessed_pil(self):
+        return Image.fromarray(cv2.cvtColor(self.preprocessed[1], cv2.COLOR_BGR2RGB))
+
+    @property
+    def cbam_model(self):
+        def build():
+            import torch
+            from cbam_model import CBAM_ResNet50
+            torch.manual_seed(self.seed)
+            return CBAM_ResNet50(num_classes=NUM_CLASSES).eval()
+        return self._get('cbam_model', build)
+
+    @property
+    def hybrid(self):
+        """Random ResNet50 feature extractor + scaler / logistic regression fitted on random features."""
+        def build():
+            import torch
+            from sklearn.linear_model import LogisticRegression
+            from sklearn.preprocessing import StandardScaler
+            from hybrid_model import FeatureExtractor
+
+            torch.manual_seed(self.seed)
+            rng = np.random.default_rng(self.seed)
+            features = rng.normal(size=(200, 2048))
+            labels = np.arange(200) % NUM_CLASSES
+            scaler = StandardScaler().fit(features)
+            classifier = LogisticRegression(max_iter=200).fit(scaler.transform(features), labels)
+            return FeatureExtractor().eval(), scaler, classifier
+        return self._get('hybrid', build)
+
+
+# ============================================================================
+# CASES
+# ============================================================================
+
+def _register_preprocessing_cases():
+    import app
+
+    steps = {
+        'resize': lambda img: app.resize_with_aspect_ratio_mirroring(img, target_size=256),
+        'nlm': app.apply_nlm_denoising,
+        'clahe': app.apply_clahe_enhancement,
+        'pipeline': app.apply_preprocessing_pipeline,
+    }
+    for step_name, step in steps.items():
+        # NLM and CLAHE run after the resize in the app, so they always see 256x256 inputs
+        sources = ['sample'] + ([f'{w}x{h}' for w, h in SYNTHETIC_SIZES] if step_name in ('resize', 'pipeline') else [])
+        for source in sources:
+            def make(ctx, step=step, step_name=step_name, source=source):
+                if source == 'sample':
+                    image = ctx.first_image
+                else:
+                    image = ctx.synthetic(*map(int, source.split('x')))
+                if step_name in ('nlm', 'clahe'):
+                    image = app.resize_with_aspect_ratio_mirroring(image, target_size=256)[0]
+                return lambda: step(image)
+            case(f'preprocess.{step_name}[{source}]')(make)
+
+    @case('preprocess.metrics[sample]')
+    def _(ctx):
+        resized, final = ctx.preprocessed
+        return lambda: app.calculate_preprocessing_metrics(resized, final)
+
+    @case('preprocess.pipeline[all_samples]')
+    def _(ctx):
+        images = ctx.sample_images
+        return lambda: [app.apply_preprocessing_pipeline(img) for img in images]
+
+
+def _register_inference_cases():
+    import app
+
+    for batch_size in FORWARD_BATCH_SIZES:
+        @case(f'inference.cbam_forward[batch={batch_size}]')
+        def _(ctx, batch_size=batch_size):
+            import torch
+            model = ctx.cbam_model
+            batch = torch.randn(batch_size, 3, 224, 224)
+
+            def run():
+                with torch.no_grad():
+                    model(batch)
+            return run
+
+        @case(f'inference.hybrid_forward[batch={batch_size}]')
+        def _(ctx, batch_size=batch_size):
+            import torch
+            feature_extractor, scaler, classifier = ctx.hybrid
+            batch = torch.randn(batch_size, 3, 224, 224)
+
+            def run():
+                with torch.no_grad():
+                    features = feature_extractor(batch).numpy()
+                classifier.predict_proba(scaler.transform(features))
+            return run
+
+    @case('inference.predict[cbam]')
+    def _(ctx):
+        """The app's prediction: preprocessed BGR array → model tensor (model_input.bgr_to_tensor) → forward."""
+        model, final_image = ctx.cbam_model, ctx.preprocessed[1]
+        return lambda: app.predict_with_attention(final_image, model)
+
+    @case('explain.gradcam_plus_plus')
+    def _(ctx):
+        model, image = ctx.cbam_model, ctx.preprocessed_pil
+        return lambda: app.generate_gradcam(image, model, 'Parabasal')
+
+    @case('explain.cbam_attention')
+    def _(ctx):
+        """Prediction with the CBAM attention maps captured and fused, then rendered."""
+        model, final_image, image = ctx.cbam_model, ctx.preprocessed[1], ctx.preprocessed_pil
+
+        def run():
+            attention = app.predict_with_attention(final_image, model)[3]
+            app.render_attention(image, attention)
+        return run
+
+
+def _register_end_to_end_cases():
+    import app
+
+    @case('end_to_end.cbam_request')
+    def _(ctx):
+        """
+        main()'s request: upload bytes → decode_upload → preprocess + metrics →
+        predict_with_attention on the BGR array → Grad-CAM++ (downloads are encoded on click).
+        """
+        model, data = ctx.cbam_model, ctx.sample_bytes
+
+        def run():
+            image_bgr = app.decode_upload(data)
+            _, _, final_image, _, _ = app.run_preprocessing(image_bgr)
+            preprocessed_pil = Image.fromarray(cv2.cvtColor(final_image, cv2.COLOR_BGR2RGB))
+            pred_class = app.predict_with_attention(final_image, model)[0]
+            app.generate_gradcam(preprocessed_pil, model, pred_class)
+        return run
+
+    @case('end_to_end.hybrid_request')
+    def _(ctx):
+        """The hybrid dashboards' predict(): decode → transform → features → scaler → logistic regression."""
+        import torch
+        from evaluation import _imagenet_transform
+        feature_extractor, scaler, classifier = ctx.hybrid
+        transform = _imagenet_transform()
+        data = ctx.sample_bytes
+
+        def run():
+            image = Image.open(BytesIO(data)).convert('RGB')
+            with torch.no_grad():
+                features = feature_extractor(transform(image).unsqueeze(0)).numpy()
+            classifier.predict_proba(scaler.transform(features))
+        return run
+
+
+def _register_training_cases():
+    @case('train.batch_augment[32]')
+    def _(ctx):
+        """On-the-fly augmentation of a normalised 32-image training batch (augmentation.BatchAugment)."""
+        import torch
+        from phoenix_shared.augmentation import IMAGENET_MEAN, IMAGENET_STD, BatchAugment
+        augment = BatchAugment(mean=IMAGENET_MEAN, std=IMAGENET_STD, generator=torch.Generator().manual_seed(0))
+        batch = torch.randn(32, 3, 224, 224)
+        return lambda: augment(batch)
+
+
+def register_cases():
+    if not CASES:
+        _register_preprocessing_cases()
+        _register_inference_cases()
+        _register_end_to_end_cases()
+        _register_training_cases()
+    return CASES
+
+
+# ============================================================================
+# RUN
+# ============================================================================
+
+def time_callable(fn, repeats=10, warmup=2, max_seconds=30.0):
+    """Per-call wall times; stops early once `max_seconds` is spent (at least 3 runs)."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    budget_start = time.perf_counter()
+    for i in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+        if i >= 2 and time.perf_counter() - budget_start > max_seconds:
+            break
+    return times
+
+
+def summarize(times):
+    ordered = sorted(times)
+    quartiles = statistics.quantiles(ordered, n=4) if len(ordered) >= 2 else [ordered[0]] * 3
+    return {
+        'runs': len(ordered),
+        'median_s': statistics.median(ordered),
+        'mean_s': statistics.fmean(ordered),
+        'min_s': ordered[0],
+        'max_s': ordered[-1],
+        'iqr_s': quartiles[2] - quartiles[0],
+    }
+
+
+def environment():
+    import torch
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+    }
+
+
+def run_suite(filter_text=None, repeats=10, warmup=2, max_seconds=30.0, threads=1, seed=0):
+    """Run every registered case (optionally filtered by substring) and return the results dict."""
+    import torch
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+
+    cases = register_cases()
+    ctx = Context(seed=seed)
+    results = {}
+    for name, make in cases.items():
+        if filter_text and filter_text not in name:
+            continue
+        fn = make(ctx)
+        results[name] = summarize(time_callable(fn, repeats=repeats, warmup=warmup, max_seconds=max_seconds))
+        print(f"{name:<45}{results[name]['median_s'] * 1000:>11.2f} ms  (±{results[name]['iqr_s'] * 1000:.2f})")
+
+    return {'environment': environment(), 'settings': {'repeats': repeats, 'warmup': warmup, 'threads': threads},
+            'results': results}
+
+
+# ============================================================================
+# COMPARE
+# ============================================================================
+
+def compare(baseline, current, threshold=0.10):
+    """
+    Compare median times case by case. A case regresses when it is more
+    than `threshold` slower and the slowdown exceeds the combined IQR of
+    both runs (so noisy cases are not flagged on jitter alone).
+    """
+    rows = []
+    for name, cur in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            rows.append({'case': name, 'status': 'new', 'current_s': cur['median_s']})
+            continue
+        ratio = cur['median_s'] / base['median_s']
+        noise = base['iqr_s'] + cur['iqr_s']
+        delta = cur['median_s'] - base['median_s']
+        if ratio > 1 + threshold and delta > noise:
+            status = 'REGRESSION'
+        elif ratio < 1 - threshold and -delta > noise:
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append({'case': name, 'status': status, 'baseline_s': base['median_s'],
+                     'current_s': cur['median_s'], 'ratio': ratio})
+    for name in baseline['results']:
+        if name not in current['results']:
+            rows.append({'case': name, 'status': 'missing', 'baseline_s': baseline['results'][name]['median_s']})
+    return rows
+
+
+def print_comparison(rows, baseline, current):
+    keys = ['cpu_count', 'torch', 'opencv', 'numpy', 'python']
+    changed = [k for k in keys if baseline['environment'].get(k) != current['environment'].get(k)]
+    if changed:
+        print("Warning: environments differ in " + ', '.join(
+            f"{k} ({baseline['environment'].get(k)} → {current['environment'].get(k)})" for k in changed))
+    if baseline.get('settings', {}).get('threads') != current.get('settings', {}).get('threads'):
+        print("Warning: runs used different thread counts")
+
+    print(f"{'Case':<45}{'Baseline ms':>13}{'Current ms':>12}{'Ratio':>8}  Status")
+    for row in rows:
+        base = f"{row['baseline_s'] * 1000:.2f}" if 'baseline_s' in row else '-'
+        cur = f"{row['current_s'] * 1000:.2f}" if 'current_s' in row else '-'
+        ratio = f"{row['ratio']:.2f}×" if 'ratio' in row else '-'
+        print(f"{row['case']:<45}{base:>13}{cur:>12}{ratio:>8}  {row['status']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocessing / inference / explainability benchmark suite")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Run the benchmarks")
+    run_parser.add_argument('--filter', default=None, help="Only run cases whose name contains this text")
+    run_parser.add_argument('--repeats', type=int, default=10)
+    run_parser.add_argument('--warmup', type=int, default=2)
+    run_parser.add_argument('--max-seconds', type=float, default=30.0, help="Time budget per case")
+    run_parser.add_argument('--threads', type=int, default=1, help="torch / OpenCV threads")
+    run_parser.add_argument('--output', default=None, help="Write results as JSON")
+
+    compare_parser = subparsers.add_parser('compare', help="Compare two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.10, help="Relative slowdown to flag (default 0.10)")
+
+    subparsers.add_parser('list', help="List benchmark cases")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        for name in register_cases():
+            print(name)
+    elif args.command == 'run':
+        results = run_suite(args.filter, repeats=args.repeats, warmup=args.warmup,
+                            max_seconds=args.max_seconds, threads=args.threads)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+            print(f"\nSaved results to: {args.output}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        rows = compare(baseline, current, threshold=args.threshold)
+        print_comparison(rows, baseline, current)
+        regressions = [r for r in rows if r['status'] == 'REGRESSION']
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+"""
+Bulk Explainability Job and Compact CAM Archive
+Manifest → Batched Forward → GradCAM++ at Native Resolution → Quantized, Chunked, Memory-Mapped Archive
+
+CAMs are computed for a whole batch at once, for the predicted class or for
+every class. Only the target layer's activations need gradients: the
+backbone runs without building a graph and each class costs a backward pass
+through cbam4 + avgpool + fc only. The maps match `pytorch_grad_cam`'s
+GradCAMPlusPlus on `model.layer4[-1]` once upsampled.
+
+Maps are stored at the layer's native resolution (7×7 for layer4, 14×14 for
+layer3 at 224×224 input), min-max normalised and quantized to uint8 or
+float16, and are upsampled only when read. Per-class mean maps are
+accumulated while the job runs.
+
+Archive layout:
+    <archive>/meta.json                 class names, layer, native shape, dtype
+    <archive>/index.csv                 one row per map: image, prediction, target class, chunk, row
+    <archive>/chunks/chunk_00000.npy    (rows, h, w) maps, opened with mmap on read
+    <archive>/class_means.npy           (num_classes, h, w) float32 mean map per target class
+    <archive>/class_counts.npy          maps accumulated per class
+
+Usage:
+    python cam_archive.py run --manifest sipakmed_file_list.csv \
+        --model cbam_resnet50_cervical/best_model.pth --output cam_archive --classes all
+    python cam_archive.py info cam_archive
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+ARCHIVE_VERSION = 1
+DTYPES = {'uint8': np.uint8, 'float16': np.float16}
+TARGET_LAYERS = ['layer4', 'layer3']
+INPUT_SIZE = (224, 224)
+
+
+# ============================================================================
+# BATCHED GRADCAM++ AT NATIVE RESOLUTION
+# ============================================================================
+
+class NativeGradCAMPlusPlus:
+    """
+    GradCAM++ on the output of `model.<layer>` for a batch and several
+    targets, returning min-max normalised maps at the layer's resolution.
+    """
+
+    def __init__(self, model, layer='layer4'):
+        if layer not in TARGET_LAYERS:
+            raise ValueError(f"Unknown layer '{layer}'. Choose from: {', '.join(TARGET_LAYERS)}")
+        self.model = model
+        self.layer = getattr(model, layer)
+
+    def __call__(self, batch, targets=None):
+        """
+        batch:   (B, 3, H, W) tensor
+        targets: None (predicted class), 'all', or a (B, T) integer array
+        Returns (probabilities (B, K), target indices (B, T), maps (B, T, h, w) float32).
+        """
+        import torch
+
+        captured = {}
+
+        def hook(module, inputs, output):
+            # Cut the graph here: the backbone before this layer never needs gradients
+            captured['activations'] = output.detach().requires_grad_(True)
+            return captured['activations']
+
+        # Inference only: parameter gradients are off during the forward pass, so only the
+        # layer output's graph is built; the caller's requires_grad flags and mode are restored
+        was_training = self.model.training
+        flags = [(param, param.requires_grad) for param in self.model.parameters()]
+        for param, _ in flags:
+            param.requires_grad_(False)
+        self.model.eval()
+        handle = self.layer.register_forward_hook(hook)
+        try:
+            with torch.enable_grad():
+                logits = self.model(batch)
+        finally:
+            handle.remove()
+            for param, requires_grad in flags:
+                param.requires_grad_(requires_grad)
+            self.model.train(was_training)
+        activations = captured['activations']
+        probabilities = torch.softmax(logits.detach(), dim=1)
+
+        if targets is None:
+            targets = probabilities.argmax(dim=1, keepdim=True).cpu().numpy()
+        elif isinstance(targets, str) and targets == 'all':
+            targets = np.tile(np.arange(logits.shape[1]), (logits.shape[0], 1))
+        targets = np.asarray(targets, dtype=np.int64)
+
+        target_tensor = torch.as_tensor(targets, device=logits.device)
+        acts = activations.detach()
+        sum_activations = acts.sum(dim=(2, 3), keepdim=True)
+        maps = []
+        for t in range(targets.shape[1]):
+            score = logits.gather(1, target_tensor[:, t:t + 1]).sum()
+            (grads,) = torch.autograd.grad(score, activations, retain_graph=t + 1 < targets.shape[1])
+            grads_power_2 = grads ** 2
+            grads_power_3 = grads_power_2 * grads
+            aij = grads_power_2 / (2 * grads_power_2 + sum_activations * grads_power_3 + 1e-6)
+            aij = torch.where(grads != 0, aij, torch.zeros_like(aij))
+            weights = (grads.clamp(min=0) * aij).sum(dim=(2, 3), keepdim=True)
+            maps.append((weights * acts).sum(dim=1).clamp(min=0))
+        maps = torch.stack(maps, dim=1)
+
+        # min-max normalise each map, as scale_cam_image does before resizing
+        flat = maps.flatten(2)
+        flat = flat - flat.min(dim=2, keepdim=True).values
+        flat = flat / (flat.max(dim=2, keepdim=True).values + 1e-7)
+        return probabilities.cpu().numpy(), targets, flat.view_as(maps).cpu().numpy().astype(np.float32)
+
+
+def upsample(native_map, size=INPUT_SIZE):
+    """Native map → `size` (width, height) float32 in [0, 1], like pytorch_grad_cam's scale_cam_image."""
+    image = cv2.resize(np.asarray(native_map, dtype=np.float32), size)
+    image -= image.min()
+    image /= 1e-7 + image.max()
+    return image
+
+
+def quantize(maps, dtype):
+    if DTYPES[dtype] is np.uint8:
+        return np.rint(np.clip(maps, 0, 1) * 255).astype(np.uint8)
+    return maps.astype(np.float16)
+
+
+def dequantize(maps):
+    maps = np.asarray(maps)
+    if maps.dtype == np.uint8:
+        return maps.astype(np.float32) / 255
+    return maps.astype(np.float32)
+
+
+# ============================================================================
+# ARCHIVE
+# ============================================================================
+
+class CamArchiveWriter:
+    """Appends maps in fixed-size chunks and accumulates per-class mean maps."""
+
+    def __init__(self, path, class_names, native_shape, dtype='uint8', chunk_size=4096, layer='layer4', targets='predicted'):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown dtype '{dtype}'. Choose from: {', '.join(DTYPES)}")
+        self.path = Path(path)
+        (self.path / "chunks").mkdir(parents=True, exist_ok=True)
+        self.class_names = list(class_names)
+        self.native_shape = tuple(native_shape)
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        self.layer = layer
+        self.targets = targets
+
+        self.index = []
+        self._buffer = []
+        self._buffered = 0
+        self._chunk = 0
+        self._class_sums = np.zeros((len(self.class_names),) + self.native_shape, dtype=np.float64)
+        self._class_counts = np.zeros(len(self.class_names), dtype=np.int64)
+
+    def add(self, records, maps, targets):
+        """
+        records: one dict per image (image_path, label, predicted_class, confidence, ...)
+        maps:    (B, T, h, w) float maps in [0, 1]
+        targets: (B, T) class indices the maps explain
+        """
+        for record, image_maps, image_targets in zip(records, maps, targets):
+            for cam, target in zip(image_maps, image_targets):
+                self._class_sums[target] += cam
+                self._class_counts[target] += 1
+                self.index.append(dict(record, target_class=self.class_names[target],
+                                       chunk=self._chunk, row=self._buffered))
+                self._buffer.append(cam)
+                self._buffered += 1
+                if self._buffered == self.chunk_size:
+                    self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        np.save(self.path / "chunks" / f"chunk_{self._chunk:05d}.npy", quantize(np.stack(self._buffer), self.dtype))
+        self._buffer = []
+        self._buffered = 0
+        self._chunk += 1
+
+    def close(self):
+        import pandas as pd
+
+        self._flush()
+        pd.DataFrame(self.index).to_csv(self.path / "index.csv", index=False)
+        counts = np.maximum(self._class_counts, 1)[:, None, None]
+        np.save(self.path / "class_means.npy", (self._class_sums / counts).astype(np.float32))
+        np.save(self.path / "class_counts.npy", self._class_counts)
+        with open(self.path / "meta.json", 'w') as f:
+            json.dump({
+                'version': ARCHIVE_VERSION,
+                'class_names': self.class_names,
+                'layer': self.layer,
+                'native_shape': list(self.native_shape),
+                'dtype': self.dtype,
+                'chunk_size': self.chunk_size,
+                'targets': self.targets,
+                'num_maps': len(self.index),
+                'num_chunks': self._chunk,
+            }, f, indent=2)
+        return self.path
+
+
+class CamArchive:
+    """Read side: chunks are memory-mapped on first access; maps are upsampled on read."""
+
+    def __init__(self, path):
+        import pandas as pd
+
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        self.class_names = self.meta['class_names']
+        self.index = pd.read_csv(self.path / "index.csv")
+        self._chunks = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def _chunk(self, number):
+        if number not in self._chunks:
+            self._chunks[number] = np.load(self.path / "chunks" / f"chunk_{number:05d}.npy", mmap_mode='r')
+        return self._chunks[number]
+
+    def native(self, i):
+        """Map `i` at native resolution, float32 in [0, 1]."""
+        row = self.index.iloc[i]
+        return dequantize(self._chunk(int(row['chunk']))[int(row['row'])])
+
+    def get(self, i, size=INPUT_SIZE):
+        """Map `i` upsampled to `size` (width, height)."""
+        return upsample(self.native(i), size)
+
+    def maps_for(self, image_path, size=INPUT_SIZE):
+        """{target class: map} for one image."""
+        rows = self.index.index[self.index['image_path'] == str(image_path)]
+        return {self.index.at[i, 'target_class']: self.get(i, size) for i in rows}
+
+    def class_mean(self, class_name, size=INPUT_SIZE):
+        means = np.load(self.path / "class_means.npy")
+        return upsample(means[self.class_names.index(class_name)], size)
+
+    def class_counts(self):
+        counts = np.load(self.path / "class_counts.npy")
+        return dict(zip(self.class_names, counts.tolist()))
+
+    def storage_bytes(self):
+        return sum(p.stat().st_size for p in self.path.rglob('*') if p.is_file())
+
+
+# ============================================================================
+# JOB
+# ============================================================================
+
+def run_job(manifest, model_path, output, targets='predicted', batch_size=32, chunk_size=4096,
+            dtype='uint8', layer='layer4', device=None, preprocess=False, root=None, progress=True, results=None):
+    """
+    Compute CAMs for every image in a manifest into an archive; returns a
+    stats dict. With `results` (a results store directory), every prediction
+    is also recorded there, its CAM referenced as `<archive>#<image_path>`
+    (see `CamArchive.maps_for`).
+    """
+    import torch
+    from PIL import Image
+    from evaluation import iter_manifest_batches, load_predictor
+
+    predictor = load_predictor('cbam', model_path, device=device, preprocess=preprocess)
+    cam = NativeGradCAMPlusPlus(predictor.model, layer=layer)
+    class_names = predictor.class_names
+
+    results_writer = None
+    if results is not None:
+        from results_store import ResultsWriter
+        results_writer = ResultsWriter(results, class_names, flush_seconds=None)
+
+    writer = None
+    images = 0
+    start = time.perf_counter()
+    for paths, labels, label_names in iter_manifest_batches(manifest, batch_size, root):
+        pil_images = []
+        for p in paths:
+            with Image.open(p) as img:
+                pil_images.append(img.convert('RGB'))
+        batch = torch.stack([predictor.transform(predictor._prepare(img)) for img in pil_images]).to(predictor.device)
+
+        probabilities, target_idx, maps = cam(batch, None if targets == 'predicted' else 'all')
+        if writer is None:
+            writer = CamArchiveWriter(output, class_names, maps.shape[2:], dtype=dtype, chunk_size=chunk_size,
+                                      layer=layer, targets=targets)
+
+        predicted = probabilities.argmax(axis=1)
+        records = []
+        for i, path in enumerate(paths):
+            record = {
+                'image_path': str(path),
+                'predicted_class': class_names[predicted[i]],
+                'confidence': float(probabilities[i, predicted[i]]),
+            }
+            if labels is not None:
+                record['label'] = int(labels[i])
+            if label_names is not None:
+                record['label_name'] = label_names[i]
+            records.append(record)
+        writer.add(records, maps, target_idx)
+        if results_writer is not None:
+            from results_store import image_hash
+            for i, path in enumerate(paths):
+                results_writer.record(image_hash(Path(path).read_bytes()), probabilities[i], file_name=str(path),
+                                      source='cam_archive', model_version=f"file:{model_path}",
+                                      cam_ref=f"{output}#{path}")
+
+        images += len(paths)
+        if progress:
+            print(f"\rExplained {images} images", end='', flush=True)
+    if progress:
+        print()
+    if writer is None:
+        raise ValueError(f"Manifest {manifest} has no images")
+    writer.close()
+    if results_writer is not None:
+        results_writer.close()
+    seconds = time.perf_counter() - start
+
+    archive = CamArchive(output)
+    return {
+        'images': images,
+        'maps': len(archive),
+        'seconds': seconds,
+        'images_per_s': images / seconds,
+        'storage_bytes': archive.storage_bytes(),
+        'bytes_per_map': archive.storage_bytes() / max(len(archive), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk GradCAM++ job and compact CAM archive")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Explain every image in a manifest")
+    run_parser.add_argument('--manifest', required=True, help="CSV with an image_path column (labels optional)")
+    run_parser.add_argument('--model', required=True, help="CBAM-ResNet50 checkpoint")
+    run_parser.add_argument('--output', required=True, help="Archive directory")
+    run_parser.add_argument('--classes', default='predicted', choices=['predicted', 'all'],
+                            help="Explain the predicted class or every class")
+    run_parser.add_argument('--root', default=None, help="Base directory for relative image paths")
+    run_parser.add_argument('--batch-size', type=int, default=32)
+    run_parser.add_argument('--chunk-size', type=int, default=4096, help="Maps per archive chunk")
+    run_parser.add_argument('--dtype', default='uint8', choices=sorted(DTYPES))
+    run_parser.add_argument('--layer', default='layer4', choices=TARGET_LAYERS,
+                            help="layer4 → 7×7 maps, layer3 → 14×14 maps")
+    run_parser.add_argument('--device', default=None, help="cpu / cuda (default: auto)")
+    run_parser.add_argument('--preprocess', action='store_true', help="Apply the app.py Resize → NLM → CLAHE pipeline")
+    run_parser.add_argument('--results', default=None, help="Also record predictions in this results store")
+
+    info_parser = subparsers.add_parser('info', help="Summarize an archive")
+    info_parser.add_argument('archive')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        stats = run_job(args.manifest, args.model, args.output, targets=args.classes, batch_size=args.batch_size,
+                        chunk_size=args.chunk_size, dtype=args.dtype, layer=args.layer, device=args.device,
+                        preprocess=args.preprocess, root=args.root, results=args.results)
+        print(f"Saved {stats['maps']} maps for {stats['images']} images to: {args.output}")
+        print(f"  {stats['images_per_s']:.1f} images/s, {stats['storage_bytes'] / 1e6:.2f} MB "
+              f"({stats['bytes_per_map']:.0f} bytes/map)")
+    else:
+        archive = CamArchive(args.archive)
+        meta = archive.meta
+        print(f"{args.archive}: {len(archive)} maps, {meta['layer']} {tuple(meta['native_shape'])} {meta['dtype']}, "
+              f"{meta['num_chunks']} chunks, {archive.storage_bytes() / 1e6:.2f} MB")
+        for name, count in archive.class_counts().items():
+            print(f"  {name:<28}{count:>8} maps")
+
+
+if __name__ == "__main__":
+    main()
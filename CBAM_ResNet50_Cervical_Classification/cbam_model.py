@@ -0,0 +1,143 @@
+"""
+CBAM-ResNet50 Model Definition
+ResNet50 backbone with Channel + Spatial attention after every residual stage
+
+Kept separate from app.py so that torch / torchvision are only imported when a
+model is actually needed.
+"""
+
+import torch
+import torch.nn as nn
+from torchvision import models
+
+CLASS_NAMES = ['Dyskeratotic', 'Koilocytotic', 'Metaplastic', 'Parabasal', 'Superficial-Intermediate']
+
+# ============================================================================
+# MODEL ARCHITECTURE DEFINITION
+# ============================================================================
+
+class ChannelAttention(nn.Module):
+    """Channel Attention Module - focuses on 'what' is meaningful."""
+    def __init__(self, in_channels, reduction_ratio=16):
+        super(ChannelAttention, self).__init__()
+        self.avg_pool = nn.AdaptiveAvgPool2d(1)
+        self.max_pool = nn.AdaptiveMaxPool2d(1)
+        self.fc = nn.Sequential(
+            nn.Conv2d(in_channels, in_channels // reduction_ratio, 1, bias=False),
+            nn.ReLU(inplace=True),
+            nn.Conv2d(in_channels // reduction_ratio, in_channels, 1, bias=False)
+        )
+        self.sigmoid = nn.Sigmoid()
+
+    def forward(self, x):
+        avg_out = self.fc(self.avg_pool(x))
+        max_out = self.fc(self.max_pool(x))
+        out = self.sigmoid(avg_out + max_out)
+        return x * out
+
+
+class SpatialAttention(nn.Module):
+    """Spatial Attention Module - focuses on 'where' is meaningful."""
+    def __init__(self, kernel_size=7):
+        super(SpatialAttention, self).__init__()
+        padding = 3 if kernel_size == 7 else 1
+        self.conv = nn.Conv2d(2, 1, kernel_size, padding=padding, bias=False)
+        self.sigmoid = nn.Sigmoid()
+
+    def forward(self, x):
+        avg_out = torch.mean(x, dim=1, keepdim=True)
+        max_out, _ = torch.max(x, dim=1, keepdim=True)
+        out = torch.cat([avg_out, max_out], dim=1)
+        out = self.sigmoid(self.conv(out))
+        return x * out
+
+
+class CBAM(nn.Module):
+    """Convolutional Block Attention Module (CBAM)."""
+    def __init__(self, in_channels, reduction_ratio=16, kernel_size=7):
+        super(CBAM, self).__init__()
+        self.channel_attention = ChannelAttention(in_channels, reduction_ratio)
+        self.spatial_attention = SpatialAttention(kernel_size)
+
+    def forward(self, x):
+        x = self.channel_attention(x)
+        x = self.spatial_attention(x)
+        return x
+
+
+class CBAM_ResNet50(nn.Module):
+    """ResNet50 with CBAM attention modules."""
+    def __init__(self, num_classes=5, pretrained=False):
+        super(CBAM_ResNet50, self).__init__()
+        
+        resnet = models.resnet50(weights=None)
+
+        self.conv1 = resnet.conv1
+        self.bn1 = resnet.bn1
+        self.relu = resnet.relu
+        self.maxpool = resnet.maxpool
+
+        self.layer1 = resnet.layer1
+        self.cbam1 = CBAM(256)
+
+        self.layer2 = resnet.layer2
+        self.cbam2 = CBAM(512)
+
+        self.layer3 = resnet.layer3
+        self.cbam3 = CBAM(1024)
+
+        self.layer4 = resnet.layer4
+        self.cbam4 = CBAM(2048)
+
+        self.avgpool = resnet.avgpool
+        self.fc = nn.Linear(2048, num_classes)
+
+    def forward(self, x):
+        x = self.conv1(x)
+        x = self.bn1(x)
+        x = self.relu(x)
+        x = self.maxpool(x)
+
+        x = self.layer1(x)
+        x = self.cbam1(x)
+
+        x = self.layer2(x)
+        x = self.cbam2(x)
+
+        x = self.layer3(x)
+        x = self.cbam3(x)
+
+        x = self.layer4(x)
+        x = self.cbam4(x)
+
+        x = self.avgpool(x)
+        x = torch.flatten(x, 1)
+        logits = self.fc(x)
+        return logits
+
+
+def cbam_resnet50_for_shapes(shapes):
+    """
+    CBAM_ResNet50 whose layer widths match `shapes` ({parameter name: shape}),
+    e.g. the state dict of a channel-pruned model (see pruning.py). Modules
+    whose stored weights are smaller than the full architecture are replaced
+    by slimmer ones; for an unpruned state dict this is plain CBAM_ResNet50.
+    """
+    shapes = {name: tuple(shape) for name, shape in shapes.items()}
+    model = CBAM_ResNet50(num_classes=shapes.get('fc.weight', (len(CLASS_NAMES),))[0])
+    for name, module in list(model.named_modules()):
+        shape = shapes.get(f"{name}.weight")
+        if shape is None or shape == tuple(module.weight.shape):
+            continue
+        if isinstance(module, nn.Conv2d):
+            slim = nn.Conv2d(shape[1] * module.groups, shape[0], module.kernel_size, stride=module.stride,
+                             padding=module.padding, groups=module.groups, bias=module.bias is not None)
+        elif isinstance(module, nn.BatchNorm2d):
+            slim = nn.BatchNorm2d(shape[0], eps=module.eps, momentum=module.momentum)
+        elif isinstance(module, nn.Linear):
+            slim = nn.Linear(shape[1], shape[0], bias=module.bias is not None)
+        else:
+            raise ValueError(f"Cannot resize {type(module).__name__} '{name}' to {shape}")
+        parent_name, _, child_name = name.rpartition('.')
+        setattr(model.get_submodule(parent_name), child_name, slim)
+    return model
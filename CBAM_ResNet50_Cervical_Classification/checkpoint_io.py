@@ -0,0 +1,254 @@
+"""
+Slim Weights-Only Checkpoints
+Export training checkpoints to a memory-mappable safetensors file and load them without copies
+
+`best_model.pth` is a full training checkpoint: `torch.load` unpickles every
+entry (optimizer state included) and `load_state_dict` then copies the weights
+into freshly allocated parameters. The exported file holds only the model
+weights in the safetensors layout:
+
+    [8-byte little-endian header length][JSON header][raw tensor bytes]
+
+Loading maps the file read-only (copy-on-write) and builds tensors directly on
+top of the mapping. The model is constructed on the meta device and the mapped
+tensors are assigned as its parameters, so nothing is deserialized or copied;
+pages are shared through the OS page cache between processes. A SHA-256 of the
+tensor bytes is stored in the header metadata and verified at load.
+
+The export also records the size, mtime and SHA-256 of the checkpoint it was
+made from, so `export_is_current` can tell when the checkpoint has since been
+overwritten (e.g. by retraining) and the export is stale.
+
+Usage:
+    python checkpoint_io.py export cbam_resnet50_cervical/best_model.pth
+    python checkpoint_io.py verify cbam_resnet50_cervical/best_model.safetensors
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import struct
+from pathlib import Path
+
+import torch
+
+# safetensors dtype names
+DTYPES = {
+    torch.float64: 'F64', torch.float32: 'F32', torch.float16: 'F16', torch.bfloat16: 'BF16',
+    torch.int64: 'I64', torch.int32: 'I32', torch.int16: 'I16', torch.int8: 'I8',
+    torch.uint8: 'U8', torch.bool: 'BOOL',
+}
+DTYPES_BY_NAME = {name: dtype for dtype, name in DTYPES.items()}
+
+HEADER_ALIGNMENT = 8
+
+
+class ChecksumError(ValueError):
+    """Raised when the tensor bytes of a weights file do not match the stored SHA-256."""
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def extract_state_dict(checkpoint):
+    """Pull the model weights out of a training checkpoint (or pass a plain state dict through)."""
+    if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+        return checkpoint['model_state_dict']
+    if isinstance(checkpoint, dict) and 'state_dict' in checkpoint:
+        return checkpoint['state_dict']
+    if isinstance(checkpoint, dict) and all(isinstance(v, torch.Tensor) for v in checkpoint.values()):
+        return checkpoint
+    raise ValueError("Checkpoint does not contain a model state dict")
+
+
+def save_weights(state_dict, output_path, metadata=None):
+    """
+    Write a state dict as a safetensors file with a SHA-256 of the tensor data.
+
+    Tensors are ordered by element size (largest first) and the header is
+    padded to 8 bytes, so every tensor starts at a naturally aligned offset.
+    """
+    tensors = [(name, t.detach().cpu().contiguous()) for name, t in state_dict.items()]
+    tensors.sort(key=lambda item: -item[1].element_size())
+
+    header = {}
+    digest = hashlib.sha256()
+    offset = 0
+    for name, tensor in tensors:
+        if tensor.dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype {tensor.dtype} for '{name}'")
+        nbytes = tensor.numel() * tensor.element_size()
+        header[name] = {
+            'dtype': DTYPES[tensor.dtype],
+            'shape': list(tensor.shape),
+            'data_offsets': [offset, offset + nbytes],
+        }
+        digest.update(_tensor_bytes(tensor))
+        offset += nbytes
+
+    meta = {str(k): str(v) for k, v in (metadata or {}).items()}
+    meta['format'] = 'pt'
+    meta['sha256'] = digest.hexdigest()
+    header['__metadata__'] = meta
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-(8 + len(header_bytes)) % HEADER_ALIGNMENT)
+
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for _, tensor in tensors:
+            f.write(_tensor_bytes(tensor))
+    tmp_path.replace(output_path)
+    return output_path
+
+
+def _tensor_bytes(tensor):
+    if tensor.numel() == 0:
+        return b''
+    return tensor.view(-1).view(torch.uint8).numpy().tobytes()
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_fingerprint(checkpoint_path):
+    """Size, mtime and SHA-256 of a checkpoint file, as stored in the metadata of its export."""
+    stat = Path(checkpoint_path).stat()
+    return {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns,
+            'source_sha256': _file_sha256(checkpoint_path)}
+
+
+def export_checkpoint(checkpoint_path, output_path=None, class_names=None):
+    """Convert a training checkpoint (.pth) into a slim weights-only file next to it."""
+    checkpoint_path = Path(checkpoint_path)
+    if output_path is None:
+        output_path = checkpoint_path.with_suffix('.safetensors')
+
+    # fingerprint before loading: if the file changes meanwhile, the export reads as stale
+    metadata = {'source': checkpoint_path.name, **source_fingerprint(checkpoint_path)}
+    checkpoint = torch.load(checkpoint_path, map_location='cpu')
+    state_dict = extract_state_dict(checkpoint)
+
+    if class_names is not None:
+        metadata['class_names'] = json.dumps(list(class_names))
+    if isinstance(checkpoint, dict):
+        for key in ['epoch', 'val_acc', 'best_val_acc']:
+            if key in checkpoint and isinstance(checkpoint[key], (int, float)):
+                metadata[key] = checkpoint[key]
+
+    return save_weights(state_dict, output_path, metadata)
+
+
+# ============================================================================
+# LOAD
+# ============================================================================
+
+def read_header(path):
+    """Return (header dict without metadata, metadata dict, data start offset)."""
+    with open(path, 'rb') as f:
+        (header_size,) = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_size))
+    metadata = header.pop('__metadata__', {})
+    return header, metadata, 8 + header_size
+
+
+def export_is_current(weights_path, checkpoint_path):
+    """
+    Whether `weights_path` was exported from `checkpoint_path` as it is now.
+    Size and mtime are compared first; the checkpoint is only hashed when its
+    size matches but its mtime does not (e.g. after a copy). Exports without a
+    source fingerprint cannot be checked and count as stale.
+    """
+    metadata = read_header(weights_path)[1]
+    if 'source_sha256' not in metadata:
+        return False
+    stat = Path(checkpoint_path).stat()
+    if str(stat.st_size) != metadata.get('source_size'):
+        return False
+    if str(stat.st_mtime_ns) == metadata.get('source_mtime_ns'):
+        return True
+    return _file_sha256(checkpoint_path) == metadata['source_sha256']
+
+
+def load_weights(path, verify=True):
+    """
+    Map a weights file and return (state_dict, metadata). The tensors are CPU
+    views onto a private (copy-on-write) mapping of the file.
+    """
+    header, metadata, data_start = read_header(path)
+
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    if verify:
+        expected = metadata.get('sha256')
+        if expected is None:
+            raise ChecksumError(f"{path} has no sha256 in its metadata")
+        actual = hashlib.sha256(memoryview(mapping)[data_start:]).hexdigest()
+        if actual != expected:
+            raise ChecksumError(f"Checksum mismatch for {path}: expected {expected}, got {actual}")
+
+    state_dict = {}
+    for name, info in header.items():
+        dtype = DTYPES_BY_NAME[info['dtype']]
+        begin, end = info['data_offsets']
+        shape = info['shape']
+        if end == begin:
+            state_dict[name] = torch.empty(shape, dtype=dtype)
+            continue
+        count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+        state_dict[name] = torch.frombuffer(mapping, dtype=dtype, count=count,
+                                            offset=data_start + begin).view(shape)
+    return state_dict, metadata
+
+
+def load_model_weights(model_fn, path, device='cpu', verify=True):
+    """
+    Build a model with `model_fn()` on the meta device (no parameter
+    allocation) and assign the mapped tensors as its parameters.
+    """
+    state_dict, metadata = load_weights(path, verify=verify)
+    with torch.device('meta'):
+        model = model_fn()
+    model.load_state_dict(state_dict, assign=True)
+    model = model.to(device)
+    model.eval()
+    return model, metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export / verify slim weights-only checkpoints")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="Convert a training checkpoint to .safetensors")
+    export_parser.add_argument('checkpoint', help="Training checkpoint (.pth)")
+    export_parser.add_argument('-o', '--output', default=None, help="Output path (default: next to the checkpoint)")
+
+    verify_parser = subparsers.add_parser('verify', help="Verify the checksum of a weights file")
+    verify_parser.add_argument('weights', help="Weights file (.safetensors)")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        from cbam_model import CLASS_NAMES
+        output = export_checkpoint(args.checkpoint, args.output, class_names=CLASS_NAMES)
+        _, metadata, _ = read_header(output)
+        print(f"Saved weights to: {output}")
+        print(f"  size: {output.stat().st_size / 1e6:.1f} MB (checkpoint: {Path(args.checkpoint).stat().st_size / 1e6:.1f} MB)")
+        print(f"  sha256: {metadata['sha256']}")
+    else:
+        state_dict, metadata = load_weights(args.weights, verify=True)
+        print(f"OK: {len(state_dict)} tensors, sha256 {metadata['sha256']}")
+
+
+if __name__ == "__main__":
+    main()
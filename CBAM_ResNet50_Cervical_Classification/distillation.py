@@ -0,0 +1,408 @@
+"""
+Knowledge Distillation of CBAM-ResNet50 into a Lightweight Student
+Manifest → Frozen Teacher Soft Targets → Student (MobileNetV3 / ResNet18) → Student vs Teacher Report
+
+The student learns from the teacher's temperature-softened class
+probabilities and from the ground-truth labels:
+
+    loss = alpha · T² · KL(softmax(teacher / T) ‖ softmax(student / T)) + (1 − alpha) · CE(student, label)
+
+Teacher targets are computed online on the same augmented batch the student
+sees. Training uses the preprocessed (NLM + CLAHE) SiPakMED images listed in a
+manifest, e.g. the `sipakmed_file_list.csv` written by the ConvNeXt fine-tuning
+script. The best epoch (validation accuracy) is saved as `student_model.pth`,
+which evaluation.py loads as the `student` family.
+
+`report` compares student and teacher: accuracy / macro F1 with bootstrap CIs
+and top-1 agreement on a labelled manifest, batch-1 latency and batched
+throughput on CPU.
+
+Usage:
+    python distillation.py train --manifest sipakmed_file_list.csv \
+        --teacher cbam_resnet50_cervical/best_model.pth --student mobilenet_v3_large --output student_mobilenet
+    python distillation.py report --teacher cbam_resnet50_cervical/best_model.pth \
+        --student student_mobilenet/student_model.pth --manifest test.csv --output distillation_report.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+STUDENT_FILE = "student_model.pth"
+HISTORY_FILE = "distillation_history.json"
+CHECKPOINT_DIR = "checkpoints"
+
+
+# ============================================================================
+# DATA
+# ============================================================================
+
+def read_manifest(manifest_path, class_names, root=None):
+    """(image paths, integer labels) from a manifest with image_path and label / label_name columns."""
+    import pandas as pd
+    from evaluation import _resolve_labels
+
+    df = pd.read_csv(manifest_path)
+    if 'image_path' not in df.columns:
+        raise ValueError("Manifest must contain an 'image_path' column")
+    paths = [Path(p) if root is None or os.path.isabs(p) else Path(root) / p for p in df['image_path']]
+    labels = _resolve_labels(df['label'].to_numpy() if 'label' in df.columns else None,
+                             df['label_name'].tolist() if 'label_name' in df.columns else None,
+                             class_names)
+    return paths, labels
+
+
+def make_dataset(paths, labels):
+    """torch Dataset of (normalised 224×224 tensor, label)."""
+    import torch
+    from PIL import Image
+    from evaluation import _imagenet_transform
+
+    transform = _imagenet_transform()
+
+    class ManifestDataset(torch.utils.data.Dataset):
+        def __len__(self):
+            return len(paths)
+
+        def __getitem__(self, i):
+            with Image.open(paths[i]) as img:
+                return transform(img.convert('RGB')), int(labels[i])
+
+    return ManifestDataset()
+
+
+def make_loader(paths, labels, train, batch_size, num_workers=0, seed=None):
+    """
+    DataLoader over `paths`. Training batches are shuffled and augmented on the
+    fly (augmentation.BatchAugment: flips, rotation, elastic, colour jitter;
+    cells have no orientation) as whole batches in the loader workers. With
+    `seed` the order comes from a checkpointing.ResumableSampler
+    (`loader.sampler.set_epoch`), so training can resume mid-epoch.
+    """
+    import torch
+    from phoenix_shared.augmentation import IMAGENET_MEAN, IMAGENET_STD, AugmentCollate, BatchAugment
+    from phoenix_shared.checkpointing import ResumableSampler
+
+    dataset = make_dataset(paths, labels)
+    if not train:
+        return torch.utils.data.DataLoader(dataset, batch_size=batch_size, num_workers=num_workers)
+    order = {'shuffle': True} if seed is None else {
+        'sampler': ResumableSampler(len(dataset), seed), 'generator': torch.Generator().manual_seed(seed)}
+    return torch.utils.data.DataLoader(dataset, batch_size=batch_size, num_workers=num_workers,
+                                       drop_last=len(paths) > batch_size,
+                                       collate_fn=AugmentCollate(BatchAugment(mean=IMAGENET_MEAN, std=IMAGENET_STD)),
+                                       **order)
+
+
+# ============================================================================
+# TRAINING
+# ============================================================================
+
+def distillation_loss(student_logits, teacher_logits, labels, temperature=4.0, alpha=0.7):
+    """Hinton et al. soft-target loss blended with cross-entropy on the labels."""
+    import torch.nn.functional as F
+
+    soft = F.kl_div(F.log_softmax(student_logits / temperature, dim=1),
+                    F.softmax(teacher_logits / temperature, dim=1),
+                    reduction='batchmean') * temperature ** 2
+    hard = F.cross_entropy(student_logits, labels)
+    return alpha * soft + (1 - alpha) * hard
+
+
+def _validate(student, teacher, loader, device):
+    import torch
+
+    student.eval()
+    correct = agree = total = 0
+    with torch.no_grad():
+        for images, labels in loader:
+            images, labels = images.to(device), labels.to(device)
+            student_pred = student(images).argmax(dim=1)
+            teacher_pred = teacher(images).argmax(dim=1)
+            correct += (student_pred == labels).sum().item()
+            agree += (student_pred == teacher_pred).sum().item()
+            total += len(labels)
+    return correct / max(total, 1), agree / max(total, 1)
+
+
+def train(manifest, teacher_path, output, architecture='mobilenet_v3_large', val_manifest=None, val_fraction=0.1,
+          epochs=30, batch_size=64, lr=1e-3, weight_decay=1e-4, temperature=4.0, alpha=0.7, pretrained=False,
+          num_workers=0, device=None, root=None, seed=42, checkpoint_every=None, keep_checkpoints=3, resume=False):
+    """
+    Distil the teacher into a new student; returns the training history.
+    The full training state is checkpointed asynchronously to
+    `output/checkpoints` after every epoch (and every `checkpoint_every`
+    steps); `resume` continues from the latest checkpoint there.
+    """
+    import torch
+    from phoenix_shared.checkpointing import (AsyncCheckpointer, latest_checkpoint, load_checkpoint,
+                                              restore_training_state, training_state)
+    from evaluation import CBAMPredictor, _get_device
+    from student_model import build_student, count_parameters
+
+    torch.manual_seed(seed)
+    device = _get_device(device)
+    teacher_predictor = CBAMPredictor(teacher_path, device=device)
+    teacher = teacher_predictor.model
+    class_names = teacher_predictor.class_names
+    for param in teacher.parameters():
+        param.requires_grad_(False)
+
+    paths, labels = read_manifest(manifest, class_names, root)
+    if val_manifest is not None:
+        train_paths, train_labels = paths, labels
+        val_paths, val_labels = read_manifest(val_manifest, class_names, root)
+    else:
+        from sklearn.model_selection import train_test_split
+        train_paths, val_paths, train_labels, val_labels = train_test_split(
+            paths, labels, test_size=val_fraction, stratify=labels, random_state=seed)
+
+    train_loader = make_loader(train_paths, train_labels, train=True, batch_size=batch_size,
+                               num_workers=num_workers, seed=seed)
+    val_loader = make_loader(val_paths, val_labels, train=False, batch_size=batch_size, num_workers=num_workers)
+    steps_per_epoch = len(train_loader)
+
+    student = build_student(architecture, num_classes=len(class_names), pretrained=pretrained).to(device)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=lr, weight_decay=weight_decay)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=epochs)
+    print(f"Student {architecture}: {count_parameters(student):,} parameters "
+          f"(teacher: {count_parameters(teacher):,}); {len(train_paths)} train / {len(val_paths)} val images")
+
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    checkpointer = AsyncCheckpointer(output / CHECKPOINT_DIR, keep_last=keep_checkpoints)
+    history, best_acc, start_epoch, start_step, global_step = [], -1.0, 1, 0, 0
+    resume_path = latest_checkpoint(output / CHECKPOINT_DIR) if resume else None
+    if resume_path is not None:
+        state = load_checkpoint(resume_path, map_location=device)
+        start_epoch, start_step, global_step = restore_training_state(state, student, optimizer, scheduler)
+        history, best_acc = state['history'], state['best_acc']
+        print(f"Resumed from {resume_path}: epoch {start_epoch}, step {start_step}")
+
+    def checkpoint(epoch, step_in_epoch, is_best=False):
+        checkpointer.save(training_state(student, optimizer, scheduler, epoch, step_in_epoch, global_step,
+                                         history=history, best_acc=best_acc, architecture=architecture),
+                          global_step, is_best=is_best)
+
+    for epoch in range(start_epoch, epochs + 1):
+        student.train()
+        train_loader.sampler.set_epoch(epoch, start=start_step * batch_size)
+        start = time.perf_counter()
+        running_loss, seen = 0.0, 0
+        for step, (images, targets) in enumerate(train_loader, start=start_step):
+            images, targets = images.to(device), targets.to(device)
+            with torch.no_grad():
+                teacher_logits = teacher(images)
+            loss = distillation_loss(student(images), teacher_logits, targets, temperature, alpha)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            running_loss += loss.item() * len(targets)
+            seen += len(targets)
+            global_step += 1
+            if checkpoint_every and global_step % checkpoint_every == 0 and step + 1 < steps_per_epoch:
+                checkpoint(epoch, step + 1)
+        start_step = 0
+        scheduler.step()
+
+        val_acc, val_agreement = _validate(student, teacher, val_loader, device)
+        history.append({'epoch': epoch, 'train_loss': running_loss / max(seen, 1), 'val_acc': val_acc,
+                        'val_teacher_agreement': val_agreement, 'seconds': time.perf_counter() - start})
+        print(f"Epoch {epoch}/{epochs}: loss {history[-1]['train_loss']:.4f}, val acc {val_acc:.4f}, "
+              f"agreement with teacher {val_agreement:.4f} ({history[-1]['seconds']:.0f}s)")
+
+        improved = val_acc > best_acc
+        if improved:
+            best_acc = val_acc
+            checkpointer.write({
+                'epoch': epoch,
+                'model_state_dict': student.state_dict(),
+                'architecture': architecture,
+                'class_names': class_names,
+                'val_acc': val_acc,
+                'val_teacher_agreement': val_agreement,
+                'temperature': temperature,
+                'alpha': alpha,
+                'teacher': str(teacher_path),
+            }, output / STUDENT_FILE)
+        checkpoint(epoch + 1, 0, is_best=improved)
+    checkpointer.close()
+
+    with open(output / HISTORY_FILE, 'w') as f:
+        json.dump(history, f, indent=2)
+    print(f"Best val acc {best_acc:.4f}; saved student to: {output / STUDENT_FILE}")
+    return history
+
+
+# ============================================================================
+# STUDENT VS TEACHER REPORT
+# ============================================================================
+
+def measure_speed(predictor, image, batch_size=32, repeats=10):
+    """Batch-1 predict_proba latency (ms) and batched throughput (images/s) on one PIL image."""
+    predictor.predict_proba([image])
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predictor.predict_proba([image])
+        latencies.append(time.perf_counter() - start)
+
+    batch = [image] * batch_size
+    predictor.predict_proba(batch)
+    batch_times = []
+    for _ in range(max(repeats // 3, 1)):
+        start = time.perf_counter()
+        predictor.predict_proba(batch)
+        batch_times.append(time.perf_counter() - start)
+    return {
+        'latency_ms_p50': statistics.median(latencies) * 1e3,
+        'latency_ms_max': max(latencies) * 1e3,
+        'throughput_images_per_s': batch_size / statistics.median(batch_times),
+    }
+
+
+def compare(predictors, manifest, batch_size=32, root=None, n_resamples=2000, seed=42):
+    """Accuracy report per predictor plus top-1 agreement with the first one (the teacher), in one pass."""
+    from PIL import Image
+    from evaluation import _resolve_labels, build_report, iter_manifest_batches
+    from phoenix_shared.metrics import StreamingConfusionMatrix
+
+    names = list(predictors)
+    class_names = predictors[names[0]].class_names
+    accumulators = {name: StreamingConfusionMatrix(len(class_names)) for name in names}
+    agreement = {name: 0 for name in names[1:]}
+    for paths, labels, label_names in iter_manifest_batches(manifest, batch_size, root):
+        images = []
+        for p in paths:
+            with Image.open(p) as img:
+                images.append(img.convert('RGB'))
+        targets = _resolve_labels(labels, label_names, class_names)
+        predictions = {name: predictors[name].predict_proba(images).argmax(axis=1) for name in names}
+        for name in names:
+            accumulators[name].update(targets, predictions[name])
+        for name in names[1:]:
+            agreement[name] += int((predictions[name] == predictions[names[0]]).sum())
+
+    reports = {name: build_report(acc, class_names, n_resamples=n_resamples, seed=seed)
+               for name, acc in accumulators.items()}
+    for name in names[1:]:
+        reports[name]['agreement_with_teacher'] = agreement[name] / max(accumulators[name].count, 1)
+    return reports
+
+
+def report(teacher_path, student_path, manifest=None, batch_size=32, threads=None, device='cpu', root=None,
+           repeats=10, n_resamples=2000):
+    import torch
+    from PIL import Image
+    from evaluation import CBAMPredictor, StudentPredictor
+    from student_model import count_parameters
+
+    if threads:
+        torch.set_num_threads(threads)
+    predictors = {
+        'teacher': CBAMPredictor(teacher_path, device=device),
+        'student': StudentPredictor(student_path, device=device),
+    }
+    sample = Image.open(sorted((Path(__file__).parent / "sample_image").glob("*.bmp"))[0]).convert('RGB')
+
+    result = {'device': str(device), 'threads': torch.get_num_threads(), 'batch_size': batch_size}
+    for name, predictor in predictors.items():
+        result[name] = {
+            'model': str(teacher_path if name == 'teacher' else student_path),
+            'architecture': 'cbam_resnet50' if name == 'teacher' else predictor.metadata['architecture'],
+            'parameters': count_parameters(predictor.model),
+            **measure_speed(predictor, sample, batch_size, repeats),
+        }
+    result['speedup'] = result['student']['throughput_images_per_s'] / result['teacher']['throughput_images_per_s']
+
+    if manifest is not None:
+        reports = compare(predictors, manifest, batch_size, root, n_resamples)
+        for name, model_report in reports.items():
+            result[name]['accuracy'] = model_report['overall']['accuracy']
+            result[name]['f1_macro'] = model_report['overall']['f1_macro']
+            result[name]['report'] = model_report
+        result['agreement'] = reports['student']['agreement_with_teacher']
+    return result
+
+
+def print_comparison(result):
+    print(f"\nDevice: {result['device']}, {result['threads']} thread(s), throughput at batch {result['batch_size']}")
+    print(f"{'Model':<10}{'Architecture':<22}{'Params':>12}{'p50 ms':>9}{'Images/s':>10}{'Accuracy':>20}{'Macro F1':>20}")
+    for name in ('teacher', 'student'):
+        row = result[name]
+        quality = ''
+        if 'accuracy' in row:
+            quality = ''.join(f"{row[m]['value']:>8.4f} [{row[m]['ci_low']:.3f},{row[m]['ci_high']:.3f}]"
+                              for m in ('accuracy', 'f1_macro'))
+        print(f"{name:<10}{row['architecture']:<22}{row['parameters']:>12,}{row['latency_ms_p50']:>9.1f}"
+              f"{row['throughput_images_per_s']:>10.1f}{quality}")
+    print(f"\nStudent throughput: {result['speedup']:.1f}× the teacher")
+    if 'agreement' in result:
+        print(f"Student / teacher top-1 agreement: {result['agreement']:.4f}")
+
+
+def main():
+    from student_model import STUDENT_ARCHITECTURES
+
+    parser = argparse.ArgumentParser(description="Distil CBAM-ResNet50 into a lightweight student")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = subparsers.add_parser('train', help="Train a student from teacher soft targets")
+    train_parser.add_argument('--manifest', required=True, help="CSV with image_path and label / label_name columns")
+    train_parser.add_argument('--teacher', required=True, help="CBAM-ResNet50 checkpoint")
+    train_parser.add_argument('--output', required=True, help="Output directory for the student checkpoint")
+    train_parser.add_argument('--student', default='mobilenet_v3_large', choices=sorted(STUDENT_ARCHITECTURES))
+    train_parser.add_argument('--val-manifest', default=None, help="Validation manifest (default: split off --manifest)")
+    train_parser.add_argument('--val-fraction', type=float, default=0.1)
+    train_parser.add_argument('--root', default=None, help="Base directory for relative image paths")
+    train_parser.add_argument('--epochs', type=int, default=30)
+    train_parser.add_argument('--batch-size', type=int, default=64)
+    train_parser.add_argument('--lr', type=float, default=1e-3)
+    train_parser.add_argument('--weight-decay', type=float, default=1e-4)
+    train_parser.add_argument('--temperature', type=float, default=4.0, help="Softmax temperature for soft targets")
+    train_parser.add_argument('--alpha', type=float, default=0.7, help="Weight of the soft-target loss")
+    train_parser.add_argument('--pretrained', action='store_true', help="Start from ImageNet weights")
+    train_parser.add_argument('--num-workers', type=int, default=0, help="DataLoader workers")
+    train_parser.add_argument('--device', default=None, help="cpu / cuda (default: auto)")
+    train_parser.add_argument('--seed', type=int, default=42)
+    train_parser.add_argument('--checkpoint-every', type=int, default=None,
+                              help="Also checkpoint every N steps (always after each epoch)")
+    train_parser.add_argument('--keep-checkpoints', type=int, default=3, help="Most recent checkpoints kept")
+    train_parser.add_argument('--resume', action='store_true', help="Continue from the latest checkpoint in --output")
+
+    report_parser = subparsers.add_parser('report', help="Throughput, latency and accuracy of student vs teacher")
+    report_parser.add_argument('--teacher', required=True, help="CBAM-ResNet50 checkpoint")
+    report_parser.add_argument('--student', required=True, help="Student checkpoint from `train`")
+    report_parser.add_argument('--manifest', default=None, help="Labelled test manifest (omit for speed only)")
+    report_parser.add_argument('--root', default=None, help="Base directory for relative image paths")
+    report_parser.add_argument('--batch-size', type=int, default=32)
+    report_parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads")
+    report_parser.add_argument('--device', default='cpu', help="The screening tier is CPU-only")
+    report_parser.add_argument('--repeats', type=int, default=10)
+    report_parser.add_argument('--n-bootstrap', type=int, default=2000)
+    report_parser.add_argument('--output', default=None, help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        train(args.manifest, args.teacher, args.output, architecture=args.student, val_manifest=args.val_manifest,
+              val_fraction=args.val_fraction, epochs=args.epochs, batch_size=args.batch_size, lr=args.lr,
+              weight_decay=args.weight_decay, temperature=args.temperature, alpha=args.alpha,
+              pretrained=args.pretrained, num_workers=args.num_workers, device=args.device, root=args.root,
+              seed=args.seed, checkpoint_every=args.checkpoint_every, keep_checkpoints=args.keep_checkpoints,
+              resume=args.resume)
+    else:
+        result = report(args.teacher, args.student, manifest=args.manifest, batch_size=args.batch_size,
+                        threads=args.threads, device=args.device, root=args.root, repeats=args.repeats,
+                        n_resamples=args.n_bootstrap)
+        print_comparison(result)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(result, f, indent=2)
+            print(f"\nSaved report to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""
+Streaming Evaluation Harness for Cervical Cell Classifiers
+Manifest → Batched Inference → Incremental Confusion Matrix / Score Metrics → Metrics + Bootstrap CIs
+
+Works with all model families in the project:
+  - cbam:     CBAM-ResNet50 checkpoint (best_model.pth) used by app.py
+  - convnext: ConvNeXtV2 directory saved by `ConvNeXt Finetuning_v0.2.py`
+  - hybrid:   ResNet50 feature extractor + scaler + logistic regression
+              (Herlev / SiPakMED streamlit dashboards)
+  - student:  MobileNetV3 / ResNet18 distilled from CBAM-ResNet50 (distillation.py)
+
+Usage:
+    python evaluation.py --manifest sipakmed_file_list.csv --family cbam \
+        --model cbam_resnet50_cervical/best_model.pth --output eval_report.json
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from phoenix_shared import tracing
+from phoenix_shared.metrics import StreamingConfusionMatrix, StreamingScoreMetrics
+from phoenix_shared.tracing import span, traced
+
+CLASS_NAMES = ['Dyskeratotic', 'Koilocytotic', 'Metaplastic', 'Parabasal', 'Superficial-Intermediate']
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def build_report(accumulator, class_names, n_resamples=2000, confidence=0.95, seed=42, scores=None):
+    """
+    Assemble a JSON-serialisable report with point estimates and CIs, plus
+    the probability-based metrics when a `StreamingScoreMetrics` is given.
+    """
+    point = accumulator.compute()
+    intervals = accumulator.bootstrap(n_resamples=n_resamples, confidence=confidence, seed=seed)
+
+    overall = {}
+    for name in ['accuracy', 'precision_macro', 'recall_macro', 'f1_macro',
+                 'precision_weighted', 'recall_weighted', 'f1_weighted']:
+        low, high = intervals[name]
+        overall[name] = {'value': float(point[name]), 'ci_low': float(low), 'ci_high': float(high)}
+
+    per_class = {}
+    for i, class_name in enumerate(class_names):
+        entry = {'support': int(point['support'][i])}
+        for name in ['precision', 'recall', 'f1']:
+            low, high = intervals[name]
+            entry[name] = {'value': float(point[name][i]), 'ci_low': float(low[i]), 'ci_high': float(high[i])}
+        per_class[class_name] = entry
+
+    report = {
+        'num_samples': accumulator.count,
+        'confidence': confidence,
+        'n_resamples': n_resamples,
+        'overall': overall,
+        'per_class': per_class,
+        'confusion_matrix': accumulator.matrix.tolist(),
+        'class_names': list(class_names),
+    }
+    if scores is not None:
+        score_point = scores.compute()
+        report['probabilistic'] = {
+            'log_loss': float(score_point['log_loss']),
+            'brier': float(score_point['brier']),
+            'ece': float(score_point['ece']),
+            'roc_auc_macro': score_point['roc_auc_macro'],
+            'roc_auc': dict(zip(class_names, score_point['roc_auc'].tolist())),
+        }
+    return report
+
+
+def print_report(report):
+    """Pretty-print a report produced by `build_report`."""
+    pct = int(round(report['confidence'] * 100))
+    print(f"\nSamples evaluated: {report['num_samples']}  ({report['n_resamples']} bootstrap resamples, {pct}% CI)")
+    print("\nOverall:")
+    for name, m in report['overall'].items():
+        print(f"  {name:<20} {m['value']:.4f}  [{m['ci_low']:.4f}, {m['ci_high']:.4f}]")
+
+    print("\nPer class:")
+    print(f"  {'Class':<26}{'Precision':>24}{'Recall':>24}{'F1':>24}{'Support':>9}")
+    for class_name, entry in report['per_class'].items():
+        cells = ''.join(
+            f"{entry[m]['value']:>8.4f} [{entry[m]['ci_low']:.3f},{entry[m]['ci_high']:.3f}]"
+            for m in ['precision', 'recall', 'f1']
+        )
+        print(f"  {class_name:<26}{cells}{entry['support']:>9}")
+
+    if 'probabilistic' in report:
+        scores = report['probabilistic']
+        print(f"\nLog loss {scores['log_loss']:.4f}  Brier {scores['brier']:.4f}  ECE {scores['ece']:.4f}  "
+              f"ROC AUC (macro, one-vs-rest) {scores['roc_auc_macro']:.4f}")
+
+
+# ============================================================================
+# MODEL FAMILIES
+# ============================================================================
+
+def _get_device(device=None):
+    import torch
+    if device is not None:
+        return torch.device(device)
+    return torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+
+def _imagenet_transform(mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225)):
+    from torchvision import transforms
+    return transforms.Compose([
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=list(mean), std=list(std))
+    ])
+
+
+class CBAMPredictor:
+    """CBAM-ResNet50 checkpoint, optionally with the app.py preprocessing pipeline."""
+
+    def __init__(self, model_path, device=None, preprocess=False):
+        import torch
+        from cbam_model import cbam_resnet50_for_shapes
+
+        self.device = _get_device(device)
+        self.preprocess = preprocess
+        self.class_names = list(CLASS_NAMES)
+
+        checkpoint = torch.load(model_path, map_location=self.device)
+        state_dict = checkpoint['model_state_dict']
+        self.model = cbam_resnet50_for_shapes({name: tensor.shape for name, tensor in state_dict.items()})
+        self.model.load_state_dict(state_dict)
+        self.model.to(self.device).eval()
+        self.transform = _imagenet_transform()
+
+    def _prepare(self, image_pil):
+        if not self.preprocess:
+            return image_pil
+        import cv2
+        from PIL import Image
+        from app import apply_preprocessing_pipeline
+
+        image_bgr = cv2.cvtColor(np.array(image_pil), cv2.COLOR_RGB2BGR)
+        _, _, final_image, _ = apply_preprocessing_pipeline(image_bgr)
+        return Image.fromarray(cv2.cvtColor(final_image, cv2.COLOR_BGR2RGB))
+
+    @traced('cbam.predict')
+    def predict_proba(self, images):
+        import torch
+        with span('cbam.to_tensor', batch=len(images)):
+            batch = torch.stack([self.transform(self._prepare(img)) for img in images]).to(self.device)
+        with torch.no_grad(), span('cbam.forward', batch=len(images)):
+            return torch.softmax(self.model(batch), dim=1).cpu().numpy()
+
+
+class ConvNeXtPredictor:
+    """ConvNeXtV2 model + processor saved with `trainer.save_model` / `save_pretrained`."""
+
+    def __init__(self, model_path, device=None):
+        import torch
+        from transformers import AutoImageProcessor, ConvNextV2ForImageClassification
+
+        self.device = _get_device(device)
+        processor = AutoImageProcessor.from_pretrained(model_path)
+        self.model = ConvNextV2ForImageClassification.from_pretrained(model_path)
+        self.model.to(self.device).eval()
+
+        id2label = self.model.config.id2label
+        self.class_names = [id2label[i] for i in range(len(id2label))]
+        self.transform = _imagenet_transform(processor.image_mean, processor.image_std)
+        self._torch = torch
+
+    def predict_proba(self, images):
+        torch = self._torch
+        batch = torch.stack([self.transform(img) for img in images]).to(self.device)
+        with torch.no_grad():
+            logits = self.model(pixel_values=batch).logits
+            return torch.softmax(logits, dim=1).cpu().numpy()
+
+
+class HybridPredictor:
+    """ResNet50 feature extractor + StandardScaler + logistic regression (Herlev / SiPakMED)."""
+
+    def __init__(self, model_path, device=None):
+        import torch
+        from hybrid_model import load_feature_extractor, load_head
+
+        self.device = _get_device(device)
+        self.feature_extractor = load_feature_extractor(model_path, device=self.device)
+        self.classifier, self.scaler, self.class_names = load_head(model_path)
+        self.transform = _imagenet_transform()
+        self._torch = torch
+
+    @traced('hybrid.predict')
+    def predict_proba(self, images):
+        torch = self._torch
+        with span('hybrid.to_tensor', batch=len(images)):
+            batch = torch.stack([self.transform(img) for img in images]).to(self.device)
+        with torch.no_grad(), span('hybrid.features', batch=len(images)):
+            features = self.feature_extractor(batch).cpu().numpy()
+        with span('hybrid.head', batch=len(images)):
+            return self.classifier.predict_proba(self.scaler.transform(features))
+
+
+class StudentPredictor:
+    """Lightweight student checkpoint written by distillation.py."""
+
+    def __init__(self, model_path, device=None):
+        import torch
+        from student_model import load_student
+
+        self.device = _get_device(device)
+        self.model, self.metadata = load_student(model_path, device=self.device)
+        self.class_names = list(self.metadata.get('class_names', CLASS_NAMES))
+        self.transform = _imagenet_transform()
+        self._torch = torch
+
+    @traced('student.predict')
+    def predict_proba(self, images):
+        torch = self._torch
+        with span('student.to_tensor', batch=len(images)):
+            batch = torch.stack([self.transform(img) for img in images]).to(self.device)
+        with torch.no_grad(), span('student.forward', batch=len(images)):
+            return torch.softmax(self.model(batch), dim=1).cpu().numpy()
+
+
+MODEL_FAMILIES = {
+    'cbam': CBAMPredictor,
+    'convnext': ConvNeXtPredictor,
+    'hybrid': HybridPredictor,
+    'student': StudentPredictor,
+}
+
+
+def load_predictor(family, model_path, device=None, preprocess=False):
+    """Instantiate the predictor for a model family."""
+    if family not in MODEL_FAMILIES:
+        raise ValueError(f"Unknown model family '{family}'. Choose from: {', '.join(MODEL_FAMILIES)}")
+    if family == 'cbam':
+        return CBAMPredictor(model_path, device=device, preprocess=preprocess)
+    if preprocess:
+        print(f"Warning: --preprocess only applies to the cbam family; ignored for '{family}'")
+    return MODEL_FAMILIES[family](model_path, device=device)
+
+
+# ============================================================================
+# MANIFEST EVALUATION
+# ============================================================================
+
+def iter_manifest_batches(manifest_path, batch_size=32, root=None):
+    """
+    Stream (paths, labels, label_names) batches from a manifest CSV.
+
+    The manifest needs an `image_path` column plus `label` (int) and/or
+    `label_name`, i.e. the `sipakmed_file_list.csv` written by the fine-tuning
+    script. Relative image paths are resolved against `root`.
+    """
+    import pandas as pd
+
+    for chunk in pd.read_csv(manifest_path, chunksize=batch_size):
+        if 'image_path' not in chunk.columns:
+            raise ValueError("Manifest must contain an 'image_path' column")
+        paths = [Path(p) if root is None or os.path.isabs(p) else Path(root) / p for p in chunk['image_path']]
+        labels = chunk['label'].to_numpy() if 'label' in chunk.columns else None
+        label_names = chunk['label_name'].tolist() if 'label_name' in chunk.columns else None
+        yield paths, labels, label_names
+
+
+def _resolve_labels(labels, label_names, class_names):
+    if label_names is not None:
+        lookup = {name: i for i, name in enumerate(class_names)}
+        if all(name in lookup for name in label_names):
+            return np.array([lookup[name] for name in label_names], dtype=np.int64)
+    if labels is None:
+        raise ValueError("Manifest label names do not match the model classes and no 'label' column is present")
+    return np.asarray(labels, dtype=np.int64)
+
+
+def evaluate_manifest(predictor, manifest_path, batch_size=32, root=None, progress=True, scores=None, store=None):
+    """
+    Run the predictor over a manifest, accumulating the confusion matrix
+    batch by batch. Optionally also feeds a `StreamingScoreMetrics`
+    (`scores`) and appends every batch's probabilities to a
+    `prediction_store.PredictionWriter` (`store`); memory stays at one batch
+    whatever the manifest's size.
+    """
+    from PIL import Image
+
+    accumulator = StreamingConfusionMatrix(len(predictor.class_names))
+    for paths, labels, label_names in iter_manifest_batches(manifest_path, batch_size, root):
+        images = []
+        for p in paths:
+            with Image.open(p) as img:
+                images.append(img.convert('RGB'))
+        probs = predictor.predict_proba(images)
+        labels = _resolve_labels(labels, label_names, predictor.class_names)
+        accumulator.update(labels, probs)
+        if scores is not None:
+            scores.update(labels, probs)
+        if store is not None:
+            store.add(probs, labels, ids=paths)
+        if progress:
+            print(f"\rEvaluated {accumulator.count} images", end='', flush=True)
+    if progress:
+        print()
+    return accumulator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a cervical cell classifier on a manifest CSV")
+    parser.add_argument('--manifest', required=True, help="CSV with image_path and label / label_name columns")
+    parser.add_argument('--family', required=True, choices=sorted(MODEL_FAMILIES), help="Model family")
+    parser.add_argument('--model', required=True,
+                        help="Checkpoint file (cbam, student) or model directory (convnext, hybrid)")
+    parser.add_argument('--root', default=None, help="Base directory for relative image paths")
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--device', default=None, help="cpu / cuda (default: auto)")
+    parser.add_argument('--preprocess', action='store_true', help="Apply the app.py Resize → NLM → CLAHE pipeline (cbam)")
+    parser.add_argument('--n-bootstrap', type=int, default=2000, help="Number of bootstrap resamples")
+    parser.add_argument('--confidence', type=float, default=0.95, help="Confidence level of the intervals")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help="Write the JSON report to this path")
+    parser.add_argument('--predictions', default=None,
+                        help="Also store every image's class probabilities in this directory (phoenix_shared/prediction_store.py)")
+    parser.add_argument('--trace', default=None, help="Write a Chrome trace of the inference stages to this path")
+    args = parser.parse_args()
+
+    tracing.configure_from_env()
+    if args.trace:
+        tracing.enable(record_spans=True)
+
+    predictor = load_predictor(args.family, args.model, device=args.device, preprocess=args.preprocess)
+    scores = StreamingScoreMetrics(len(predictor.class_names))
+    store = None
+    if args.predictions:
+        from phoenix_shared.prediction_store import PredictionWriter
+        store = PredictionWriter(args.predictions, predictor.class_names, kind='probabilities')
+    accumulator = evaluate_manifest(predictor, args.manifest, batch_size=args.batch_size, root=args.root,
+                                    scores=scores, store=store)
+    if store is not None:
+        store.close()
+    report = build_report(accumulator, predictor.class_names, n_resamples=args.n_bootstrap,
+                          confidence=args.confidence, seed=args.seed, scores=scores)
+    report['family'] = args.family
+    report['model'] = str(args.model)
+    report['manifest'] = str(args.manifest)
+    if args.trace:
+        report['stage_latency'] = tracing.snapshot()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved report to: {args.output}")
+    if args.predictions:
+        print(f"Saved predictions to: {args.predictions}")
+    if args.trace:
+        tracing.write_chrome_trace(args.trace)
+        print(f"Saved trace to: {args.trace}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""
+Parallel Hyperparameter Search with ASHA Early Stopping
+Cached Dataset (Decoded Once) → Parallel Trials → Val Accuracy at Each Rung → Stop Weak Trials → Leaderboard
+
+Searches the fine-tuning hyperparameters that `ConvNeXt Finetuning_v0.2.py`
+hard-codes in its TrainingArguments (learning rate, weight decay, batch size,
+epochs) without editing the script:
+
+  - the manifest's images are decoded and resized once into a memory-mapped
+    uint8 cache that every trial process reads (pages shared through the OS
+    page cache), with the script's stratified 80/10/10 split. For
+    `convnextv2` they match the script's val_transform: 224 px bilinear,
+    normalised with the checkpoint's image processor mean/std
+  - trials sample distinct configurations from SEARCH_SPACE and run in
+    `--parallel` spawned processes, each with its share of the CPU threads
+  - ASHA (asynchronous successive halving): validation accuracy, as in the
+    script's compute_metrics, is measured at rung epochs
+    min_epochs · η^k (and max_epochs). A trial continues past a rung only if
+    it is in the top 1/η of all results recorded at that rung so far; the
+    others are stopped, so most of the budget goes to promising trials
+  - epochs are the resource: a trial that reaches max_epochs has the
+    script's full schedule (AdamW, linear decay over max_epochs)
+
+`leaderboard.csv` ranks every trial; `best_config.json` holds the best trial
+that completed max_epochs as TrainingArguments keyword arguments, which the
+ConvNeXt script reads from the CONVNEXT_HPARAMS environment variable.
+`num_train_epochs` is max_epochs, the length of the schedule the winner's
+learning rate decayed over (its best rung is kept in search_results.json;
+load_best_model_at_end picks that checkpoint). It is only written for
+`--model convnextv2`: a student's hyperparameters do not transfer.
+
+Usage:
+    python hparam_search.py --manifest sipakmed_file_list.csv --model convnextv2 --trials 16 --parallel 4 \
+        --min-epochs 1 --max-epochs 5 --output hparam_search
+    CONVNEXT_HPARAMS=hparam_search/best_config.json \
+        python "../Fine Tuning/2_ConvNeXt Transfer Learning/ConvNeXt Finetuning_v0.2.py"
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+SEARCH_SPACE = {
+    'learning_rate': [1e-5, 3e-5, 5e-5, 1e-4, 3e-4],
+    'weight_decay': [0.0, 0.01, 0.05],
+    'batch_size': [8, 16, 32],
+}
+CONVNEXT_CHECKPOINT = "facebook/convnextv2-tiny-22k-384"
+LEADERBOARD_FILE = "leaderboard.csv"
+RESULTS_FILE = "search_results.json"
+BEST_FILE = "best_config.json"
+
+
+# ============================================================================
+# DATASET CACHE
+# ============================================================================
+
+def preprocessing(model_name, image_size=None):
+    """
+    Input size, PIL resampling filter and normalisation for `model_name`:
+    224 px bilinear for every model, as the ConvNeXt script's val_transform
+    (T.Resize((224, 224))) feeds it, with the image processor's mean/std for
+    `convnextv2` and ImageNet statistics for students. `image_size` overrides
+    the size.
+    """
+    from phoenix_shared.augmentation import IMAGENET_MEAN, IMAGENET_STD
+
+    inputs = {'image_size': image_size or 224, 'resample': 2, 'mean': list(IMAGENET_MEAN),
+              'std': list(IMAGENET_STD)}
+    if model_name == 'convnextv2':
+        from transformers import AutoImageProcessor
+
+        processor = AutoImageProcessor.from_pretrained(CONVNEXT_CHECKPOINT)
+        inputs.update(mean=list(processor.image_mean), std=list(processor.image_std))
+    return inputs
+
+
+def build_cache(manifest, cache_dir, image_size=224, root=None, seed=42, resample=2, mean=None, std=None):
+    """
+    Decode every manifest image once, resized to `image_size` with the PIL
+    filter `resample`, into `images.npy` (uint8, N×3×H×W) with labels and the
+    script's stratified 80/10/10 split. `mean` / `std` are recorded for
+    normalising at read time. Reused when the manifest, size and filter are
+    unchanged.
+    """
+    from PIL import Image
+    from sklearn.model_selection import train_test_split
+    from phoenix_shared.augmentation import IMAGENET_MEAN, IMAGENET_STD
+    from cbam_model import CLASS_NAMES
+    from distillation import read_manifest
+
+    cache_dir = Path(cache_dir)
+    meta_path = cache_dir / "meta.json"
+    normalisation = {'mean': list(mean or IMAGENET_MEAN), 'std': list(std or IMAGENET_STD)}
+    key = {'manifest': str(Path(manifest).resolve()), 'mtime': os.path.getmtime(manifest),
+           'image_size': image_size, 'resample': resample, 'seed': seed}
+    if meta_path.exists():
+        meta = json.loads(meta_path.read_text())
+        if meta.get('key') == key:
+            meta.update(normalisation)
+            meta_path.write_text(json.dumps(meta, indent=2))
+            return cache_dir
+
+    paths, labels = read_manifest(manifest, CLASS_NAMES, root)
+    labels = np.asarray(labels)
+    index = np.arange(len(paths))
+    train, temp = train_test_split(index, test_size=0.2, stratify=labels, random_state=seed)
+    val, test = train_test_split(temp, test_size=0.5, stratify=labels[temp], random_state=seed)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    images = np.lib.format.open_memmap(cache_dir / "images.npy", mode='w+', dtype=np.uint8,
+                                       shape=(len(paths), 3, image_size, image_size))
+    for i, path in enumerate(paths):
+        with Image.open(path) as img:
+            resized = img.convert('RGB').resize((image_size, image_size), resample)
+        images[i] = np.asarray(resized).transpose(2, 0, 1)
+    images.flush()
+    np.save(cache_dir / "labels.npy", labels)
+    np.savez(cache_dir / "splits.npz", train=np.sort(train), val=np.sort(val), test=np.sort(test))
+    meta_path.write_text(json.dumps({'key': key, 'class_names': CLASS_NAMES, 'images': len(paths),
+                                     **normalisation}, indent=2))
+    return cache_dir
+
+
+def load_cache(cache_dir):
+    """(memory-mapped images, labels, {'train', 'val', 'test'} index arrays, (mean, std))."""
+    cache_dir = Path(cache_dir)
+    splits = np.load(cache_dir / "splits.npz")
+    meta = json.loads((cache_dir / "meta.json").read_text())
+    return (np.load(cache_dir / "images.npy", mmap_mode='r'), np.load(cache_dir / "labels.npy"),
+            {name: splits[name] for name in splits.files}, (meta['mean'], meta['std']))
+
+
+def _to_tensor(images, index, normalisation):
+    import torch
+
+    batch = torch.from_numpy(np.ascontiguousarray(images[index])).float().div_(255)
+    mean = torch.tensor(normalisation[0]).view(1, 3, 1, 1)
+    std = torch.tensor(normalisation[1]).view(1, 3, 1, 1)
+    return (batch - mean) / std
+
+
+# ============================================================================
+# ASHA
+# ============================================================================
+
+def rung_epochs(min_epochs, max_epochs, reduction_factor):
+    """Rung milestones min_epochs · η^k below max_epochs, then max_epochs."""
+    rungs, epochs = [], min_epochs
+    while epochs < max_epochs:
+        rungs.append(epochs)
+        epochs *= reduction_factor
+    return rungs + [max_epochs]
+
+
+class ASHA:
+    """
+    Asynchronous successive halving shared by the trial processes (the rung
+    results live in a multiprocessing.Manager). `report` records a trial's
+    accuracy at a rung and says whether it may continue: yes if it ranks in
+    the top ceil(n / η) of the n results recorded at that rung so far (ties
+    go to the result recorded first). Trials are never held back waiting for
+    others, so early trials are judged against few results and later ones
+    against many.
+    """
+
+    def __init__(self, manager, rungs, reduction_factor=3):
+        self.rungs = list(rungs)
+        self.reduction_factor = reduction_factor
+        self._results = manager.dict()
+        self._lock = manager.Lock()
+
+    def report(self, rung, accuracy):
+        with self._lock:
+            recorded = self._results.get(rung, ()) + (accuracy,)
+            self._results[rung] = recorded
+        if rung == self.rungs[-1]:
+            return False
+        rank = sum(1 for other in recorded[:-1] if other >= accuracy)
+        return rank < math.ceil(len(recorded) / self.reduction_factor)
+
+
+# ============================================================================
+# TRIALS
+# ============================================================================
+
+def make_model(name, num_classes, pretrained=False):
+    """`convnextv2`: the Hugging Face model the fine-tuning script trains; otherwise a student_model architecture."""
+    import torch.nn as nn
+
+    if name != 'convnextv2':
+        from student_model import build_student
+        return build_student(name, num_classes=num_classes, pretrained=pretrained)
+
+    from transformers import ConvNextV2ForImageClassification
+
+    class LogitsOnly(nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return self.model(pixel_values=pixel_values).logits
+
+    return LogitsOnly(ConvNextV2ForImageClassification.from_pretrained(
+        CONVNEXT_CHECKPOINT, num_labels=num_classes, ignore_mismatched_sizes=True))
+
+
+def _evaluate(model, images, labels, index, normalisation, batch_size=64):
+    import torch
+    from sklearn.metrics import accuracy_score, f1_score
+
+    model.eval()
+    predictions = []
+    with torch.no_grad():
+        for start in range(0, len(index), batch_size):
+            predictions.append(model(_to_tensor(images, index[start:start + batch_size], normalisation)).argmax(dim=1).numpy())
+    predictions = np.concatenate(predictions)
+    return {'accuracy': float(accuracy_score(labels[index], predictions)),
+            'f1': float(f1_score(labels[index], predictions, average='weighted'))}
+
+
+def run_trial(trial_id, config, cache_dir, model_name, scheduler, threads=1, pretrained=False, seed=42):
+    """Train one configuration until ASHA stops it or it completes max_epochs; returns its leaderboard row."""
+    import torch
+    import torch.nn.functional as F
+    from phoenix_shared.augmentation import BatchAugment
+
+    torch.set_num_threads(threads)
+    torch.manual_seed(seed + trial_id)
+    rng = np.random.default_rng(seed + trial_id)
+    images, labels, splits, normalisation = load_cache(cache_dir)
+    train, val = splits['train'], splits['val']
+    model = make_model(model_name, int(labels.max()) + 1, pretrained)
+    augment = BatchAugment(rotation=10, mean=normalisation[0], std=normalisation[1])
+
+    batch_size = config['batch_size']
+    steps_per_epoch = max(len(train) // batch_size, 1)
+    total_steps = int(round(scheduler.rungs[-1] * steps_per_epoch))
+    milestones = {int(round(rung * steps_per_epoch)): rung for rung in scheduler.rungs}
+    optimizer = torch.optim.AdamW(model.parameters(), lr=config['learning_rate'],
+                                  weight_decay=config['weight_decay'])
+    lr_schedule = torch.optim.lr_scheduler.LambdaLR(optimizer, lambda step: 1 - step / total_steps)
+
+    start = time.perf_counter()
+    history, order = [], np.empty(0, dtype=int)
+    for step in range(1, total_steps + 1):
+        if len(order) < batch_size:
+            order = np.concatenate([order, rng.permutation(train)])
+        batch, order = np.sort(order[:batch_size]), order[batch_size:]
+        model.train()
+        loss = F.cross_entropy(model(augment(_to_tensor(images, batch, normalisation))), torch.as_tensor(labels[batch]))
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        lr_schedule.step()
+
+        if step in milestones:
+            metrics = _evaluate(model, images, labels, val, normalisation)
+            history.append({'epoch': milestones[step], 'step': step, **metrics})
+            if not scheduler.report(milestones[step], metrics['accuracy']):
+                break
+
+    epochs = history[-1]['epoch']
+    best = max(history, key=lambda h: h['accuracy'])
+    return {
+        'trial': trial_id,
+        **config,
+        'status': 'completed' if epochs == scheduler.rungs[-1] else f'stopped@{epochs:g}',
+        'epochs_trained': epochs,
+        'best_val_accuracy': best['accuracy'],
+        'best_epoch': best['epoch'],
+        'best_val_f1': best['f1'],
+        'final_val_accuracy': history[-1]['accuracy'],
+        'seconds': time.perf_counter() - start,
+        'history': history,
+    }
+
+
+# ============================================================================
+# SEARCH
+# ============================================================================
+
+def sample_configs(trials, seed=42):
+    """(`trials` distinct configurations drawn from the SEARCH_SPACE grid, grid size)."""
+    grid = [dict(zip(SEARCH_SPACE, values)) for values in itertools.product(*SEARCH_SPACE.values())]
+    rng = np.random.default_rng(seed)
+    return [grid[i] for i in rng.choice(len(grid), size=min(trials, len(grid)), replace=False)], len(grid)
+
+
+def search(manifest, output, model_name='convnextv2', trials=16, parallel=2, min_epochs=1, max_epochs=5,
+           reduction_factor=3, image_size=None, pretrained=False, root=None, seed=42):
+    """
+    Run the ASHA search; writes the leaderboard and full results to `output`,
+    and for `convnextv2` the best completed trial's config.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    inputs = preprocessing(model_name, image_size)
+    cache_dir = build_cache(manifest, output / "cache", inputs['image_size'], root, seed, inputs['resample'],
+                            inputs['mean'], inputs['std'])
+    cache_s = time.perf_counter() - start
+
+    configs, grid_size = sample_configs(trials, seed)
+    rungs = rung_epochs(min_epochs, max_epochs, reduction_factor)
+    threads = max(1, (os.cpu_count() or 1) // parallel)
+    print(f"{len(configs)} trials from a {grid_size}-configuration grid, {parallel} in parallel "
+          f"({threads} thread(s) each); rungs at epochs {', '.join(f'{r:g}' for r in rungs)}, η = {reduction_factor}; "
+          f"{inputs['image_size']} px inputs")
+
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    with context.Manager() as manager:
+        scheduler = ASHA(manager, rungs, reduction_factor)
+        with ProcessPoolExecutor(max_workers=parallel, mp_context=context) as pool:
+            futures = [pool.submit(run_trial, trial_id, config, cache_dir, model_name, scheduler, threads,
+                                   pretrained, seed)
+                       for trial_id, config in enumerate(configs)]
+            for future in as_completed(futures):
+                row = future.result()
+                rows.append(row)
+                print(f"  trial {row['trial']:>3} {row['status']:<12} best val acc {row['best_val_accuracy']:.4f} "
+                      f"(lr {row['learning_rate']:g}, wd {row['weight_decay']:g}, batch {row['batch_size']})")
+
+    rows.sort(key=lambda r: (-r['best_val_accuracy'], r['epochs_trained']))
+    epochs_used = sum(r['epochs_trained'] for r in rows)
+    # only a trial that ran the whole schedule was trained the way the script will train it
+    best = next((r for r in rows if r['epochs_trained'] == max_epochs), None)
+    results = {
+        'model': model_name,
+        'preprocessing': inputs,
+        'rungs': rungs,
+        'reduction_factor': reduction_factor,
+        'cache_seconds': cache_s,
+        'search_seconds': time.perf_counter() - start - cache_s,
+        'epochs_trained': epochs_used,
+        'fraction_of_sampled_trials_run_fully': epochs_used / (len(rows) * max_epochs),
+        'fraction_of_full_grid': epochs_used / (grid_size * max_epochs),
+        'best': best and {'trial': best['trial'], 'best_epoch': best['best_epoch'],
+                          'best_val_accuracy': best['best_val_accuracy'], 'schedule_epochs': max_epochs},
+        'leaderboard': rows,
+    }
+
+    import pandas as pd
+    pd.DataFrame([{k: v for k, v in r.items() if k != 'history'} for r in rows]).to_csv(
+        output / LEADERBOARD_FILE, index=False)
+    with open(output / RESULTS_FILE, 'w') as f:
+        json.dump(results, f, indent=2)
+    if model_name != 'convnextv2':
+        print(f"\nNot writing {BEST_FILE}: hyperparameters searched on {model_name} do not transfer to ConvNeXt")
+    elif best is None:
+        print(f"\nNot writing {BEST_FILE}: no trial completed {max_epochs:g} epochs")
+    else:
+        # the winner's learning rate decayed linearly over max_epochs, so that is the schedule to reproduce
+        with open(output / BEST_FILE, 'w') as f:
+            json.dump({'learning_rate': best['learning_rate'], 'weight_decay': best['weight_decay'],
+                       'per_device_train_batch_size': best['batch_size'], 'num_train_epochs': max_epochs},
+                      f, indent=2)
+    return results
+
+
+def print_leaderboard(results, top=10):
+    print(f"\n{'Rank':<5}{'Trial':>6}{'LR':>9}{'WD':>7}{'Batch':>7}{'Status':>14}{'Epochs':>8}"
+          f"{'Best acc':>10}{'F1':>8}")
+    for rank, row in enumerate(results['leaderboard'][:top], 1):
+        print(f"{rank:<5}{row['trial']:>6}{row['learning_rate']:>9.0e}{row['weight_decay']:>7.2f}"
+              f"{row['batch_size']:>7}{row['status']:>14}{row['epochs_trained']:>8g}"
+              f"{row['best_val_accuracy']:>10.4f}{row['best_val_f1']:>8.4f}")
+    print(f"\nSearch cost: {results['epochs_trained']:g} training epochs = "
+          f"{results['fraction_of_sampled_trials_run_fully']:.0%} of running every sampled trial to the end, "
+          f"{results['fraction_of_full_grid']:.0%} of the full grid ({results['search_seconds']:.0f}s, "
+          f"plus {results['cache_seconds']:.0f}s to build the dataset cache)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel ASHA hyperparameter search for fine-tuning")
+    parser.add_argument('--manifest', required=True, help="CSV with image_path and label / label_name")
+    parser.add_argument('--model', default='convnextv2',
+                        help="'convnextv2' (the fine-tuning script's model, needs transformers) or a student "
+                             "architecture for fast CPU searches (no best_config.json)")
+    parser.add_argument('--trials', type=int, default=16)
+    parser.add_argument('--parallel', type=int, default=2, help="Trials run at once (processes)")
+    parser.add_argument('--min-epochs', type=float, default=1, help="First rung")
+    parser.add_argument('--max-epochs', type=float, default=5, help="Full budget (the script's num_train_epochs)")
+    parser.add_argument('--reduction-factor', type=int, default=3, help="η: keep the top 1/η at each rung")
+    parser.add_argument('--image-size', type=int, default=None,
+                        help="Cache size (default: 224, the ConvNeXt script's val_transform size)")
+    parser.add_argument('--pretrained', action='store_true', help="Start students from ImageNet weights")
+    parser.add_argument('--root', default=None, help="Base directory for relative image paths")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default='hparam_search')
+    args = parser.parse_args()
+
+    results = search(args.manifest, args.output, args.model, args.trials, args.parallel, args.min_epochs,
+                     args.max_epochs, args.reduction_factor, args.image_size, args.pretrained, args.root, args.seed)
+    print_leaderboard(results)
+    print(f"\nSaved leaderboard to: {Path(args.output) / LEADERBOARD_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Hybrid ResNet50 + Logistic Regression Model Components
+Shared by the evaluation harness and the model registry
+
+Mirrors the models served by the Herlev and SiPakMED streamlit dashboards:
+a global-average-pooled ResNet50 feature extractor followed by a
+StandardScaler and a scikit-learn logistic regression head.
+"""
+
+import pickle
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+import torchvision.models as models
+
+SIPAKMED_CLASS_NAMES = ['Dyskeratotic', 'Koilocytotic', 'Metaplastic', 'Parabasal', 'Superficial-Intermediate']
+
+FEATURE_EXTRACTOR_FILE = "resnet50_feature_extractor.pth"
+CLASSIFIER_FILE = "logistic_classifier.pkl"
+# Herlev saves `scaler.pkl`, SiPakMED saves `feature_scaler.pkl`
+SCALER_FILES = ["scaler.pkl", "feature_scaler.pkl"]
+CLASS_MAPPING_FILE = "class_mapping.pkl"
+
+
+class FeatureExtractor(nn.Module):
+    """ResNet50 without its fc layer; returns 2048-d pooled features."""
+    def __init__(self):
+        super(FeatureExtractor, self).__init__()
+        resnet = models.resnet50(weights=None)
+        self.features = nn.Sequential(*list(resnet.children())[:-1])
+
+    def forward(self, x):
+        x = self.features(x)
+        x = torch.flatten(x, 1)
+        return x
+
+
+def find_scaler(models_dir):
+    """Path of the pickled scaler in a models directory."""
+    for name in SCALER_FILES:
+        path = Path(models_dir) / name
+        if path.exists():
+            return path
+    raise FileNotFoundError(f"No scaler ({' / '.join(SCALER_FILES)}) found in {models_dir}")
+
+
+def load_head(models_dir):
+    """Load (classifier, scaler, class_names) from a hybrid models directory."""
+    models_dir = Path(models_dir)
+    with open(models_dir / CLASSIFIER_FILE, 'rb') as f:
+        classifier = pickle.load(f)
+    with open(find_scaler(models_dir), 'rb') as f:
+        scaler = pickle.load(f)
+
+    mapping_path = models_dir / CLASS_MAPPING_FILE
+    if mapping_path.exists():
+        with open(mapping_path, 'rb') as f:
+            class_mapping = pickle.load(f)
+        idx_to_class = {v: k for k, v in class_mapping.items()}
+        class_names = [idx_to_class[i] for i in range(len(idx_to_class))]
+    else:
+        class_names = list(SIPAKMED_CLASS_NAMES)
+    return classifier, scaler, class_names
+
+
+def load_feature_extractor(models_dir, device='cpu'):
+    """Load the feature extractor weights saved by the hybrid pipelines."""
+    feature_extractor = FeatureExtractor()
+    feature_extractor.load_state_dict(torch.load(
+        Path(models_dir) / FEATURE_EXTRACTOR_FILE, map_location=device
+    ))
+    feature_extractor.to(device)
+    feature_extractor.eval()
+    return feature_extractor
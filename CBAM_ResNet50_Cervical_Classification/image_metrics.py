@@ -0,0 +1,194 @@
+"""
+Batched Image Quality Metrics
+PSNR, SSIM and contrast ratio over N×H×W image stacks in one vectorized pass
+
+Drop-in batched counterpart of `calculate_preprocessing_metrics` in app.py:
+  - Grayscale conversion happens once per stack (OpenCV fixed-point weights).
+  - PSNR sums squared errors with cv2.norm, no float64 image temporaries.
+  - SSIM uses separable float32 filtering, one OpenCV call per chunk. The default window matches the call
+    in app.py (skimage `structural_similarity(..., data_range=255)`: 7×7
+    uniform window, sample covariance); `gaussian_weights=True` gives the
+    11×11, sigma=1.5 Gaussian window of Wang et al.
+
+Stacks are processed in chunks of `batch_size` images so memory stays bounded.
+"""
+
+import cv2
+import numpy as np
+
+K1 = 0.01
+K2 = 0.03
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def to_gray_stack(images):
+    """
+    Convert a BGR stack (N, H, W, 3) or a single BGR image (H, W, 3) to uint8
+    grayscale (N, H, W). Grayscale stacks (N, H, W) are returned unchanged.
+    """
+    images = np.asarray(images)
+    if images.ndim == 3 and images.shape[-1] == 3:
+        images = images[None]
+    if images.ndim == 3:
+        return images
+    if images.ndim != 4 or images.shape[-1] != 3:
+        raise ValueError(f"Expected (N, H, W, 3) or (N, H, W) images, got shape {images.shape}")
+
+    n, h, w, _ = images.shape
+    # Fold the batch into rows so OpenCV converts the whole stack in one call
+    gray = cv2.cvtColor(np.ascontiguousarray(images).reshape(n * h, w, 3), cv2.COLOR_BGR2GRAY)
+    return gray.reshape(n, h, w)
+
+
+def _window(win_size=None, gaussian_weights=False, sigma=1.5):
+    """1-D separable window weights, matching skimage's defaults."""
+    if gaussian_weights:
+        if win_size is None:
+            # skimage: truncate=3.5 → radius = int(3.5 * sigma + 0.5)
+            win_size = 2 * int(3.5 * sigma + 0.5) + 1
+        radius = (win_size - 1) // 2
+        x = np.arange(-radius, radius + 1, dtype=np.float64)
+        weights = np.exp(-0.5 * (x / sigma) ** 2)
+    else:
+        if win_size is None:
+            win_size = 7
+        weights = np.ones(win_size, dtype=np.float64)
+    if win_size % 2 != 1:
+        raise ValueError("win_size must be odd")
+    return (weights / weights.sum()).astype(np.float32)
+
+
+def _filter_and_crop(stack, weights):
+    """
+    Separable filtering of every image in a float32 stack (..., H, W) with a
+    single OpenCV call, keeping only the region skimage averages over.
+
+    The stack is folded into one tall (N*H, W) image. Vertical filtering then
+    mixes rows across neighbouring images, but only within (win_size - 1) // 2
+    rows of each border, which are exactly the rows skimage crops away.
+    """
+    k = len(weights)
+    radius = (k - 1) // 2
+    h, w = stack.shape[-2:]
+    if h < k or w < k:
+        raise ValueError(f"Images ({h}×{w}) are smaller than the {k}×{k} SSIM window")
+
+    filtered = cv2.sepFilter2D(stack.reshape(-1, w), cv2.CV_32F, weights, weights,
+                               borderType=cv2.BORDER_REFLECT)
+    return filtered.reshape(stack.shape)[..., radius:h - radius, radius:w - radius]
+
+
+# ============================================================================
+# METRICS
+# ============================================================================
+
+def batch_psnr(images1, images2, data_range=255.0):
+    """PSNR per image pair; stacks of any matching shape (N, ...). Identical pairs give inf."""
+    a = np.asarray(images1)
+    b = np.asarray(images2)
+    if a.shape != b.shape:
+        raise ValueError(f"Shape mismatch: {a.shape} vs {b.shape}")
+    n = a.shape[0]
+
+    # cv2.norm sums squared differences in double precision without any
+    # full-size temporaries; each image is viewed as a 2-D array
+    flat_a = a.reshape(n, a.shape[1], -1)
+    flat_b = b.reshape(n, b.shape[1], -1)
+    sse = np.array([cv2.norm(x, y, cv2.NORM_L2SQR) for x, y in zip(flat_a, flat_b)], dtype=np.float64)
+    mse = sse / a[0].size
+
+    with np.errstate(divide='ignore'):
+        return 20 * np.log10(data_range / np.sqrt(mse))
+
+
+def batch_ssim(gray1, gray2, data_range=255.0, gaussian_weights=False, win_size=None,
+               sigma=1.5, use_sample_covariance=True, batch_size=16):
+    """Mean SSIM per pair of grayscale images, (N, H, W) → (N,)."""
+    gray1 = np.asarray(gray1)
+    gray2 = np.asarray(gray2)
+    if gray1.shape != gray2.shape:
+        raise ValueError(f"Shape mismatch: {gray1.shape} vs {gray2.shape}")
+
+    weights = _window(win_size, gaussian_weights, sigma)
+    k = len(weights)
+    cov_norm = k * k / (k * k - 1.0) if use_sample_covariance else 1.0
+
+    # Work on [0, 1]-scaled data: SSIM is scale invariant once C1 / C2 are
+    # scaled too, and it keeps float32 cancellation in the variances small.
+    c1 = np.float32(K1 ** 2)
+    c2 = np.float32(K2 ** 2)
+    scale = np.float32(1.0 / data_range)
+
+    n, h, w = gray1.shape
+    chunk = min(batch_size, n)
+    buffer = np.empty((5, chunk, h, w), dtype=np.float32)
+
+    results = np.empty(n, dtype=np.float64)
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        x, y, xx, yy, xy = buffer[:, :m]
+        np.multiply(gray1[start:start + m], scale, out=x, dtype=np.float32)
+        np.multiply(gray2[start:start + m], scale, out=y, dtype=np.float32)
+        np.multiply(x, x, out=xx)
+        np.multiply(y, y, out=yy)
+        np.multiply(x, y, out=xy)
+
+        # One filtering pass over all five moment maps
+        ux, uy, uxx, uyy, uxy = _filter_and_crop(buffer[:, :m], weights)
+
+        # In-place arithmetic: uxy → 2·cov, uxx → var sum, ux → luminance term
+        uxy -= ux * uy
+        uxy *= 2 * cov_norm
+        uxy += c2
+        uxx += uyy
+        uy_sq = np.multiply(uy, uy)
+        uy *= ux
+        uy *= 2
+        uy += c1                      # 2·ux·uy + C1
+        ux *= ux
+        ux += uy_sq                   # ux² + uy²
+        uxx -= ux
+        uxx *= cov_norm
+        uxx += c2                     # vx + vy + C2
+        ux += c1                      # ux² + uy² + C1
+
+        uy *= uxy
+        ux *= uxx
+        uy /= ux
+        results[start:start + m] = uy.mean(axis=(1, 2), dtype=np.float64)
+    return results
+
+
+def batch_contrast(gray):
+    """Global contrast (pixel standard deviation) per grayscale image, (N, H, W) → (N,)."""
+    gray = np.asarray(gray)
+    n = gray.shape[0]
+    return gray.reshape(n, -1).std(axis=1, dtype=np.float32).astype(np.float64)
+
+
+def batch_preprocessing_metrics(originals, processed, batch_size=16):
+    """
+    Batched `calculate_preprocessing_metrics`: BGR stacks (N, H, W, 3) in,
+    dict of (N,) arrays out, using the same keys as app.py.
+    """
+    originals = np.asarray(originals)
+    processed = np.asarray(processed)
+    if originals.ndim == 3:
+        originals = originals[None]
+        processed = processed[None]
+
+    gray_orig = to_gray_stack(originals)
+    gray_proc = to_gray_stack(processed)
+
+    contrast_orig = batch_contrast(gray_orig)
+    contrast_proc = batch_contrast(gray_proc)
+    improvement = np.zeros_like(contrast_orig)
+    np.divide(contrast_proc, contrast_orig, out=improvement, where=contrast_orig != 0)
+
+    return {
+        'PSNR (dB)': batch_psnr(originals, processed),
+        'SSIM': batch_ssim(gray_orig, gray_proc, data_range=255, batch_size=batch_size),
+        'Contrast Improvement': improvement,
+    }
@@ -0,0 +1,145 @@
+"""
+Copy-Free Model Input Path
+Upload Bytes → cv2.imdecode (BGR) → Preprocessing → One Resample → Fused Normalize into the Model Tensor
+
+The original path copies the image at nearly every step: PIL decode →
+`convert('RGB')` → `np.array` → BGR for OpenCV → preprocessing → back to RGB
+→ `Image.fromarray` → `Resize` → `ToTensor` → `Normalize`.
+
+This path decodes the bytes in place (`np.frombuffer`, no BytesIO) straight
+to the BGR array the OpenCV preprocessing expects. The 256 → 224 resample
+runs on the BGR buffer itself; bilinear resampling treats each channel
+separately, so channel order does not matter. The BGR → RGB swap, the
+/255 of ToTensor and Normalize are then folded into one multiply-add per
+channel, written directly into the model's input tensor.
+
+The resample is PIL's (the same code the torchvision transform runs), so
+the tensors equal the original path's to float rounding (~1e-7), and the
+decoded pixels are identical.
+
+Full-resolution microscopy fields are only ever shown to the model at 256px.
+With `target_size`, decoding is size-aware: the header is read first, uploads
+above `MAX_INPUT_PIXELS` are refused before decoding, and large images are
+decoded at 1/2, 1/4 or 1/8 scale (libjpeg DCT scaling for JPEG, a box
+pre-downscale otherwise). Images up to 4 × target on the long side decode
+exactly as before.
+
+Usage:
+    image_bgr = decode_image_bytes(upload_bytes, target_size=PREPROCESS_SIZE)
+    _, _, final_image, _ = apply_preprocessing_pipeline(image_bgr)
+    batch = bgr_to_tensor(final_image)          # (1, 3, 224, 224) float32
+"""
+
+import warnings
+from io import BytesIO
+
+import cv2
+import numpy as np
+from PIL import Image
+
+MODEL_INPUT_SIZE = 224
+PREPROCESS_SIZE = 256
+# 100 MP: a decoded RGB image this size takes 300 MB
+MAX_INPUT_PIXELS = 100_000_000
+REDUCED_DECODE_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class ImageTooLargeError(ValueError):
+    """Raised for uploads whose header declares more pixels than the input limit."""
+
+
+def probe_image(data):
+    """(format, (width, height)) read from the header alone, or (None, None) if PIL cannot parse it."""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            with Image.open(BytesIO(data)) as image:
+                return image.format, image.size
+    except Image.DecompressionBombError as error:
+        # PIL refuses beyond 2 × Image.MAX_IMAGE_PIXELS (~179 MP), above any sensible input limit
+        raise ImageTooLargeError(str(error)) from error
+    except Exception:
+        return None, None
+
+
+def reduction_factor(size, target_size=PREPROCESS_SIZE, oversample=2):
+    """
+    Largest power-of-two reduction (at most 8, the JPEG DCT scaling limit)
+    that keeps the long side at least `oversample` × `target_size`, so the
+    LANCZOS resize to `target_size` still downsamples.
+    """
+    factor = 1
+    while factor < 8 and max(size) >= 2 * factor * target_size * oversample:
+        factor *= 2
+    return factor
+
+
+def decode_image_bytes(data, target_size=None, max_pixels=MAX_INPUT_PIXELS):
+    """
+    Encoded image bytes → BGR uint8 array, like PIL `open().convert('RGB')`
+    followed by RGB → BGR. EXIF orientation is ignored, as PIL does. Formats
+    OpenCV cannot decode fall back to PIL.
+
+    The header is checked against `max_pixels` before anything is decoded.
+    With `target_size` (the preprocessing resize target), large images are
+    reduced by `reduction_factor` while decoding: JPEGs are decoded scaled
+    in the DCT domain (`cv2.IMREAD_REDUCED_COLOR_*`), so the full-resolution
+    image never exists in memory. Other formats are decoded in full and
+    box-averaged down right away (INTER_AREA).
+    """
+    image_format, size = probe_image(data)
+    if size is not None and size[0] * size[1] > max_pixels:
+        raise ImageTooLargeError(f"{size[0]}×{size[1]} image exceeds the {max_pixels / 1e6:.0f} MP input limit")
+    factor = reduction_factor(size, target_size) if target_size and size is not None else 1
+
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if factor > 1 and image_format == 'JPEG':
+        image = cv2.imdecode(buffer, REDUCED_DECODE_FLAGS[factor] | cv2.IMREAD_IGNORE_ORIENTATION)
+        if image is not None:
+            return image
+    image = cv2.imdecode(buffer, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+    if image is None:
+        with Image.open(BytesIO(data)) as image_pil:
+            image_pil = image_pil.convert('RGB')
+            if factor > 1:
+                image_pil = image_pil.reduce(factor)
+            return cv2.cvtColor(np.asarray(image_pil), cv2.COLOR_RGB2BGR)
+    if size is None and image.shape[0] * image.shape[1] > max_pixels:
+        raise ImageTooLargeError(f"{image.shape[1]}×{image.shape[0]} image exceeds the "
+                                 f"{max_pixels / 1e6:.0f} MP input limit")
+    if factor > 1:
+        height, width = image.shape[:2]
+        image = cv2.resize(image, (-(-width // factor), -(-height // factor)), interpolation=cv2.INTER_AREA)
+    return image
+
+
+def bgr_to_tensor(image_bgr, size=MODEL_INPUT_SIZE, mean=IMAGENET_MEAN, std=IMAGENET_STD, out=None):
+    """
+    BGR uint8 image → normalised (1, 3, size, size) RGB float tensor, equal
+    to `Normalize(ToTensor(Resize((size, size))(RGB PIL image)))`. Pass
+    `out` (e.g. one row of a preallocated batch) to write into it.
+    """
+    import torch
+
+    image_bgr = np.ascontiguousarray(image_bgr)
+    height, width = image_bgr.shape[:2]
+    if (height, width) != (size, size):
+        # PIL bilinear (with antialiasing) on the BGR buffer, as transforms.Resize does on the RGB image
+        resampled = Image.frombuffer('RGB', (width, height), image_bgr, 'raw', 'RGB', 0, 1).resize(
+            (size, size), Image.BILINEAR)
+        image_bgr = np.asarray(resampled)
+    with warnings.catch_warnings():
+        # the resampled array is a read-only view of PIL's bytes; it is only read here
+        warnings.simplefilter('ignore', UserWarning)
+        hwc = torch.from_numpy(image_bgr)
+
+    if out is None:
+        out = torch.empty((1, 3, size, size), dtype=torch.float32)
+    target = out.view(3, size, size)
+    for channel in range(3):
+        # (x / 255 - mean) / std as one multiply-add; RGB channel c is BGR channel 2 - c
+        scale = 1.0 / (255.0 * std[channel])
+        torch.mul(hwc[:, :, 2 - channel], scale, out=target[channel]).sub_(mean[channel] / std[channel])
+    return out
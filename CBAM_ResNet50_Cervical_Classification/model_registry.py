@@ -0,0 +1,226 @@
+"""
+Model Registry with Shared Weights Across Worker Processes
+One copy of every model's weights per node, hot-swappable without restarting workers
+
+Each published model version is stored as a slim weights-only file
+(checkpoint_io.py). Workers map that file copy-on-write instead of
+`torch.load`-ing their own copy, so every Streamlit / worker process on a node
+shares the same physical pages through the OS page cache, whether or not the
+processes were forked from a common parent.
+
+Layout:
+    <root>/<name>/CURRENT                       JSON pointer: {"version": ..., "family": ...}
+    <root>/<name>/versions/<version>/model.safetensors
+    <root>/<name>/versions/<version>/*.pkl      hybrid heads (scaler, classifier, class mapping)
+
+Publishing writes a new version directory and then atomically replaces
+CURRENT. Workers `stat` CURRENT on every `get()` and remap when it changes, so a
+new checkpoint goes live on the next request. Old mappings stay valid until
+the worker drops them.
+
+Usage:
+    python model_registry.py publish cbam cbam_resnet50_cervical/best_model.pth --root model_registry
+    python model_registry.py publish sipakmed "../Sipakmed Pipeline/Models v1/models" --family hybrid
+    python model_registry.py list --root model_registry
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+WEIGHTS_FILE = "model.safetensors"
+CURRENT_FILE = "CURRENT"
+FAMILIES = ['cbam', 'hybrid']
+
+
+class LoadedModel:
+    """A model handed to a worker, together with the registry version it came from."""
+
+    def __init__(self, name, version, family, model, metadata, head=None):
+        self.name = name
+        self.version = version
+        self.family = family
+        self.model = model
+        self.metadata = metadata
+        # (classifier, scaler, class_names) for hybrid models
+        self.head = head
+
+    @property
+    def class_names(self):
+        if self.head is not None:
+            return self.head[2]
+        return json.loads(self.metadata.get('class_names', '[]'))
+
+
+class ModelRegistry:
+    """Versioned models on disk; `get()` returns the current version, mapped once per process."""
+
+    def __init__(self, root, device='cpu', verify=True):
+        self.root = Path(root)
+        self.device = device
+        self.verify = verify
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Publishing
+    # ------------------------------------------------------------------
+
+    def publish(self, name, source, family='cbam', version=None):
+        """
+        Add a new version of `name` and make it current.
+
+        `source` is a training checkpoint / .safetensors file for the cbam
+        family, or a models directory (feature extractor + pickles) for hybrid.
+        """
+        from checkpoint_io import export_checkpoint
+
+        if family not in FAMILIES:
+            raise ValueError(f"Unknown family '{family}'. Choose from: {', '.join(FAMILIES)}")
+        if version is None:
+            version = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+
+        version_dir = self.root / name / "versions" / version
+        if version_dir.exists():
+            raise FileExistsError(f"{name} version {version} already exists")
+        tmp_dir = version_dir.with_name(version + '.tmp')
+        tmp_dir.mkdir(parents=True)
+
+        source = Path(source)
+        if family == 'cbam':
+            from cbam_model import CLASS_NAMES
+            if source.suffix == '.safetensors':
+                shutil.copyfile(source, tmp_dir / WEIGHTS_FILE)
+            else:
+                export_checkpoint(source, tmp_dir / WEIGHTS_FILE, class_names=CLASS_NAMES)
+        else:
+            from hybrid_model import FEATURE_EXTRACTOR_FILE, CLASSIFIER_FILE, CLASS_MAPPING_FILE, find_scaler
+            export_checkpoint(source / FEATURE_EXTRACTOR_FILE, tmp_dir / WEIGHTS_FILE)
+            for path in [source / CLASSIFIER_FILE, find_scaler(source), source / CLASS_MAPPING_FILE]:
+                if path.exists():
+                    shutil.copyfile(path, tmp_dir / path.name)
+        tmp_dir.rename(version_dir)
+
+        self._write_current(name, {'version': version, 'family': family, 'published': time.time()})
+        return version
+
+    def rollback(self, name, version):
+        """Point CURRENT back to an existing version."""
+        if not (self.root / name / "versions" / version).exists():
+            raise FileNotFoundError(f"{name} has no version {version}")
+        pointer = self._read_current(name)
+        self._write_current(name, {'version': version, 'family': pointer['family'], 'published': time.time()})
+
+    def _write_current(self, name, pointer):
+        current = self.root / name / CURRENT_FILE
+        tmp = current.with_name(CURRENT_FILE + f'.{os.getpid()}.tmp')
+        tmp.write_text(json.dumps(pointer))
+        os.replace(tmp, current)
+
+    def _read_current(self, name):
+        current = self.root / name / CURRENT_FILE
+        if not current.exists():
+            raise KeyError(f"No model named '{name}' in registry {self.root}")
+        return json.loads(current.read_text())
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def names(self):
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if (p / CURRENT_FILE).exists())
+
+    def versions(self, name):
+        versions_dir = self.root / name / "versions"
+        if not versions_dir.exists():
+            return []
+        return sorted(p.name for p in versions_dir.iterdir() if p.is_dir() and not p.name.endswith('.tmp'))
+
+    def current_version(self, name):
+        return self._read_current(name)['version']
+
+    def get(self, name):
+        """
+        Current version of `name` for this process. Costs one `stat` when
+        nothing changed; remaps the weights when CURRENT points elsewhere.
+        """
+        current = self.root / name / CURRENT_FILE
+        st = current.stat()
+        # CURRENT is replaced atomically, so a new inode means a new pointer
+        stamp = (st.st_ino, st.st_mtime_ns)
+        cached = self._loaded.get(name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        with self._lock:
+            cached = self._loaded.get(name)
+            if cached is not None and cached[0] == stamp:
+                return cached[1]
+            pointer = self._read_current(name)
+            if cached is not None and cached[1].version == pointer['version']:
+                loaded = cached[1]
+            else:
+                loaded = self._load(name, pointer['version'], pointer['family'])
+            self._loaded[name] = (stamp, loaded)
+            return loaded
+
+    def _load(self, name, version, family):
+        from checkpoint_io import load_model_weights, read_header
+
+        version_dir = self.root / name / "versions" / version
+        if family == 'cbam':
+            from cbam_model import cbam_resnet50_for_shapes
+            shapes = {key: info['shape'] for key, info in read_header(version_dir / WEIGHTS_FILE)[0].items()}
+            model, metadata = load_model_weights(lambda: cbam_resnet50_for_shapes(shapes), version_dir / WEIGHTS_FILE,
+                                                 device=self.device, verify=self.verify)
+            return LoadedModel(name, version, family, model, metadata)
+
+        from hybrid_model import FeatureExtractor, load_head
+        model, metadata = load_model_weights(FeatureExtractor, version_dir / WEIGHTS_FILE,
+                                             device=self.device, verify=self.verify)
+        return LoadedModel(name, version, family, model, metadata, head=load_head(version_dir))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the shared model registry")
+    parser.add_argument('--root', default=os.environ.get('PHOENIX_MODEL_REGISTRY', 'model_registry'),
+                        help="Registry directory (default: $PHOENIX_MODEL_REGISTRY or ./model_registry)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    publish_parser = subparsers.add_parser('publish', help="Publish a new model version and make it current")
+    publish_parser.add_argument('name')
+    publish_parser.add_argument('source', help="Checkpoint (cbam) or models directory (hybrid)")
+    publish_parser.add_argument('--family', default='cbam', choices=FAMILIES)
+    publish_parser.add_argument('--version', default=None)
+
+    rollback_parser = subparsers.add_parser('rollback', help="Make an older version current again")
+    rollback_parser.add_argument('name')
+    rollback_parser.add_argument('version')
+
+    subparsers.add_parser('list', help="List models and versions")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == 'publish':
+        version = registry.publish(args.name, args.source, family=args.family, version=args.version)
+        print(f"Published {args.name} version {version}")
+    elif args.command == 'rollback':
+        registry.rollback(args.name, args.version)
+        print(f"{args.name} now serves version {args.version}")
+    else:
+        for name in registry.names():
+            current = registry.current_version(name)
+            print(name)
+            for version in registry.versions(name):
+                print(f"  {'*' if version == current else ' '} {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""
+Modules shared by the CBAM-ResNet50 app, the Herlev / SiPakMED hybrid
+dashboards and the ConvNeXt fine-tuning script.
+
+The CBAM app imports the package from its own directory. The other projects
+install it once:
+    pip install -e CBAM_ResNet50_Cervical_Classification
+"""
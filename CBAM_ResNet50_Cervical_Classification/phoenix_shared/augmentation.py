@@ -0,0 +1,159 @@
+"""
+Batched On-the-Fly Augmentation
+Tensor Batch (B, 3, H, W) → Flips + Rotation + Elastic (one resampling) → Colour Jitter → Augmented Batch
+
+Replaces the pre-generated `Augmented Dataset - Limited Enhancement` folder:
+every epoch sees new random variants of the source images, and nothing extra
+is written to disk. Parameters are drawn per sample but applied to the whole
+batch at once:
+  - geometry: horizontal / vertical flips, a rotation and (with probability
+    `elastic_p`) a smooth elastic displacement are folded into one sampling
+    grid, so each image is resampled once with `grid_sample` (reflection
+    padding, no black corners)
+  - colour: brightness, contrast and saturation factors, as in
+    torchvision's ColorJitter
+
+`BatchAugment` also accepts a single (3, H, W) image, so it can run per sample
+inside a Dataset, on whole batches in DataLoader workers (`AugmentCollate`)
+or on the training device after the batch has been moved there. With `mean` /
+`std` it takes and returns normalised tensors, so it can be added after an
+existing Normalize.
+
+Usage:
+    augment = BatchAugment(mean=IMAGENET_MEAN, std=IMAGENET_STD)
+    loader = DataLoader(dataset, batch_size=32, collate_fn=AugmentCollate(augment))
+    # or, inside the training loop:
+    images = augment(images.to(device))
+"""
+
+import math
+
+import torch
+import torch.nn.functional as F
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# ITU-R 601 luma weights, as used by torchvision's rgb_to_grayscale
+_LUMA = (0.299, 0.587, 0.114)
+
+
+class BatchAugment:
+    """
+    Random flips, rotation (±`rotation` degrees), elastic deformation and
+    colour jitter for a float image batch in [0, 1] (or normalised with
+    `mean` / `std`). `elastic_alpha` is the displacement amplitude as a
+    fraction of the image half-size, `elastic_grid` the number of random
+    control points per side that are smoothly interpolated into the field.
+    Leave `generator` unset inside DataLoader workers: each worker's global
+    RNG is seeded differently, a shared generator would repeat the same draws.
+    """
+
+    def __init__(self, hflip=0.5, vflip=0.5, rotation=15.0, brightness=0.1, contrast=0.1, saturation=0.1,
+                 elastic_p=0.3, elastic_alpha=0.03, elastic_grid=4, mean=None, std=None, generator=None):
+        self.hflip = hflip
+        self.vflip = vflip
+        self.rotation = rotation
+        self.brightness = brightness
+        self.contrast = contrast
+        self.saturation = saturation
+        self.elastic_p = elastic_p
+        self.elastic_alpha = elastic_alpha
+        self.elastic_grid = elastic_grid
+        self.mean = None if mean is None else torch.tensor(mean, dtype=torch.float32).view(1, -1, 1, 1)
+        self.std = None if std is None else torch.tensor(std, dtype=torch.float32).view(1, -1, 1, 1)
+        self.generator = generator
+        self._base_grids = {}
+
+    def _rand(self, *shape):
+        return torch.rand(*shape, generator=self.generator)
+
+    def _uniform(self, n, spread):
+        return 1.0 + (self._rand(n) * 2 - 1) * spread
+
+    def _base_grid(self, h, w, device):
+        """(1, H·W, 3) homogeneous pixel-centre coordinates, as F.affine_grid builds them (align_corners=False)."""
+        key = (h, w, str(device))
+        if key not in self._base_grids:
+            xs = (torch.arange(w, device=device) * 2 + 1) / w - 1
+            ys = (torch.arange(h, device=device) * 2 + 1) / h - 1
+            gy, gx = torch.meshgrid(ys, xs, indexing='ij')
+            self._base_grids[key] = torch.stack((gx, gy, torch.ones_like(gx)), dim=-1).view(1, h * w, 3)
+        return self._base_grids[key]
+
+    @torch.no_grad()
+    def __call__(self, images):
+        single = images.dim() == 3
+        x = images.unsqueeze(0) if single else images
+        x = self.colour(self.geometric(x.float()))
+        return x[0] if single else x
+
+    def geometric(self, x):
+        # Interpolation weights sum to one, so resampling commutes with the
+        # per-channel Normalize and works directly on normalised input
+        n, _, h, w = x.shape
+        angle = (self._rand(n) * 2 - 1) * math.radians(self.rotation)
+        flip_x = torch.where(self._rand(n) < self.hflip, -1.0, 1.0)
+        flip_y = torch.where(self._rand(n) < self.vflip, -1.0, 1.0)
+        cos, sin = torch.cos(angle), torch.sin(angle)
+        theta = torch.zeros(n, 2, 3)
+        theta[:, 0, 0], theta[:, 0, 1] = cos * flip_x, -sin * flip_y
+        theta[:, 1, 0], theta[:, 1, 1] = sin * flip_x, cos * flip_y
+        # same grid as F.affine_grid, but from a cached base grid (affine_grid rebuilds it every call)
+        grid = (self._base_grid(h, w, x.device) @ theta.to(x.device).transpose(1, 2)).view(n, h, w, 2)
+
+        elastic = self._rand(n) < self.elastic_p
+        if elastic.any():
+            k = elastic.sum().item()
+            control = (self._rand(k, 2, self.elastic_grid, self.elastic_grid) * 2 - 1) * self.elastic_alpha
+            # bicubic to 1/8 resolution, then bilinear: as smooth, a fraction of the cost of full-size bicubic
+            field = F.interpolate(control.to(x.device), size=(max(h // 8, 2), max(w // 8, 2)), mode='bicubic',
+                                  align_corners=True)
+            field = F.interpolate(field, size=(h, w), mode='bilinear', align_corners=True)
+            grid[elastic.to(x.device)] += field.permute(0, 2, 3, 1)
+        return F.grid_sample(x, grid, mode='bilinear', padding_mode='reflection', align_corners=False)
+
+    def colour(self, x):
+        """
+        Brightness, contrast and saturation are all affine in RGB, so together
+        (and with the Normalize on either side) they reduce to one 3×3 matrix
+        and offset per sample, applied in a single pass over the batch.
+        """
+        n = x.shape[0]
+        luma = torch.tensor(_LUMA)
+        eye = torch.eye(3).expand(n, 3, 3)
+        brightness = self._uniform(n, self.brightness)
+        contrast = self._uniform(n, self.contrast)
+        saturation = self._uniform(n, self.saturation).view(n, 1, 1)
+
+        # saturation: blend with the grey image; contrast: blend with the mean grey level
+        matrix = saturation * eye + (1 - saturation) * luma.view(1, 1, 3)
+        matrix = matrix * (contrast * brightness).view(n, 1, 1)
+        channel_mean = x.mean(dim=(2, 3)).cpu()
+        mean, std = torch.zeros(3), torch.ones(3)
+        if self.mean is not None:
+            mean, std = self.mean.view(3), self.std.view(3)
+            channel_mean = channel_mean * std + mean
+        offset = ((1 - contrast) * brightness * (channel_mean @ luma)).view(n, 1).expand(n, 3)
+
+        # y = ((A (std·x + mean) + t) − mean) / std, clamped to [0, 1] before normalising
+        offset = (offset + matrix @ mean - mean) / std
+        matrix = matrix * std.view(1, 1, 3) / std.view(1, 3, 1)
+        out = torch.baddbmm(offset.unsqueeze(-1).to(x.device), matrix.to(x.device), x.flatten(2)).view_as(x)
+        low, high = (-mean / std).view(1, 3, 1, 1), ((1 - mean) / std).view(1, 3, 1, 1)
+        return torch.clamp(out, low.to(x.device), high.to(x.device))
+
+
+class AugmentCollate:
+    """
+    DataLoader `collate_fn` that stacks (image, label) samples and augments the
+    whole batch; with num_workers > 0 this runs in the worker processes. A
+    class rather than a closure so it pickles for spawned workers.
+    """
+
+    def __init__(self, augment):
+        self.augment = augment
+
+    def __call__(self, batch):
+        images, labels = torch.utils.data.default_collate(batch)
+        return self.augment(images), labels
@@ -0,0 +1,390 @@
+"""
+Asynchronous, Resumable Training Checkpoints
+Snapshot State to CPU Memory → Background Writer Thread → Atomic Rename → Keep Last N + Best
+
+Saving with `torch.save` inside the training loop blocks every step until
+the file is on disk. `AsyncCheckpointer.save` only copies the state to CPU
+memory (tensors are cloned, so training can keep updating them) and returns;
+a writer thread serialises the snapshot to `<name>.tmp`, fsyncs it and
+renames it over the final name, so a crash never leaves a truncated
+checkpoint. At most one snapshot waits behind the one being written; a
+further `save` blocks until the writer catches up, bounding memory.
+
+Checkpoints hold everything needed to continue bit-for-bit: model,
+optimizer and scheduler state, the Python / NumPy / torch RNG states and the
+position in the epoch. `ResumableSampler` makes the data order a function of
+(seed, epoch), so a resumed run skips the batches already seen and continues
+with the same ones the uninterrupted run would have used. (Augmentation
+draws are exact when they are made in the main process, i.e. num_workers=0
+or augmenting on the device.)
+
+Rotation keeps the `keep_last` most recent `checkpoint_XXXXXXXX.pth` files;
+`best.pth` is a hard link to the best one, so it survives rotation without a
+second copy.
+
+`AsyncTrainerCheckpoints` brings the same writer to a transformers
+`Trainer`: its save_steps checkpoints keep the Trainer's `checkpoint-<step>`
+layout, but the weight / optimizer / scheduler files are written in the
+background.
+
+Usage:
+    checkpointer = AsyncCheckpointer("checkpoints", keep_last=3)
+    checkpointer.save(training_state(model, optimizer, scheduler, epoch, step, global_step), global_step,
+                      is_best=val_acc > best_acc)
+    checkpointer.close()
+    state = load_checkpoint(latest_checkpoint("checkpoints"))
+
+    class CustomTrainer(AsyncTrainerCheckpoints, Trainer): ...
+    trainer.train(resume_from_checkpoint=latest_trainer_checkpoint(output_dir))
+"""
+
+import os
+import queue
+import random
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+import torch
+
+CHECKPOINT_PATTERN = re.compile(r"checkpoint_(\d+)\.pth$")
+BEST_FILE = "best.pth"
+TRAINER_CHECKPOINT_PATTERN = re.compile(r"checkpoint-(\d+)$")
+# written by AsyncTrainerCheckpoints after every other file of a checkpoint-<step> folder
+TRAINER_COMPLETE_FILE = "checkpoint.complete"
+
+
+# ============================================================================
+# STATE
+# ============================================================================
+
+def snapshot(obj):
+    """Copy of a (nested) state with every tensor cloned to CPU memory."""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {key: snapshot(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot(value) for value in obj)
+    return obj
+
+
+def rng_state():
+    state = {'python': random.getstate(), 'numpy': np.random.get_state(), 'torch': torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def set_rng_state(state):
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+
+def training_state(model, optimizer, scheduler, epoch, step_in_epoch, global_step, **extra):
+    """
+    Everything needed to resume: `epoch` is the epoch in progress and
+    `step_in_epoch` the number of its batches already trained on. `extra`
+    entries (history, best metric, ...) are stored alongside.
+    """
+    return {
+        'model_state_dict': model.state_dict(),
+        'optimizer_state_dict': optimizer.state_dict(),
+        'scheduler_state_dict': scheduler.state_dict() if scheduler is not None else None,
+        'epoch': epoch,
+        'step_in_epoch': step_in_epoch,
+        'global_step': global_step,
+        'rng_state': rng_state(),
+        **extra,
+    }
+
+
+def restore_training_state(state, model, optimizer, scheduler=None):
+    """Load model / optimizer / scheduler / RNG state in place; returns (epoch, step_in_epoch, global_step)."""
+    model.load_state_dict(state['model_state_dict'])
+    optimizer.load_state_dict(state['optimizer_state_dict'])
+    if scheduler is not None and state.get('scheduler_state_dict') is not None:
+        scheduler.load_state_dict(state['scheduler_state_dict'])
+    set_rng_state(state['rng_state'])
+    return state['epoch'], state['step_in_epoch'], state['global_step']
+
+
+def load_checkpoint(path, map_location='cpu'):
+    # RNG states include NumPy / Python objects, so this is a full (trusted) unpickle
+    return torch.load(path, map_location=map_location, weights_only=False)
+
+
+def latest_checkpoint(directory):
+    """Most recent complete checkpoint in `directory` (in-flight .tmp files are ignored), or None."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return None
+    steps = [(int(m.group(1)), path) for path in directory.iterdir() if (m := CHECKPOINT_PATTERN.match(path.name))]
+    return max(steps)[1] if steps else None
+
+
+def latest_trainer_checkpoint(directory):
+    """
+    Most recent Trainer `checkpoint-<step>` folder in `directory` that
+    AsyncTrainerCheckpoints finished writing (it has TRAINER_COMPLETE_FILE),
+    or None. A folder the background writer had not finished when the run
+    stopped is skipped.
+    """
+    directory = Path(directory)
+    if not directory.is_dir():
+        return None
+    steps = [(int(m.group(1)), path) for path in directory.iterdir()
+             if (m := TRAINER_CHECKPOINT_PATTERN.match(path.name)) and (path / TRAINER_COMPLETE_FILE).exists()]
+    return str(max(steps)[1]) if steps else None
+
+
+# ============================================================================
+# DATA POSITION
+# ============================================================================
+
+class ResumableSampler(torch.utils.data.Sampler):
+    """
+    Shuffled order that depends only on (seed, epoch). `set_epoch(epoch,
+    start)` selects the epoch and skips its first `start` samples (the
+    batches a checkpoint has already trained on).
+    """
+
+    def __init__(self, num_samples, seed=42):
+        self.num_samples = num_samples
+        self.seed = seed
+        self.epoch = 0
+        self.start = 0
+
+    def set_epoch(self, epoch, start=0):
+        self.epoch, self.start = epoch, start
+
+    def __iter__(self):
+        generator = torch.Generator().manual_seed(self.seed * 100_003 + self.epoch)
+        return iter(torch.randperm(self.num_samples, generator=generator)[self.start:].tolist())
+
+    def __len__(self):
+        return max(self.num_samples - self.start, 0)
+
+
+# ============================================================================
+# WRITER
+# ============================================================================
+
+class AsyncCheckpointer:
+    """
+    Atomic checkpoint writer. With `background=False` files are written in
+    the calling thread (the synchronous baseline, same file handling).
+    Errors from the writer thread are raised by the next `save` / `wait`.
+    """
+
+    def __init__(self, directory, keep_last=3, background=True):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.keep_last = keep_last
+        self.background = background
+        self._queue = queue.Queue(maxsize=1)
+        self._error = None
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+            self._thread.start()
+
+    def save(self, state, step, is_best=False):
+        """Snapshot `state` now and write it as checkpoint_<step>.pth (and best.pth when `is_best`)."""
+        self._submit(('checkpoint', snapshot(state), step, is_best))
+
+    def write(self, state, path):
+        """Snapshot `state` and atomically write it to `path` (relative to the directory), outside the rotation."""
+        self.write_files({path: state})
+
+    def write_files(self, files, marker=None):
+        """
+        `write` for several {path: state} files at once, as one snapshot taking
+        one place in the queue. `marker` (a path) is written empty once every
+        file is on disk, so readers can tell a complete set from a partial one.
+        """
+        self._submit(('files', {path: snapshot(state) for path, state in files.items()}, marker, False))
+
+    def wait(self):
+        """Block until every submitted snapshot is on disk."""
+        if self.background:
+            self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        self.wait()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _submit(self, job):
+        self._raise_error()
+        if self.background:
+            self._queue.put(job)
+        else:
+            self._process(job)
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Checkpoint write failed") from error
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                self._queue.task_done()
+                return
+            try:
+                self._process(job)
+            except Exception as error:
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def _process(self, job):
+        kind, state, target, is_best = job
+        if kind == 'files':
+            for path, file_state in state.items():
+                self._atomic_save(file_state, self.directory / path)
+            if target is not None:
+                with open(self.directory / target, 'wb') as f:
+                    os.fsync(f.fileno())
+            return
+        path = self.directory / f"checkpoint_{target:08d}.pth"
+        self._atomic_save(state, path)
+        if is_best:
+            tmp = self.directory / (BEST_FILE + ".tmp")
+            tmp.unlink(missing_ok=True)
+            os.link(path, tmp)
+            os.replace(tmp, self.directory / BEST_FILE)
+        self._rotate()
+
+    def _write(self, state, path):
+        with open(path, 'wb') as f:
+            if '.safetensors' in Path(path).suffixes:
+                from safetensors.torch import save
+                f.write(save(state, metadata={'format': 'pt'}))
+            else:
+                torch.save(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _atomic_save(self, state, path):
+        tmp = path.with_name(path.name + ".tmp")
+        self._write(state, tmp)
+        os.replace(tmp, path)
+        if hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(path.parent, os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _rotate(self):
+        steps = sorted((int(m.group(1)), path) for path in self.directory.iterdir()
+                       if (m := CHECKPOINT_PATTERN.match(path.name)))
+        for _, path in steps[:-self.keep_last] if self.keep_last else []:
+            path.unlink(missing_ok=True)
+
+
+# ============================================================================
+# TRANSFORMERS TRAINER
+# ============================================================================
+
+class AsyncTrainerCheckpoints:
+    """
+    Mixin for a transformers `Trainer` subclass (listed before `Trainer`)
+    that writes its save_steps checkpoints through an AsyncCheckpointer. The
+    Trainer still builds each `checkpoint-<step>` folder (config, trainer
+    state, RNG state, rotation, best-model tracking), but the weights
+    (`model.safetensors`, or `pytorch_model.bin` with save_safetensors=False),
+    optimizer and scheduler state are snapshotted and written by the
+    background thread, so the training step only pays for the copy. Each
+    folder gets TRAINER_COMPLETE_FILE once its last file is written (see
+    latest_trainer_checkpoint). Loading the best model at the end or resuming
+    waits for pending writes; so does the end of `train()`. `checkpointer`
+    defaults to a background AsyncCheckpointer in the output directory.
+
+    This overrides private Trainer methods (`_save_checkpoint`, `_save`,
+    `_save_optimizer_and_scheduler`, `_load_from_checkpoint`,
+    `_load_best_model`) and file-name constants of `transformers.trainer`,
+    which change between releases: it is written against the transformers
+    version pinned in the ConvNeXt script's requirements.txt (4.57.1).
+    """
+
+    def __init__(self, *args, checkpointer=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkpointer = checkpointer or AsyncCheckpointer(self.args.output_dir, keep_last=0)
+        self._pending_files = None
+
+    def train(self, *args, **kwargs):
+        try:
+            return super().train(*args, **kwargs)
+        finally:
+            self.checkpointer.wait()
+
+    def _save_checkpoint(self, model, trial, *args, **kwargs):
+        if self.args.save_total_limit:
+            # rotation may delete the previous checkpoint folder, so it must be complete first
+            self.checkpointer.wait()
+        from transformers.trainer_utils import PREFIX_CHECKPOINT_DIR
+
+        self._pending_files = {}
+        try:
+            super()._save_checkpoint(model, trial, *args, **kwargs)
+            files = self._pending_files
+        finally:
+            self._pending_files = None
+        if self.args.should_save:
+            output_dir = os.path.join(self._get_output_dir(trial=trial),
+                                      f"{PREFIX_CHECKPOINT_DIR}-{self.state.global_step}")
+            self.checkpointer.write_files(files, marker=os.path.join(output_dir, TRAINER_COMPLETE_FILE))
+
+    def _save(self, output_dir=None, state_dict=None):
+        if self._pending_files is None:
+            return super()._save(output_dir, state_dict)
+        from transformers.trainer import SAFE_WEIGHTS_NAME, TRAINING_ARGS_NAME, WEIGHTS_NAME
+
+        output_dir = output_dir if output_dir is not None else self.args.output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        model = self.accelerator.unwrap_model(self.model)
+        if hasattr(model, 'config'):
+            model.config.save_pretrained(output_dir)
+        if self.processing_class is not None:
+            self.processing_class.save_pretrained(output_dir)
+        elif getattr(self.data_collator, 'tokenizer', None) is not None:
+            self.data_collator.tokenizer.save_pretrained(output_dir)
+        torch.save(self.args, os.path.join(output_dir, TRAINING_ARGS_NAME))
+        weights_name = SAFE_WEIGHTS_NAME if self.args.save_safetensors else WEIGHTS_NAME
+        self._pending_files[os.path.join(output_dir, weights_name)] = (
+            model.state_dict() if state_dict is None else state_dict)
+
+    def _save_optimizer_and_scheduler(self, output_dir):
+        if self._pending_files is None or self.is_deepspeed_enabled or self.is_fsdp_enabled:
+            return super()._save_optimizer_and_scheduler(output_dir)
+        from transformers.trainer import OPTIMIZER_NAME, SCHEDULER_NAME
+
+        if self.args.should_save:
+            self._pending_files[os.path.join(output_dir, OPTIMIZER_NAME)] = self.optimizer.state_dict()
+            if self.lr_scheduler is not None:
+                self._pending_files[os.path.join(output_dir, SCHEDULER_NAME)] = self.lr_scheduler.state_dict()
+
+    def _load_from_checkpoint(self, *args, **kwargs):
+        self.checkpointer.wait()
+        return super()._load_from_checkpoint(*args, **kwargs)
+
+    def _load_best_model(self, *args, **kwargs):
+        self.checkpointer.wait()
+        return super()._load_best_model(*args, **kwargs)
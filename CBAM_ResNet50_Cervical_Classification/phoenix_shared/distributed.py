@@ -0,0 +1,210 @@
+"""
+Multi-Process CPU Data-Parallel Training
+torchrun / Local Spawn → gloo Process Group → Stratified Shard per Rank → DDP (Gradient All-Reduce)
+
+Each rank trains on its own stratified shard of the training set (every class
+spread evenly over the ranks, shards padded to equal length so all ranks run
+the same number of steps). DistributedDataParallel all-reduces (averages) the
+gradients after every backward pass, so the replicas stay identical; the
+effective batch is `batch_size × world_size`.
+
+Ranks are configured from the standard torchrun environment (RANK,
+WORLD_SIZE, LOCAL_RANK, MASTER_ADDR, MASTER_PORT), so the same code runs:
+  - on one machine: `launch(fn, nprocs)` spawns the workers, or
+    `torchrun --nproc-per-node N script.py`
+  - on several CPU nodes: `torchrun --nnodes M --node-rank i --nproc-per-node N
+    --master-addr <node 0> --master-port 29500 script.py` on every node
+Without a distributed environment everything falls back to a single process.
+
+Usage:
+    rank, world_size = setup()
+    indices = stratified_shard(train_df['label'], rank, world_size)
+    model, history = train_ddp(model, shard_dataset, loss_fn, epochs=5, batch_size=16)
+    cleanup()
+"""
+
+import math
+import os
+import socket
+import time
+
+import numpy as np
+import torch
+import torch.distributed as dist
+
+
+# ============================================================================
+# PROCESS GROUP
+# ============================================================================
+
+def rank_info():
+    """(rank, world_size, local_rank, local_world_size) from the torchrun environment; (0, 1, 0, 1) without one."""
+    world_size = int(os.environ.get('WORLD_SIZE', 1))
+    return (int(os.environ.get('RANK', 0)), world_size, int(os.environ.get('LOCAL_RANK', 0)),
+            int(os.environ.get('LOCAL_WORLD_SIZE', world_size)))
+
+
+def setup(backend='gloo', threads=None):
+    """
+    Join the process group (when WORLD_SIZE > 1) and split this node's cores
+    between its local ranks: without `threads`, each rank gets
+    cpu_count // LOCAL_WORLD_SIZE intra-op threads so workers don't oversubscribe.
+    Returns (rank, world_size).
+    """
+    rank, world_size, _, local_world_size = rank_info()
+    torch.set_num_threads(threads or max(1, (os.cpu_count() or 1) // local_world_size))
+    if world_size > 1 and not dist.is_initialized():
+        dist.init_process_group(backend=backend, rank=rank, world_size=world_size)
+    return rank, world_size
+
+
+def cleanup():
+    if dist.is_available() and dist.is_initialized():
+        dist.destroy_process_group()
+
+
+def is_distributed():
+    return dist.is_available() and dist.is_initialized() and dist.get_world_size() > 1
+
+
+def is_main_process():
+    return not is_distributed() or dist.get_rank() == 0
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _spawned(local_rank, fn, nprocs, port, args):
+    os.environ.update({
+        'RANK': str(local_rank), 'LOCAL_RANK': str(local_rank),
+        'WORLD_SIZE': str(nprocs), 'LOCAL_WORLD_SIZE': str(nprocs),
+        'MASTER_ADDR': '127.0.0.1', 'MASTER_PORT': str(port),
+    })
+    fn(*args)
+
+
+def launch(fn, nprocs, *args):
+    """Run `fn(*args)` in `nprocs` local worker processes with the torchrun environment set (single node)."""
+    import torch.multiprocessing as mp
+    mp.spawn(_spawned, args=(fn, nprocs, _free_port(), args), nprocs=nprocs, join=True)
+
+
+# ============================================================================
+# SHARDING
+# ============================================================================
+
+def stratified_shard(labels, rank, world_size, seed=42):
+    """
+    Indices of this rank's shard: each class is shuffled (same seed on every
+    rank) and dealt round-robin over the ranks, continuing where the previous
+    class stopped, so class proportions match the full set and shard sizes
+    differ by at most one. Smaller shards are padded with one of their own
+    samples to ceil(n / world_size).
+    """
+    labels = np.asarray(labels)
+    rng = np.random.default_rng(seed)
+    shard, dealt = [], 0
+    for label in np.unique(labels):
+        members = rng.permutation(np.flatnonzero(labels == label))
+        shard.append(members[(np.arange(len(members)) + dealt) % world_size == rank])
+        dealt += len(members)
+    shard = np.concatenate(shard)
+    padding = math.ceil(len(labels) / world_size) - len(shard)
+    if padding > 0:
+        shard = np.concatenate([shard, rng.choice(shard, padding, replace=False)])
+    return np.sort(shard)
+
+
+# ============================================================================
+# TRAINING
+# ============================================================================
+
+def all_reduce(values, op='sum'):
+    """Reduce a list of floats over all ranks (returned unchanged in a single process)."""
+    tensor = torch.tensor(values, dtype=torch.float64)
+    if is_distributed():
+        dist.all_reduce(tensor, op=dist.ReduceOp.SUM if op == 'sum' else dist.ReduceOp.MAX)
+    return tensor.tolist()
+
+
+def train_ddp(model, dataset, loss_fn, epochs=1, batch_size=16, lr=5e-5, weight_decay=0.01, num_workers=0,
+              steps_per_epoch=None, seed=42, checkpointer=None, checkpoint_every=None, resume=None, log=print):
+    """
+    Train `model` on this rank's `dataset` shard with AdamW and a linear decay
+    to zero (the Hugging Face Trainer defaults). `loss_fn(model, batch)`
+    returns the batch loss; it receives the DDP wrapper, so the forward pass
+    goes through it and gradients are all-reduced in backward. Returns (the
+    unwrapped model, per-epoch history with the loss averaged over ranks and
+    the global samples/s).
+
+    With a `checkpointer` (checkpointing.AsyncCheckpointer, one directory per
+    rank) the full training state is saved every `checkpoint_every` steps
+    and at the end of each epoch without stalling the loop; `resume` (a
+    checkpoint path) continues such a run exactly where it stopped.
+    """
+    from torch.nn.parallel import DistributedDataParallel
+    from .checkpointing import ResumableSampler, load_checkpoint, restore_training_state, training_state
+
+    world_size = dist.get_world_size() if is_distributed() else 1
+    rank = dist.get_rank() if is_distributed() else 0
+    sampler = ResumableSampler(len(dataset), seed=seed + rank)
+    # own generator: creating an iterator draws a seed from it, which would otherwise shift the global RNG
+    loader = torch.utils.data.DataLoader(dataset, batch_size=batch_size, sampler=sampler, drop_last=True,
+                                         num_workers=num_workers,
+                                         generator=torch.Generator().manual_seed(seed + rank))
+    steps = min(len(dataset) // batch_size, steps_per_epoch or len(dataset))
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr, weight_decay=weight_decay)
+    total_steps = max(steps * epochs, 1)
+    scheduler = torch.optim.lr_scheduler.LambdaLR(optimizer, lambda step: 1 - step / total_steps)
+
+    history, start_epoch, start_step, global_step = [], 1, 0, 0
+    if resume is not None:
+        state = load_checkpoint(resume)
+        start_epoch, start_step, global_step = restore_training_state(state, model, optimizer, scheduler)
+        history = state.get('history', [])
+        if log is not None and rank == 0:
+            log(f"Resumed from {resume}: epoch {start_epoch}, step {start_step}")
+    ddp_model = DistributedDataParallel(model, gradient_as_bucket_view=True) if is_distributed() else model
+
+    def checkpoint(epoch, step_in_epoch):
+        checkpointer.save(training_state(model, optimizer, scheduler, epoch, step_in_epoch, global_step,
+                                         history=history), global_step)
+
+    for epoch in range(start_epoch, epochs + 1):
+        ddp_model.train()
+        sampler.set_epoch(epoch, start=start_step * batch_size)
+        start = time.perf_counter()
+        running_loss = 0.0
+        for step, batch in enumerate(loader, start=start_step):
+            if step == steps:
+                break
+            loss = loss_fn(ddp_model, batch)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            running_loss += loss.item()
+            global_step += 1
+            # (the end-of-epoch checkpoint below covers the last step)
+            if checkpointer is not None and checkpoint_every and global_step % checkpoint_every == 0 \
+                    and step + 1 < steps:
+                checkpoint(epoch, step + 1)
+        elapsed = time.perf_counter() - start
+        trained = steps - start_step
+        start_step = 0
+
+        loss_sum, samples = all_reduce([running_loss, trained * batch_size])
+        (elapsed,) = all_reduce([elapsed], op='max')
+        history.append({'epoch': epoch, 'train_loss': loss_sum / max(trained * world_size, 1),
+                        'samples': int(samples), 'seconds': elapsed, 'samples_per_s': samples / elapsed})
+        if log is not None and rank == 0:
+            log(f"Epoch {epoch}/{epochs}: loss {history[-1]['train_loss']:.4f}, "
+                f"{history[-1]['samples_per_s']:.1f} samples/s over {world_size} worker(s)")
+        if checkpointer is not None:
+            checkpoint(epoch + 1, 0)
+    if checkpointer is not None:
+        checkpointer.wait()
+    return model, history
@@ -0,0 +1,209 @@
+"""
+Hybrid Dashboard Inference, CAMs and Batch Mode
+Images → Dataset-Specific Transform → ResNet50 Feature Maps → Logistic Head (+ per-class CAMs)
+
+Shared by the Herlev and SiPakMED streamlit dashboards, which serve the same
+model: a global-average-pooled ResNet50 feature extractor followed by a
+StandardScaler and a scikit-learn logistic regression (hybrid_model.py).
+Each app passes in its own image transform (and any preprocessing it applies
+before it) and its class labels; everything else lives here.
+
+Class activation maps need no gradients: the head is linear on avg-pooled
+features, so it can be applied at every position of the last conv feature
+map instead, and each map's spatial mean is exactly that class's decision
+value.
+
+Usage:
+    probabilities = predict_batch(images, transform, feature_extractor, classifier, scaler, device)
+    probabilities, cams = predict_with_cams(images, transform, feature_extractor, classifier, scaler, device)
+    render_batch_mode(lambda images: predict_batch(images, transform, ...), class_labels)
+"""
+
+import os
+import zipfile
+from io import BytesIO
+
+import numpy as np
+import torch
+from PIL import Image
+
+from .tracing import span
+
+IMAGE_EXTENSIONS = ('.bmp', '.png', '.jpg', '.jpeg')
+BATCH_SIZE = 16
+# Batch members are refused above this many pixels (read from the header, before decoding);
+# 100 MP, as the CBAM app's model_input.MAX_INPUT_PIXELS: a decoded RGB image this size takes 300 MB
+MAX_INPUT_PIXELS = 100_000_000
+
+
+def _to_batch(images, transform, device):
+    with span('hybrid.to_tensor', batch=len(images)):
+        return torch.stack([transform(image) for image in images]).to(device)
+
+
+def predict_batch(images, transform, feature_extractor, classifier, scaler, device):
+    """Class probabilities for a list of images in one forward pass, shape (N, num_classes)."""
+    img_tensor = _to_batch(images, transform, device)
+
+    with torch.no_grad(), span('hybrid.features', batch=len(images)):
+        features = feature_extractor(img_tensor).cpu().numpy()
+
+    with span('hybrid.head', batch=len(images)):
+        return classifier.predict_proba(scaler.transform(features))
+
+
+def fold_head(classifier, scaler):
+    """Logistic coefficients with the scaler folded in: (weights (K, 2048), bias (K,)) on raw features."""
+    coef, intercept = classifier.coef_, classifier.intercept_
+    if coef.shape[0] == 1:
+        # binary head: one decision function, negated for the first class
+        coef, intercept = np.vstack([-coef, coef]), np.concatenate([-intercept, intercept])
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+    weights = coef / (1.0 if scale is None else scale)
+    bias = intercept - (0.0 if mean is None else weights @ mean)
+    return weights, bias
+
+
+def predict_with_cams(images, transform, feature_extractor, classifier, scaler, device):
+    """
+    Class probabilities (N, K) and one class activation map per class (N, K, 7, 7)
+    from a single forward pass.
+    """
+    img_tensor = _to_batch(images, transform, device)
+    weights, bias = fold_head(classifier, scaler)
+
+    with torch.no_grad():
+        # all ResNet50 layers except the global average pool
+        with span('hybrid.features', batch=len(images)):
+            feature_maps = feature_extractor.features[:-1](img_tensor)
+            features = feature_maps.mean(dim=(2, 3)).cpu().numpy()
+        with span('hybrid.cam', batch=len(images)):
+            weights = torch.as_tensor(weights, dtype=feature_maps.dtype, device=feature_maps.device)
+            cams = torch.einsum('kc,nchw->nkhw', weights, feature_maps).cpu().numpy()
+
+    cams += bias[None, :, None, None]
+    with span('hybrid.head', batch=len(images)):
+        return classifier.predict_proba(scaler.transform(features)), cams
+
+
+def cam_overlays(image, cams, size=224, alpha=0.5):
+    """Min-max normalised CAMs (K, h, w) as JET heatmaps blended onto the image; list of RGB uint8 arrays."""
+    import cv2
+
+    rgb = np.array(image.convert('RGB').resize((size, size)))
+    overlays = []
+    for cam in cams:
+        cam = cv2.resize(cam.astype(np.float32), (size, size))
+        cam = (cam - cam.min()) / (cam.max() - cam.min() + 1e-7)
+        heatmap = cv2.cvtColor(cv2.applyColorMap(np.uint8(255 * cam), cv2.COLORMAP_JET), cv2.COLOR_BGR2RGB)
+        overlays.append(np.uint8((1 - alpha) * rgb + alpha * heatmap))
+    return overlays
+
+
+def list_uploaded_images(uploaded_files):
+    """(name, opener) for every uploaded image and every image inside uploaded zip archives; nothing is decoded yet."""
+    entries = []
+    for uploaded in uploaded_files:
+        if uploaded.name.lower().endswith('.zip'):
+            archive = zipfile.ZipFile(uploaded)
+            for info in archive.infolist():
+                member = os.path.basename(info.filename)
+                if not info.is_dir() and not member.startswith('.') and member.lower().endswith(IMAGE_EXTENSIONS):
+                    entries.append((f"{uploaded.name}/{info.filename}",
+                                    lambda archive=archive, info=info: archive.open(info)))
+        elif uploaded.name.lower().endswith(IMAGE_EXTENSIONS):
+            entries.append((uploaded.name, lambda uploaded=uploaded: BytesIO(uploaded.getvalue())))
+    return entries
+
+
+def classify_batch(entries, predict, class_labels):
+    """
+    Classify entries chunk by chunk, streaming rows into a sortable table.
+    `predict` maps a list of RGB images to (N, K) probabilities.
+    """
+    import pandas as pd
+    import streamlit as st
+
+    rows = []
+    table = st.empty()
+    progress = st.progress(0.0, text=f"Classifying {len(entries)} images...")
+    for start in range(0, len(entries), BATCH_SIZE):
+        # Decode only the current chunk
+        names, images = [], []
+        for name, opener in entries[start:start + BATCH_SIZE]:
+            try:
+                with opener() as f:
+                    # Image.open only parses the header, so oversized members are never decoded
+                    image = Image.open(f)
+                    width, height = image.size
+                    if width * height > MAX_INPUT_PIXELS:
+                        raise ValueError(f"{width}×{height} image exceeds the "
+                                         f"{MAX_INPUT_PIXELS / 1e6:.0f} MP input limit")
+                    images.append(image.convert('RGB'))
+                names.append(name)
+            except Exception as e:
+                rows.append({'File': name, 'Error': str(e)})
+
+        if images:
+            for name, probs in zip(names, predict(images)):
+                pred_idx = int(np.argmax(probs))
+                row = {'File': name, 'Predicted Class': class_labels[pred_idx],
+                       'Confidence (%)': float(probs[pred_idx] * 100)}
+                row.update({f"{label} (%)": float(p * 100) for label, p in zip(class_labels, probs)})
+                rows.append(row)
+
+        done = min(start + BATCH_SIZE, len(entries))
+        progress.progress(done / len(entries), text=f"Classified {done} / {len(entries)} images")
+        table.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+    progress.empty()
+    return rows
+
+
+def render_batch_mode(predict, class_labels, settings=(), uploader_label="Choose images or zip archives...",
+                      button_label=None):
+    """
+    Batch upload UI; results are kept in the session until the uploads or
+    `settings` (anything else that changes the predictions) change. With
+    `button_label`, classification waits for that button instead of starting
+    on upload.
+    """
+    import pandas as pd
+    import streamlit as st
+
+    uploaded_files = st.file_uploader(
+        uploader_label,
+        type=['bmp', 'png', 'jpg', 'jpeg', 'zip'],
+        accept_multiple_files=True
+    )
+    if not uploaded_files:
+        st.info("Please upload images or a zip archive to classify.")
+        return
+
+    entries = list_uploaded_images(uploaded_files)
+    if not entries:
+        st.warning("No images found in the uploaded files.")
+        return
+
+    batch_key = ([(f.name, f.size, getattr(f, 'file_id', None)) for f in uploaded_files], settings)
+    cached = st.session_state.get('batch_results')
+    if cached is not None and cached[0] == batch_key:
+        rows = cached[1]
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    elif button_label is None or st.button(button_label, type='primary'):
+        rows = classify_batch(entries, predict, class_labels)
+        st.session_state['batch_results'] = (batch_key, rows)
+    else:
+        return
+
+    results_df = pd.DataFrame(rows)
+    if 'Predicted Class' in results_df:
+        st.subheader("Predicted Class Counts")
+        st.bar_chart(results_df['Predicted Class'].value_counts().reindex(class_labels, fill_value=0))
+    st.download_button(
+        "Download Results (CSV)",
+        data=results_df.to_csv(index=False),
+        file_name="batch_results.csv",
+        mime="text/csv"
+    )
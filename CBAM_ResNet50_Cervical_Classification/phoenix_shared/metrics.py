@@ -0,0 +1,209 @@
+"""
+Streaming Classification Metrics
+Prediction Batches → Incremental Confusion Matrix / Probability Histograms → Metrics + Bootstrap CIs
+
+Both accumulators keep constant-size state however many predictions are
+streamed through them, and `merge` combines accumulators from different
+workers or shards. Used by evaluation.py, distillation.py and the ConvNeXt
+fine-tuning script.
+
+Usage:
+    confusion, scores = StreamingConfusionMatrix(5), StreamingScoreMetrics(5)
+    for labels, probabilities in batches:
+        confusion.update(labels, probabilities)
+        scores.update(labels, probabilities)
+    metrics = {**confusion.compute(), **scores.compute()}
+    intervals = confusion.bootstrap(n_resamples=2000)
+"""
+
+import numpy as np
+
+
+def _safe_divide(numerator, denominator):
+    """Element-wise division that returns 0 where the denominator is 0 (sklearn zero_division=0)."""
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    out = np.zeros(np.broadcast(numerator, denominator).shape, dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out
+
+
+def metrics_from_confusion(cm):
+    """
+    Compute classification metrics from one or many confusion matrices.
+
+    `cm` has shape (..., K, K) with rows = true class and columns = predicted
+    class, so a stack of bootstrap resamples is scored in a single pass.
+    """
+    cm = np.asarray(cm, dtype=np.float64)
+    tp = np.diagonal(cm, axis1=-2, axis2=-1)
+    support = cm.sum(axis=-1)
+    predicted = cm.sum(axis=-2)
+    total = support.sum(axis=-1)
+
+    precision = _safe_divide(tp, predicted)
+    recall = _safe_divide(tp, support)
+    f1 = _safe_divide(2 * precision * recall, precision + recall)
+
+    weights = _safe_divide(support, total[..., None])
+
+    return {
+        'accuracy': _safe_divide(tp.sum(axis=-1), total),
+        'precision_macro': precision.mean(axis=-1),
+        'recall_macro': recall.mean(axis=-1),
+        'f1_macro': f1.mean(axis=-1),
+        'precision_weighted': (precision * weights).sum(axis=-1),
+        'recall_weighted': (recall * weights).sum(axis=-1),
+        'f1_weighted': (f1 * weights).sum(axis=-1),
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'support': support,
+    }
+
+
+class StreamingConfusionMatrix:
+    """Confusion matrix accumulated incrementally from streamed prediction batches."""
+
+    def __init__(self, num_classes):
+        self.num_classes = num_classes
+        self.matrix = np.zeros((num_classes, num_classes), dtype=np.int64)
+
+    @property
+    def count(self):
+        return int(self.matrix.sum())
+
+    def update(self, labels, predictions):
+        """
+        Add one batch. `predictions` may be class indices (N,) or
+        logits/probabilities (N, K), in which case the argmax is used.
+        """
+        labels = np.asarray(labels, dtype=np.int64).ravel()
+        predictions = np.asarray(predictions)
+        if predictions.ndim == 2:
+            predictions = predictions.argmax(axis=1)
+        predictions = predictions.astype(np.int64).ravel()
+
+        if labels.shape != predictions.shape:
+            raise ValueError(f"Got {labels.shape[0]} labels for {predictions.shape[0]} predictions")
+
+        k = self.num_classes
+        self.matrix += np.bincount(labels * k + predictions, minlength=k * k).reshape(k, k)
+        return self
+
+    def merge(self, other):
+        """Merge another accumulator (e.g. from a different worker or shard)."""
+        if other.num_classes != self.num_classes:
+            raise ValueError("Cannot merge confusion matrices with different class counts")
+        self.matrix += other.matrix
+        return self
+
+    def compute(self):
+        """Point estimates of all metrics."""
+        return metrics_from_confusion(self.matrix)
+
+    def bootstrap(self, n_resamples=2000, confidence=0.95, seed=42):
+        """
+        Percentile bootstrap confidence intervals for every metric.
+
+        Resampling N predictions with replacement is equivalent to drawing the
+        confusion-matrix cell counts from Multinomial(N, cm / N), so all
+        resamples are generated and scored at once from the K×K matrix alone,
+        without keeping per-sample predictions around.
+        """
+        n = self.count
+        if n == 0:
+            raise ValueError("No predictions have been accumulated")
+
+        rng = np.random.default_rng(seed)
+        k = self.num_classes
+        cell_probs = self.matrix.ravel() / n
+        resampled = rng.multinomial(n, cell_probs, size=n_resamples).reshape(n_resamples, k, k)
+
+        samples = metrics_from_confusion(resampled)
+        tail = (1.0 - confidence) / 2.0 * 100.0
+        intervals = {}
+        for name, values in samples.items():
+            if name == 'support':
+                continue
+            low, high = np.percentile(values, [tail, 100.0 - tail], axis=0)
+            intervals[name] = (low, high)
+        return intervals
+
+
+class StreamingScoreMetrics:
+    """
+    Probability-based metrics accumulated from streamed batches in constant
+    memory: log loss, multi-class Brier score, expected calibration error
+    (top-1 confidence, `calibration_bins` equal-width bins) and one-vs-rest
+    ROC AUC. AUC is computed from per-class histograms of the predicted
+    probability over `auc_bins` equal-width bins; scores that fall in the
+    same bin count as ties, so it is exact up to 1 / auc_bins resolution.
+    """
+
+    def __init__(self, num_classes, calibration_bins=15, auc_bins=1000):
+        self.num_classes = num_classes
+        self.calibration_bins = calibration_bins
+        self.auc_bins = auc_bins
+        self.count = 0
+        self.log_loss_sum = 0.0
+        self.brier_sum = 0.0
+        self.calibration = np.zeros((3, calibration_bins), dtype=np.float64)  # count, confidence, correct
+        self.histograms = np.zeros((num_classes, 2, auc_bins), dtype=np.int64)  # class, negative/positive, bin
+
+    def update(self, labels, probabilities):
+        """Add one batch of (N,) labels and (N, K) probabilities."""
+        labels = np.asarray(labels, dtype=np.int64).ravel()
+        probabilities = np.asarray(probabilities, dtype=np.float64)
+        if probabilities.shape != (len(labels), self.num_classes):
+            raise ValueError(f"Expected probabilities of shape ({len(labels)}, {self.num_classes}), "
+                             f"got {probabilities.shape}")
+        rows = np.arange(len(labels))
+        self.count += len(labels)
+        self.log_loss_sum -= np.log(np.clip(probabilities[rows, labels], 1e-15, None)).sum()
+        onehot = np.zeros_like(probabilities)
+        onehot[rows, labels] = 1.0
+        self.brier_sum += ((probabilities - onehot) ** 2).sum()
+
+        confidence = probabilities.max(axis=1)
+        bins = np.minimum((confidence * self.calibration_bins).astype(np.int64), self.calibration_bins - 1)
+        correct = probabilities.argmax(axis=1) == labels
+        for row, weights in enumerate((None, confidence, correct)):
+            self.calibration[row] += np.bincount(bins, weights=weights, minlength=self.calibration_bins)
+
+        # one bincount over (class, positive, bin) cells for the whole batch
+        score_bins = np.minimum((probabilities * self.auc_bins).astype(np.int64), self.auc_bins - 1)
+        cells = (np.arange(self.num_classes) * 2 + onehot.astype(np.int64)) * self.auc_bins + score_bins
+        self.histograms += np.bincount(cells.ravel(), minlength=self.histograms.size).reshape(self.histograms.shape)
+        return self
+
+    def merge(self, other):
+        """Merge another accumulator (e.g. from a different worker or shard)."""
+        if (other.num_classes, other.calibration_bins, other.auc_bins) != \
+                (self.num_classes, self.calibration_bins, self.auc_bins):
+            raise ValueError("Cannot merge score metrics with different classes or bins")
+        self.count += other.count
+        self.log_loss_sum += other.log_loss_sum
+        self.brier_sum += other.brier_sum
+        self.calibration += other.calibration
+        self.histograms += other.histograms
+        return self
+
+    def compute(self):
+        if self.count == 0:
+            raise ValueError("No predictions have been accumulated")
+        counts, confidence, correct = self.calibration
+        ece = np.abs(confidence - correct).sum() / self.count
+
+        negatives, positives = self.histograms[:, 0], self.histograms[:, 1]
+        negatives_below = np.cumsum(negatives, axis=1) - negatives
+        pairs = positives.sum(axis=1) * negatives.sum(axis=1)
+        auc = _safe_divide((positives * (negatives_below + 0.5 * negatives)).sum(axis=1), pairs)
+        auc[pairs == 0] = np.nan
+        return {
+            'log_loss': self.log_loss_sum / self.count,
+            'brier': self.brier_sum / self.count,
+            'ece': ece,
+            'roc_auc': auc,
+            'roc_auc_macro': float(np.nanmean(auc)) if np.isfinite(auc).any() else float('nan'),
+        }
@@ -0,0 +1,182 @@
+"""
+Chunked On-Disk Prediction Store
+Streamed Logit Batches → Fixed-Size Buffer → .npy Chunks (+ Labels, IDs) → Memory-Mapped Reload
+
+Evaluation loops hand over one batch of logits (or probabilities) at a time.
+`PredictionWriter` copies it into a preallocated chunk buffer and writes the
+buffer out whenever it fills, so memory stays at one chunk however many
+cells the test set has. The image IDs are appended to `ids.csv` at each
+flush, and `meta.json` is rewritten then too, so the store can be read while
+a long job is still running (up to the last complete chunk).
+
+Store layout:
+    <store>/meta.json                   class names, score kind, dtype, chunk size, row / chunk counts
+    <store>/chunks/scores_00000.npy     (rows, num_classes) logits or probabilities
+    <store>/chunks/labels_00000.npy     (rows,) int64 labels, -1 where unlabelled
+    <store>/ids.csv                     optional image id per row, in store order
+
+Usage:
+    with PredictionWriter("test_predictions", class_names, kind='logits') as writer:
+        for batch in loader:
+            writer.add(model(batch['pixel_values']).logits, batch['label'], ids=batch_paths)
+    store = PredictionStore("test_predictions")
+    for scores, labels in store.iter_chunks():
+        ...
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+STORE_VERSION = 1
+DTYPES = {'float32': np.float32, 'float16': np.float16}
+SCORE_KINDS = ['logits', 'probabilities']
+
+
+def _to_numpy(values):
+    """Torch tensors (any device) or array-likes → NumPy."""
+    if hasattr(values, 'detach'):
+        values = values.detach().float().cpu().numpy()
+    return np.asarray(values)
+
+
+class PredictionWriter:
+    """Appends score batches into fixed-size chunks on disk."""
+
+    def __init__(self, path, class_names, kind='logits', dtype='float32', chunk_size=65536):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown dtype '{dtype}'. Choose from: {', '.join(DTYPES)}")
+        if kind not in SCORE_KINDS:
+            raise ValueError(f"Unknown score kind '{kind}'. Choose from: {', '.join(SCORE_KINDS)}")
+        self.path = Path(path)
+        (self.path / "chunks").mkdir(parents=True, exist_ok=True)
+        self.class_names = list(class_names)
+        self.kind = kind
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+
+        self._scores = np.empty((chunk_size, len(self.class_names)), dtype=DTYPES[dtype])
+        self._labels = np.empty(chunk_size, dtype=np.int64)
+        self._ids = None
+        self._buffered = 0
+        self._chunk = 0
+        self._rows = 0
+        (self.path / "ids.csv").unlink(missing_ok=True)
+        self._write_meta()
+
+    def add(self, scores, labels=None, ids=None):
+        """
+        scores: (B, num_classes) logits / probabilities (NumPy or torch)
+        labels: (B,) class indices, or None
+        ids:    B image ids (e.g. paths), or None; give them for every batch or none
+        """
+        scores = _to_numpy(scores)
+        if scores.ndim != 2 or scores.shape[1] != len(self.class_names):
+            raise ValueError(f"Expected scores of shape (B, {len(self.class_names)}), got {scores.shape}")
+        labels = np.full(len(scores), -1, dtype=np.int64) if labels is None else _to_numpy(labels).astype(np.int64)
+        if ids is not None:
+            if self._ids is None:
+                if self._rows:
+                    raise ValueError("ids must be given for every batch or for none")
+                self._ids = []
+            ids = [str(i) for i in ids]
+        elif self._ids is not None:
+            raise ValueError("ids must be given for every batch or for none")
+
+        start = 0
+        while start < len(scores):
+            take = min(self.chunk_size - self._buffered, len(scores) - start)
+            self._scores[self._buffered:self._buffered + take] = scores[start:start + take]
+            self._labels[self._buffered:self._buffered + take] = labels[start:start + take]
+            if ids is not None:
+                self._ids.extend(ids[start:start + take])
+            self._buffered += take
+            start += take
+            if self._buffered == self.chunk_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        n = self._buffered
+        np.save(self.path / "chunks" / f"scores_{self._chunk:05d}.npy", self._scores[:n])
+        np.save(self.path / "chunks" / f"labels_{self._chunk:05d}.npy", self._labels[:n])
+        if self._ids is not None:
+            import pandas as pd
+            pd.DataFrame({'id': self._ids}).to_csv(self.path / "ids.csv", mode='a', index=False,
+                                                   header=self._rows == 0)
+            self._ids = []
+        self._rows += n
+        self._buffered = 0
+        self._chunk += 1
+        self._write_meta()
+
+    def _write_meta(self):
+        with open(self.path / "meta.json", 'w') as f:
+            json.dump({
+                'version': STORE_VERSION,
+                'class_names': self.class_names,
+                'kind': self.kind,
+                'dtype': self.dtype,
+                'chunk_size': self.chunk_size,
+                'num_rows': self._rows,
+                'num_chunks': self._chunk,
+            }, f, indent=2)
+
+    def close(self):
+        self._flush()
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PredictionStore:
+    """Read side: chunks are memory-mapped, so iterating a store of any size keeps one chunk resident."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "meta.json") as f:
+            self.meta = json.load(f)
+        self.class_names = self.meta['class_names']
+        self.kind = self.meta['kind']
+
+    def __len__(self):
+        return self.meta['num_rows']
+
+    @property
+    def num_chunks(self):
+        return self.meta['num_chunks']
+
+    def chunk(self, number):
+        """(scores, labels) of one chunk, memory-mapped."""
+        return (np.load(self.path / "chunks" / f"scores_{number:05d}.npy", mmap_mode='r'),
+                np.load(self.path / "chunks" / f"labels_{number:05d}.npy", mmap_mode='r'))
+
+    def iter_chunks(self):
+        for number in range(self.num_chunks):
+            yield self.chunk(number)
+
+    def probabilities(self, scores):
+        """Scores of this store as probabilities (softmax over logits)."""
+        scores = np.asarray(scores, dtype=np.float64)
+        if self.kind == 'probabilities':
+            return scores
+        exp = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def load(self):
+        """Every (scores, labels) row in memory; for stores that fit, otherwise use `iter_chunks`."""
+        chunks = list(self.iter_chunks())
+        if not chunks:
+            return np.empty((0, len(self.class_names)), dtype=DTYPES[self.meta['dtype']]), np.empty(0, np.int64)
+        return np.concatenate([s for s, _ in chunks]), np.concatenate([l for _, l in chunks])
+
+    def ids(self):
+        import pandas as pd
+        path = self.path / "ids.csv"
+        return pd.read_csv(path)['id'] if path.exists() else None
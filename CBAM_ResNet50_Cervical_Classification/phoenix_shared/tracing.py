@@ -0,0 +1,317 @@
+"""
+Per-Stage Latency Tracing for the Inference Pipeline
+Spans → Latency Histograms → Prometheus text / JSON / Chrome trace
+
+Stages are timed with the `span()` context manager or the `@traced()`
+decorator. Tracing is off by default: a disabled span is a shared no-op
+object and a traced function costs one attribute check, so instrumentation
+can stay in the hot path. Importing the module has no side effects.
+
+Enable it with `enable()`, or from environment variables with
+`configure_from_env()`, which each app calls once at startup:
+    PHOENIX_TRACE=1                  record latency histograms
+    PHOENIX_TRACE_FILE=trace.json    also record spans and write a Chrome trace
+                                     (chrome://tracing, Perfetto) at exit
+    PHOENIX_METRICS_PORT=9108        serve /metrics (Prometheus), /metrics.json
+                                     and /trace.json from a background thread
+
+Usage:
+    PHOENIX_TRACE=1 PHOENIX_METRICS_PORT=9108 streamlit run app.py
+    curl localhost:9108/metrics
+"""
+
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Prometheus-style upper bounds in seconds (+Inf is implicit)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Spans kept for the Chrome trace; the oldest are dropped first
+MAX_TRACE_EVENTS = 100_000
+METRIC_NAME = "phoenix_stage_duration_seconds"
+
+
+class _State:
+    enabled = False
+    record_spans = False
+
+
+_state = _State()
+_lock = threading.Lock()
+_local = threading.local()
+_histograms = {}
+_events = deque(maxlen=MAX_TRACE_EVENTS)
+_origin_ns = time.perf_counter_ns()
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram for one stage."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float('inf')
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (as Prometheus' histogram_quantile)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum_s': self.total,
+            'mean_s': self.total / self.count if self.count else 0.0,
+            'min_s': self.min if self.count else 0.0,
+            'max_s': self.max,
+            'p50_s': self.quantile(0.5),
+            'p95_s': self.quantile(0.95),
+            'buckets': {str(b): c for b, c in zip(self.buckets + ('+Inf',), self.counts)},
+        }
+
+
+def record(stage, seconds):
+    """Add one observation to the histogram of `stage`."""
+    with _lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = Histogram()
+        histogram.observe(seconds)
+
+
+class _Span:
+    __slots__ = ('name', 'args', 'start_ns')
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end_ns = time.perf_counter_ns()
+        record(self.name, (end_ns - self.start_ns) / 1e9)
+        if _state.record_spans:
+            event = {
+                'name': self.name,
+                'ph': 'X',
+                'ts': (self.start_ns - _origin_ns) / 1e3,
+                'dur': (end_ns - self.start_ns) / 1e3,
+                'pid': os.getpid(),
+                'tid': threading.get_ident(),
+            }
+            if self.args:
+                event['args'] = self.args
+            if exc_type is not None:
+                event.setdefault('args', {})['error'] = exc_type.__name__
+            _events.append(event)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **args):
+    """Time a block as stage `name`; `args` are attached to the Chrome trace event."""
+    if not _state.enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def traced(name=None):
+    """Decorator form of `span()`; the stage defaults to the function name."""
+    def decorator(fn):
+        stage = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _state.enabled:
+                return fn(*args, **kwargs)
+            with _Span(stage, None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ============================================================================
+# CONTROL
+# ============================================================================
+
+def enable(record_spans=False):
+    _state.record_spans = record_spans
+    _state.enabled = True
+
+
+def disable():
+    _state.enabled = False
+    _state.record_spans = False
+
+
+def is_enabled():
+    return _state.enabled
+
+
+def reset():
+    """Drop all histograms and recorded spans."""
+    with _lock:
+        _histograms.clear()
+        _events.clear()
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def snapshot():
+    """{stage: histogram summary} for every stage seen so far."""
+    with _lock:
+        return {stage: h.to_dict() for stage, h in sorted(_histograms.items())}
+
+
+def _format_value(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+def prometheus_text():
+    """All histograms in the Prometheus text exposition format."""
+    lines = [
+        f"# HELP {METRIC_NAME} Latency of inference pipeline stages.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    with _lock:
+        items = sorted(_histograms.items())
+        for stage, h in items:
+            label = stage.replace('\\', '\\\\').replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(h.buckets + (float('inf'),), h.counts):
+                cumulative += count
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{label}",le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{label}"}} {h.total!r}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{label}"}} {h.count}')
+    return '\n'.join(lines) + '\n'
+
+
+def dump_json(path=None):
+    """Histogram summaries as JSON; written to `path` when given."""
+    text = json.dumps({'pid': os.getpid(), 'stages': snapshot()}, indent=2)
+    if path is not None:
+        with open(path, 'w') as f:
+            f.write(text)
+    return text
+
+
+def chrome_trace():
+    """Recorded spans in the Chrome trace event format."""
+    with _lock:
+        events = list(_events)
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def write_chrome_trace(path):
+    with open(path, 'w') as f:
+        json.dump(chrome_trace(), f)
+    return path
+
+
+# ============================================================================
+# METRICS ENDPOINT
+# ============================================================================
+
+_server = None
+
+
+def serve_metrics(port, host='127.0.0.1'):
+    """
+    Serve /metrics, /metrics.json and /trace.json on a daemon thread.
+    Only one server is started per process; later calls return it.
+    """
+    global _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        routes = {
+            '/metrics': (prometheus_text, 'text/plain; version=0.0.4'),
+            '/metrics.json': (dump_json, 'application/json'),
+            '/trace.json': (lambda: json.dumps(chrome_trace()), 'application/json'),
+        }
+
+        def do_GET(self):
+            route = self.routes.get(self.path.split('?')[0])
+            if route is None:
+                self.send_error(404)
+                return
+            body = route[0]().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', route[1])
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, int(port)), Handler)
+            threading.Thread(target=_server.serve_forever, name='phoenix-metrics', daemon=True).start()
+    return _server
+
+
+_configured = False
+
+
+def configure_from_env():
+    """
+    Apply the PHOENIX_TRACE* / PHOENIX_METRICS_PORT variables. Only the
+    first call has an effect, so a Streamlit script may call it on every rerun.
+    """
+    global _configured
+    with _lock:
+        if _configured:
+            return
+        _configured = True
+    trace_file = os.environ.get('PHOENIX_TRACE_FILE')
+    metrics_port = os.environ.get('PHOENIX_METRICS_PORT')
+    if os.environ.get('PHOENIX_TRACE', '').lower() in ('1', 'true', 'yes') or trace_file or metrics_port:
+        enable(record_spans=bool(trace_file))
+    if trace_file:
+        atexit.register(write_chrome_trace, trace_file)
+    if metrics_port:
+        try:
+            serve_metrics(metrics_port)
+        except OSError as e:
+            print(f"Warning: could not serve metrics on port {metrics_port}: {e}")
@@ -0,0 +1,387 @@
+"""
+Preprocessing Combination Sweep Engine
+Resize → NLM → CLAHE parameter grid with shared-stage memoization
+
+Every combination is a chain of stages from app.py. Chains are merged into a
+prefix tree (a DAG of stages), so a shared prefix such as the resize or an NLM
+output is computed once per image, no matter how many combinations build on
+it. Subtrees below the shared prefix run in a process pool and the results are
+written as a ranked report with PSNR / SSIM / contrast.
+
+Usage:
+    python preprocessing_sweep.py --images sample_image/original_images \
+        --nlm-h 3 5 10 --clahe-clip 1.2 2.0 --clahe-tile 6 8 --output-dir sweep_results
+"""
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app import (
+    resize_with_aspect_ratio_mirroring,
+    apply_nlm_denoising,
+    apply_clahe_enhancement,
+)
+from image_metrics import batch_preprocessing_metrics
+
+IMAGE_EXTENSIONS = ['.bmp', '.png', '.jpg', '.jpeg']
+PSNR_CAP = 100.0  # identical images give inf PSNR; cap it so averages stay finite
+
+# ============================================================================
+# STAGES
+# ============================================================================
+
+def _resize_stage(image, target_size=256):
+    resized, _ = resize_with_aspect_ratio_mirroring(image, target_size=target_size)
+    return resized
+
+
+STAGES = {
+    'resize': _resize_stage,
+    'nlm': apply_nlm_denoising,
+    'clahe': apply_clahe_enhancement,
+}
+
+STAGE_LABELS = {
+    'resize': lambda p: f"Resize{p['target_size']}",
+    'nlm': lambda p: f"NLM(h={p['h']},t={p['template_window_size']},s={p['search_window_size']})",
+    'clahe': lambda p: f"CLAHE(clip={p['clip_limit']},tile={p['tile_grid_size']})",
+}
+
+
+def make_step(stage, **params):
+    """A hashable (stage, params) step usable as a DAG node key component."""
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage '{stage}'. Available: {', '.join(STAGES)}")
+    return (stage, tuple(sorted(params.items())))
+
+
+def combination_name(steps):
+    """Human-readable name of a combination, e.g. Resize256 → NLM(h=3,...) → CLAHE(...)."""
+    return ' → '.join(STAGE_LABELS[stage](dict(params)) for stage, params in steps)
+
+
+def build_combinations(sizes=(256,), nlm_h=(3,), nlm_template=(7,), nlm_search=(21,),
+                       clahe_clip=(1.2,), clahe_tile=(6,), include_skips=True):
+    """
+    Cartesian grid of Resize → [NLM] → [CLAHE] combinations.
+
+    With `include_skips`, NLM-only and CLAHE-only chains are also generated
+    (the resize-only chain is always left out since it is the reference).
+    """
+    nlm_options = [make_step('nlm', h=h, template_window_size=t, search_window_size=s)
+                   for h, t, s in itertools.product(nlm_h, nlm_template, nlm_search)]
+    clahe_options = [make_step('clahe', clip_limit=c, tile_grid_size=g)
+                     for c, g in itertools.product(clahe_clip, clahe_tile)]
+    if include_skips:
+        nlm_options = [None] + nlm_options
+        clahe_options = [None] + clahe_options
+
+    combinations = []
+    for size, nlm, clahe in itertools.product(sizes, nlm_options, clahe_options):
+        if nlm is None and clahe is None:
+            continue
+        steps = [make_step('resize', target_size=size)] + [s for s in (nlm, clahe) if s is not None]
+        combinations.append(tuple(steps))
+    return combinations
+
+
+# ============================================================================
+# STAGE DAG
+# ============================================================================
+
+class StageNode:
+    """One unique stage application: a step plus the prefix it is applied to."""
+
+    def __init__(self, step, depth=0):
+        self.step = step
+        self.depth = depth
+        self.children = {}
+        self.leaf_names = []  # combinations that end at this node
+
+    def iter_nodes(self):
+        yield self
+        for child in self.children.values():
+            yield from child.iter_nodes()
+
+
+def build_stage_graph(combinations):
+    """Merge combinations into a prefix tree; returns the list of root nodes."""
+    roots = {}
+    for steps in combinations:
+        level, node = roots, None
+        for depth, step in enumerate(steps):
+            node = level.get(step)
+            if node is None:
+                node = StageNode(step, depth)
+                level[step] = node
+            level = node.children
+        node.leaf_names.append(combination_name(steps))
+    return list(roots.values())
+
+
+def count_stages(roots):
+    """(unique stage applications, naive stage applications) per image."""
+    unique = sum(1 for root in roots for _ in root.iter_nodes())
+    naive = sum(node.depth + 1 for root in roots for node in root.iter_nodes() for _ in node.leaf_names)
+    return unique, naive
+
+
+def _apply(node, image):
+    stage, params = node.step
+    start = time.perf_counter()
+    output = STAGES[stage](image, **dict(params))
+    return output, time.perf_counter() - start
+
+
+def _collect_leaves(node, image, reference, path_time, leaves):
+    """Depth-first evaluation; every node runs once and its output feeds all children."""
+    output, elapsed = _apply(node, image)
+    path_time += elapsed
+    if reference is None:
+        reference = output  # the first stage (resize) is the metric reference
+
+    for name in node.leaf_names:
+        leaves.append((name, reference, output, path_time))
+    for child in node.children.values():
+        _collect_leaves(child, output, reference, path_time, leaves)
+    return leaves
+
+
+def _score_leaves(leaves):
+    """Score all leaf outputs of a subtree in one batched metrics pass."""
+    if not leaves:
+        return []
+    metrics = batch_preprocessing_metrics(np.stack([leaf[1] for leaf in leaves]),
+                                          np.stack([leaf[2] for leaf in leaves]))
+    results = []
+    for i, (name, _, _, path_time) in enumerate(leaves):
+        leaf_metrics = {key: values[i] for key, values in metrics.items()}
+        leaf_metrics['Processing Time (s)'] = path_time
+        results.append((name, leaf_metrics))
+    return results
+
+
+def _evaluate_subtree(node, image, reference, path_time):
+    """Process-pool task: evaluate a subtree and score its leaves."""
+    return _score_leaves(_collect_leaves(node, image, reference, path_time, []))
+
+
+def _init_worker():
+    # One OpenCV thread per process so the pool does not oversubscribe the CPU
+    cv2.setNumThreads(1)
+
+
+# ============================================================================
+# SWEEP
+# ============================================================================
+
+def _drain(in_flight, limit, records):
+    """Wait until at most `limit` subtree tasks are in flight, recording the finished ones; returns their count."""
+    finished_count = 0
+    while len(in_flight) > limit:
+        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in finished:
+            image_path = in_flight.pop(future)
+            for name, metrics in future.result():
+                records.append(_record(image_path, name, metrics))
+        finished_count += len(finished)
+    return finished_count
+
+
+def run_sweep(image_paths, combinations, workers=None, split_depth=1, max_in_flight=None, progress=True):
+    """
+    Run all combinations over all images.
+
+    Nodes above `split_depth` (by default just the resize) are computed in the
+    parent process once per image; each subtree below is a separate pool task
+    that receives the shared intermediate result. Every queued task holds its
+    own copy of that result, so at most `max_in_flight` tasks (default: two
+    per worker) are outstanding; later images are read only as tasks finish.
+    """
+    roots = build_stage_graph(combinations)
+    records = []
+    if max_in_flight is None:
+        max_in_flight = 2 * (workers or os.cpu_count() or 1)
+    tasks_per_image = sum(1 for root in roots for node in root.iter_nodes() if node.depth == split_depth)
+    total = tasks_per_image * len(image_paths)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        in_flight = {}
+        done = 0
+        for image_path in image_paths:
+            image = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
+            if image is None:
+                print(f"Warning: could not read {image_path}, skipping")
+                total -= tasks_per_image
+                continue
+
+            pending = [(root, image, None, 0.0) for root in roots]
+            leaves = []
+            while pending:
+                node, parent_output, reference, path_time = pending.pop()
+                if node.depth >= split_depth:
+                    done += _drain(in_flight, max_in_flight - 1, records)
+                    future = pool.submit(_evaluate_subtree, node, parent_output, reference, path_time)
+                    in_flight[future] = image_path
+                    continue
+                output, elapsed = _apply(node, parent_output)
+                node_reference = output if reference is None else reference
+                for name in node.leaf_names:
+                    leaves.append((name, node_reference, output, path_time + elapsed))
+                for child in node.children.values():
+                    pending.append((child, output, node_reference, path_time + elapsed))
+            for name, metrics in _score_leaves(leaves):
+                records.append(_record(image_path, name, metrics))
+            if progress and total:
+                print(f"\rCompleted {done}/{total} subtree tasks", end='', flush=True)
+
+        done += _drain(in_flight, 0, records)
+        if progress and total:
+            print(f"\rCompleted {done}/{total} subtree tasks", flush=True)
+
+    return records
+
+
+def _record(image_path, name, metrics):
+    return {
+        'image': Path(image_path).name,
+        'combination': name,
+        'psnr': min(float(metrics['PSNR (dB)']), PSNR_CAP),
+        'ssim': float(metrics['SSIM']),
+        'contrast': float(metrics['Contrast Improvement']),
+        'time': float(metrics['Processing Time (s)']),
+    }
+
+
+def rank_combinations(records, rank_by='composite'):
+    """
+    Aggregate per-image records per combination and sort best-first.
+
+    The composite score is the mean of min-max normalised PSNR, SSIM and
+    contrast improvement across the tested combinations.
+    """
+    import pandas as pd
+
+    df = pd.DataFrame(records)
+    summary = df.groupby('combination').agg(
+        psnr=('psnr', 'mean'), psnr_std=('psnr', 'std'),
+        ssim=('ssim', 'mean'), ssim_std=('ssim', 'std'),
+        contrast=('contrast', 'mean'), contrast_std=('contrast', 'std'),
+        time=('time', 'mean'), images=('image', 'nunique'),
+    ).reset_index()
+
+    normalised = []
+    for column in ['psnr', 'ssim', 'contrast']:
+        values = summary[column]
+        span = values.max() - values.min()
+        normalised.append((values - values.min()) / span if span > 0 else values * 0 + 1.0)
+    summary['composite'] = sum(normalised) / len(normalised)
+
+    summary = summary.sort_values(rank_by, ascending=False).reset_index(drop=True)
+    summary.insert(0, 'rank', np.arange(1, len(summary) + 1))
+    return summary
+
+
+def write_report(summary, records, output_dir, num_images, unique_stages, naive_stages, elapsed, rank_by):
+    """Write per-image CSV, ranking CSV and a text summary report."""
+    import pandas as pd
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(records).to_csv(output_dir / "sweep_results.csv", index=False)
+    summary.to_csv(output_dir / "sweep_ranking.csv", index=False)
+
+    best = summary.iloc[0]
+    lines = [
+        "PREPROCESSING COMBINATION SWEEP REPORT",
+        f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        "",
+        "SWEEP SCOPE:",
+        f"- Total combinations tested: {len(summary)}",
+        f"- Images processed: {num_images}",
+        f"- Unique stage applications per image: {unique_stages} (naive: {naive_stages})",
+        f"- Wall time: {elapsed:.2f}s",
+        f"- Ranked by: {rank_by}",
+        "",
+        "BEST PERFORMING COMBINATION:",
+        f"Pipeline: {best['combination']}",
+        f"Composite Score: {best['composite']:.4f}",
+        f"SSIM: {best['ssim']:.4f} (±{best['ssim_std']:.4f})",
+        f"PSNR: {best['psnr']:.2f} dB (±{best['psnr_std']:.2f})",
+        f"Contrast Enhancement: {best['contrast']:.4f} (±{best['contrast_std']:.4f})",
+        f"Processing Time: {best['time']:.3f}s",
+        "",
+        "RANKING:",
+    ]
+    for _, row in summary.iterrows():
+        lines.append(
+            f"{int(row['rank']):>3}. {row['combination']:<70} "
+            f"composite={row['composite']:.4f}  SSIM={row['ssim']:.4f}  "
+            f"PSNR={row['psnr']:.2f}dB  contrast={row['contrast']:.3f}  time={row['time']:.3f}s"
+        )
+    report = '\n'.join(lines) + '\n'
+    (output_dir / "sweep_report.txt").write_text(report, encoding='utf-8')
+    return report
+
+
+def collect_images(paths):
+    """Expand files and directories into a sorted list of image paths."""
+    images = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            images.extend(sorted(f for f in p.iterdir() if f.suffix.lower() in IMAGE_EXTENSIONS))
+        elif p.suffix.lower() in IMAGE_EXTENSIONS:
+            images.append(p)
+    return images
+
+
+def main():
+    app_dir = Path(__file__).parent
+    parser = argparse.ArgumentParser(description="Sweep preprocessing parameter combinations with stage memoization")
+    parser.add_argument('--images', nargs='+', default=[str(app_dir / "sample_image" / "original_images")],
+                        help="Image files and/or directories")
+    parser.add_argument('--sizes', nargs='+', type=int, default=[256], help="Resize target sizes")
+    parser.add_argument('--nlm-h', nargs='+', type=float, default=[3, 5, 10], help="NLM filter strengths")
+    parser.add_argument('--nlm-template', nargs='+', type=int, default=[7], help="NLM template window sizes")
+    parser.add_argument('--nlm-search', nargs='+', type=int, default=[21], help="NLM search window sizes")
+    parser.add_argument('--clahe-clip', nargs='+', type=float, default=[1.2, 2.0], help="CLAHE clip limits")
+    parser.add_argument('--clahe-tile', nargs='+', type=int, default=[6, 8], help="CLAHE tile grid sizes")
+    parser.add_argument('--no-skips', action='store_true', help="Only test full Resize → NLM → CLAHE chains")
+    parser.add_argument('--workers', type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument('--rank-by', default='composite', choices=['composite', 'psnr', 'ssim', 'contrast'])
+    parser.add_argument('--output-dir', default=str(app_dir / "sweep_results"))
+    args = parser.parse_args()
+
+    image_paths = collect_images(args.images)
+    if not image_paths:
+        raise SystemExit("No images found")
+
+    combinations = build_combinations(
+        sizes=args.sizes, nlm_h=args.nlm_h, nlm_template=args.nlm_template, nlm_search=args.nlm_search,
+        clahe_clip=args.clahe_clip, clahe_tile=args.clahe_tile, include_skips=not args.no_skips,
+    )
+    unique_stages, naive_stages = count_stages(build_stage_graph(combinations))
+    print(f"{len(combinations)} combinations × {len(image_paths)} images "
+          f"({unique_stages} unique stages per image instead of {naive_stages})")
+
+    start = time.perf_counter()
+    records = run_sweep(image_paths, combinations, workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    summary = rank_combinations(records, rank_by=args.rank_by)
+    report = write_report(summary, records, args.output_dir, len(image_paths),
+                          unique_stages, naive_stages, elapsed, args.rank_by)
+    print(report)
+    print(f"Results saved to: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""
+Structured Channel Pruning of CBAM-ResNet50
+Rank Channels (BN-γ / L1) → Remove Them Consistently → Fine-Tune → Sparsity / Accuracy / Latency Report
+
+Three groups of channels are pruned at a ratio each:
+  - bottleneck widths: the conv1 / conv2 outputs inside every residual block
+    (most of the FLOPs), ranked by |γ| of bn1 / bn2 or the L1 norm of the filters
+  - stage outputs: the 256/512/1024/2048 channels shared through the residual
+    connections of a stage. One channel set per stage is removed from every
+    block's conv3 / bn3, the downsample branch, the stage's CBAM
+    ChannelAttention MLP (input and output) and the next stage's inputs (or
+    fc), ranked by |γ| summed over the stage's bn3 / downsample BNs
+  - ChannelAttention hidden units of each CBAM MLP, ranked by the L1 norms of
+    their in/out weights
+Kept channel counts are rounded to multiples of 8. The result is a smaller
+dense model (no masks): its checkpoint has the `model_state_dict` layout of
+best_model.pth and loads with app.py's `load_model`, which reads the layer
+widths from the stored weights (`cbam_model.cbam_resnet50_for_shapes`).
+
+Pruned models are fine-tuned on a manifest to recover accuracy, optionally
+distilling from the unpruned model.
+
+Usage:
+    python pruning.py --model cbam_resnet50_cervical/best_model.pth --ratios 0.25 0.5 0.75 \
+        --train-manifest train.csv --test-manifest test.csv --epochs 5 --output pruned_models
+"""
+
+import argparse
+import copy
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from cbam_model import cbam_resnet50_for_shapes
+
+STAGES = (('layer1', 'cbam1'), ('layer2', 'cbam2'), ('layer3', 'cbam3'), ('layer4', 'cbam4'))
+CRITERIA = ('bn', 'l1')
+CHANNEL_MULTIPLE = 8
+
+
+# ============================================================================
+# CHANNEL SELECTION
+# ============================================================================
+
+def keep_count(channels, ratio, multiple=CHANNEL_MULTIPLE):
+    """Channels kept when pruning `ratio` of `channels`, rounded to a multiple (at least one multiple)."""
+    keep = int(round(channels * (1 - ratio) / multiple)) * multiple
+    return int(min(channels, max(multiple, keep)))
+
+
+def _top(importance, count):
+    """Indices of the `count` most important channels, in their original order."""
+    return torch.sort(torch.argsort(importance, descending=True)[:count]).values
+
+
+def _filter_l1(conv):
+    return conv.weight.detach().abs().flatten(1).sum(dim=1)
+
+
+def _channel_importance(conv, bn, criterion):
+    return bn.weight.detach().abs() if criterion == 'bn' else _filter_l1(conv)
+
+
+# ============================================================================
+# MODULE SLICING
+# ============================================================================
+
+def _slice_conv(conv, out_idx=None, in_idx=None):
+    weight = conv.weight.detach()
+    if out_idx is not None:
+        weight = weight[out_idx]
+    if in_idx is not None:
+        weight = weight[:, in_idx]
+    slim = nn.Conv2d(weight.shape[1], weight.shape[0], conv.kernel_size, stride=conv.stride,
+                     padding=conv.padding, bias=conv.bias is not None)
+    slim.weight.data.copy_(weight)
+    if conv.bias is not None:
+        slim.bias.data.copy_(conv.bias.detach() if out_idx is None else conv.bias.detach()[out_idx])
+    return slim
+
+
+def _slice_bn(bn, idx):
+    slim = nn.BatchNorm2d(len(idx), eps=bn.eps, momentum=bn.momentum)
+    slim.weight.data.copy_(bn.weight.detach()[idx])
+    slim.bias.data.copy_(bn.bias.detach()[idx])
+    slim.running_mean.copy_(bn.running_mean[idx])
+    slim.running_var.copy_(bn.running_var[idx])
+    slim.num_batches_tracked.copy_(bn.num_batches_tracked)
+    return slim
+
+
+def _slice_linear(fc, in_idx):
+    slim = nn.Linear(len(in_idx), fc.out_features, bias=fc.bias is not None)
+    slim.weight.data.copy_(fc.weight.detach()[:, in_idx])
+    if fc.bias is not None:
+        slim.bias.data.copy_(fc.bias.detach())
+    return slim
+
+
+# ============================================================================
+# PRUNING
+# ============================================================================
+
+def _prune_stage_outputs(model, ratio, criterion):
+    previous = None
+    for layer_name, cbam_name in STAGES:
+        layer, cbam = getattr(model, layer_name), getattr(model, cbam_name)
+        blocks = list(layer)
+        importance = sum(_channel_importance(block.conv3, block.bn3, criterion) for block in blocks)
+        downsample = blocks[0].downsample
+        if downsample is not None:
+            importance = importance + _channel_importance(downsample[0], downsample[1], criterion)
+        keep = _top(importance, keep_count(len(importance), ratio))
+
+        for i, block in enumerate(blocks):
+            block.conv3 = _slice_conv(block.conv3, out_idx=keep)
+            block.bn3 = _slice_bn(block.bn3, keep)
+            # inputs: previous stage's kept channels for the first block, this stage's for the rest
+            in_idx = previous if i == 0 else keep
+            if in_idx is not None:
+                block.conv1 = _slice_conv(block.conv1, in_idx=in_idx)
+            if block.downsample is not None:
+                block.downsample[0] = _slice_conv(block.downsample[0], out_idx=keep, in_idx=previous)
+                block.downsample[1] = _slice_bn(block.downsample[1], keep)
+
+        mlp = cbam.channel_attention.fc
+        mlp[0] = _slice_conv(mlp[0], in_idx=keep)
+        mlp[2] = _slice_conv(mlp[2], out_idx=keep)
+        previous = keep
+    model.fc = _slice_linear(model.fc, previous)
+
+
+def _prune_bottleneck_widths(model, ratio, criterion):
+    for layer_name, _ in STAGES:
+        for block in getattr(model, layer_name):
+            keep1 = _top(_channel_importance(block.conv1, block.bn1, criterion),
+                         keep_count(block.bn1.num_features, ratio))
+            keep2 = _top(_channel_importance(block.conv2, block.bn2, criterion),
+                         keep_count(block.bn2.num_features, ratio))
+            block.conv1 = _slice_conv(block.conv1, out_idx=keep1)
+            block.bn1 = _slice_bn(block.bn1, keep1)
+            block.conv2 = _slice_conv(block.conv2, out_idx=keep2, in_idx=keep1)
+            block.bn2 = _slice_bn(block.bn2, keep2)
+            block.conv3 = _slice_conv(block.conv3, in_idx=keep2)
+
+
+def _prune_attention_mlps(model, ratio):
+    for _, cbam_name in STAGES:
+        mlp = getattr(model, cbam_name).channel_attention.fc
+        importance = _filter_l1(mlp[0]) * mlp[2].weight.detach().abs().flatten(1).sum(dim=0)
+        keep = _top(importance, keep_count(len(importance), ratio, multiple=1))
+        mlp[0] = _slice_conv(mlp[0], out_idx=keep)
+        mlp[2] = _slice_conv(mlp[2], in_idx=keep)
+
+
+def prune_model(model, ratio, stage_ratio=None, criterion='bn'):
+    """
+    A channel-pruned copy of a CBAM_ResNet50. `ratio` applies to the bottleneck
+    widths and CBAM MLP hidden units, `stage_ratio` (default: `ratio`) to the
+    stage output channels.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"Unknown criterion '{criterion}'. Choose from: {', '.join(CRITERIA)}")
+    if not 0 <= ratio < 1:
+        raise ValueError(f"Pruning ratio must be in [0, 1), got {ratio}")
+    stage_ratio = ratio if stage_ratio is None else stage_ratio
+
+    pruned = copy.deepcopy(model).cpu().eval()
+    with torch.no_grad():
+        if stage_ratio > 0:
+            _prune_stage_outputs(pruned, stage_ratio, criterion)
+        if ratio > 0:
+            _prune_bottleneck_widths(pruned, ratio, criterion)
+            _prune_attention_mlps(pruned, ratio)
+    # round-trip through the shape-driven builder, exactly as load_model will rebuild it
+    rebuilt = cbam_resnet50_for_shapes({name: t.shape for name, t in pruned.state_dict().items()})
+    rebuilt.load_state_dict(pruned.state_dict())
+    return rebuilt.eval()
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+def count_parameters(model):
+    return sum(p.numel() for p in model.parameters())
+
+
+def count_macs(model, input_size=224):
+    """Multiply-accumulates of the conv and linear layers for one image."""
+    macs = []
+
+    def conv_hook(module, inputs, output):
+        macs.append(output[0].numel() * module.in_channels // module.groups * module.kernel_size[0] * module.kernel_size[1])
+
+    def linear_hook(module, inputs, output):
+        macs.append(module.in_features * module.out_features)
+
+    handles = [m.register_forward_hook(conv_hook if isinstance(m, nn.Conv2d) else linear_hook)
+               for m in model.modules() if isinstance(m, (nn.Conv2d, nn.Linear))]
+    try:
+        with torch.no_grad():
+            model(torch.zeros(1, 3, input_size, input_size))
+    finally:
+        for handle in handles:
+            handle.remove()
+    return int(sum(macs))
+
+
+def measure_latency(model, batch_size=1, repeats=10, input_size=224):
+    """Median forward time (ms) on CPU for a batch of random images."""
+    batch = torch.randn(batch_size, 3, input_size, input_size)
+    times = []
+    with torch.no_grad():
+        model(batch)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model(batch)
+            times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1e3)
+
+
+# ============================================================================
+# FINE-TUNING
+# ============================================================================
+
+def fine_tune(model, train_manifest, epochs=5, batch_size=32, lr=1e-4, teacher=None, temperature=4.0, alpha=0.5,
+              val_manifest=None, val_fraction=0.1, num_workers=0, device=None, root=None, seed=42):
+    """
+    Recover accuracy after pruning. With a `teacher` (the unpruned model) the
+    loss is distillation.distillation_loss, otherwise cross-entropy. Returns
+    (best model by validation accuracy, history).
+    """
+    from distillation import distillation_loss, make_loader, read_manifest
+    from evaluation import CLASS_NAMES, _get_device
+
+    torch.manual_seed(seed)
+    device = _get_device(device)
+    paths, labels = read_manifest(train_manifest, CLASS_NAMES, root)
+    if val_manifest is not None:
+        train_paths, train_labels = paths, labels
+        val_paths, val_labels = read_manifest(val_manifest, CLASS_NAMES, root)
+    else:
+        from sklearn.model_selection import train_test_split
+        train_paths, val_paths, train_labels, val_labels = train_test_split(
+            paths, labels, test_size=val_fraction, stratify=labels, random_state=seed)
+    train_loader = make_loader(train_paths, train_labels, train=True, batch_size=batch_size,
+                               num_workers=num_workers)
+    val_loader = make_loader(val_paths, val_labels, train=False, batch_size=batch_size, num_workers=num_workers)
+
+    model = model.to(device)
+    if teacher is not None:
+        teacher = teacher.to(device).eval()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=lr, weight_decay=1e-4)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=max(epochs, 1))
+    criterion = nn.CrossEntropyLoss()
+
+    best_state, best_acc, history = copy.deepcopy(model.state_dict()), -1.0, []
+    for epoch in range(1, epochs + 1):
+        model.train()
+        running_loss, seen = 0.0, 0
+        for images, targets in train_loader:
+            images, targets = images.to(device), targets.to(device)
+            logits = model(images)
+            if teacher is not None:
+                with torch.no_grad():
+                    teacher_logits = teacher(images)
+                loss = distillation_loss(logits, teacher_logits, targets, temperature, alpha)
+            else:
+                loss = criterion(logits, targets)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            running_loss += loss.item() * len(targets)
+            seen += len(targets)
+        scheduler.step()
+
+        model.eval()
+        correct = total = 0
+        with torch.no_grad():
+            for images, targets in val_loader:
+                correct += (model(images.to(device)).argmax(dim=1).cpu() == targets).sum().item()
+                total += len(targets)
+        val_acc = correct / max(total, 1)
+        history.append({'epoch': epoch, 'train_loss': running_loss / max(seen, 1), 'val_acc': val_acc})
+        print(f"  epoch {epoch}/{epochs}: loss {history[-1]['train_loss']:.4f}, val acc {val_acc:.4f}")
+        if val_acc > best_acc:
+            best_acc, best_state = val_acc, copy.deepcopy(model.state_dict())
+
+    model.load_state_dict(best_state)
+    return model.cpu().eval(), history
+
+
+# ============================================================================
+# WORKFLOW
+# ============================================================================
+
+def run(model_path, ratios, output, stage_ratio_scale=1.0, criterion='bn', train_manifest=None, val_manifest=None,
+        test_manifest=None, epochs=5, batch_size=32, lr=1e-4, distill=False, threads=None, root=None, repeats=10):
+    """Prune at each ratio, fine-tune, save and report; returns the report rows (ratio 0 = unpruned)."""
+    from evaluation import CBAMPredictor, build_report, evaluate_manifest
+
+    if threads:
+        torch.set_num_threads(threads)
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    base = CBAMPredictor(model_path, device='cpu').model
+    base_params, base_macs = count_parameters(base), count_macs(base)
+
+    rows = []
+    for ratio in [0.0] + [r for r in ratios if r > 0]:
+        if ratio == 0:
+            path, history = Path(model_path), []
+        else:
+            print(f"Pruning ratio {ratio:.2f} (stage outputs {ratio * stage_ratio_scale:.2f}, criterion {criterion})")
+            model = prune_model(base, ratio, stage_ratio=ratio * stage_ratio_scale, criterion=criterion)
+            history = []
+            if train_manifest is not None and epochs > 0:
+                model, history = fine_tune(model, train_manifest, epochs=epochs, batch_size=batch_size, lr=lr,
+                                           teacher=base if distill else None, val_manifest=val_manifest, root=root)
+            path = output / f"pruned_{int(round(ratio * 100)):02d}.pth"
+            torch.save({
+                'model_state_dict': model.state_dict(),
+                'epoch': len(history),
+                'val_acc': history[-1]['val_acc'] if history else None,
+                'pruning': {'ratio': ratio, 'stage_ratio': ratio * stage_ratio_scale, 'criterion': criterion,
+                            'source': str(model_path), 'fine_tune': history},
+            }, path)
+
+        # reload the saved file, as the app would
+        predictor = CBAMPredictor(path, device='cpu')
+        params, macs = count_parameters(predictor.model), count_macs(predictor.model)
+        row = {
+            'ratio': ratio,
+            'model': str(path),
+            'parameters': params,
+            'macs': macs,
+            'parameter_sparsity': 1 - params / base_params,
+            'mac_reduction': 1 - macs / base_macs,
+            'latency_ms_batch1': measure_latency(predictor.model, 1, repeats),
+            'latency_ms_batch16': measure_latency(predictor.model, 16, max(repeats // 3, 1)),
+            'fine_tune': history,
+        }
+        if test_manifest is not None:
+            report = build_report(evaluate_manifest(predictor, test_manifest, batch_size, root, progress=False),
+                                  predictor.class_names, n_resamples=1000)
+            row['accuracy'] = report['overall']['accuracy']
+            row['f1_macro'] = report['overall']['f1_macro']
+        rows.append(row)
+        print(f"  {params:,} parameters, {macs / 1e9:.2f} GMACs, {row['latency_ms_batch1']:.1f} ms/image")
+
+    with open(output / "pruning_report.json", 'w') as f:
+        json.dump({'threads': torch.get_num_threads(), 'rows': rows}, f, indent=2)
+    return rows
+
+
+def print_rows(rows):
+    print(f"\n{'Ratio':>6}{'Params':>13}{'Sparsity':>10}{'GMACs':>8}{'MACs -':>8}{'ms (b=1)':>10}{'ms (b=16)':>11}"
+          f"{'Accuracy':>22}")
+    for row in rows:
+        accuracy = ''
+        if 'accuracy' in row:
+            a = row['accuracy']
+            accuracy = f"{a['value']:>8.4f} [{a['ci_low']:.3f},{a['ci_high']:.3f}]"
+        print(f"{row['ratio']:>6.2f}{row['parameters']:>13,}{row['parameter_sparsity']:>9.1%}{row['macs'] / 1e9:>8.2f}"
+              f"{row['mac_reduction']:>8.1%}{row['latency_ms_batch1']:>10.1f}{row['latency_ms_batch16']:>11.1f}{accuracy}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Structured channel pruning of CBAM-ResNet50")
+    parser.add_argument('--model', required=True, help="CBAM-ResNet50 checkpoint")
+    parser.add_argument('--ratios', type=float, nargs='+', default=[0.25, 0.5, 0.75],
+                        help="Fraction of channels removed per group")
+    parser.add_argument('--stage-ratio-scale', type=float, default=1.0,
+                        help="Stage output channels are pruned at ratio × this (0 keeps them)")
+    parser.add_argument('--criterion', default='bn', choices=CRITERIA, help="BN-γ magnitude or filter L1 norm")
+    parser.add_argument('--train-manifest', default=None, help="Fine-tuning manifest (omit to skip fine-tuning)")
+    parser.add_argument('--val-manifest', default=None,
+                        help="Validation manifest for picking the best epoch (default: split off --train-manifest)")
+    parser.add_argument('--test-manifest', default=None, help="Labelled manifest for the accuracy column")
+    parser.add_argument('--root', default=None, help="Base directory for relative image paths")
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--lr', type=float, default=1e-4)
+    parser.add_argument('--distill', action='store_true', help="Fine-tune against the unpruned model's soft targets")
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads for the latency columns")
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--output', default='pruned_models', help="Directory for pruned checkpoints and the report")
+    args = parser.parse_args()
+
+    rows = run(args.model, args.ratios, args.output, stage_ratio_scale=args.stage_ratio_scale,
+               criterion=args.criterion, train_manifest=args.train_manifest, val_manifest=args.val_manifest,
+               test_manifest=args.test_manifest,
+               epochs=args.epochs, batch_size=args.batch_size, lr=args.lr, distill=args.distill,
+               threads=args.threads, root=args.root, repeats=args.repeats)
+    print_rows(rows)
+    print(f"\nSaved pruned models and pruning_report.json to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
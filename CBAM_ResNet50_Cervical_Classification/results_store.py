@@ -0,0 +1,397 @@
+"""
+Queryable Results Store
+Predictions → Buffered Appends → Parquet Parts Partitioned by Class, Sorted by Image Hash → Indexed Queries
+
+Every classification (dashboard, batch mode, cam_archive.py jobs) can be
+appended as one row: image hash, file name, predicted class, confidence,
+per-class probabilities, preprocessing metrics, model version and a CAM
+reference. Rows are buffered and written in batches as immutable Parquet
+parts; nothing is ever rewritten in place, and several processes may append
+to the same store.
+
+Two indexes make lookups over millions of rows sub-second:
+  - predicted class: parts are hive-partitioned by class, so a class filter
+    only opens that class's directory;
+  - image hash: each part is sorted by hash and written in small row groups
+    with min/max statistics, so a hash lookup skips every row group whose
+    hash range cannot contain it.
+Hashes are random, so every part's hash range spans nearly all hashes and a
+lookup reads a row group from each part. Writers therefore merge their
+parts size-tiered as they go, and `compact()` merges each class's parts
+into one sorted part, after which a lookup reads one 4096-row group per
+class.
+
+Store layout:
+    <store>/_meta.json                                   class names, schema version
+    <store>/predicted_class=<class>/part-<time>-<id>.parquet
+
+Usage:
+    writer = ResultsWriter("results_store", CLASS_NAMES)
+    writer.record(image_hash(upload_bytes), probabilities, file_name="cell.bmp", model_version="file:best_model.pth")
+    writer.close()
+
+    store = ResultsStore("results_store")
+    store.query(image_hash="3f2a...").to_pandas()
+    store.query(predicted_class="Koilocytotic", min_confidence=0.9, columns=['image_hash', 'confidence'])
+
+    python results_store.py info results_store
+    python results_store.py query results_store --class Koilocytotic --limit 20
+    python results_store.py compact results_store
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+STORE_VERSION = 1
+PARTITION = 'predicted_class'
+METRIC_COLUMNS = ['psnr_db', 'ssim', 'contrast_improvement']
+DEFAULT_FLUSH_ROWS = 4096
+DEFAULT_FLUSH_SECONDS = 30.0
+DEFAULT_MERGE_PARTS = 8
+ROW_GROUP_ROWS = 4096
+
+
+def image_hash(data):
+    """Content hash identifying an image across uploads (the dashboard's stage-cache key)."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def probability_column(class_name):
+    return f"prob_{class_name}"
+
+
+def results_schema(class_names, partition=True):
+    """Arrow schema of a store; without `partition`, the schema of the part files themselves."""
+    import pyarrow as pa
+
+    fields = [
+        ('recorded_at', pa.timestamp('ms', tz='UTC')),
+        ('image_hash', pa.string()),
+        ('file_name', pa.string()),
+        ('source', pa.string()),
+        ('confidence', pa.float32()),
+    ]
+    fields += [(probability_column(name), pa.float32()) for name in class_names]
+    fields += [(name, pa.float32()) for name in METRIC_COLUMNS]
+    fields += [('model_version', pa.string()), ('cam_ref', pa.string())]
+    if partition:
+        fields.append((PARTITION, pa.string()))
+    return pa.schema(fields)
+
+
+def _read_meta(root):
+    with open(Path(root) / "_meta.json") as f:
+        return json.load(f)
+
+
+def _write_part(directory, table):
+    """Write `table` sorted by image hash as a new part; the rename makes it visible atomically."""
+    import pyarrow.parquet as pq
+
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"part-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:12]}.parquet"
+    # dot-prefixed files are skipped by dataset discovery until renamed
+    tmp = directory / f".{name}.tmp"
+    pq.write_table(table.sort_by('image_hash'), tmp, row_group_size=ROW_GROUP_ROWS, compression='zstd')
+    os.replace(tmp, directory / name)
+    return directory / name
+
+
+def _merge_parts(directory, parts, class_names):
+    """Replace `parts` with one sorted part; the merged part is visible before the old ones are removed."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = results_schema(class_names, partition=False)
+    merged = _write_part(directory, pa.concat_tables([pq.read_table(part, schema=schema) for part in parts]))
+    for part in parts:
+        part.unlink()
+    return merged
+
+
+# ============================================================================
+# WRITE SIDE
+# ============================================================================
+
+class ResultsWriter:
+    """
+    Append-only writer. Rows are buffered and written as one part per
+    predicted class once `flush_rows` are pending or the oldest pending row
+    is `flush_seconds` old (checked by a background thread). Thread-safe, so
+    one writer can serve every dashboard session in a process; pending rows
+    are flushed at exit.
+
+    The writer merges its own parts size-tiered: once `merge_parts` parts of
+    one tier exist for a class, they become one part of the next tier. A
+    long-running writer thus leaves O(log n) parts per class, not one per
+    flush, and never touches parts written by other processes.
+    """
+
+    def __init__(self, root, class_names, flush_rows=DEFAULT_FLUSH_ROWS, flush_seconds=DEFAULT_FLUSH_SECONDS,
+                 merge_parts=DEFAULT_MERGE_PARTS):
+        self.root = Path(root)
+        self.class_names = list(class_names)
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.merge_parts = merge_parts
+        self.schema = results_schema(self.class_names, partition=False)
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        meta_path = self.root / "_meta.json"
+        if meta_path.exists():
+            meta = _read_meta(self.root)
+            if meta['class_names'] != self.class_names:
+                raise ValueError(f"Store {self.root} holds classes {meta['class_names']}, not {self.class_names}")
+        else:
+            tmp = self.root / f"._meta.json.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump({'version': STORE_VERSION, 'class_names': self.class_names}, f, indent=2)
+            os.replace(tmp, meta_path)
+
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._tiers = {}
+        self._pending = 0
+        self._oldest = None
+        self._stop = threading.Event()
+        self._flusher = None
+        if flush_seconds:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="results-flusher", daemon=True)
+            self._flusher.start()
+        atexit.register(self.close)
+
+    def record(self, image_hash, probabilities, file_name=None, source='app', metrics=None, model_version=None,
+               cam_ref=None, recorded_at=None):
+        """
+        Append one prediction. `probabilities` is a {class: p} dict or a
+        sequence in class order, as fractions; the predicted class and
+        confidence are derived from it. `metrics` uses METRIC_COLUMNS keys.
+        """
+        if isinstance(probabilities, dict):
+            probabilities = [probabilities[name] for name in self.class_names]
+        probabilities = [float(p) for p in probabilities]
+        predicted = max(range(len(probabilities)), key=probabilities.__getitem__)
+        row = {
+            'recorded_at': recorded_at or datetime.now(timezone.utc),
+            'image_hash': image_hash,
+            'file_name': file_name,
+            'source': source,
+            'confidence': probabilities[predicted],
+            'model_version': model_version,
+            'cam_ref': cam_ref,
+        }
+        row.update({probability_column(name): p for name, p in zip(self.class_names, probabilities)})
+        metrics = metrics or {}
+        row.update({name: None if metrics.get(name) is None else float(metrics[name]) for name in METRIC_COLUMNS})
+        self.add(self.class_names[predicted], row)
+
+    def add(self, predicted_class, row):
+        """Append a row already in the store's column layout (see `results_schema`)."""
+        with self._lock:
+            columns = self._rows.setdefault(predicted_class, {name: [] for name in self.schema.names})
+            for name in self.schema.names:
+                columns[name].append(row.get(name))
+            self._pending += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if self._pending >= self.flush_rows:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        import pyarrow as pa
+
+        for predicted_class, columns in self._rows.items():
+            directory = self.root / f"{PARTITION}={quote(predicted_class, safe='')}"
+            part = _write_part(directory, pa.Table.from_pydict(columns, schema=self.schema))
+            tiers = self._tiers.setdefault(predicted_class, [[]])
+            tiers[0].append(part)
+            level = 0
+            while self.merge_parts and len(tiers[level]) >= self.merge_parts:
+                if level + 1 == len(tiers):
+                    tiers.append([])
+                tiers[level + 1].append(_merge_parts(directory, tiers[level], self.class_names))
+                tiers[level] = []
+                level += 1
+        self._rows = {}
+        self._pending = 0
+        self._oldest = None
+
+    def _flush_periodically(self):
+        while not self._stop.wait(min(self.flush_seconds, 1.0)):
+            with self._lock:
+                if self._oldest is not None and time.monotonic() - self._oldest >= self.flush_seconds:
+                    self._flush_locked()
+
+    def close(self):
+        self._stop.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join()
+        self.flush()
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ============================================================================
+# READ SIDE
+# ============================================================================
+
+class ResultsStore:
+    """
+    Read side over every part in the store. The part list is read once;
+    call `refresh()` to see parts written since.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.meta = _read_meta(self.root)
+        self.class_names = self.meta['class_names']
+        self.schema = results_schema(self.class_names)
+        self.refresh()
+
+    def refresh(self):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        partitioning = ds.partitioning(pa.schema([(PARTITION, pa.string())]), flavor='hive')
+        self.dataset = ds.dataset(self.root, schema=self.schema, format='parquet', partitioning=partitioning)
+        return self
+
+    def __len__(self):
+        return self.dataset.count_rows()
+
+    def filter(self, image_hash=None, predicted_class=None, model_version=None, source=None, min_confidence=None,
+               since=None, until=None):
+        """Dataset filter expression for `query`; every argument is optional and they combine with AND."""
+        import pyarrow.dataset as ds
+
+        conditions = []
+        for column, value in [('image_hash', image_hash), (PARTITION, predicted_class),
+                              ('model_version', model_version), ('source', source)]:
+            if value is None:
+                continue
+            if isinstance(value, (list, tuple, set)):
+                conditions.append(ds.field(column).isin(list(value)))
+            else:
+                conditions.append(ds.field(column) == value)
+        if min_confidence is not None:
+            conditions.append(ds.field('confidence') >= min_confidence)
+        if since is not None:
+            conditions.append(ds.field('recorded_at') >= since)
+        if until is not None:
+            conditions.append(ds.field('recorded_at') < until)
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def query(self, columns=None, limit=None, **filters):
+        """
+        Matching rows as a pyarrow Table (`.to_pandas()` for a DataFrame).
+        Filters on image hash and predicted class use the store's indexes;
+        the others are evaluated while scanning.
+        """
+        expression = self.filter(**filters)
+        if limit is not None:
+            return self.dataset.head(limit, columns=columns, filter=expression)
+        return self.dataset.to_table(columns=columns, filter=expression)
+
+    def history(self, image_hash):
+        """Every prediction recorded for one image, oldest first, as a DataFrame."""
+        return self.query(image_hash=image_hash).sort_by('recorded_at').to_pandas()
+
+    def class_counts(self, **filters):
+        """{predicted class: rows}; with no filters, counts come from Parquet footers alone."""
+        return {name: self.dataset.count_rows(filter=self.filter(**dict(filters, predicted_class=name)))
+                for name in self.class_names}
+
+    def parts(self):
+        return sorted(self.root.glob(f"{PARTITION}=*/part-*.parquet"))
+
+    def storage_bytes(self):
+        return sum(p.stat().st_size for p in self.parts())
+
+    def compact(self, min_parts=2):
+        """
+        Merge each class's parts into one part sorted by hash. The merged part
+        becomes visible before the old parts are removed, so rows are never
+        missing, but a concurrent reader may see them twice. Run it while no
+        writer is open (it would merge parts a writer is about to merge) and
+        queries are quiet. Returns the number of parts removed.
+        """
+        removed = 0
+        for directory in sorted(self.root.glob(f"{PARTITION}=*")):
+            parts = sorted(directory.glob("part-*.parquet"))
+            if len(parts) < min_parts:
+                continue
+            _merge_parts(directory, parts, self.class_names)
+            removed += len(parts) - 1
+        self.refresh()
+        return removed
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect, query and compact a results store")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    info_parser = subparsers.add_parser('info', help="Rows per class and storage")
+    info_parser.add_argument('store')
+
+    query_parser = subparsers.add_parser('query', help="Print matching predictions")
+    query_parser.add_argument('store')
+    query_parser.add_argument('--hash', default=None, help="Image hash")
+    query_parser.add_argument('--class', dest='predicted_class', default=None, help="Predicted class")
+    query_parser.add_argument('--model-version', default=None)
+    query_parser.add_argument('--min-confidence', type=float, default=None, help="Fraction, e.g. 0.9")
+    query_parser.add_argument('--limit', type=int, default=None)
+    query_parser.add_argument('--output', default=None, help="Write matches to CSV instead of printing")
+
+    compact_parser = subparsers.add_parser('compact', help="Merge each class's parts into one sorted part")
+    compact_parser.add_argument('store')
+    args = parser.parse_args()
+
+    store = ResultsStore(args.store)
+    if args.command == 'info':
+        print(f"{args.store}: {len(store)} predictions in {len(store.parts())} parts, "
+              f"{store.storage_bytes() / 1e6:.2f} MB")
+        for name, count in store.class_counts().items():
+            print(f"  {name:<28}{count:>10}")
+    elif args.command == 'query':
+        start = time.perf_counter()
+        matches = store.query(limit=args.limit, image_hash=args.hash, predicted_class=args.predicted_class,
+                              model_version=args.model_version, min_confidence=args.min_confidence).to_pandas()
+        seconds = time.perf_counter() - start
+        if args.output:
+            matches.to_csv(args.output, index=False)
+            print(f"Saved {len(matches)} rows to: {args.output}")
+        else:
+            print(matches.to_string(index=False))
+        print(f"{len(matches)} rows in {seconds * 1e3:.0f} ms")
+    else:
+        removed = store.compact()
+        print(f"Compacted {args.store}: {removed} parts merged, {len(store.parts())} parts remain")
+
+
+if __name__ == "__main__":
+    main()
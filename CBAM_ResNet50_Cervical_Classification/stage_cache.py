@@ -0,0 +1,60 @@
+"""
+Per-Session Stage Memoization for the Dashboard
+Streamlit reruns the whole script on every widget change; StageCache reruns
+only the pipeline stages whose inputs changed.
+
+Stages form a dependency graph (e.g. image → preprocessed → probabilities →
+gradcam). A stage's key combines its own parameters with the keys of the
+stages it depends on, so a new upload invalidates everything downstream while
+a UI-only toggle reuses every cached result. One entry per stage is kept in
+the session store (`st.session_state`), so memory stays bounded to the
+current image.
+"""
+
+import hashlib
+
+
+class StageCache:
+    """Memoize pipeline stages in a per-session dict, keyed by their inputs."""
+
+    def __init__(self, store, graph):
+        """
+        store: mutable mapping that survives reruns (a dict in st.session_state)
+        graph: {stage: tuple of upstream stages}
+        """
+        self.store = store
+        self.graph = graph
+        self.keys = {}
+        self.hits = []
+        self.misses = []
+
+    def run(self, name, compute, params=()):
+        """
+        Return the cached value of `name` if its parameters and upstream keys
+        are unchanged since the last run, else call `compute()` and cache it.
+        Upstream stages must have been run earlier in this rerun.
+        """
+        upstream = []
+        for dependency in self.graph[name]:
+            if dependency not in self.keys:
+                raise RuntimeError(f"Stage '{name}' depends on '{dependency}', which has not run yet")
+            upstream.append(self.keys[dependency])
+        key = hashlib.sha1(repr((name, params, upstream)).encode('utf-8')).hexdigest()
+        self.keys[name] = key
+
+        entry = self.store.get(name)
+        if entry is not None and entry[0] == key:
+            self.hits.append(name)
+            return entry[1]
+
+        value = compute()
+        self.store[name] = (key, value)
+        self.misses.append(name)
+        return value
+
+    def invalidate(self, name=None):
+        """Drop one stage (or all) from the session store."""
+        if name is None:
+            self.store.clear()
+        else:
+            self.store.pop(name, None)
@@ -0,0 +1,56 @@
+"""
+Lightweight Student Model Definition
+MobileNetV3 / ResNet18 classifiers distilled from CBAM-ResNet50 for CPU screening
+
+Students are trained by distillation.py and saved as a checkpoint with the
+same `model_state_dict` layout as best_model.pth, plus the architecture name
+and class names needed to rebuild them.
+"""
+
+import torch
+import torch.nn as nn
+from torchvision import models
+
+from cbam_model import CLASS_NAMES
+
+STUDENT_ARCHITECTURES = {
+    'mobilenet_v3_small': models.mobilenet_v3_small,
+    'mobilenet_v3_large': models.mobilenet_v3_large,
+    'resnet18': models.resnet18,
+}
+
+
+def _replace_classifier(model, num_classes):
+    if isinstance(model, models.ResNet):
+        model.fc = nn.Linear(model.fc.in_features, num_classes)
+    else:
+        last = model.classifier[-1]
+        model.classifier[-1] = nn.Linear(last.in_features, num_classes)
+    return model
+
+
+def build_student(architecture='mobilenet_v3_large', num_classes=len(CLASS_NAMES), pretrained=False):
+    """
+    Student network with a `num_classes` output layer. `pretrained` starts
+    from the torchvision ImageNet weights (downloaded on first use).
+    """
+    if architecture not in STUDENT_ARCHITECTURES:
+        raise ValueError(f"Unknown student architecture '{architecture}'. "
+                         f"Choose from: {', '.join(STUDENT_ARCHITECTURES)}")
+    model = STUDENT_ARCHITECTURES[architecture](weights='DEFAULT' if pretrained else None)
+    return _replace_classifier(model, num_classes)
+
+
+def load_student(path, device='cpu'):
+    """Rebuild a student from a distillation checkpoint; returns (model in eval mode, checkpoint metadata)."""
+    checkpoint = torch.load(path, map_location=device)
+    class_names = checkpoint.get('class_names', CLASS_NAMES)
+    model = build_student(checkpoint['architecture'], num_classes=len(class_names))
+    model.load_state_dict(checkpoint['model_state_dict'])
+    model.to(device).eval()
+    metadata = {key: value for key, value in checkpoint.items() if key not in ('model_state_dict', 'optimizer_state_dict')}
+    return model, metadata
+
+
+def count_parameters(model):
+    return sum(p.numel() for p in model.parameters())
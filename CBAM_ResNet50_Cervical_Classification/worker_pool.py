@@ -0,0 +1,313 @@
+"""
+CPU Inference Worker Pool
+Batches → Shared Request Queue → K Model Replicas (Fixed Threads, Pinned Cores) → Futures
+
+One PyTorch process with the default intra-op thread count scales poorly on
+many-core nodes: small batches cannot keep 32 threads busy, and the threads
+synchronise at every operator. `InferencePool` runs K replica processes
+instead. Each has a fixed `threads` budget (`torch.set_num_threads`, one
+inter-op thread) and, with `pin=True`, its own set of cores
+(`os.sched_setaffinity`), so replicas do not compete for the same cores.
+
+Dispatch is pull-based: batches wait in one queue and the pool hands the
+next one to a replica as soon as it is idle, so a slow batch never holds up
+others queued behind it. Because the pool assigns every batch, it knows
+what each replica is running: a replica that dies fails only its own batch
+and is respawned. Batches and results travel as shared-memory tensors (torch
+multiprocessing), not pickled copies. `.safetensors` exports
+(checkpoint_io.py) are memory-mapped by every replica, so K replicas share
+one copy of the weights.
+
+Usage:
+    with InferencePool("cbam_resnet50_cervical/best_model.safetensors", replicas=4, threads=8, pin=True) as pool:
+        futures = [pool.submit(batch) for batch in batches]   # (B, 3, 224, 224) float tensors
+        probabilities = [f.result() for f in futures]         # (B, 5) float tensors
+"""
+
+import collections
+import itertools
+import os
+import queue
+import threading
+import warnings
+from concurrent.futures import Future
+from pathlib import Path
+
+
+# ============================================================================
+# REPLICA PROCESS
+# ============================================================================
+
+def available_cores():
+    """Cores this process may run on (all logical CPUs where affinity is unsupported)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def core_plan(replicas, threads, cores=None):
+    """
+    Core set for each replica: consecutive blocks of `threads` cores. When
+    replicas × threads exceeds the cores, blocks wrap around and replicas
+    share cores (oversubscription).
+    """
+    cores = list(cores) if cores is not None else available_cores()
+    if replicas * threads > len(cores):
+        warnings.warn(f"{replicas} replicas × {threads} threads oversubscribe {len(cores)} cores")
+    return [[cores[(replica * threads + i) % len(cores)] for i in range(threads)] for replica in range(replicas)]
+
+
+def load_replica(model_path):
+    """CBAM-ResNet50 for inference; `.safetensors` weights are mapped, `.pth` checkpoints loaded."""
+    import torch
+    from cbam_model import cbam_resnet50_for_shapes
+
+    model_path = Path(model_path)
+    if model_path.suffix == '.safetensors':
+        from checkpoint_io import load_model_weights, read_header
+        shapes = {name: info['shape'] for name, info in read_header(model_path)[0].items()}
+        model, _ = load_model_weights(lambda: cbam_resnet50_for_shapes(shapes), model_path, device='cpu')
+    else:
+        state_dict = torch.load(model_path, map_location='cpu')['model_state_dict']
+        model = cbam_resnet50_for_shapes({name: tensor.shape for name, tensor in state_dict.items()})
+        model.load_state_dict(state_dict)
+    return model.eval()
+
+
+def _replica_main(replica, model_path, threads, cores, requests, responses, warmup_shape):
+    import torch
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    if cores is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    try:
+        model = load_replica(model_path)
+        with torch.inference_mode():
+            if warmup_shape is not None:
+                model(torch.zeros(warmup_shape))
+    except Exception as error:
+        responses.put(('failed', replica, None, repr(error)))
+        return
+    responses.put(('ready', replica, None, os.getpid()))
+
+    while True:
+        job = requests.get()
+        if job is None:
+            return
+        job_id, batch = job
+        try:
+            with torch.inference_mode():
+                probabilities = torch.softmax(model(batch), dim=1)
+            responses.put(('done', replica, job_id, probabilities))
+        except Exception as error:
+            responses.put(('error', replica, job_id, repr(error)))
+
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+class InferencePool:
+    """
+    K replica processes behind one queue. `submit` returns a
+    concurrent.futures.Future resolving to the batch's (B, num_classes)
+    class probabilities.
+
+    A replica that dies (OOM kill, segfault) fails the batch it was running
+    and is respawned. After more than `max_restarts` deaths, or if a
+    respawned replica cannot load the model, the pool is broken: every
+    pending future fails and `submit` raises.
+    """
+
+    def __init__(self, model_path, replicas=1, threads=1, pin=False, cores=None, warmup_batch=1,
+                 input_size=224, max_restarts=3, poll_interval=1.0):
+        import torch.multiprocessing as mp
+
+        self.replicas = replicas
+        self.threads = threads
+        self.max_restarts = max_restarts
+        self.poll_interval = poll_interval
+        self.restarts = 0
+        self.cores = core_plan(replicas, threads, cores) if pin else None
+        self._model_path = str(model_path)
+        self._warmup_shape = (warmup_batch, 3, input_size, input_size) if warmup_batch else None
+        self._context = mp.get_context('spawn')
+        self._responses = self._context.Queue()
+        self._futures = {}
+        self._backlog = collections.deque()
+        self._idle = set()
+        self._running = {}
+        self._broken = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._inboxes = [None] * replicas
+        self._processes = [None] * replicas
+        for replica in range(replicas):
+            self._spawn(replica)
+
+        # wait until every replica has loaded its model, so requests are not timed against start-up
+        self.pids = {}
+        while len(self.pids) < replicas:
+            try:
+                status, replica, _, detail = self._responses.get(timeout=self.poll_interval)
+            except queue.Empty:
+                exited = [p.exitcode for p in self._processes if p.exitcode is not None]
+                if exited:
+                    self.close()
+                    raise RuntimeError(f"A replica exited during start-up (exit code {exited[0]})")
+                continue
+            if status == 'failed':
+                self.close()
+                raise RuntimeError(f"Replica {replica} failed to start: {detail}")
+            self.pids[replica] = detail
+            self._idle.add(replica)
+        self._collector = threading.Thread(target=self._collect, name="pool-collector", daemon=True)
+        self._collector.start()
+
+    def _spawn(self, replica):
+        # each replica has its own inbox, so the pool always knows which job a replica holds
+        self._inboxes[replica] = self._context.Queue()
+        self._processes[replica] = self._context.Process(
+            target=_replica_main, daemon=True,
+            args=(replica, self._model_path, self.threads, self.cores[replica] if self.cores else None,
+                  self._inboxes[replica], self._responses, self._warmup_shape))
+        self._processes[replica].start()
+
+    def submit(self, batch):
+        """Queue a (B, 3, H, W) float tensor; the next idle replica picks it up."""
+        future = Future()
+        job_id = next(self._ids)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Inference pool is closed")
+            if self._broken is not None:
+                raise RuntimeError(f"Inference pool is broken: {self._broken}")
+            self._futures[job_id] = future
+            self._backlog.append((job_id, batch.contiguous()))
+            self._dispatch_locked()
+        return future
+
+    def predict(self, batch):
+        return self.submit(batch).result()
+
+    def map(self, batches):
+        """Probabilities for every batch, in order, with all of them in flight at once."""
+        return [future.result() for future in [self.submit(batch) for batch in batches]]
+
+    def _dispatch_locked(self):
+        if self._closed:
+            return
+        while self._backlog and self._idle:
+            replica = self._idle.pop()
+            job_id, batch = self._backlog.popleft()
+            self._running[replica] = job_id
+            self._inboxes[replica].put((job_id, batch))
+
+    def _collect(self):
+        while True:
+            try:
+                message = self._responses.get(timeout=self.poll_interval)
+            except queue.Empty:
+                message = False
+            if message is None:
+                return
+            with self._lock:
+                if message:
+                    self._handle_locked(*message)
+                if not self._closed and self._broken is None:
+                    self._check_replicas_locked()
+
+    def _handle_locked(self, status, replica, job_id, payload):
+        if status == 'ready':
+            self.pids[replica] = payload
+            self._idle.add(replica)
+        elif status == 'failed':
+            self._break_locked(f"replica {replica} failed to restart: {payload}")
+            return
+        else:
+            # a result a dead replica sent late must not free its respawned successor
+            if self._running.get(replica) == job_id:
+                del self._running[replica]
+                self._idle.add(replica)
+            future = self._futures.pop(job_id, None)
+            if future is not None:
+                if status == 'done':
+                    future.set_result(payload.clone())
+                else:
+                    future.set_exception(RuntimeError(f"Inference failed in replica: {payload}"))
+        self._dispatch_locked()
+
+    def _check_replicas_locked(self):
+        for replica, process in enumerate(self._processes):
+            if process.exitcode is None:
+                continue
+            # results the replica sent before dying are still queued; settle them first
+            while True:
+                try:
+                    message = self._responses.get_nowait()
+                except queue.Empty:
+                    break
+                if message is not None:
+                    self._handle_locked(*message)
+            self._idle.discard(replica)
+            job_id = self._running.pop(replica, None)
+            future = self._futures.pop(job_id, None) if job_id is not None else None
+            if future is not None:
+                future.set_exception(RuntimeError(
+                    f"Replica {replica} died (exit code {process.exitcode}) while running this batch"))
+            self.restarts += 1
+            if self.restarts > self.max_restarts:
+                self._break_locked(f"replicas died {self.restarts} times (last exit code {process.exitcode})")
+                return
+            warnings.warn(f"Replica {replica} died (exit code {process.exitcode}); restarting it")
+            self._spawn(replica)
+
+    def _break_locked(self, reason):
+        self._broken = reason
+        self._backlog.clear()
+        self._running.clear()
+        self._idle.clear()
+        for future in self._futures.values():
+            future.set_exception(RuntimeError(f"Inference pool is broken: {reason}"))
+        self._futures.clear()
+
+    def close(self):
+        """
+        Stop the replicas. Batches already running finish; batches still
+        queued, and any a replica did not finish, fail with "Inference pool
+        is closed".
+        """
+        with self._lock:
+            self._closed = True
+            for job_id, _ in self._backlog:
+                self._fail_closed_locked(job_id)
+            self._backlog.clear()
+        for inbox in self._inboxes:
+            if inbox is not None:
+                inbox.put(None)
+        for process in self._processes:
+            if process is None:
+                continue
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        if getattr(self, '_collector', None) is not None:
+            self._responses.put(None)
+            self._collector.join()
+            self._collector = None
+        with self._lock:
+            for job_id in list(self._futures):
+                self._fail_closed_locked(job_id)
+
+    def _fail_closed_locked(self, job_id):
+        future = self._futures.pop(job_id, None)
+        if future is not None:
+            future.set_exception(RuntimeError("Inference pool is closed"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,4 +1,9 @@
 # --- dependencies ---
+# batched on-the-fly augmentation, CPU data-parallel training, async checkpoints and streaming metrics
+# come from the shared package: pip install -e ../../CBAM_ResNet50_Cervical_Classification
+import json
+import os
+from functools import partial
 from pathlib import Path
 import pandas as pd
 from sklearn.model_selection import train_test_split
@@ -7,224 +12,179 @@ from transformers import AutoImageProcessor, ConvNextV2ForImageClassification, T
 import torch
 from torchvision import transforms as T
 from PIL import Image
-import numpy as np
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, classification_report
 
-DATASET_PARENT = Path(
+from phoenix_shared.augmentation import BatchAugment
+from phoenix_shared.checkpointing import (AsyncCheckpointer, AsyncTrainerCheckpoints, latest_checkpoint,
+                                          latest_trainer_checkpoint)
+from phoenix_shared.distributed import cleanup, is_main_process, setup, stratified_shard, train_ddp
+from phoenix_shared.metrics import StreamingConfusionMatrix, StreamingScoreMetrics
+from phoenix_shared.prediction_store import PredictionWriter
+
+# Augmentation now happens on the fly during training, so SIPAKMED_DATASET can point at the
+# NLM + CLAHE enhanced source images instead of the pre-generated augmented copies
+DATASET_PARENT = Path(os.environ.get(
+    "SIPAKMED_DATASET",
     r"c:/Meet/Projects/Project_8_Phoenix_Cervical Cancer Image Classification/Project-Phoenix/Dataset/Augmented Dataset - Limited Enhancement"
-)
+))
 # ----------------------------------------------
 
-if not DATASET_PARENT.exists():
-    raise FileNotFoundError(f"Dataset parent path not found: {DATASET_PARENT}")
-
-# --- find all NLM_CLAHE directories (case-insensitive) ---
-nlm_dirs = set()
-
-# 1) immediate child search: look for X/<class>/NLM_CLAHE
-for child in DATASET_PARENT.iterdir():
-    if not child.is_dir():
-        continue
-    # search child for a folder named NLM_CLAHE (case-insensitive)
-    for sub in child.iterdir():
-        if sub.is_dir() and sub.name.lower() == "nlm_clahe":
-            nlm_dirs.add(sub.resolve())
-            break
-
-# 2) recursive fallback: in case structure is deeper or different
-for p in DATASET_PARENT.rglob("*"):
-    if p.is_dir() and p.name.lower() == "nlm_clahe":
-        nlm_dirs.add(p.resolve())
-
-if not nlm_dirs:
-    raise FileNotFoundError(
-        "No 'NLM_CLAHE' directories found under DATASET_PARENT. "
-        "Check folder names and capitalization."
-    )
 
-# --- collect BMP files from each NLM_CLAHE and map to class name (parent folder) ---
-rows = []
-seen_paths = set()   # dedupe absolute paths
-
-for nlm in sorted(nlm_dirs, key=lambda x: str(x)):
-    class_name = nlm.parent.name    # parent folder is the class label
-    # gather BMP files (case-insensitive)
-    bmp_files = [p.resolve() for p in nlm.iterdir() if p.is_file() and p.suffix.lower() == ".bmp"]
-    if not bmp_files:
-        # warn but continue
-        print(f"Warning: no .bmp files found in: {nlm}  (class = '{class_name}')")
-        continue
-    for p in bmp_files:
-        sp = str(p)
-        if sp in seen_paths:
+def find_images(dataset_parent):
+    """File list of every .bmp under the NLM_CLAHE folders, labelled by class folder."""
+    if not dataset_parent.exists():
+        raise FileNotFoundError(f"Dataset parent path not found: {dataset_parent}")
+
+    # --- find all NLM_CLAHE directories (case-insensitive) ---
+    nlm_dirs = set()
+
+    # 1) immediate child search: look for X/<class>/NLM_CLAHE
+    for child in dataset_parent.iterdir():
+        if not child.is_dir():
+            continue
+        # search child for a folder named NLM_CLAHE (case-insensitive)
+        for sub in child.iterdir():
+            if sub.is_dir() and sub.name.lower() == "nlm_clahe":
+                nlm_dirs.add(sub.resolve())
+                break
+
+    # 2) recursive fallback: in case structure is deeper or different
+    for p in dataset_parent.rglob("*"):
+        if p.is_dir() and p.name.lower() == "nlm_clahe":
+            nlm_dirs.add(p.resolve())
+
+    if not nlm_dirs:
+        raise FileNotFoundError(
+            "No 'NLM_CLAHE' directories found under DATASET_PARENT. "
+            "Check folder names and capitalization."
+        )
+
+    # --- collect BMP files from each NLM_CLAHE and map to class name (parent folder) ---
+    rows = []
+    seen_paths = set()   # dedupe absolute paths
+
+    for nlm in sorted(nlm_dirs, key=lambda x: str(x)):
+        class_name = nlm.parent.name    # parent folder is the class label
+        # gather BMP files (case-insensitive)
+        bmp_files = [p.resolve() for p in nlm.iterdir() if p.is_file() and p.suffix.lower() == ".bmp"]
+        if not bmp_files:
+            # warn but continue
+            print(f"Warning: no .bmp files found in: {nlm}  (class = '{class_name}')")
             continue
-        seen_paths.add(sp)
-        rows.append((sp, class_name))
-
-# --- build DataFrame ---
-df = pd.DataFrame(rows, columns=["image_path", "label_name"])
-if df.empty:
-    raise RuntimeError("No .bmp image files were found in any discovered NLM_CLAHE directories.")
-
-# stable sorted class ordering -> map to integer labels
-class_names = sorted(df["label_name"].unique().tolist())
-label_to_id = {n: i for i, n in enumerate(class_names)}
-df["label"] = df["label_name"].map(label_to_id)
-
-# optional: shuffle rows (helps downstream splitting)
-df = df.sample(frac=1, random_state=42).reset_index(drop=True)
-
-# summary prints
-print("Dataset parent:", DATASET_PARENT)
-print("Discovered NLM_CLAHE directories (count):", len(nlm_dirs))
-for p in sorted(nlm_dirs):
-    print("  -", p)
-print("\nFound classes (alphabetical):", class_names)
-print("Total images found:", len(df))
-print("Counts per class:")
-print(df.groupby("label_name").size().sort_values(ascending=False))
-
-# save csv to dataset parent for convenience
-csv_out = DATASET_PARENT / "sipakmed_file_list.csv"
-df.to_csv(csv_out, index=False)
-print(f"\nSaved file list to: {csv_out}")
-
-
-# stratified split
-train_df, temp_df = train_test_split(
-    df, test_size=0.2, stratify=df['label'], random_state=42
-)
-val_df, test_df = train_test_split(
-    temp_df, test_size=0.5, stratify=temp_df['label'], random_state=42
-)
-
-print("Train size:", len(train_df))
-print("Validation size:", len(val_df))
-print("Test size:", len(test_df))
-
-# Optional: check class distribution
-print("\nTrain class counts:\n", train_df['label_name'].value_counts())
-print("\nValidation class counts:\n", val_df['label_name'].value_counts())
-print("\nTest class counts:\n", test_df['label_name'].value_counts())
-
-# Define features for HF dataset
-features = Features({
-    "image": HFImage(),                # image will be lazy-loaded
-    "label": ClassLabel(names=sorted(df['label_name'].unique()))
-})
-
-def df_to_ds(dframe):
+        for p in bmp_files:
+            sp = str(p)
+            if sp in seen_paths:
+                continue
+            seen_paths.add(sp)
+            rows.append((sp, class_name))
+
+    # --- build DataFrame ---
+    df = pd.DataFrame(rows, columns=["image_path", "label_name"])
+    if df.empty:
+        raise RuntimeError("No .bmp image files were found in any discovered NLM_CLAHE directories.")
+
+    # stable sorted class ordering -> map to integer labels
+    class_names = sorted(df["label_name"].unique().tolist())
+    label_to_id = {n: i for i, n in enumerate(class_names)}
+    df["label"] = df["label_name"].map(label_to_id)
+
+    # optional: shuffle rows (helps downstream splitting)
+    df = df.sample(frac=1, random_state=42).reset_index(drop=True)
+
+    # summary prints
+    print("Dataset parent:", dataset_parent)
+    print("Discovered NLM_CLAHE directories (count):", len(nlm_dirs))
+    for p in sorted(nlm_dirs):
+        print("  -", p)
+    print("\nFound classes (alphabetical):", class_names)
+    print("Total images found:", len(df))
+    print("Counts per class:")
+    print(df.groupby("label_name").size().sort_values(ascending=False))
+    return df, class_names
+
+
+def df_to_ds(dframe, features):
     d = Dataset.from_dict({
         "image": dframe["image_path"].tolist(),
         "label": dframe["label"].tolist()
     })
     return d.cast(features)
 
-dataset = DatasetDict({
-    "train": df_to_ds(train_df.reset_index(drop=True)),
-    "validation": df_to_ds(val_df.reset_index(drop=True)),
-    "test": df_to_ds(test_df.reset_index(drop=True))
-})
-
-# Quick check
-print(dataset)
-print(dataset['train'][0])
-
-from transformers import ConvNextV2ForImageClassification, AutoImageProcessor
-
-model_name = "facebook/convnextv2-tiny-22k-384"
-
-processor = AutoImageProcessor.from_pretrained(model_name)
-
-# Load the model WITHOUT classifier weights
-
-model = ConvNextV2ForImageClassification.from_pretrained(
-    model_name,
-    num_labels=5,  # your 5 classes
-    id2label={i: name for i, name in enumerate(dataset['train'].features['label'].names)},
-    label2id={name: i for i, name in enumerate(dataset['train'].features['label'].names)},
-    ignore_mismatched_sizes=True  # randomly initialize classifier
-)
-
-mean, std = processor.image_mean, processor.image_std
-
-# Transformations remain the same
-train_transform = T.Compose([
-    T.Resize((224,224)),
-    T.RandomHorizontalFlip(),
-    T.RandomRotation(10),
-    T.ToTensor(),
-    T.Normalize(mean=mean, std=std)
-])
-
-val_transform = T.Compose([
-    T.Resize((224,224)),
-    T.ToTensor(),
-    T.Normalize(mean=mean, std=std)
-])
-
-# Create functions to apply the transforms
-def apply_train_transforms(examples):
-    """Applies training transformations to a batch of images."""
-    examples["pixel_values"] = [train_transform(image.convert("RGB")) for image in examples["image"]]
-    return examples
 
-def apply_val_transforms(examples):
-    """Applies validation/testing transformations to a batch of images."""
-    examples["pixel_values"] = [val_transform(image.convert("RGB")) for image in examples["image"]]
+def apply_transforms(examples, transform):
+    """Decodes, resizes and normalises images when they are read (nothing is cached to disk)."""
+    examples["pixel_values"] = [transform(image.convert("RGB")) for image in examples["image"]]
+    del examples["image"]
     return examples
 
-# Use .map() to create the new processed datasets
-train_ds = dataset["train"].map(apply_train_transforms, batched=True, remove_columns=["image"])
-val_ds = dataset["validation"].map(apply_val_transforms, batched=True, remove_columns=["image"])
-test_ds = dataset["test"].map(apply_val_transforms, batched=True, remove_columns=["image"])
-
-def compute_metrics(eval_pred):
-    predictions, labels = eval_pred
-    predictions = np.argmax(predictions, axis=1)
-    accuracy = accuracy_score(labels, predictions)
-    precision = precision_score(labels, predictions, average='weighted')
-    recall = recall_score(labels, predictions, average='weighted')
-    f1 = f1_score(labels, predictions, average='weighted')
-    return {
-        'accuracy': accuracy,
-        'precision': precision,
-        'recall': recall,
-        'f1': f1
-    }
 
-from transformers import TrainingArguments
-
-training_args = TrainingArguments(
-    output_dir="./convnextv2_cervical",
-    per_device_train_batch_size=16,
-    per_device_eval_batch_size=16,
-    eval_strategy="steps",  # <-- ADD THIS LINE
-    save_strategy="steps",
-    save_steps=200,
-    eval_steps=200,
-    logging_steps=50,
-    num_train_epochs=5,
-    learning_rate=5e-5,
-    weight_decay=0.01,
-    load_best_model_at_end=True,
-    metric_for_best_model="accuracy",
-    fp16=True,
-)
-from transformers import Trainer
-
-class CustomTrainer(Trainer):
+class StreamingMetrics:
+    """
+    compute_metrics for batch_eval_metrics=True: the Trainer passes one batch of logits at a
+    time and asks for the result on the last one, so no array of logits for the whole split is
+    ever built. Set `store` to a PredictionWriter to also keep the logits on disk.
+    """
+
+    def __init__(self, num_classes):
+        self.num_classes = num_classes
+        self.store = None
+        self.reset()
+
+    def reset(self):
+        self.confusion = StreamingConfusionMatrix(self.num_classes)
+        self.scores = StreamingScoreMetrics(self.num_classes)
+
+    def update(self, logits, labels):
+        if isinstance(logits, (tuple, list)):
+            logits = logits[0]
+        logits = torch.as_tensor(logits).detach().float().cpu()
+        labels = torch.as_tensor(labels).cpu().numpy()
+        probabilities = torch.softmax(logits, dim=1).numpy()
+        self.confusion.update(labels, probabilities)
+        self.scores.update(labels, probabilities)
+        if self.store is not None:
+            self.store.add(logits, labels)
+
+    def result(self):
+        point, scores = self.confusion.compute(), self.scores.compute()
+        self.reset()
+        return {
+            'accuracy': float(point['accuracy']),
+            'precision': float(point['precision_weighted']),
+            'recall': float(point['recall_weighted']),
+            'f1': float(point['f1_weighted']),
+            'log_loss': float(scores['log_loss']),
+            'ece': float(scores['ece']),
+            'roc_auc': scores['roc_auc_macro'],
+        }
+
+    def __call__(self, eval_pred, compute_result=True):
+        self.update(eval_pred.predictions, eval_pred.label_ids)
+        if compute_result:
+            return self.result()
+
+
+# The save_steps checkpoints' weight / optimizer files are written by a background thread
+# (checkpointing.AsyncTrainerCheckpoints), so saving no longer stalls training
+class CustomTrainer(AsyncTrainerCheckpoints, Trainer):
+    def __init__(self, *args, augment=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.augment = augment
+
     def compute_loss(self, model, inputs, return_outputs=False, num_items_in_batch=None):
         """
         Override compute_loss to filter out unexpected kwargs before passing to model.
         """
         # Filter out keys that the model doesn't expect
-        filtered_inputs = {k: v for k, v in inputs.items() 
+        filtered_inputs = {k: v for k, v in inputs.items()
                           if k in ['pixel_values', 'labels']}
-        
+
+        # Augment the whole training batch on the device (evaluation batches are left as-is)
+        if self.augment is not None and model.training:
+            filtered_inputs['pixel_values'] = self.augment(filtered_inputs['pixel_values'])
+
         # Call the model with filtered inputs
         outputs = model(**filtered_inputs)
-        
+
         if self.args.past_index >= 0:
             self._past = outputs[self.args.past_index]
 
@@ -233,28 +193,206 @@ class CustomTrainer(Trainer):
                 "The model did not return a loss from the inputs, only the following keys: "
                 f"{','.join(outputs.keys())}. For reference, the inputs it received are {','.join(inputs.keys())}."
             )
-        
+
         loss = outputs["loss"] if isinstance(outputs, dict) else outputs[0]
 
         return (loss, outputs) if return_outputs else loss
 
-trainer = CustomTrainer(
-    model=model,
-    args=training_args,
-    train_dataset=train_ds,         # Use the new mapped train_ds
-    eval_dataset=val_ds,          # Use the new mapped val_ds
-    processing_class=processor,
-    compute_metrics=compute_metrics
-)
-trainer.train()
-
-# Evaluate on test set
-print("\nEvaluating on test set...")
-test_results = trainer.evaluate(test_ds)
-print("Test Results:", test_results)
-
-# Save the model and processor
-model_save_path = "./saved_convnextv2_model"
-trainer.save_model(model_save_path)
-processor.save_pretrained(model_save_path)
-print(f"Model and processor saved to {model_save_path}")
\ No newline at end of file
+
+def evaluate_dataset(model, ds, compute_metrics, batch_size=16, store=None):
+    """compute_metrics streamed over a dataset outside the Trainer (used after distributed training, on rank 0)."""
+    model.eval()
+    compute_metrics.store = store
+    with torch.no_grad():
+        for batch in torch.utils.data.DataLoader(ds, batch_size=batch_size):
+            compute_metrics.update(model(pixel_values=batch["pixel_values"]).logits, batch["label"])
+    compute_metrics.store = None
+    return compute_metrics.result()
+
+
+def main():
+    # Single process by default. For CPU data-parallel training launch with torchrun, e.g.
+    #   one machine:  torchrun --nproc-per-node 4 "ConvNeXt Finetuning_v0.2.py"
+    #   CPU cluster:  torchrun --nnodes 4 --node-rank <i> --nproc-per-node 8 \
+    #                     --master-addr <node 0> --master-port 29500 "ConvNeXt Finetuning_v0.2.py"
+    # Each rank trains on a stratified shard of train_df; gradients are all-reduced over gloo.
+    rank, world_size = setup(backend="gloo")
+
+    df, class_names = find_images(DATASET_PARENT)
+
+    # save csv to dataset parent for convenience
+    csv_out = DATASET_PARENT / "sipakmed_file_list.csv"
+    if is_main_process():
+        df.to_csv(csv_out, index=False)
+        print(f"\nSaved file list to: {csv_out}")
+
+    # stratified split
+    train_df, temp_df = train_test_split(
+        df, test_size=0.2, stratify=df['label'], random_state=42
+    )
+    val_df, test_df = train_test_split(
+        temp_df, test_size=0.5, stratify=temp_df['label'], random_state=42
+    )
+
+    # Distributed: every rank keeps only its stratified shard of the (identical) training split
+    if world_size > 1:
+        train_df = train_df.iloc[stratified_shard(train_df['label'], rank, world_size)]
+        print(f"Rank {rank}/{world_size}: training on a shard of {len(train_df)} images")
+
+    print("Train size:", len(train_df))
+    print("Validation size:", len(val_df))
+    print("Test size:", len(test_df))
+
+    # Optional: check class distribution
+    print("\nTrain class counts:\n", train_df['label_name'].value_counts())
+    print("\nValidation class counts:\n", val_df['label_name'].value_counts())
+    print("\nTest class counts:\n", test_df['label_name'].value_counts())
+
+    # Define features for HF dataset
+    features = Features({
+        "image": HFImage(),                # image will be lazy-loaded
+        "label": ClassLabel(names=sorted(df['label_name'].unique()))
+    })
+
+    dataset = DatasetDict({
+        "train": df_to_ds(train_df.reset_index(drop=True), features),
+        "validation": df_to_ds(val_df.reset_index(drop=True), features),
+        "test": df_to_ds(test_df.reset_index(drop=True), features)
+    })
+
+    # Quick check
+    print(dataset)
+    print(dataset['train'][0])
+
+    model_name = "facebook/convnextv2-tiny-22k-384"
+
+    processor = AutoImageProcessor.from_pretrained(model_name)
+
+    # Load the model WITHOUT classifier weights
+
+    model = ConvNextV2ForImageClassification.from_pretrained(
+        model_name,
+        num_labels=5,  # your 5 classes
+        id2label={i: name for i, name in enumerate(dataset['train'].features['label'].names)},
+        label2id={name: i for i, name in enumerate(dataset['train'].features['label'].names)},
+        ignore_mismatched_sizes=True  # randomly initialize classifier
+    )
+
+    mean, std = processor.image_mean, processor.image_std
+
+    # Random flips / rotation / elastic / colour jitter, drawn per image and applied to
+    # whole (normalised) training batches by CustomTrainer - new variants every epoch
+    train_augment = BatchAugment(rotation=10, mean=mean, std=std)
+
+    val_transform = T.Compose([
+        T.Resize((224,224)),
+        T.ToTensor(),
+        T.Normalize(mean=mean, std=std)
+    ])
+
+    # .with_transform() runs lazily in the DataLoader, unlike .map(), which would fix
+    # one random augmentation per image for the whole run and write it to the cache
+    transform = partial(apply_transforms, transform=val_transform)
+    train_ds = dataset["train"].with_transform(transform)
+    val_ds = dataset["validation"].with_transform(transform)
+    test_ds = dataset["test"].with_transform(transform)
+
+    compute_metrics = StreamingMetrics(len(class_names))
+
+    # Defaults; pass a search winner (hparam_search.py's best_config.json) with CONVNEXT_HPARAMS
+    hparams = {
+        "per_device_train_batch_size": 16,
+        "num_train_epochs": 5,
+        "learning_rate": 5e-5,
+        "weight_decay": 0.01,
+    }
+    if os.environ.get("CONVNEXT_HPARAMS"):
+        with open(os.environ["CONVNEXT_HPARAMS"]) as f:
+            hparams.update(json.load(f))
+        print("Hyperparameters:", hparams)
+
+    training_args = TrainingArguments(
+        output_dir="./convnextv2_cervical",
+        per_device_eval_batch_size=16,
+        eval_strategy="steps",  # <-- ADD THIS LINE
+        save_strategy="steps",
+        save_steps=200,
+        eval_steps=200,
+        logging_steps=50,
+        load_best_model_at_end=True,
+        metric_for_best_model="accuracy",
+        fp16=torch.cuda.is_available(),  # AMP needs a GPU; CPU-only nodes train in fp32
+        ddp_backend="gloo",
+        remove_unused_columns=False,  # keep "image" for the on-the-fly transform
+        dataloader_num_workers=2,
+        batch_eval_metrics=True,  # compute_metrics accumulates per batch instead of on all logits at once
+        **hparams,
+    )
+
+    # Test-set logits are streamed to chunked .npy files for later analysis (prediction_store.PredictionStore)
+    test_predictions_path = Path(training_args.output_dir) / "test_predictions"
+
+    model_save_path = "./saved_convnextv2_model"
+
+    if world_size > 1:
+        def ddp_loss(ddp_model, batch):
+            pixel_values = train_augment(batch["pixel_values"])
+            return ddp_model(pixel_values=pixel_values, labels=batch["label"]).loss
+
+        # Full training state every save_steps, written in the background (one directory per rank);
+        # set CONVNEXT_RESUME=1 to continue an interrupted run from its latest checkpoint
+        checkpoint_dir = Path(training_args.output_dir) / "checkpoints" / f"rank_{rank}"
+        checkpointer = AsyncCheckpointer(checkpoint_dir, keep_last=3)
+
+        # Same optimiser settings as the Trainer run; the effective batch is 16 × world_size
+        model, history = train_ddp(
+            model, train_ds, ddp_loss,
+            epochs=int(training_args.num_train_epochs),
+            batch_size=training_args.per_device_train_batch_size,
+            lr=training_args.learning_rate,
+            weight_decay=training_args.weight_decay,
+            num_workers=training_args.dataloader_num_workers,
+            checkpointer=checkpointer,
+            checkpoint_every=training_args.save_steps,
+            resume=latest_checkpoint(checkpoint_dir) if os.environ.get("CONVNEXT_RESUME") else None,
+        )
+        checkpointer.close()
+        if is_main_process():
+            print("Validation Results:", evaluate_dataset(model, val_ds, compute_metrics))
+            print("\nEvaluating on test set...")
+            with PredictionWriter(test_predictions_path, class_names, kind='logits') as test_store:
+                print("Test Results:", evaluate_dataset(model, test_ds, compute_metrics, store=test_store))
+            model.save_pretrained(model_save_path)
+            processor.save_pretrained(model_save_path)
+        cleanup()
+    else:
+        trainer = CustomTrainer(
+            model=model,
+            args=training_args,
+            train_dataset=train_ds,         # Lazily transformed train_ds
+            eval_dataset=val_ds,          # Lazily transformed val_ds
+            processing_class=processor,
+            compute_metrics=compute_metrics,
+            augment=train_augment
+        )
+        # set CONVNEXT_RESUME=1 to continue an interrupted run from its latest complete checkpoint
+        trainer.train(resume_from_checkpoint=latest_trainer_checkpoint(training_args.output_dir)
+                      if os.environ.get("CONVNEXT_RESUME") else None)
+
+        # Evaluate on test set
+        print("\nEvaluating on test set...")
+        with PredictionWriter(test_predictions_path, class_names, kind='logits') as test_store:
+            compute_metrics.store = test_store
+            test_results = trainer.evaluate(test_ds)
+            compute_metrics.store = None
+        print("Test Results:", test_results)
+        print(f"Test logits saved to {test_predictions_path}")
+
+        # Save the model and processor
+        trainer.save_model(model_save_path)
+        processor.save_pretrained(model_save_path)
+        print(f"Model and processor saved to {model_save_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,9 @@ import numpy as np
 import pickle
 import os
 
+from phoenix_shared import hybrid_dashboard
+from phoenix_shared.tracing import configure_from_env, span
+
 # Page configuration
 st.set_page_config(
     page_title="Project Phoenix - Cell Classification",
@@ -67,13 +70,14 @@ def load_models():
     return feature_extractor, classifier, scaler, class_mapping, device
 
 # Image preprocessing
+transform = transforms.Compose([
+    transforms.Resize((IMG_SIZE, IMG_SIZE)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+
 def preprocess_image(image):
     """Preprocess image for model input."""
-    transform = transforms.Compose([
-        transforms.Resize((IMG_SIZE, IMG_SIZE)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
     return transform(image).unsqueeze(0)
 
 # Prediction function
@@ -81,24 +85,32 @@ def predict(image, feature_extractor, classifier, scaler, class_mapping, device)
     """Make prediction on an image."""
     
     # Preprocess
-    img_tensor = preprocess_image(image).to(device)
+    with span('hybrid.to_tensor'):
+        img_tensor = preprocess_image(image).to(device)
     
     # Extract features
-    with torch.no_grad():
+    with torch.no_grad(), span('hybrid.features'):
         features = feature_extractor(img_tensor).cpu().numpy()
     
     # Scale and predict
-    features_scaled = scaler.transform(features)
-    prediction = classifier.predict(features_scaled)[0]
-    probabilities = classifier.predict_proba(features_scaled)[0]
+    with span('hybrid.head'):
+        features_scaled = scaler.transform(features)
+        prediction = classifier.predict(features_scaled)[0]
+        probabilities = classifier.predict_proba(features_scaled)[0]
     
     # Get class names
     idx_to_class = {v: k for k, v in class_mapping.items()}
     
     return idx_to_class[prediction], probabilities, idx_to_class
 
+def class_labels(class_mapping):
+    """Display names in class index order."""
+    idx_to_class = {v: k for k, v in class_mapping.items()}
+    return [idx_to_class[i].replace('_', ' ').title() for i in range(len(idx_to_class))]
+
 # Main app
 def main():
+    configure_from_env()
     st.title("🔬 Project Phoenix")
     st.subheader("Cervical Cancer Cell Classification")
     st.markdown("---")
@@ -130,51 +142,86 @@ def main():
         st.error(f"Error loading models: {e}")
         st.stop()
     
-    # File upload
-    col1, col2 = st.columns(2)
+    mode = st.radio("Mode", ["Single Image", "Batch"], horizontal=True,
+                    help="Batch mode accepts multiple images and zip archives")
     
-    with col1:
-        st.subheader("Upload Cell Image")
-        uploaded_file = st.file_uploader(
-            "Choose an image...",
-            type=['bmp', 'png', 'jpg', 'jpeg']
+    if mode == "Batch":
+        hybrid_dashboard.render_batch_mode(
+            lambda images: hybrid_dashboard.predict_batch(images, transform, feature_extractor, classifier,
+                                                          scaler, device),
+            class_labels(class_mapping),
+            button_label="Classify All"
         )
+    else:
+        # File upload
+        col1, col2 = st.columns(2)
         
-        if uploaded_file is not None:
-            image = Image.open(uploaded_file).convert('RGB')
-            st.image(image, caption="Uploaded Image", use_column_width=True)
-    
-    with col2:
-        st.subheader("Classification Results")
+        with col1:
+            st.subheader("Upload Cell Image")
+            uploaded_file = st.file_uploader(
+                "Choose an image...",
+                type=['bmp', 'png', 'jpg', 'jpeg']
+            )
+        
+            if uploaded_file is not None:
+                image = Image.open(uploaded_file).convert('RGB')
+                st.image(image, caption="Uploaded Image", use_column_width=True)
+                show_cams = st.checkbox("Show class activation maps", value=True,
+                                        help="Computed from the same forward pass as the prediction")
         
-        if uploaded_file is not None:
-            if st.button("Classify", type="primary"):
-                with st.spinner("Analyzing..."):
-                    pred_class, probs, idx_to_class = predict(
-                        image, feature_extractor, classifier, scaler, class_mapping, device
-                    )
+        with col2:
+            st.subheader("Classification Results")
+        
+            if uploaded_file is not None:
+                if st.button("Classify", type="primary"):
+                    with st.spinner("Analyzing..."):
+                        if show_cams:
+                            probs, cams = hybrid_dashboard.predict_with_cams(
+                                [image], transform, feature_extractor, classifier, scaler, device
+                            )
+                            probs, cams = probs[0], cams[0]
+                            idx_to_class = {v: k for k, v in class_mapping.items()}
+                            pred_class = idx_to_class[classifier.classes_[np.argmax(probs)]]
+                        else:
+                            pred_class, probs, idx_to_class = predict(
+                                image, feature_extractor, classifier, scaler, class_mapping, device
+                            )
+                
+                    # Display prediction
+                    st.success(f"**Predicted Class:** {pred_class.replace('_', ' ').title()}")
                 
-                # Display prediction
-                st.success(f"**Predicted Class:** {pred_class.replace('_', ' ').title()}")
+                    # Probability chart
+                    st.subheader("Class Probabilities")
+                    prob_data = {
+                        idx_to_class[i].replace('_', ' ').title(): probs[i]
+                        for i in range(len(probs))
+                    }
+                    st.bar_chart(prob_data)
                 
-                # Probability chart
-                st.subheader("Class Probabilities")
-                prob_data = {
-                    idx_to_class[i].replace('_', ' ').title(): probs[i]
-                    for i in range(len(probs))
-                }
-                st.bar_chart(prob_data)
+                    # Risk assessment
+                    abnormal_classes = ['carcinoma_in_situ', 'light_dysplastic', 
+                                       'moderate_dysplastic', 'severe_dysplastic']
                 
-                # Risk assessment
-                abnormal_classes = ['carcinoma_in_situ', 'light_dysplastic', 
-                                   'moderate_dysplastic', 'severe_dysplastic']
+                    if pred_class in abnormal_classes:
+                        st.warning("⚠️ **Abnormal cell detected.** Please consult a medical professional.")
+                    else:
+                        st.info("✅ Cell appears normal.")
                 
-                if pred_class in abnormal_classes:
-                    st.warning("⚠️ **Abnormal cell detected.** Please consult a medical professional.")
-                else:
-                    st.info("✅ Cell appears normal.")
-        else:
-            st.info("Please upload an image to classify.")
+                    if show_cams:
+                        overlays = hybrid_dashboard.cam_overlays(image, cams, size=IMG_SIZE)
+                        pred_idx = int(np.argmax(probs))
+                        st.subheader("Class Activation Map")
+                        st.image(overlays[pred_idx], caption=f"Evidence for {pred_class.replace('_', ' ').title()}",
+                                 use_column_width=True)
+            
+                        with st.expander("Class activation maps for every class"):
+                            cam_cols = st.columns(4)
+                            for i, overlay in enumerate(overlays):
+                                with cam_cols[i % 4]:
+                                    st.image(overlay, use_column_width=True)
+                                    st.caption(f"{idx_to_class[i].replace('_', ' ').title()} ({probs[i] * 100:.1f}%)")
+            else:
+                st.info("Please upload an image to classify.")
     
     # Footer
     st.markdown("---")
@@ -14,6 +14,9 @@ import pickle
 import cv2
 import matplotlib.pyplot as plt
 
+from phoenix_shared import hybrid_dashboard
+from phoenix_shared.tracing import configure_from_env, span
+
 # Page configuration
 st.set_page_config(
     page_title="SiPakMED Cell Classifier",
@@ -68,48 +71,61 @@ def load_models():
     
     return feature_extractor, classifier, scaler, device
 
+def preprocess_for_model(image, apply_preprocessing=True):
+    """RGB conversion plus optional NLM + CLAHE; returns the processed PIL image."""
+    with span("hybrid.preprocess"):
+        img_array = np.array(image)
+        if len(img_array.shape) == 2:
+            img_array = cv2.cvtColor(img_array, cv2.COLOR_GRAY2RGB)
+        elif img_array.shape[2] == 4:
+            img_array = cv2.cvtColor(img_array, cv2.COLOR_RGBA2RGB)
+        
+        img_bgr = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+        
+        if apply_preprocessing:
+            img_bgr = apply_nlm_denoising(img_bgr)
+            img_bgr = apply_clahe(img_bgr)
+        
+        img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+        return Image.fromarray(img_rgb)
+
+# Transform
+transform = transforms.Compose([
+    transforms.Resize((IMG_SIZE, IMG_SIZE)),
+    transforms.ToTensor(),
+    transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+])
+
 def predict(image, feature_extractor, classifier, scaler, device, apply_preprocessing=True):
     """Make prediction on an image."""
     # Preprocessing
-    img_array = np.array(image)
-    if len(img_array.shape) == 2:
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_GRAY2RGB)
-    elif img_array.shape[2] == 4:
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_RGBA2RGB)
-    
-    img_bgr = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-    
-    if apply_preprocessing:
-        img_bgr = apply_nlm_denoising(img_bgr)
-        img_bgr = apply_clahe(img_bgr)
+    processed_image = preprocess_for_model(image, apply_preprocessing)
     
-    img_rgb = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
-    processed_image = Image.fromarray(img_rgb)
-    
-    # Transform
-    transform = transforms.Compose([
-        transforms.Resize((IMG_SIZE, IMG_SIZE)),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-    
-    img_tensor = transform(processed_image).unsqueeze(0).to(device)
+    with span("hybrid.to_tensor"):
+        img_tensor = transform(processed_image).unsqueeze(0).to(device)
     
     # Extract features
-    with torch.no_grad():
+    with torch.no_grad(), span("hybrid.features"):
         features = feature_extractor(img_tensor)
     
     # Scale and predict
-    features_np = features.cpu().numpy()
-    features_scaled = scaler.transform(features_np)
-    
-    prediction = classifier.predict(features_scaled)[0]
-    probabilities = classifier.predict_proba(features_scaled)[0]
+    with span("hybrid.head"):
+        features_np = features.cpu().numpy()
+        features_scaled = scaler.transform(features_np)
+        
+        prediction = classifier.predict(features_scaled)[0]
+        probabilities = classifier.predict_proba(features_scaled)[0]
     
     return prediction, probabilities, processed_image
 
+def predict_batch(images, feature_extractor, classifier, scaler, device, apply_preprocessing=True):
+    """Class probabilities for a list of images in one forward pass, shape (N, 5)."""
+    processed = [preprocess_for_model(image, apply_preprocessing) for image in images]
+    return hybrid_dashboard.predict_batch(processed, transform, feature_extractor, classifier, scaler, device)
+
 # Main app
 def main():
+    configure_from_env()
     st.title("🔬 SiPakMED Cervical Cell Classifier")
     st.markdown("**Hybrid Model: ResNet50 Feature Extractor + Logistic Regression**")
     st.markdown("---")
@@ -117,6 +133,8 @@ def main():
     # Sidebar
     st.sidebar.header("Settings")
     apply_preprocessing = st.sidebar.checkbox("Apply NLM + CLAHE preprocessing", value=True)
+    show_cams = st.sidebar.checkbox("Show class activation maps", value=True,
+                                    help="Computed from the same forward pass as the prediction")
     
     st.sidebar.markdown("---")
     st.sidebar.header("About")
@@ -138,6 +156,17 @@ def main():
         st.info("Please ensure model files exist in the 'models' directory.")
         return
     
+    mode = st.radio("Mode", ["Single Image", "Batch"], horizontal=True,
+                    help="Batch mode accepts multiple images and zip archives")
+    if mode == "Batch":
+        hybrid_dashboard.render_batch_mode(
+            lambda images: predict_batch(images, feature_extractor, classifier, scaler, device, apply_preprocessing),
+            CLASS_NAMES,
+            settings=apply_preprocessing,
+            uploader_label="Upload cervical cell images or zip archives"
+        )
+        return
+    
     # File uploader
     uploaded_file = st.file_uploader(
         "Upload a cervical cell image",
@@ -155,9 +184,17 @@ def main():
         
         # Make prediction
         with st.spinner("Analyzing image..."):
-            prediction, probabilities, processed = predict(
-                image, feature_extractor, classifier, scaler, device, apply_preprocessing
-            )
+            if show_cams:
+                processed = preprocess_for_model(image, apply_preprocessing)
+                probabilities, cams = hybrid_dashboard.predict_with_cams(
+                    [processed], transform, feature_extractor, classifier, scaler, device
+                )
+                probabilities, cams = probabilities[0], cams[0]
+                prediction = classifier.classes_[np.argmax(probabilities)]
+            else:
+                prediction, probabilities, processed = predict(
+                    image, feature_extractor, classifier, scaler, device, apply_preprocessing
+                )
         
         with col2:
             st.subheader("Processed Image")
@@ -184,6 +221,17 @@ def main():
             ax.text(v + 1, i, f"{v:.1f}%", va="center")
         plt.tight_layout()
         st.pyplot(fig)
+        
+        # Class activation maps
+        if show_cams:
+            st.subheader("Class Activation Maps")
+            st.caption("Regions whose features raised each class's score (red = strongest evidence)")
+            overlays = hybrid_dashboard.cam_overlays(processed, cams, size=IMG_SIZE)
+            cam_cols = st.columns(len(CLASS_NAMES))
+            for i, class_name in enumerate(CLASS_NAMES):
+                with cam_cols[i]:
+                    st.image(overlays[i], use_container_width=True)
+                    st.caption(f"{'**' + class_name + '**' if i == prediction else class_name} ({probabilities[i] * 100:.1f}%)")
 
 if __name__ == "__main__":
     main()